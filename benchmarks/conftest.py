@@ -0,0 +1,44 @@
+""" Benchmarks of the frame and input pipeline. They only need numpy, pytest and pytest-benchmark:
+
+    pip install -r requirements_benchmarks.txt
+    pytest benchmarks --benchmark-autosave
+    pytest-benchmark compare
+"""
+
+import sys
+from os import path
+
+import pytest
+
+
+# The shared renderer modules are imported as siblings, the same way the renderer scripts do.
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'blender_web', 'scripts'))
+
+
+RESOLUTIONS = (
+    (640, 360),
+    (1280, 720),
+    (1920, 1080),
+)
+
+
+@pytest.fixture(params=RESOLUTIONS, ids=lambda resolution: '%dx%d' % resolution)
+def resolution(request):
+    return request.param
+
+
+@pytest.fixture
+def make_ring():
+    """ FrameRing factory. Every ring is closed and unlinked after the test. """
+    from bws_frames import FrameRing
+    rings = []
+
+    def _make_ring(width: int, height: int, channels: int = 4, slot_count: int = 1):
+        ring = FrameRing.create(width, height, channels, slot_count)
+        rings.append(ring)
+        return ring
+
+    yield _make_ring
+    for ring in rings:
+        ring.close()
+        ring.unlink()
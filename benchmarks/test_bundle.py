@@ -0,0 +1,95 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from bws_bundle import HTML_DIR, SVG_BETWEEN_TAGS, AssetBundle, bundle_path, bundle_url, renderer_url, to_http_url
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'html'
+    shutil.copytree(HTML_DIR, root)
+    return str(root)
+
+
+def test_urls():
+    url = bundle_url('color_picker.html')
+    assert url == 'bws://addon/color_picker.html'
+    assert to_http_url(url) == 'http://bws.local/color_picker.html'
+    assert to_http_url('https://blender.org/') == 'https://blender.org/'
+    assert bundle_path(url) == bundle_path(to_http_url(url)) == 'color_picker.html'
+    assert bundle_path('bws://addon/images/svg/a%20b.svg?v=1') == 'images/svg/a b.svg'
+    assert bundle_path('https://blender.org/') is None
+    # Renderer urls.
+    assert renderer_url(url) == to_http_url(url)
+    for web_url in ('http://localhost:8000/', 'HTTPS://blender.org/', 'file:///tmp/page.html'):
+        assert renderer_url(web_url) == web_url
+    assert renderer_url('ftp://blender.org/') is None
+    assert renderer_url('hub://127.0.0.1:8765/view') is None
+
+
+def test_bundle_content(tree):
+    bundle = AssetBundle.build(tree)
+    page = bundle.get('color_picker.html')
+    with open(os.path.join(tree, 'color_picker.html'), 'rb') as f:
+        assert page.data.tobytes() == f.read()
+    assert page.mime == 'text/html'
+    assert page.headers()['ETag'] == f'"{page.etag}"'
+    # Minified SVGs, still parseable markup.
+    svgs = [p for p in bundle.index if p.endswith('.svg')]
+    assert svgs
+    for svg in svgs:
+        asset = bundle.get(svg)
+        assert asset.mime == 'image/svg+xml'
+        data = asset.data.tobytes()
+        assert not SVG_BETWEEN_TAGS.search(data) and b'<!--' not in data and data.startswith(b'<')
+    assert bundle.get('missing.html') is None
+
+    unpacked = AssetBundle.unpack(bundle.pack())
+    assert unpacked.index == bundle.index
+    assert unpacked.get('color_picker.html').data.tobytes() == page.data.tobytes()
+    assert AssetBundle.unpack(b'nope') is None
+
+
+def test_identical_files_stored_once(tree):
+    with open(os.path.join(tree, 'copy.html'), 'wb') as f:
+        f.write(AssetBundle.build(tree).get('test_web.html').data.tobytes())
+    bundle = AssetBundle.build(tree)
+    assert bundle.index['copy.html'][:2] == bundle.index['test_web.html'][:2]
+
+
+def test_cached_pack(tree, tmp_path):
+    cache = str(tmp_path / 'cache')
+    first = AssetBundle.load(tree, cache)
+    assert not first.from_cache
+    second = AssetBundle.load(tree, cache)
+    assert second.from_cache and second.content_hash == first.content_hash
+
+    # Any change invalidates the pack, the stale one is removed.
+    with open(os.path.join(tree, 'test_web.html'), 'ab') as f:
+        f.write(b'<!-- edited -->')
+    third = AssetBundle.load(tree, cache)
+    assert not third.from_cache and third.content_hash != first.content_hash
+    assert len(os.listdir(cache)) == 1
+    assert AssetBundle.load(tree, cache).from_cache
+
+
+def test_load_cold(benchmark, tree, tmp_path):
+    """ First launch: every asset is read, minified and hashed, then packed. """
+    cache = str(tmp_path / 'cache')
+
+    def _cold():
+        shutil.rmtree(cache, ignore_errors=True)
+        return AssetBundle.load(tree, cache)
+
+    assert not benchmark(_cold).from_cache
+
+
+def test_load_warm(benchmark, tree, tmp_path):
+    """ Next launches: the tree is listed and the cached pack is read in one go. """
+    cache = str(tmp_path / 'cache')
+    AssetBundle.load(tree, cache)
+    assert benchmark(AssetBundle.load, tree, cache).from_cache
@@ -0,0 +1,31 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_frames import rgba8_to_float32
+
+
+@pytest.fixture
+def rgba8(resolution):
+    width, height = resolution
+    return np.random.default_rng(0).integers(0, 256, width * height * 4, dtype=np.uint8).tobytes()
+
+
+def test_rgba8_to_float32(benchmark, rgba8):
+    out = np.empty(len(rgba8), dtype=np.float32)
+    benchmark(rgba8_to_float32, rgba8, out)
+    assert out.max() <= 1.0
+
+
+def test_rgba8_to_float32_legacy(benchmark, rgba8):
+    """ Reference: the previous OnPaint pipeline (array -> astype -> divide -> flatten -> copy). """
+    out = np.empty(len(rgba8), dtype=np.float32)
+
+    def legacy():
+        arr = np.array(np.frombuffer(rgba8, dtype=np.uint8))
+        arr = arr.astype(np.float32)
+        arr /= 255.0
+        out[:] = arr.flatten()[:]
+
+    benchmark(legacy)
@@ -0,0 +1,118 @@
+import shutil
+import struct
+import zlib
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_export import BACKPRESSURE, EXPORT_FORMAT, FrameExporter, encode_exr, encode_frame, encode_png, srgb_to_linear
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """ Minimal decoder for encode_png() output (RGBA8, 'Sub' filter). """
+    width, height = struct.unpack_from('>II', data, 16)
+    idat_size = struct.unpack_from('>I', data, 33)[0]
+    rows = np.frombuffer(zlib.decompress(data[41:41 + idat_size]), dtype=np.uint8).reshape(height, width * 4 + 1)
+    assert (rows[:, 0] == 1).all()
+    pixels = rows[:, 1:].copy()
+    for x in range(4, width * 4, 4):
+        pixels[:, x:x + 4] += pixels[:, x - 4:x]
+    return pixels.reshape(height, width, 4)
+
+
+def decode_exr(data: bytes, width: int, height: int) -> np.ndarray:
+    """ Minimal decoder for encode_exr() output (half ABGR, ZIPS). """
+    header_end = data.index(b'screenWindowWidth\0float\0') + len('screenWindowWidth\0float\0') + 4 + 4 + 1
+    offsets = struct.unpack_from(f'<{height}Q', data, header_end)
+    row_bytes = width * 4 * 2
+    image = np.empty((height, row_bytes), dtype=np.uint8)
+    for offset in offsets:
+        y, size = struct.unpack_from('<ii', data, offset)
+        chunk = data[offset + 8:offset + 8 + size]
+        if size == row_bytes:
+            image[y] = np.frombuffer(chunk, dtype=np.uint8)
+            continue
+        predicted = np.frombuffer(zlib.decompress(chunk), dtype=np.uint8)
+        reordered = np.empty_like(predicted)
+        reordered[0] = predicted[0]
+        reordered[1:] = (predicted[0] + np.cumsum(predicted[1:].astype(np.int64) - 128)) & 0xFF
+        half = (row_bytes + 1) // 2
+        image[y, 0::2] = reordered[:half]
+        image[y, 1::2] = reordered[half:]
+    planes = image.view('<f2').reshape(height, 4, width).transpose(0, 2, 1)
+    return planes[..., [3, 2, 1, 0]].astype(np.float32)
+
+
+@pytest.fixture
+def rgba8():
+    rng = np.random.default_rng(0)
+    image = np.zeros((90, 160, 4), dtype=np.uint8)
+    image[20:60, 30:120] = rng.integers(0, 256, (40, 90, 4), dtype=np.uint8)
+    return image
+
+
+def test_png_roundtrip(rgba8):
+    assert np.array_equal(decode_png(encode_png(rgba8)), rgba8)
+
+
+def test_exr_roundtrip(rgba8):
+    linear = srgb_to_linear(rgba8 * np.float32(1 / 255))
+    decoded = decode_exr(encode_exr(linear), 160, 90)
+    assert np.allclose(decoded, linear.astype(np.float16).astype(np.float32))
+
+
+@pytest.mark.parametrize('fmt', (EXPORT_FORMAT.PNG, EXPORT_FORMAT.EXR))
+def test_exporter_sequence(tmp_path, rgba8, fmt):
+    exporter = FrameExporter(str(tmp_path), 160, 90, fmt=fmt, policy=BACKPRESSURE.QUEUE, workers=2, max_queued=16)
+    frames = [np.roll(rgba8, i * 8, axis=1) * np.float32(1 / 255) for i in range(6)]
+    for frame in frames:
+        assert exporter.submit(frame)
+    exporter.close()
+    assert (exporter.written, exporter.dropped, exporter.errors) == (6, 0, 0)
+    if fmt == EXPORT_FORMAT.PNG:
+        for index, frame in enumerate(frames):
+            with open(exporter.output % index, 'rb') as f:
+                assert np.array_equal(decode_png(f.read()), (frame * 255 + 0.5).astype(np.uint8))
+
+
+def test_exporter_drop_policy(tmp_path, rgba8):
+    """ Backpressure: with a single staging buffer, frames submitted faster than written are dropped. """
+    exporter = FrameExporter(str(tmp_path), 160, 90, dtype=np.uint8, policy=BACKPRESSURE.DROP, workers=1, staging_slots=1)
+    accepted = sum(exporter.submit(rgba8) for _ in range(10))
+    exporter.close()
+    assert accepted < 10
+    assert exporter.written == accepted
+    assert exporter.dropped == 10 - accepted
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg not installed")
+def test_exporter_ffmpeg(tmp_path, rgba8):
+    exporter = FrameExporter(str(tmp_path), 160, 90, dtype=np.uint8, fmt=EXPORT_FORMAT.FFMPEG, policy=BACKPRESSURE.QUEUE)
+    for i in range(10):
+        exporter.submit(np.roll(rgba8, i, axis=1))
+    exporter.close()
+    assert exporter.written == 10
+    assert (tmp_path / 'frame.mp4').stat().st_size > 0
+
+
+def test_export_submit(benchmark, tmp_path, resolution):
+    """ Cost on the consuming thread: stage a float32 frame (the encoding runs in the pool). """
+    width, height = resolution
+    frame = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+    exporter = FrameExporter(str(tmp_path), width, height, policy=BACKPRESSURE.DROP, workers=1, staging_slots=2)
+    benchmark(exporter.submit, frame)
+    exporter.close()
+    benchmark.extra_info['written'] = exporter.written
+    benchmark.extra_info['dropped'] = exporter.dropped
+
+
+@pytest.mark.parametrize('fmt', (EXPORT_FORMAT.PNG, EXPORT_FORMAT.EXR))
+def test_encode_frame(benchmark, resolution, fmt):
+    """ Encoding cost of a worker, per frame. """
+    width, height = resolution
+    frame = np.zeros((height, width, 4), dtype=np.float32)
+    frame[height // 4:height // 2, width // 4:width // 2] = np.random.default_rng(0).random((height // 2 - height // 4, width // 2 - width // 4, 4))
+    data = benchmark(encode_frame, frame, fmt)
+    benchmark.extra_info['bytes'] = len(data)
@@ -0,0 +1,34 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.mark.parametrize('slot_count', (1, 3))
+def test_ring_handshake(benchmark, make_ring, slot_count):
+    """ Slot state machine and header overhead, without pixel copies. """
+    ring = make_ring(64, 64, 4, slot_count)
+
+    def handshake():
+        slot = ring.acquire_write()
+        ring.publish(slot, 1, 0, 0, 0, 0)
+        ring.release(ring.acquire_read())
+
+    benchmark(handshake)
+
+
+@pytest.mark.parametrize('slot_count', (1, 3))
+def test_ring_frame_throughput(benchmark, make_ring, resolution, slot_count):
+    """ Producer copy into a slot + publish + consumer acquire/release. """
+    width, height = resolution
+    ring = make_ring(width, height, 4, slot_count)
+    frame = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+
+    def roundtrip():
+        slot = ring.acquire_write()
+        ring.pixels(slot)[:] = frame
+        ring.publish(slot, 1, 0, 0, 0, 0)
+        ring.release(ring.acquire_read())
+
+    benchmark(roundtrip)
+    benchmark.extra_info['bytes_per_frame'] = frame.nbytes
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_frames import copy_alpha, pixel_alpha
+
+
+POINTS = 1000
+
+
+def test_pixel_alpha(benchmark, resolution):
+    width, height = resolution
+    pixels = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+    rng = np.random.default_rng(1)
+    points = list(zip(rng.integers(0, width, POINTS).tolist(), rng.integers(0, height, POINTS).tolist()))
+
+    def hit_test():
+        hits = 0
+        for x, y in points:
+            if pixel_alpha(pixels, width, height, x, y) > 0.01:
+                hits += 1
+        return hits
+
+    benchmark(hit_test)
+
+
+def test_copy_alpha():
+    pixels = np.random.default_rng(0).random(8 * 4 * 4, dtype=np.float32)
+    alpha = copy_alpha(pixels)
+    assert alpha.size == 8 * 4 and not np.shares_memory(alpha, pixels)
+    for x, y in ((0, 0), (7, 3), (3, 2)):
+        assert pixel_alpha(alpha, 8, 4, x, y, channels=1) == pixel_alpha(pixels, 8, 4, x, y)
+    # Reused when the size matches, replaced when the frame size changed.
+    assert copy_alpha(pixels, alpha) is alpha
+    assert copy_alpha(pixels[:16 * 4], alpha).size == 16
+
+
+def test_copy_alpha_speed(benchmark, resolution):
+    """ Per-frame cost of keeping the hit test pixels after the slot is released. """
+    width, height = resolution
+    pixels = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+    out = np.empty(width * height, dtype=np.float32)
+    benchmark(copy_alpha, pixels, out)
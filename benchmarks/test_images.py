@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_images import SharedImages, response_headers
+from bws_mock import MockHost
+from bws_protocol import SOCKET_SIGNAL
+
+
+@pytest.fixture
+def shared_images():
+    images = SharedImages.create('bws_test_images', capacity=1 << 20)
+    yield images
+    images.close()
+    images.unlink()
+
+
+def test_publish_read(shared_images):
+    rng = np.random.default_rng(0)
+    color = rng.random((30, 40, 4), dtype=np.float32)
+    mask = rng.integers(0, 256, (20, 10, 1), dtype=np.uint8)
+    assert shared_images.publish('color', color, flip_y=True) == 2
+    assert shared_images.publish('mask', mask) == 2
+    assert shared_images.publish('color', color) == 4
+
+    renderer_side = SharedImages.attach('bws_test_images')
+    info, pixels = renderer_side.read_array('color')
+    assert (info.width, info.height, info.channels, info.version) == (40, 30, 4, 4)
+    assert np.array_equal(pixels, color)
+    info, pixels = renderer_side.read_array('mask')
+    assert np.array_equal(pixels, mask)
+    assert response_headers(info)['X-BWS-Dtype'] == 'uint8'
+    assert [info.name for info in renderer_side.images()] == ['color', 'mask']
+    assert renderer_side.read('missing') == (None, None)
+    renderer_side.close()
+
+
+def test_publish_reuses_regions(shared_images):
+    small = np.zeros((16, 16, 4), dtype=np.float32)
+    shared_images.publish('a', small)
+    used = shared_images.used
+    # Same size or smaller: in place.
+    shared_images.publish('a', small[:8])
+    assert shared_images.used == used
+    # A removed entry is reused by an image that fits in it.
+    assert shared_images.remove('a')
+    shared_images.publish('b', small)
+    assert shared_images.used == used
+    assert shared_images.find('a') is None
+    # No room left.
+    huge = np.zeros((1024, 1024, 4), dtype=np.float32)
+    assert not shared_images.fits('c', huge.nbytes)
+    assert shared_images.publish('c', huge) is None
+
+
+def test_mock_renderer_shows_shared_image():
+    """ Blender shares an image, the renderer reads it from the SHM and the next frames show it. """
+    image = np.zeros((20, 30, 4), dtype=np.float32)
+    image[..., 0] = 1.0
+    image[..., 3] = 1.0
+    with MockHost(160, 90, url='mock://full') as host:
+        host.wait_frame()
+        host.share_image('red', image)
+        # Painted after the image was read: the control message comes first on the socket.
+        input_id = host.send_input(SOCKET_SIGNAL.MOUSE_MOVE, 100, 50)
+        while True:
+            slot = host.ring.acquire_read()
+            if slot is None:
+                continue
+            header = host.ring.read_header(slot)
+            pixels = host.ring.pixels(slot).reshape(90, 160, 4).copy()
+            host.ring.release(slot)
+            if header.input_id >= input_id:
+                break
+    assert np.array_equal(pixels[:20, :30], image)
+
+
+def test_publish(benchmark, resolution):
+    """ Blender side cost of sharing an image of the size of the view (float32, flipped). """
+    width, height = resolution
+    images = SharedImages.create('bws_bench_images', capacity=width * height * 16)
+    pixels = np.random.default_rng(0).random((height, width, 4), dtype=np.float32)
+    benchmark(images.publish, 'image', pixels, True)
+    images.close()
+    images.unlink()
+
+
+def test_read(benchmark, resolution):
+    """ Renderer side: consistent copy handed to the page. """
+    width, height = resolution
+    images = SharedImages.create('bws_bench_images', capacity=width * height * 16)
+    images.publish('image', np.zeros((height, width, 4), dtype=np.float32))
+    info, data = benchmark(images.read, 'image')
+    assert len(data) == info.nbytes
+    images.close()
+    images.unlink()
@@ -0,0 +1,132 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_mip import MipRequester, Viewport, mip_level, visible_part
+from bws_pipeline import FramePipeline
+
+
+PAGE = (1920, 1080)
+# Page drawn over view space (0, -1080) -> (1920, 0).
+PAGE_RECT = (0.0, -1080.0, 1920.0, 0.0)
+
+
+def view_rect(center_x: float, center_y: float, zoom: float, region=(1280, 720)):
+    half_w = region[0] / zoom / 2
+    half_h = region[1] / zoom / 2
+    return center_x - half_w, center_y - half_h, center_x + half_w, center_y + half_h
+
+
+def test_mip_level():
+    assert mip_level(2.0) == 0
+    assert mip_level(1.0) == 0
+    assert mip_level(0.6) == 0
+    assert mip_level(0.5) == 1
+    assert mip_level(0.2) == 2
+    assert mip_level(0.001) == 4
+
+
+def test_viewport_crop():
+    viewport = Viewport(2, 64, 128, 300, 200)
+    assert viewport.paint_size(*PAGE) == (480, 270)
+    assert viewport.crop() == (16, 32, 75, 50)
+    assert Viewport.full(*PAGE).crop() == (0, 0, *PAGE)
+    assert viewport.pixel_fraction(*PAGE) == pytest.approx(75 * 50 / (1920 * 1080))
+
+
+def test_visible_part():
+    # Whole page visible.
+    assert visible_part(PAGE_RECT, (-100, -2000, 3000, 100), PAGE) == (0, 0, *PAGE)
+    # Top-left corner of the page (view y up, page y down), snapped and padded.
+    assert visible_part(PAGE_RECT, (-10, -100, 100, 10), PAGE, grid=64) == (0, 0, 192, 192)
+    assert visible_part(PAGE_RECT, (2000, -100, 2100, 10), PAGE) is None
+
+
+def test_requester_reuses_viewport():
+    mip = MipRequester(*PAGE)
+    first = mip.update(1.0, PAGE_RECT, view_rect(600, -500, 1.0))
+    assert first is not None and first.level == 0
+    # Small pans stay inside the padded request.
+    assert mip.update(1.0, PAGE_RECT, view_rect(620, -490, 1.0)) is None
+    # Leaving it requests a new one.
+    assert mip.update(1.0, PAGE_RECT, view_rect(1200, -500, 1.0)) is not None
+    assert mip.requests == 2
+
+
+def test_requester_rollback():
+    mip = MipRequester(*PAGE)
+    rect = view_rect(600, -500, 1.0)
+    first = mip.update(1.0, PAGE_RECT, rect)
+    # Not sent: the same view requests it again.
+    mip.rollback()
+    assert mip.viewport is None and mip.requests == 0
+    assert mip.update(1.0, PAGE_RECT, rect) == first
+    # Rolls back to the previous request, once.
+    assert mip.update(0.3, PAGE_RECT, view_rect(960, -540, 0.3)).level > 0
+    mip.rollback()
+    mip.rollback()
+    assert (mip.level, mip.viewport, mip.requests) == (0, first, 1)
+
+
+def test_requester_hysteresis():
+    mip = MipRequester(*PAGE)
+    center = view_rect(960, -540, 0.48)
+    assert mip.update(0.48, PAGE_RECT, center).level == 0
+    # Past the level boundary by more than the hysteresis.
+    assert mip.update(0.4, PAGE_RECT, view_rect(960, -540, 0.4)).level == 1
+    # Back just above the boundary: keeps level 1.
+    assert mip.update(0.55, PAGE_RECT, view_rect(960, -540, 0.55)) is None
+    assert mip.level == 1
+    assert mip.update(0.9, PAGE_RECT, view_rect(960, -540, 0.9)).level == 0
+    assert mip.pixel_fraction < 1.0
+
+
+def test_pipeline_crop(make_ring):
+    width, height = PAGE
+    viewport = Viewport(1, 128, 64, 512, 256)
+    paint_size = viewport.paint_size(width, height)
+    paint = np.random.default_rng(0).integers(0, 256, paint_size[0] * paint_size[1] * 4, dtype=np.uint8)
+
+    pipeline = FramePipeline(make_ring(width, height, 4, 3))
+    try:
+        ring = pipeline.ring
+        pipeline.set_crop(paint_size, viewport.crop())
+        pipeline.process(ring.acquire_write(), paint.ctypes.data, input_id=3)
+        assert pipeline.wait(timeout=5.0)
+        slot = ring.acquire_read()
+        header = ring.read_header(slot)
+        x, y, crop_width, crop_height = viewport.crop()
+        assert ring.frame_size(header) == (crop_width, crop_height)
+        pixels = ring.frame_pixels(slot, (crop_width, crop_height)).reshape(crop_height, crop_width, 4)
+        source = paint.reshape(paint_size[1], paint_size[0], 4)[y:y + crop_height, x:x + crop_width]
+        assert np.allclose(pixels[..., 0], source[..., 2] / 255.0)
+        ring.release(slot)
+
+        # Back to whole paints of the ring size.
+        pipeline.set_crop(None, None)
+        full = np.zeros(width * height * 4, dtype=np.uint8)
+        pipeline.process(ring.acquire_write(), full.ctypes.data)
+        assert pipeline.wait(timeout=5.0)
+        slot = ring.acquire_read()
+        assert ring.frame_size(ring.read_header(slot)) == (width, height)
+        ring.release(slot)
+
+        with pytest.raises(ValueError):
+            pipeline.set_crop(paint_size, (paint_size[0] - 10, 0, 64, 64))
+    finally:
+        pipeline.close()
+
+
+def test_requester_update(benchmark):
+    """ Per-draw cost of the viewport check while panning inside a request. """
+    mip = MipRequester(*PAGE)
+    mip.update(0.3, PAGE_RECT, view_rect(960, -540, 0.3))
+    rects = [view_rect(960 + dx, -540, 0.3) for dx in range(0, 32, 4)]
+
+    def update():
+        for rect in rects:
+            mip.update(0.3, PAGE_RECT, rect)
+
+    benchmark(update)
+    assert mip.requests == 1
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_mock import MockHost
+from bws_protocol import SOCKET_SIGNAL
+
+
+@pytest.mark.parametrize('mode', ('full', 'partial', 'animated'))
+def test_input_to_frame(benchmark, resolution, mode):
+    """ Input sent by the host until a frame reflecting it is consumed, through the mock renderer process. """
+    width, height = resolution
+    with MockHost(width, height, url=f'mock://{mode}?fps=60') as host:
+        host.wait_frame(timeout=10.0)
+        position = [0]
+
+        def input_to_frame():
+            position[0] = (position[0] + 7) % width
+            input_id = host.send_input(SOCKET_SIGNAL.MOUSE_MOVE, position[0], height // 2)
+            return host.wait_frame(input_id)
+
+        header = benchmark.pedantic(input_to_frame, rounds=50, warmup_rounds=5)
+        assert header.input_id > 0
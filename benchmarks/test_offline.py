@@ -0,0 +1,63 @@
+import socket
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_mock import MockHost
+
+
+FRAMES = range(1, 9)
+
+
+def render_sequence(host, prefetch):
+    return [host.render_frame(frame, prefetch=prefetch) for frame in FRAMES]
+
+
+def test_offline_frames_are_deterministic():
+    """ Same frames, same pixels: with or without prefetch, and after going back in time. """
+    with MockHost(160, 90, slot_count=3, url='mock://animated', offline=True) as host:
+        serial = render_sequence(host, prefetch=0)
+        prefetched = render_sequence(host, prefetch=1)
+        _header, again = host.render_frame(FRAMES[2])
+    for (_, a), (_, b) in zip(serial, prefetched):
+        assert np.array_equal(a, b)
+    assert np.array_equal(again, serial[2][1])
+    assert not np.array_equal(serial[0][1], serial[1][1])
+
+
+def test_offline_prefetch_stale_frames():
+    """ A prefetched frame that is not wanted anymore is skipped and its slot freed. """
+    with MockHost(64, 32, slot_count=3, url='mock://animated', offline=True) as host:
+        header, _pixels = host.render_frame(10, prefetch=1)
+        # Frame 11 was prefetched, jump elsewhere instead.
+        jump, _pixels = host.render_frame(3)
+        assert jump.input_id > header.input_id + 1
+        assert not host.offline_requests.requested
+
+
+def test_offline_http_url():
+    """ Plain http pages (local dev servers) launch like the other web urls. """
+    with MockHost(64, 32, slot_count=3, url='http://localhost:8000/page.html', offline=True) as host:
+        header, _pixels = host.render_frame(1)
+        assert header is not None
+
+
+def test_unsupported_url_exits():
+    host = MockHost(64, 32, url='ftp://localhost/page.html')
+    try:
+        with pytest.raises(socket.timeout):
+            host.start(timeout=2.0)
+        assert host.process.wait(timeout=5) == 1
+    finally:
+        host.stop()
+
+
+@pytest.mark.parametrize('prefetch', (0, 1))
+def test_offline_sequence(benchmark, resolution, prefetch):
+    """ Offline render of a frame sequence, one request/acquire/copy per frame, with or without prefetch. """
+    width, height = resolution
+    with MockHost(width, height, slot_count=3, url='mock://animated', offline=True) as host:
+        host.render_frame(0)
+        benchmark.pedantic(render_sequence, args=(host, prefetch), rounds=3)
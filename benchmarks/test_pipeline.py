@@ -0,0 +1,80 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_pipeline import FramePipeline
+
+
+@pytest.fixture
+def bgra8(resolution):
+    width, height = resolution
+    return np.random.default_rng(0).integers(0, 256, width * height * 4, dtype=np.uint8)
+
+
+@pytest.fixture
+def make_pipeline(make_ring):
+    pipelines = []
+
+    def _make_pipeline(width: int, height: int, **kwargs):
+        pipeline = FramePipeline(make_ring(width, height, 4, 3), **kwargs)
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield _make_pipeline
+    for pipeline in pipelines:
+        pipeline.close()
+
+
+def test_pipeline_paint_callback(benchmark, make_pipeline, resolution, bgra8):
+    """ Time spent in the paint callback: claim a slot, snapshot and submit. """
+    pipeline = make_pipeline(*resolution, skip_unchanged=False)
+    ring = pipeline.ring
+
+    def paint():
+        slot = ring.acquire_write()
+        pipeline.process(slot, bgra8.ctypes.data)
+
+    def setup():
+        pipeline.wait()
+        slot = ring.acquire_read()
+        if slot is not None:
+            ring.release(slot)
+
+    benchmark.pedantic(paint, setup=setup, rounds=20)
+    pipeline.wait()
+
+
+def test_pipeline_frame(benchmark, make_pipeline, resolution, bgra8):
+    """ Paint callback to published frame (convert + tile hashes on the workers). """
+    pipeline = make_pipeline(*resolution)
+    ring = pipeline.ring
+
+    def frame():
+        bgra8[0] ^= 1
+        pipeline.process(ring.acquire_write(), bgra8.ctypes.data, input_id=1)
+        pipeline.wait()
+        ring.release(ring.acquire_read())
+
+    benchmark(frame)
+
+
+def test_pipeline_output(make_pipeline, resolution, bgra8):
+    width, height = resolution
+    pipeline = make_pipeline(width, height)
+    ring = pipeline.ring
+    pipeline.process(ring.acquire_write(), bgra8.tobytes(), input_id=7)
+    assert pipeline.wait(timeout=5.0)
+    slot = ring.acquire_read()
+    assert ring.read_header(slot).input_id == 7
+    pixels = ring.pixels(slot).reshape(height, width, 4)
+    source = bgra8.reshape(height, width, 4)
+    assert np.allclose(pixels[..., 0], source[..., 2] / 255.0)
+    assert np.allclose(pixels[..., 2], source[..., 0] / 255.0)
+    assert np.allclose(pixels[..., 3], source[..., 3] / 255.0)
+    ring.release(slot)
+
+    # Same paint again: never published.
+    pipeline.process(ring.acquire_write(), bgra8.tobytes())
+    assert pipeline.wait(timeout=5.0)
+    assert ring.acquire_read() is None
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from bws_protocol import SOCKET_SIGNAL, MOUSE_BUTTON, InputDecoder, coalesce_inputs, decode_input_records, encode_input
+
+
+RECORDS = 1000
+# Typical TCP segment payload.
+CHUNK_SIZE = 1448
+
+
+def make_stream(records: int = RECORDS) -> bytes:
+    """ Mouse moves with a press/release pair every 50 records. """
+    chunks = []
+    for input_id in range(1, records + 1):
+        if input_id % 50 == 0:
+            signal = SOCKET_SIGNAL.MOUSE_PRESS if input_id % 100 else SOCKET_SIGNAL.MOUSE_RELEASE
+            chunks.append(encode_input(signal, input_id, input_id, input_id, input_id, MOUSE_BUTTON.LEFT))
+        else:
+            chunks.append(encode_input(SOCKET_SIGNAL.MOUSE_MOVE, input_id, input_id, input_id, input_id))
+    return b''.join(chunks)
+
+
+def test_encode_inputs(benchmark):
+    def encode():
+        for input_id in range(RECORDS):
+            encode_input(SOCKET_SIGNAL.MOUSE_MOVE, input_id, input_id, 10, 20)
+
+    benchmark(encode)
+
+
+def test_decode_inputs(benchmark):
+    stream = make_stream()
+    records, consumed = benchmark(decode_input_records, stream)
+    assert len(records) == RECORDS and consumed == len(stream)
+
+
+def test_decode_inputs_chunked(benchmark):
+    stream = make_stream()
+    chunks = [stream[i:i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+
+    def decode():
+        decoder = InputDecoder()
+        count = 0
+        for chunk in chunks:
+            count += len(decoder.feed(chunk))
+        return count
+
+    assert benchmark(decode) == RECORDS
+
+
+def test_coalesce_inputs(benchmark):
+    records, _ = decode_input_records(make_stream())
+    coalesced = benchmark(coalesce_inputs, records)
+    assert coalesced[-1] == records[-1]
+    assert len(coalesced) < len(records)
@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_mock import MockHost
+from bws_replay import GENERATORS, replay
+
+
+@pytest.mark.parametrize('generator', sorted(GENERATORS))
+def test_replay_synthetic(benchmark, generator):
+    """ Synthetic interaction patterns sent as fast as possible through the mock renderer. """
+    recording = GENERATORS[generator](1280, 720, duration=0.5)
+    with MockHost(recording.width, recording.height, url='mock://partial') as host:
+        host.wait_frame(timeout=10.0)
+        report = benchmark.pedantic(replay, args=(recording, host), kwargs={'fast': True}, rounds=3)
+    assert report['unresolved_inputs'] == 0
+    benchmark.extra_info.update(
+        {f'{name}_p95_ms': latency['p95'] for name, latency in report['latency_ms'].items()}
+    )
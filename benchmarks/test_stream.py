@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+from time import sleep
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+import bws_stream
+from bws_mock import MockHost
+from bws_protocol import SOCKET_SIGNAL
+from bws_stream import (CODEC, MESSAGE, ROLE, HubConnection, StreamHub, TileDeltaDecoder, TileDeltaEncoder,
+                        available_codecs, decode_message, encode_json, encode_message, serve_tcp)
+
+
+def make_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+
+@pytest.fixture
+def hub_address():
+    """ A TCP hub on localhost, served by an event loop thread. """
+    loop = asyncio.new_event_loop()
+    hub = StreamHub()
+    server = loop.run_until_complete(serve_tcp(hub, '127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield '127.0.0.1:%d' % server.sockets[0].getsockname()[1]
+
+    async def _shutdown():
+        server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(5.0)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def connect(address: str, role: str) -> HubConnection:
+    host, port = bws_stream.parse_address(address)
+    connection = HubConnection(host, port, role)
+    connection.sock.settimeout(5.0)
+    return connection
+
+
+def test_hub_url():
+    assert bws_stream.hub_url('hubhost:9100') == 'hub://hubhost:9100'
+    assert bws_stream.hub_url('hub://10.0.0.2:9100/') == 'hub://10.0.0.2:9100'
+    assert bws_stream.hub_url(':9100') == 'hub://127.0.0.1:9100'
+    with pytest.raises(ValueError):
+        bws_stream.hub_url('hubhost')
+
+
+@pytest.mark.parametrize('codec', sorted(available_codecs().values()), ids=lambda codec: bws_stream.CODEC_NAMES[codec])
+def test_delta_roundtrip(codec):
+    encoder = TileDeltaEncoder(200, 130, codec)
+    decoder = TileDeltaDecoder()
+    frame = make_frame(200, 130)
+    assert decoder.apply(encoder.encode(frame, input_id=7)) == (0, 0, 200, 130)
+    assert np.array_equal(decoder.canvas, frame)
+    assert decoder.input_id == 7
+
+    frame[70:80, 100:110] = 0
+    assert decoder.apply(encoder.encode(frame)) == (64, 64, 64, 64)
+    assert np.array_equal(decoder.canvas, frame)
+    assert encoder.encode(frame) is None
+    assert decoder.apply(encoder.encode(frame, key=True)) == (0, 0, 200, 130)
+
+
+def test_hub_relays_frames_and_events(hub_address):
+    renderer = connect(hub_address, ROLE.RENDERER)
+    viewers = [connect(hub_address, ROLE.BLENDER), connect(hub_address, ROLE.WEB)]
+    sleep(0.1)
+    encoder = TileDeltaEncoder(160, 90)
+    frame = make_frame(160, 90)
+    renderer.send(encoder.encode(frame, input_id=1))
+    frame[:10, :10] = 255
+    renderer.send(encoder.encode(frame, input_id=2))
+    for viewer in viewers:
+        decoder = TileDeltaDecoder()
+        while decoder.input_id != 2:
+            decoder.apply(viewer.receive())
+        assert np.array_equal(decoder.canvas, frame)
+
+    viewers[0].send(encode_message(MESSAGE.EVENT, 3, b'event'))
+    kind, _codec, correlation_id, body = decode_message(renderer.receive())
+    assert (kind, correlation_id, bytes(body)) == (MESSAGE.EVENT, 3, b'event')
+    for connection in (renderer, *viewers):
+        connection.close()
+
+
+def test_hub_backpressure_key_frame(hub_address):
+    """ A viewer that does not read gets its queued deltas replaced by a key frame of the latest canvas. """
+    renderer = connect(hub_address, ROLE.RENDERER)
+    slow = connect(hub_address, ROLE.BLENDER)
+    sleep(0.1)
+    width, height = 640, 360
+    encoder = TileDeltaEncoder(width, height, CODEC.RAW)
+    for i in range(40):
+        frame = make_frame(width, height, i)
+        renderer.send(encoder.encode(frame, input_id=i + 1))
+    sleep(0.5)
+
+    decoder = TileDeltaDecoder()
+    frames = 0
+    while decoder.input_id != 40:
+        decoder.apply(slow.receive())
+        frames += 1
+    assert frames < 40
+    assert np.array_equal(decoder.canvas, frame)
+    renderer.close()
+    slow.close()
+
+
+def test_hub_correlated_requests(hub_address):
+    renderer = connect(hub_address, ROLE.RENDERER)
+    viewers = [connect(hub_address, ROLE.WEB), connect(hub_address, ROLE.WEB)]
+    sleep(0.1)
+    # Both viewers use the same correlation id: the hub keeps them apart.
+    for index, viewer in enumerate(viewers):
+        viewer.send(encode_json(MESSAGE.REQUEST, 1, {'type': 'get_element', 'x': index}))
+    for _ in viewers:
+        kind, _codec, hub_id, body = decode_message(renderer.receive())
+        assert kind == MESSAGE.REQUEST
+        renderer.send(encode_json(MESSAGE.REPLY, hub_id, {'x': json.loads(bytes(body))['x']}))
+    for index, viewer in enumerate(viewers):
+        kind, _codec, correlation_id, body = decode_message(viewer.receive())
+        assert (kind, correlation_id, json.loads(bytes(body))) == (MESSAGE.REPLY, 1, {'x': index})
+    for connection in (renderer, *viewers):
+        connection.close()
+
+
+def test_remote_renderer_end_to_end(hub_address):
+    """ Renderer machine (mock renderer published to the hub) -> hub -> Blender machine (bws_remote.py), over localhost. """
+    stop = threading.Event()
+    publisher = threading.Thread(target=bws_stream.publish, args=(hub_address, 'mock://partial', 320, 180), kwargs={'stop': stop}, daemon=True)
+    publisher.start()
+    sleep(0.5)
+    script = bws_stream.__file__.replace('bws_stream.py', 'bws_remote.py')
+    try:
+        with MockHost(320, 180, slot_count=2, url='hub://' + hub_address, script=script) as host:
+            for x in (50, 200):
+                input_id = host.send_input(SOCKET_SIGNAL.MOUSE_MOVE, x, 90)
+                header = host.wait_frame(input_id, timeout=5.0)
+                assert header.input_id >= input_id
+    finally:
+        stop.set()
+        publisher.join(5.0)
+
+
+def test_delta_encode(benchmark, resolution):
+    """ Producer cost per frame when a 256x256 box changes. """
+    width, height = resolution
+    encoder = TileDeltaEncoder(width, height)
+    frames = [make_frame(width, height, 0), make_frame(width, height, 0)]
+    frames[1][64:320, 64:320] = 0
+    encoder.encode(frames[0])
+    state = {'index': 0}
+
+    def _encode():
+        state['index'] ^= 1
+        return encoder.encode(frames[state['index']])
+
+    message = benchmark(_encode)
+    benchmark.extra_info['bytes'] = len(message)
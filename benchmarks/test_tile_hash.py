@@ -0,0 +1,29 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_frames import TileHasher
+
+
+@pytest.fixture
+def rgba8(resolution):
+    width, height = resolution
+    return np.random.default_rng(0).integers(0, 256, width * height * 4, dtype=np.uint8)
+
+
+def test_tile_hash_unchanged(benchmark, resolution, rgba8):
+    hasher = TileHasher(*resolution)
+    hasher.update(rgba8)
+    assert benchmark(hasher.update, rgba8) is None
+
+
+def test_tile_hash_dirty_rect(resolution, rgba8):
+    width, height = resolution
+    hasher = TileHasher(width, height, tile_size=64)
+    assert hasher.update(rgba8) == (0, 0, width, height)
+    rgba8[((height - 1) * width + 70) * 4] ^= 1
+    rgba8[(5 * width + 200) * 4 + 3] ^= 1
+    x, y, w, h = hasher.update(rgba8)
+    assert (x, y) == (64, 0)
+    assert (x + w, y + h) == (256, height)
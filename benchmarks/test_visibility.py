@@ -0,0 +1,55 @@
+from time import sleep
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pytest_benchmark')
+
+from bws_frames import float32_to_rgba8, rgba8_to_float32
+from bws_mock import MockHost
+from bws_protocol import SOCKET_SIGNAL
+
+
+def test_cached_frame_is_lossless():
+    painted = np.random.default_rng(0).integers(0, 256, 64 * 64 * 4, dtype=np.uint8)
+    frame = rgba8_to_float32(painted, np.empty(painted.size, dtype=np.float32))
+    compact = float32_to_rgba8(frame)
+    assert compact.dtype == np.uint8 and compact.nbytes * 4 == frame.nbytes
+    assert np.array_equal(compact, painted)
+    assert np.array_equal(rgba8_to_float32(compact, np.empty_like(frame)), frame)
+
+
+def test_hidden_view_stops_painting():
+    with MockHost(320, 180, slot_count=3, url='mock://animated?fps=120') as host:
+        host.wait_frame(timeout=10.0)
+        host.set_visible(False)
+        # Frames painted before the renderer got the message.
+        sleep(0.1)
+        while host.poll_frame() is not None:
+            pass
+        sleep(0.1)
+        assert host.poll_frame() is None
+
+        host.set_visible(True)
+        assert host.wait_frame(timeout=5.0) is not None
+
+
+def test_released_frame_ring():
+    with MockHost(320, 180, slot_count=3) as host:
+        host.wait_frame(host.send_input(SOCKET_SIGNAL.MOUSE_MOVE, 10, 10))
+        first_ring = host.ring.name
+        host.set_visible(False, release=True)
+        assert host.ring is None and host.poll_frame() is None
+
+        host.set_visible(True)
+        assert host.ring.name != first_ring
+        header = host.wait_frame(host.send_input(SOCKET_SIGNAL.MOUSE_MOVE, 20, 20), timeout=5.0)
+        assert header.seq >= 1
+
+
+def test_cache_frame(benchmark, resolution):
+    """ Cost of hiding a view: 8-bit copy of its last frame. """
+    width, height = resolution
+    frame = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+    compact = np.empty(frame.size, dtype=np.uint8)
+    benchmark(float32_to_rgba8, frame, compact)
@@ -1,41 +1,171 @@
-from bpy.app import timers
+from bpy.app import timers, handlers
 import functools
-from time import time
+import heapq
+import itertools
+from time import perf_counter, thread_time_ns
 
 
-to_register_timers = []
-registered_timers = []
-
+# Timers due within this window of the earliest one run in the same wake-up.
+COALESCE_WINDOW = 0.004
 
-class TimerHandler:
-    def __init__(self, timer_callback):
-        self.timer = timer_callback
 
-    def stop(self):
-        if self.timer and timers.is_registered(self.timer):
-            self.timer.stop = True
-            timers.unregister(self.timer)
-            self.timer = None
-        del self
+to_register_timers = []
 
 
-def timer_callback_decorator(decorated_callback):
-    def wrapper(*args, **kwargs):
-        if hasattr(decorated_callback, 'timeout') and decorated_callback.timeout is not None:
-            if time() > decorated_callback.timeout:
-                return None
-        if hasattr(decorated_callback, 'stop') and decorated_callback.stop:
+class Timer:
+    ''' A callback scheduled by the TimerScheduler.
+        Cancelled timers stay in the heap until their deadline, where they are dropped. '''
+    __slots__ = ('callback', 'name', 'step_interval', 'timeout', 'one_time_only', 'persistent',
+                 'deadline', 'cancelled', 'calls', 'cpu_time_ns', '__weakref__')
+
+    def __init__(self, callback: callable, name: str, step_interval: float, timeout: float | None,
+                 one_time_only: bool, persistent: bool) -> None:
+        self.callback = callback
+        self.name = name
+        self.step_interval = step_interval
+        self.timeout = timeout
+        self.one_time_only = one_time_only
+        self.persistent = persistent
+        self.deadline = 0.0
+        self.cancelled = False
+        self.calls = 0
+        self.cpu_time_ns = 0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def run(self, now: float) -> float | None:
+        ''' Calls the callback. Returns the next interval, None when the timer is done. '''
+        if self.timeout is not None and now > self.timeout:
             return None
-        if res := decorated_callback(*args, **kwargs):
+        cpu_start_ns = thread_time_ns()
+        try:
+            res = self.callback()
+        finally:
+            self.cpu_time_ns += thread_time_ns() - cpu_start_ns
+            self.calls += 1
+        if res:
             if res == -1:
                 return None
             return res
-        if hasattr(decorated_callback, 'one_time_only') and decorated_callback.one_time_only:
+        if self.one_time_only:
+            return None
+        return self.step_interval
+
+
+class TimerScheduler:
+    ''' Runs every addon timer from a single bpy.app.timers callback.
+        Deadlines are kept in a min-heap: one Blender wake-up per tick whatever the number of timers,
+        and the timers due in the same window (COALESCE_WINDOW) run together. '''
+
+    def __init__(self) -> None:
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.counter = itertools.count()
+        self.wake_up: float | None = None  # Deadline the Blender timer is registered for.
+        self.wake_ups = 0
+        # Stable callable: bpy.app.timers identifies callbacks by identity, a bound method is a new object each time.
+        self._tick = self.tick
+
+    def add(self, timer: Timer, first_interval: float) -> None:
+        self.push(timer, perf_counter() + first_interval)
+        self.reschedule()
+
+    def push(self, timer: Timer, deadline: float) -> None:
+        timer.deadline = deadline
+        heapq.heappush(self.heap, (deadline, next(self.counter), timer))
+
+    def reschedule(self) -> None:
+        ''' Moves the Blender timer to the earliest deadline, if it is not already there. '''
+        self.drop_cancelled()
+        if not self.heap:
+            return
+        deadline = self.heap[0][0]
+        if self.wake_up is not None and self.wake_up <= deadline:
+            return
+        if timers.is_registered(self._tick):
+            timers.unregister(self._tick)
+        self.wake_up = deadline
+        timers.register(self._tick, first_interval=max(deadline - perf_counter(), 0.0), persistent=True)
+
+    def drop_cancelled(self) -> None:
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+
+    def tick(self) -> float | None:
+        self.wake_ups += 1
+        now = perf_counter()
+        heap = self.heap
+        due = []
+        while heap and heap[0][0] <= now + COALESCE_WINDOW:
+            due.append(heapq.heappop(heap)[2])
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                interval = timer.run(now)
+            except Exception as e:
+                print(f"[ACKit] Timer '{timer.name}' failed and was stopped:", e)
+                interval = None
+            if interval is None or timer.cancelled:
+                timer.cancelled = True
+                continue
+            # From the same 'now': timers with the same interval stay coalesced.
+            self.push(timer, now + interval)
+
+        self.drop_cancelled()
+        if not heap:
+            self.wake_up = None
             return None
-        # ret = getattr(decorated_callback, 'step_interval', None)
-        # print(decorated_callback.__name__, ret)
-        return getattr(decorated_callback, 'step_interval', None)
-    return wrapper
+        self.wake_up = heap[0][0]
+        return max(self.wake_up - perf_counter(), 0.0)
+
+    def cancel_all(self, keep_persistent: bool = False) -> None:
+        for _deadline, _count, timer in self.heap:
+            if not (keep_persistent and timer.persistent):
+                timer.cancel()
+        self.drop_cancelled()
+        if not self.heap:
+            self.stop()
+
+    def stop(self) -> None:
+        for _deadline, _count, timer in self.heap:
+            timer.cancel()
+        self.heap.clear()
+        self.wake_up = None
+        if timers.is_registered(self._tick):
+            timers.unregister(self._tick)
+
+    def stats(self) -> list[dict]:
+        ''' Per-timer CPU time of the live timers, most expensive first. '''
+        stats = [
+            {
+                'name': timer.name,
+                'calls': timer.calls,
+                'cpu_ms': timer.cpu_time_ns / 1e6,
+                'mean_us': timer.cpu_time_ns / timer.calls / 1e3 if timer.calls else 0.0,
+            }
+            for _deadline, _count, timer in self.heap if not timer.cancelled
+        ]
+        stats.sort(key=lambda stat: stat['cpu_ms'], reverse=True)
+        return stats
+
+
+SCHEDULER = TimerScheduler()
+
+
+class TimerHandler:
+    def __init__(self, timer: Timer):
+        self.timer = timer
+
+    def stop(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.timer is not None and not self.timer.cancelled
 
 
 def new_timer(callback: callable,
@@ -45,33 +175,22 @@ def new_timer(callback: callable,
               one_time_only: bool = True,
               persistent: bool = False,
               args: tuple = (),
-              kwargs: dict = {}) -> TimerHandler or None:
+              kwargs: dict = {}) -> TimerHandler:
     ''' - 'step_interval' and 'timeout' work only if 'one_time_only' is False.
         - If 'timeout' is 0, then won't use it.
+        - Like bpy.app.timers, returning a number runs the callback again after that many seconds.
         - NOTE: return -1 whenever you want to stop your callback from repeating...
     '''
+    name = getattr(callback, '__qualname__', repr(callback))
     if args or kwargs:
-        deco_callback = functools.partial(deco_callback, *args, **kwargs)
+        callback = functools.partial(callback, *args, **kwargs)
     if one_time_only:
-        deco_callback = callback
-        timer_handler = None
-    else:
-        setattr(callback, 'one_time_only', one_time_only)
-        setattr(callback, 'timeout', (time()+timeout+first_interval) if timeout > 0 else None)
-        setattr(callback, 'step_interval', step_interval)
-        setattr(callback, 'stop', False)
-        deco_callback = timer_callback_decorator(callback)
-        timer_handler = TimerHandler(deco_callback)
-    if args or kwargs:
-        # TODO: functools partial.
-        timers.register(
-            deco_callback,
-            first_interval=first_interval,
-            persistent=persistent)
+        timeout = None
     else:
-        timers.register(deco_callback, first_interval=first_interval, persistent=persistent)
-    registered_timers.append(deco_callback)
-    return timer_handler
+        timeout = (perf_counter() + timeout + first_interval) if timeout > 0 else None
+    timer = Timer(callback, name, step_interval, timeout, one_time_only, persistent)
+    SCHEDULER.add(timer, first_interval)
+    return TimerHandler(timer)
 
 
 def new_timer_as_decorator(
@@ -96,13 +215,23 @@ def new_timer_as_decorator(
     return _decorator
 
 
+def timer_stats() -> list[dict]:
+    return SCHEDULER.stats()
+
+
+@handlers.persistent
+def cancel_non_persistent_timers(*args) -> None:
+    ''' Same as bpy.app.timers: only persistent timers survive loading a file. '''
+    SCHEDULER.cancel_all(keep_persistent=True)
+
+
 def register():
+    handlers.load_pre.append(cancel_non_persistent_timers)
     for timer_data in to_register_timers:
         new_timer(*timer_data)
 
 
 def unregister():
-    for timer in registered_timers:
-        if timers.is_registered(timer):
-            timers.unregister(timer)
-    registered_timers.clear()
+    if cancel_non_persistent_timers in handlers.load_pre:
+        handlers.load_pre.remove(cancel_non_persistent_timers)
+    SCHEDULER.stop()
@@ -1,6 +1,7 @@
 from .help_shortcut import ShortcutRegister
 from .help_property import PropertyRegister, BatchPropertyRegister, PropertyRegisterRuntime
 from .help_ui_hide import ui_hide
+from ..reg_decorators.reg_timer import new_timer
 
 
 class RegHelper:
@@ -10,3 +11,4 @@ class RegHelper:
     PROP_RUNTIME = PropertyRegisterRuntime
     PROP_BATCH = BatchPropertyRegister
     UI_HIDE = ui_hide
+    TIMER = new_timer
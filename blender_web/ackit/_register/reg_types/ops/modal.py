@@ -2,7 +2,8 @@ from enum import Enum, auto
 
 from bpy import types as bpy_types
 
-from .....utils.event import Mouse, EventType, EventValue, set_global_event, GEvent
+from .....utils.event import Mouse, EventType, EventValue, set_global_event, get_global_event_code, GEvent
+from .....utils.event.event_codes import VALUE_BITS, type_code
 from .....utils.cursor import CursorIcon
 from .....utils.operator import ModalEventTrigger
 from .operator import Operator, OpsReturn
@@ -25,6 +26,9 @@ class ModalFlags(Enum):
 
 active_modal_instance: dict['ModalOperator', 'ModalOperator'] = {}
 
+MOUSE_MOVE_TYPE_CODES = frozenset((type_code(EventType.MOUSEMOVE), type_code(EventType.INBETWEEN_MOUSEMOVE)))
+TIMER_TYPE_CODE = type_code(EventType.TIMER)
+
 
 class ModalOperator(Operator):
     # Blender props.
@@ -108,10 +112,11 @@ class ModalOperator(Operator):
                 return OpsReturn.FINISH
 
         # Special Event callbacks (mouse motion, timer...)
-        if event.type in {EventType.MOUSEMOVE, EventType.INBETWEEN_MOUSEMOVE}:
+        event_type_code = get_global_event_code() >> VALUE_BITS
+        if event_type_code in MOUSE_MOVE_TYPE_CODES:
             self.mouse.update(event)
             res = self.modal__mouse_move(context, self.mouse)
-        elif self.modal_use_timer and event.type in {EventType.TIMER}:
+        elif self.modal_use_timer and event_type_code == TIMER_TYPE_CODE:
             res = self.modal_timer(context)
         else:
             # Generic modal event handling.
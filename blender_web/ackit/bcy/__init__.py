@@ -1 +1,2 @@
-from .cy_structs import CyBlStruct
\ No newline at end of file
+from .cy_structs import CyBlStruct
+from .region_view import RegionView
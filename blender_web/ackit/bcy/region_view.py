@@ -0,0 +1,145 @@
+import bpy
+from bpy.types import Region
+
+from .cy_structs import CY_ARegion
+
+
+# Blender versions whose ARegion/View2D layout matches CY_ARegion.
+LAYOUT_MIN_VERSION = (3, 6, 0)
+LAYOUT_MAX_VERSION = (4, 2, 99)
+
+# Tolerance of the layout check, in view units.
+LAYOUT_CHECK_EPSILON = 1e-3
+
+
+class RegionView:
+    ''' View state of a region read straight from its ARegion/View2D structs.
+
+        The struct is resolved once per region and read through ctypes: zoom, scroll and visible rect
+        don't go through RNA. Derived values are cached and recomputed only when the View2D changes
+        ('cur', 'mask' or the region size); 'stamp' changes with them, so draw handlers can keep
+        their batches while it is the same.
+        NOTE: resolve it from the live region on each use ('RegionView.get(region)'), don't keep it
+        around: the struct goes away with its region.
+    '''
+    __slots__ = ('pointer', 'cy_region', 'stamp', '_key',
+                 '_scale_x', '_scale_y', '_ofs_x', '_ofs_y', '_mask_x', '_mask_y')
+
+    _cache: dict[int, 'RegionView'] = {}
+    # Layout check, done on the first region: None until then.
+    _layout_ok: bool | None = None
+
+    def __init__(self, region: Region) -> None:
+        self.pointer = region.as_pointer()
+        self.cy_region: CY_ARegion = CY_ARegion.from_address(self.pointer)
+        self.stamp = 0
+        self._key = None
+
+    @classmethod
+    def get(cls, region: Region | None) -> 'RegionView | None':
+        ''' Accessor of the region, None when the struct layout can't be trusted in this Blender version. '''
+        if region is None or cls._layout_ok is False:
+            return None
+        pointer = region.as_pointer()
+        view = cls._cache.get(pointer, None)
+        if view is not None:
+            return view
+        view = RegionView(region)
+        if cls._layout_ok is None:
+            cls._layout_ok = cls.check_layout(region, view)
+            if not cls._layout_ok:
+                print("[ACKit] RegionView: unknown ARegion layout, falling back to RNA")
+                return None
+        cls._cache[pointer] = view
+        return view
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
+
+    @staticmethod
+    def check_layout(region: Region, view: 'RegionView') -> bool:
+        ''' The Blender version must be a known one, and the struct must agree with RNA. '''
+        if not (LAYOUT_MIN_VERSION <= bpy.app.version <= LAYOUT_MAX_VERSION):
+            return False
+        cy_region = view.cy_region
+        if (cy_region.winx, cy_region.winy) != (region.width, region.height):
+            return False
+        view2d = region.view2d
+        for region_x, region_y in ((0, 0), (region.width, region.height)):
+            rna_x, rna_y = view2d.region_to_view(region_x, region_y)
+            x, y = view.region_to_view(region_x, region_y)
+            if abs(rna_x - x) > LAYOUT_CHECK_EPSILON or abs(rna_y - y) > LAYOUT_CHECK_EPSILON:
+                return False
+        return True
+
+    def _update(self) -> None:
+        v2d = self.cy_region.v2d
+        cur = v2d.cur
+        mask = v2d.mask
+        key = (cur.xmin, cur.xmax, cur.ymin, cur.ymax, mask.xmin, mask.xmax, mask.ymin, mask.ymax)
+        if key == self._key:
+            return
+        self._key = key
+        self.stamp += 1
+        cur_x = cur.xmax - cur.xmin
+        cur_y = cur.ymax - cur.ymin
+        # Same mapping as UI_view2d_region_to_view / UI_view2d_view_to_region_fl.
+        self._scale_x = (mask.xmax - mask.xmin) / cur_x if cur_x else 1.0
+        self._scale_y = (mask.ymax - mask.ymin) / cur_y if cur_y else 1.0
+        self._ofs_x = cur.xmin
+        self._ofs_y = cur.ymin
+        self._mask_x = mask.xmin
+        self._mask_y = mask.ymin
+
+    def changed(self, stamp: int) -> bool:
+        ''' True when the view moved or zoomed since 'stamp' was read. '''
+        self._update()
+        return self.stamp != stamp
+
+    @property
+    def zoom(self) -> float:
+        ''' Region pixels per view unit (vertical, as the node editor zoom). '''
+        self._update()
+        return self._scale_y
+
+    @property
+    def zoom_xy(self) -> tuple[float, float]:
+        self._update()
+        return self._scale_x, self._scale_y
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.cy_region.winx, self.cy_region.winy
+
+    @property
+    def scroll(self) -> int:
+        ''' Scroll-bar flags of the View2D. '''
+        return self.cy_region.v2d.scroll
+
+    @property
+    def visible_rect(self) -> tuple[float, float, float, float]:
+        ''' View space rect visible in the region: (x_min, y_min, x_max, y_max). '''
+        cur = self.cy_region.v2d.cur
+        return cur.xmin, cur.ymin, cur.xmax, cur.ymax
+
+    @property
+    def view_size(self) -> tuple[float, float]:
+        cur = self.cy_region.v2d.cur
+        return cur.xmax - cur.xmin, cur.ymax - cur.ymin
+
+    @property
+    def offset(self) -> tuple[float, float]:
+        ''' Region position of the view origin. '''
+        return self.view_to_region(0.0, 0.0)
+
+    def region_to_view(self, x: float, y: float) -> tuple[float, float]:
+        self._update()
+        return (self._ofs_x + (x - self._mask_x) / self._scale_x,
+                self._ofs_y + (y - self._mask_y) / self._scale_y)
+
+    def view_to_region(self, x: float, y: float) -> tuple[float, float]:
+        ''' Unclipped, like 'view2d.view_to_region(x, y, clip=False)'. '''
+        self._update()
+        return (self._mask_x + (x - self._ofs_x) * self._scale_x,
+                self._mask_y + (y - self._ofs_y) * self._scale_y)
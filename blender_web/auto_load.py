@@ -1,14 +1,20 @@
 import os
 import bpy
 import sys
+import json
 import typing
+import hashlib
 import inspect
 import pkgutil
 import importlib
+from collections import deque
+from functools import reduce
 from pathlib import Path
+from time import perf_counter
 
 from .ackit.globals import GLOBALS
 from .ackit.debug import print_debug
+from .scripts.bws_bundle import cache_dir
 
 __all__ = (
     "_init",
@@ -22,6 +28,14 @@ modules = None
 ordered_classes = None
 initilized = False
 
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = 'auto_load_manifest.json'
+MODULE_HOOKS = (
+    "init_pre", "init", "init_post",
+    "register_pre", "register", "register_post",
+    "unregister_pre", "unregister", "unregister_post",
+)
+
 
 def get_classes():
     global ordered_classes
@@ -73,8 +87,22 @@ def init_addon():
     GLOBALS.set_addon_global_value("IS_INITIALIZED", False)
 
     clean_modules()
-    modules = get_all_submodules(GLOBALS.ADDON_SOURCE_PATH)
-    ordered_classes = get_ordered_classes_to_register(modules)
+    start_time = perf_counter()
+    module_names = list(iter_submodule_names(GLOBALS.ADDON_SOURCE_PATH))
+    key = get_manifest_key(GLOBALS.ADDON_SOURCE_PATH, module_names)
+    manifest = load_manifest(key)
+    if manifest is not None:
+        try:
+            modules, ordered_classes = load_from_manifest(manifest)
+        except (ImportError, AttributeError, KeyError) as e:
+            print("WARN! Invalid addon manifest, scanning the modules again:", e)
+            manifest = None
+    if manifest is None:
+        modules = list(iter_submodules(module_names, GLOBALS.ADDON_SOURCE_PATH.name))
+        ordered_classes = get_ordered_classes_to_register(modules)
+        save_manifest(build_manifest(key, modules, ordered_classes))
+    print_debug(f"[AutoLoad] {len(modules)} modules, {len(ordered_classes)} classes in "
+                f"{(perf_counter() - start_time) * 1000:.1f} ms ({'manifest' if manifest is not None else 'full scan'})")
 
     for module in modules:
         if module.__name__ in {__name__, GLOBALS.ADDON_MODULE}:
@@ -174,11 +202,11 @@ def unregister_addon():
 #################################################
 
 def get_all_submodules(directory):
-    return list(iter_submodules(directory, directory.name))
+    return list(iter_submodules(iter_submodule_names(directory, depth=0), directory.name))
 
-def iter_submodules(path, package_name):
+def iter_submodules(module_names, package_name):
     # print(f"######### ITER SUBMODULES FOR PACKAGE '{package_name}' #########")
-    for name in sorted(iter_submodule_names(path, depth=0)):
+    for name in sorted(module_names):
         yield importlib.import_module("." + name, package_name)
 
 def iter_submodule_names(path, root="", depth: int = 0):
@@ -194,6 +222,95 @@ def iter_submodule_names(path, root="", depth: int = 0):
             yield root + module_name
 
 
+# Manifest of the modules to import and the classes to register
+#################################################
+# Built by the first full scan, and reused as long as no module file changes (stats key):
+# only the modules with hooks, classes to register or ACKit decorators/types (which register at import)
+# are imported on enable, the rest is imported by them when first used. No class scan and no sort either.
+
+def get_manifest_key(path, module_names):
+    filepaths = {path / "__init__.py"}
+    for name in module_names:
+        parts = name.split(".")
+        filepaths.add(path.joinpath(*parts[:-1], parts[-1] + ".py"))
+        # Packages too: their __init__ runs when a submodule is imported.
+        for i in range(1, len(parts)):
+            filepaths.add(path.joinpath(*parts[:i], "__init__.py"))
+    digest = hashlib.sha1(f"{MANIFEST_VERSION}:{bpy.app.version}".encode())
+    for filepath in sorted(filepaths):
+        stat = filepath.stat()
+        digest.update(f"{filepath.relative_to(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def get_manifest_path() -> Path:
+    return Path(cache_dir("addon")) / MANIFEST_FILENAME
+
+def load_manifest(key):
+    try:
+        with open(get_manifest_path(), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("key") != key:
+        return None
+    return manifest
+
+def save_manifest(manifest) -> None:
+    if manifest is None:
+        return
+    try:
+        # Best effort: the cache directory may not be writable (cache_dir() creates it).
+        manifest_path = get_manifest_path()
+        temp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(temp_path, manifest_path)
+    except OSError as e:
+        print("WARN! Could not save the addon manifest:", e)
+
+def build_manifest(key, modules, ordered_classes):
+    if not all(is_reachable(cls) for cls in ordered_classes):
+        # Classes created at runtime (locals, type()...): can not be found again without a scan.
+        return None
+    return {
+        "key": key,
+        "modules": [
+            module.__name__ for module in modules
+            if module.__name__ not in {__name__, GLOBALS.ADDON_MODULE} and needs_eager_import(module, ordered_classes)
+        ],
+        "classes": [[cls.__module__, cls.__qualname__] for cls in ordered_classes],
+    }
+
+def is_reachable(cls) -> bool:
+    try:
+        return reduce(getattr, cls.__qualname__.split("."), sys.modules[cls.__module__]) is cls
+    except (KeyError, AttributeError):
+        return False
+
+def load_from_manifest(manifest):
+    modules = [importlib.import_module(name) for name in manifest["modules"]]
+    classes = [
+        reduce(getattr, qualname.split("."), importlib.import_module(module_name))
+        for module_name, qualname in manifest["classes"]
+    ]
+    return modules, classes
+
+def needs_eager_import(module, classes) -> bool:
+    if any(hasattr(module, hook) for hook in MODULE_HOOKS):
+        return True
+    if any(cls.__module__ == module.__name__ for cls in classes):
+        return True
+    # Users of ACKit decorators and types: registered when the module is imported.
+    ackit_module = GLOBALS.ADDON_MODULE + ".ackit"
+    if module.__name__.startswith(ackit_module):
+        return False
+    for value in module.__dict__.values():
+        owner = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+        if isinstance(owner, str) and owner.startswith(ackit_module):
+            return True
+    return False
+
+
 # Find classes to register
 #################################################
 
@@ -205,7 +322,8 @@ def get_register_deps_dict(modules):
     my_classes_by_idname = {cls.bl_idname : cls for cls in my_classes if hasattr(cls, "bl_idname")}
 
     deps_dict = {}
-    for cls in my_classes:
+    # Sorted: same registration order on every run.
+    for cls in sorted(my_classes, key=lambda cls: (cls.__module__, cls.__qualname__)):
         deps_dict[cls] = set(iter_my_register_deps(cls, my_classes, my_classes_by_idname))
     return deps_dict
 
@@ -271,17 +389,25 @@ def get_register_base_types():
 #################################################
 
 def toposort(deps_dict):
+    # Kahn's algorithm: linear in classes + dependencies, keeps the input order among independent classes.
+    pending = {value: len(deps) for value, deps in deps_dict.items()}
+    dependents = {value: [] for value in deps_dict}
+    for value, deps in deps_dict.items():
+        for dep in deps:
+            dependents.setdefault(dep, []).append(value)
+    ready = deque(value for value, count in pending.items() if count == 0)
     sorted_list = []
-    sorted_values = set()
-    while len(deps_dict) > 0:
-        unsorted = []
-        for value, deps in deps_dict.items():
-            if len(deps) == 0:
-                sorted_list.append(value)
-                sorted_values.add(value)
-            else:
-                unsorted.append(value)
-        deps_dict = {value : deps_dict[value] - sorted_values for value in unsorted}
+    while ready:
+        value = ready.popleft()
+        sorted_list.append(value)
+        for dependent in dependents.get(value, ()):
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+    if len(sorted_list) != len(pending):
+        cyclic = [value for value, count in pending.items() if count > 0]
+        print("WARN! Cyclic register dependencies:", [getattr(value, '__name__', value) for value in cyclic])
+        sorted_list.extend(cyclic)
     return sorted_list
 
 
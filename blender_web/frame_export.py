@@ -0,0 +1,84 @@
+from os import path
+import tempfile
+
+import bpy
+from bpy.props import EnumProperty, StringProperty
+from bpy.types import Context, Operator
+
+from .metrics import ViewMetrics, live_views
+from .scripts.bws_export import BACKPRESSURE, EXPORT_FORMAT, MAX_QUEUED, FrameExporter
+from .scripts.bws_frames import FrameRing
+
+
+EXPORT_FORMATS = (
+    (EXPORT_FORMAT.PNG, "PNG Sequence", "8-bit RGBA PNG files, page colors as is"),
+    (EXPORT_FORMAT.EXR, "EXR Sequence", "Half float linear RGBA OpenEXR files"),
+    (EXPORT_FORMAT.FFMPEG, "Video (FFmpeg)", "H.264 MP4 encoded by an ffmpeg process (ffmpeg must be in the PATH)"),
+)
+EXPORT_POLICIES = (
+    (BACKPRESSURE.DROP, "Drop", "Drop frames while the encoders are busy"),
+    (BACKPRESSURE.QUEUE, "Queue", f"Keep up to {MAX_QUEUED} frames in memory while the encoders are busy, then drop"),
+)
+
+
+def start_export(view_metrics: ViewMetrics, directory: str, fmt: str, policy: str) -> None:
+    ''' The exporter is created with the next consumed frame (ViewMetrics.export_frame), at the size of its ring. '''
+    stop_export(view_metrics)
+
+    def _create_exporter(ring: FrameRing) -> FrameExporter | None:
+        try:
+            return FrameExporter(path.join(directory, view_metrics.file_label()), ring.width, ring.height, ring.channels, ring.dtype,
+                                 fmt=fmt, policy=policy)
+        except (OSError, ValueError) as e:
+            print("[EXPORT] ERROR! Could not start exporting:", e)
+            return None
+
+    view_metrics.create_exporter = _create_exporter
+
+
+def stop_export(view_metrics: ViewMetrics) -> FrameExporter | None:
+    ''' The staged frames are written in the background. '''
+    exporter, view_metrics.exporter = view_metrics.exporter, None
+    view_metrics.create_exporter = None
+    if exporter is not None:
+        exporter.close(wait=False)
+    return exporter
+
+
+class BWS_OT_frame_export_start(Operator):
+    bl_idname = "bws.frame_export_start"
+    bl_label = "Start Frame Export"
+    bl_description = "Export the frames of the web views as image sequences or video, encoded in the background"
+
+    format: EnumProperty(name="Format", items=EXPORT_FORMATS, default=EXPORT_FORMAT.PNG)
+    policy: EnumProperty(name="When Busy", items=EXPORT_POLICIES, default=BACKPRESSURE.DROP)
+    directory: StringProperty(name="Directory", subtype='DIR_PATH', default='',
+                              description="One sub-directory per web view is created there. Blender temp directory by default")
+
+    def execute(self, context: Context):
+        views = live_views()
+        if not views:
+            self.report({'WARNING'}, "No web view to export")
+            return {'CANCELLED'}
+        directory = bpy.path.abspath(self.directory) if self.directory else (bpy.app.tempdir or tempfile.gettempdir())
+        for view_metrics in views:
+            start_export(view_metrics, directory, self.format, self.policy)
+        self.report({'INFO'}, f"Exporting {len(views)} web view(s) to {directory}")
+        return {'FINISHED'}
+
+
+class BWS_OT_frame_export_stop(Operator):
+    bl_idname = "bws.frame_export_stop"
+    bl_label = "Stop Frame Export"
+    bl_description = "Stop exporting frames. The frames already captured are still written"
+
+    def execute(self, context: Context):
+        exporters = [exporter for view_metrics in live_views() if (exporter := stop_export(view_metrics))]
+        if not exporters:
+            self.report({'WARNING'}, "No frames were being exported")
+            return {'CANCELLED'}
+        for exporter in exporters:
+            print(f"[EXPORT] {exporter.output}:", ', '.join(f"{name} {value}" for name, value in exporter.stats()))
+        dropped = sum(exporter.dropped for exporter in exporters)
+        self.report({'INFO'}, f"Finishing {sum(exporter.submitted for exporter in exporters)} frame(s), {dropped} dropped")
+        return {'FINISHED'}
@@ -12,86 +12,54 @@ from pathlib import Path
 
 import bpy
 import gpu
-from bpy.types import Context, Event
+from bpy.types import Context, Event, Region
 from gpu_extras.batch import batch_for_shader
-from mathutils import Vector
 
 
 from .utils.operator import OpsReturn
+from .utils.event.event_codes import EventDispatch, VALUE_BITS, VALUE_CODES, VALUE_MASK, code, event_code, type_code
 from .ackit import ACK
 from .shaders import IMAGE_SHADER
+from .metrics import ViewMetrics, draw_hud
+from .image_stream import ImageStream, draw_stream_mode
+from .image_share import ImageShare
+from .view_manager import ViewManager, draw_release_hidden_views, find_visible_region
+from .remote_view import draw_remote_hub, is_remote_url, remote_command, remote_url
+from .scripts.bws_bundle import AssetBundle, bundle_url
+from .scripts.bws_frames import FrameRing, copy_alpha, float32_to_rgba8, pixel_alpha, rgba8_to_float32
+from .scripts.bws_protocol import (
+    SOCKET_SIGNAL, MOUSE_BUTTON, VISIBILITY_FLAGS, KeyEventFlags, INPUT_SIGNALS,
+    encode_signal, encode_input, encode_control
+)
 
 
 SOCKET_LOCK = threading.Lock()
 
 FPS = 30
+# One slot drawn by Blender, one being post-processed by the renderer pipeline, one for the next paint.
+FRAME_SLOTS = 3
 
 
 HTML_FILENAME = 'color_picker.html'
 
+# Event codes routed without string comparisons (see utils/event/event_codes).
+TIMER_TYPE_CODE = type_code('TIMER')
+MOUSE_MOVE_TYPE_CODES = frozenset((type_code('MOUSEMOVE'), type_code('INBETWEEN_MOUSEMOVE')))
+LEFTMOUSE_RELEASE_CODE = code('LEFTMOUSE', 'RELEASE')
+KEY_VALUE_CODES = frozenset((VALUE_CODES['PRESS'], VALUE_CODES['RELEASE']))
+# (alt, shift, ctrl) bits -> KeyEventFlags.
+MODIFIER_FLAGS = tuple(
+    (KeyEventFlags.EVENTFLAG_ALT_DOWN if bits & 1 else 0) |
+    (KeyEventFlags.EVENTFLAG_SHIFT_DOWN if bits & 2 else 0) |
+    (KeyEventFlags.EVENTFLAG_CONTROL_DOWN if bits & 4 else 0)
+    for bits in range(8)
+)
+
 
 #############################################################################################
 #############################################################################################
 #############################################################################################
 
-class SOCKET_SIGNAL:
-    PING = 0
-    PONG = 1
-    BUFFER_UPDATE = 2
-    KILL = 3
-
-    MOUSE_MOVE = 8
-    MOUSE_PRESS = 9
-    MOUSE_RELEASE = 10
-    MOUSE_DRAG_START = 11
-    MOUSE_DRAG_END = 12
-
-    SCROLL_UP = 16
-    SCROLL_DOWN = 17
-
-    UNICODE = 24
-    
-    # UI Events
-    BUTTON_CLICK = 32
-    INPUT_CHANGE = 33
-
-
-class MOUSE_BUTTON:
-    LEFT = 0
-    MIDDLE = 1
-    RIGHT = 2
-
-
-class KeyEventFlags:
-    EVENTFLAG_NONE = 0
-    EVENTFLAG_CAPS_LOCK_ON = 1 << 0
-    EVENTFLAG_SHIFT_DOWN = 1 << 1
-    EVENTFLAG_CONTROL_DOWN = 1 << 2
-    EVENTFLAG_ALT_DOWN = 1 << 3
-    EVENTFLAG_LEFT_MOUSE_BUTTON = 1 << 4
-    EVENTFLAG_MIDDLE_MOUSE_BUTTON = 1 << 5
-    EVENTFLAG_RIGHT_MOUSE_BUTTON = 1 << 6
-    # Mac OS-X command key.
-    EVENTFLAG_COMMAND_DOWN = 1 << 7
-    EVENTFLAG_NUM_LOCK_ON = 1 << 8
-    EVENTFLAG_IS_KEY_PAD = 1 << 9
-    EVENTFLAG_IS_LEFT = 1 << 10
-    EVENTFLAG_IS_RIGHT = 1 << 11
-
-
-EVENT_DATA_BYTES = {
-    SOCKET_SIGNAL.MOUSE_MOVE        : 'II',     # (X, Y)
-    SOCKET_SIGNAL.MOUSE_PRESS       : 'III',    # (X, Y, MOUSE_BUTTON)
-    SOCKET_SIGNAL.MOUSE_RELEASE     : 'III',    # (X, Y, MOUSE_BUTTON)
-    SOCKET_SIGNAL.MOUSE_DRAG_START  : 'II',     # (X, Y)
-    SOCKET_SIGNAL.MOUSE_DRAG_END    : 'II',     # (X, Y)
-    SOCKET_SIGNAL.SCROLL_UP         : 'II',     # (X, Y)
-    SOCKET_SIGNAL.SCROLL_DOWN       : 'II',     # (X, Y)
-    SOCKET_SIGNAL.UNICODE           : 'II',     # (UNICODE CODE, KeyEventFlags)
-    SOCKET_SIGNAL.BUTTON_CLICK      : 'I',      # (button_id length, button_id string)
-    SOCKET_SIGNAL.INPUT_CHANGE      : 'II',     # (input_id length, input_id string, type_id (INPUT_TYPE_ID) of value, value (int, float, str, bool...))
-}
-
 INPUT_TYPE_ID = {
     'int'   : 0,
     'float' : 1,
@@ -122,7 +90,11 @@ class CEF_Python_Controller:
     texture: gpu.types.GPUTexture
     batch: gpu.types.GPUBatch
     shm_texture_buffer: np.ndarray
-    gpu_buffer: gpu.types.Buffer
+    gpu_buffers: list[gpu.types.Buffer]
+    frame_ring: FrameRing
+
+    # WindowManager property that turns the controller on.
+    toggle_prop = 'show_gz_cefpython'
 
 
     # Initializing.
@@ -134,27 +106,44 @@ class CEF_Python_Controller:
         self.area_type = context.area.type
         self.width = context.region.width
         self.height = context.region.height
-        self.mouse_pos = Vector((0, 0))
-        self.prev_mouse_pos = Vector((0, 0))
-        self.last_mouse_pos = Vector((0, 0))
+        # Region coordinates, and last position sent to the renderer.
+        self.mouse_pos = (0, 0)
+        self.last_mouse_pos = (0, 0)
         self.renderer_mouse_pos = (0, 0)
-
-        # To messure FPS.
-        self.draw_frame_count = 0
-        self.draw_start_time = time.time()
+        # Id of the last input sent, and (width, height) of the last consumed frame.
+        self.last_input_id = 0
+        self.frame_size = (self.width, self.height)
+
+        # Performance metrics (Blender side + renderer stats block).
+        self.metrics = ViewMetrics('CEF-Python', (self.width, self.height))
+        self.image_stream = ImageStream('Screenshot_CEFPython', self.width, self.height)
+        self.metrics.send_control = self.send_control
+        # Blender images / viewport captures shared with the page.
+        self.image_share = ImageShare('CEF-Python')
+        self.image_share.send_control = self.send_control
 
         # States.
         self.is_running = False
         self.is_hovered = False
         self.is_dragging = False
         self.is_dirty = False
+        # Displayed somewhere (see view_manager). Hidden views keep their last frame as 8-bit (pixels, size).
+        self.is_visible = True
+        self.cached_frame: tuple[np.ndarray, tuple[int, int]] | None = None
 
         # Runtime data.
-        self._event_timer = None
+        self._frame_timer = None
         self.texture = None
         self.batch = None
         self.shm_texture_buffer = None
-        self.gpu_buffer = None
+        # Alpha of the last consumed frame, copied before its slot is given back to the renderer (hit tests).
+        self.frame_alpha = None
+        self.gpu_buffers = None
+        # Buffers of frames smaller than the ring: (slot, size) -> Buffer.
+        self.sized_gpu_buffers = {}
+        self.frame_ring = None
+        # Slot of the last consumed frame, kept READING (the renderer can't paint into it) until the next one.
+        self.held_slot = None
         self.shm = None
         self.server = None
         self.client = None
@@ -180,13 +169,17 @@ class CEF_Python_Controller:
         self.thread = threading.Thread(target=self.echo_server, daemon=True)
         self.thread.start()
 
-    def start_renderer(self, html_filepath) -> None:
+    def start_renderer(self, url: str) -> None:
+        if is_remote_url(url):
+            # Page rendered on another machine and relayed by a hub (see remote_view).
+            self.process = subprocess.Popen(remote_command(url, f'{self.width},{self.height},{4}', self.shm.name, self.port))
+            return True
         self.process = subprocess.Popen(
             [
                 path.abspath(path.join(path.dirname(__file__), 'venv', '.env_cefpython', 'Scripts', 'python.exe')),
                 path.abspath(path.join(path.dirname(__file__), 'scripts', 'bws_cefpython.py')),
                 '--',
-                f'file://{html_filepath}',
+                url,
                 f'{self.width},{self.height},{4}',
                 self.shm.name,
                 str(self.port)
@@ -195,8 +188,33 @@ class CEF_Python_Controller:
         )
         return True
 
-    def start_event_timer(self, context: Context):
-        self._event_timer = context.window_manager.event_timer_add(1 / FPS, window=context.window)
+    def start_frame_timer(self, context: Context | Region | None):
+        ''' Polls the frame ring from the addon timer scheduler: every view shares the same Blender timer wake-up.
+            Persistent: the controller outlives a file load, and so must its polling. '''
+        if self._frame_timer:
+            self._frame_timer.stop()
+        region = context if context is None or isinstance(context, Region) else context.region
+
+        def _poll_frame():
+            nonlocal region
+            if not self.is_running or self.frame_ring is None:
+                return -1
+            if self.consume_frame() or self.is_dirty:
+                self.is_dirty = False
+                try:
+                    if region is not None:
+                        region.tag_redraw()
+                except ReferenceError:
+                    region = None
+                if region is None:
+                    # Closed region (or file reloaded), or resumed for the image stream only: redraw one showing the view, if any.
+                    region = find_visible_region(self.area_type)
+                    if region is not None:
+                        region.tag_redraw()
+            return None
+
+        self._frame_timer = ACK.Helper.TIMER(_poll_frame, first_interval=1 / FPS, step_interval=1 / FPS,
+                                             one_time_only=False, persistent=True)
 
     def start(self, context: Context) -> bool:
         self.is_running = True
@@ -212,10 +230,19 @@ class CEF_Python_Controller:
         # self.start_thread()
         self.start_server()
         self.update_shm_buffer()
+        self.metrics.create_stats_block(self.shm.name)
+        self.image_share.attach_view(self.shm.name)
         self.update_batch()
         self.update_texture()
-        self.start_renderer(html_example)
-        self.start_event_timer(context)
+        if url := remote_url(context):
+            self.start_renderer(url)
+        else:
+            # Served from memory by the renderer (bws:// scheme), packed here so its launch reads a single cached file.
+            AssetBundle.load()
+            self.start_renderer(bundle_url(HTML_FILENAME))
+        self.start_frame_timer(context)
+        self.is_visible = True
+        ViewManager.add(self)
 
         context.region.tag_redraw()
         
@@ -224,17 +251,21 @@ class CEF_Python_Controller:
     def stop(self, context: Context) -> None:
         ## print("STOP!")
         context.region.tag_redraw()
+        ViewManager.remove(self)
+        self.cached_frame = None
 
         # Stop drawing.
         self.texture = None
         self.batch = None
         self.shm_texture_buffer = None
-        self.gpu_buffer = None
+        self.frame_alpha = None
+        self.gpu_buffers = None
+        self.sized_gpu_buffers.clear()
 
-        # Clear event Timer.
-        if self._event_timer:
-            context.window_manager.event_timer_remove(self._event_timer)
-            self._event_timer = None
+        # Stop polling frames.
+        if self._frame_timer:
+            self._frame_timer.stop()
+            self._frame_timer = None
 
         # Close the socket reader flow.
         # if self.thread:
@@ -245,7 +276,7 @@ class CEF_Python_Controller:
         # Close client connection and close server.
         if client := self.client:
             try:
-                client.send(SOCKET_SIGNAL.KILL.to_bytes(4, byteorder='big'))
+                client.send(encode_signal(SOCKET_SIGNAL.KILL))
             except socket.error as e:
                 print(e)
             self.client = None
@@ -259,10 +290,10 @@ class CEF_Python_Controller:
             self.process.kill()
 
         # Close SHM.
-        if shm := self.shm:
-            shm.close()
-            shm.unlink()
-            del shm
+        self.release_shm_buffer()
+        self.metrics.release()
+        self.image_stream.release()
+        self.image_share.release()
 
         self.is_running = False
 
@@ -273,24 +304,146 @@ class CEF_Python_Controller:
     def update_batch(self) -> None:
         self.batch = batch_for_shader(IMAGE_SHADER, 'TRI_FAN', {"pos": [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)], "texco": [(0, 1), (1, 1), (1, 0), (0, 0)]})
 
+    def release_shm_buffer(self) -> None:
+        self.shm_texture_buffer = None
+        self.gpu_buffers = None
+        self.sized_gpu_buffers.clear()
+        if frame_ring := self.frame_ring:
+            self.frame_ring = None
+            self.held_slot = None
+            self.shm = None
+            frame_ring.close()
+            frame_ring.unlink()
+
     def update_shm_buffer(self) -> None:
-        a = np.zeros((self.width * self.height * 4, ), dtype=np.float32)
-        self.shm = shared_memory.SharedMemory(create=True, size=a.nbytes)
-        b = np.ndarray(a.shape, dtype=a.dtype, buffer=self.shm.buf)
-        b[:] = a[:]
-        self.shm_texture_buffer = b
-        self.shm_texture_buffer[-1] = 0
-        self.gpu_buffer = gpu.types.Buffer('FLOAT', self.width * self.height * 4, self.shm_texture_buffer)
-        del a
-
-    def update_texture(self) -> None:
+        self.frame_ring = FrameRing.create(self.width, self.height, 4, slot_count=FRAME_SLOTS)
+        self.shm = self.frame_ring.shm
+        self.gpu_buffers = [
+            gpu.types.Buffer('FLOAT', self.frame_ring.frame_length, self.frame_ring.pixels(slot))
+            for slot in range(self.frame_ring.slot_count)
+        ]
+        self.shm_texture_buffer = self.frame_ring.pixels(0)
+
+    def get_gpu_buffer(self, slot: int, size: tuple[int, int]) -> gpu.types.Buffer:
+        frame_ring = self.frame_ring
+        if size == (frame_ring.width, frame_ring.height):
+            return self.gpu_buffers[slot]
+        buffer = self.sized_gpu_buffers.get((slot, size), None)
+        if buffer is None:
+            if len(self.sized_gpu_buffers) >= 2 * frame_ring.slot_count:
+                # Sizes of older viewports.
+                self.sized_gpu_buffers.clear()
+            pixels = frame_ring.frame_pixels(slot, size)
+            buffer = self.sized_gpu_buffers[slot, size] = gpu.types.Buffer('FLOAT', len(pixels), pixels)
+        return buffer
+
+    def update_texture(self, slot: int = 0, size: tuple[int, int] | None = None) -> None:
         if self.shm_texture_buffer is None:
             return
+        size = size or (self.width, self.height)
         try:
-            self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
+            self.texture = gpu.types.GPUTexture(size, format='RGBA32F', data=self.get_gpu_buffer(slot, size))
         except Exception as e:
             print(e)
 
+    def consume_frame(self) -> bool:
+        ''' Uploads the newest frame published by the renderer, if any. '''
+        if self.frame_ring is None:
+            # Released while the view is hidden.
+            return False
+        slot = self.frame_ring.acquire_read()
+        if slot is None:
+            return False
+        self.release_held_slot()
+        self.held_slot = slot
+        header = self.frame_ring.read_header(slot)
+        size = self.frame_ring.frame_size(header)
+        upload_start_ns = time.perf_counter_ns()
+        self.update_texture(slot, size)
+        upload_end_ns = time.perf_counter_ns()
+        self.shm_texture_buffer = self.frame_ring.frame_pixels(slot, size)
+        self.frame_alpha = copy_alpha(self.shm_texture_buffer, self.frame_alpha)
+        self.frame_size = size
+        self.frame_consumed(header)
+        if size == (self.frame_ring.width, self.frame_ring.height):
+            # Streams and exports are whole views.
+            self.image_stream.push(self.shm_texture_buffer, self.texture)
+            self.metrics.export_frame(self.frame_ring, slot)
+        self.metrics.frame_consumed(upload_start_ns / 1e9)
+        self.metrics.latency.set_renderer_pid(self.frame_ring.producer_pid)
+        self.metrics.latency.frame_consumed(header, upload_start_ns, upload_end_ns)
+        if recorder := self.metrics.recorder:
+            recorder.frame(header, upload_start_ns)
+        return True
+
+    def release_held_slot(self) -> None:
+        ''' Gives the slot of the last consumed frame back to the renderer. '''
+        if self.held_slot is not None:
+            self.frame_ring.release(self.held_slot)
+            self.held_slot = None
+
+
+    # Visibility (see view_manager).
+    # ----------------------------------------------------------------
+
+    def keeps_running(self) -> bool:
+        ''' Frames are used outside of the view (image stream), even when it is hidden. '''
+        return self.image_stream.is_consumed()
+
+    def set_visible(self, visible: bool, region: Region | None, release_frames: bool) -> None:
+        if not self.is_running:
+            return
+        self.is_visible = visible
+        if visible:
+            self.resume(region)
+        else:
+            self.suspend(release_frames)
+
+    def suspend(self, release_frames: bool) -> None:
+        ''' Stops the paints and the frame polling. The last frame is kept, 4 times smaller. '''
+        if self._frame_timer:
+            self._frame_timer.stop()
+            self._frame_timer = None
+        if self.held_slot is not None:
+            # Still READING: the renderer, painting until it gets VISIBILITY, can't write into it.
+            self.cached_frame = (float32_to_rgba8(self.shm_texture_buffer), self.frame_size)
+            self.release_held_slot()
+        self.texture = None
+        flags = VISIBILITY_FLAGS.HIDDEN
+        if release_frames:
+            flags |= VISIBILITY_FLAGS.RELEASE_FRAMES
+            self.release_shm_buffer()
+        self.send_control(encode_control(SOCKET_SIGNAL.VISIBILITY, flags, ''))
+
+    def resume(self, region: Region | None) -> None:
+        ''' Draws the cached frame right away, and resumes the paints (in a new frame ring if it was released). '''
+        ring_name = ''
+        if self.frame_ring is None:
+            self.update_shm_buffer()
+            ring_name = self.frame_ring.name
+        self.restore_cached_frame()
+        self.send_control(encode_control(SOCKET_SIGNAL.VISIBILITY, 0, ring_name))
+        # Frames are polled even without a region to redraw (kept running for the image stream).
+        self.start_frame_timer(region)
+        if region is not None:
+            region.tag_redraw()
+
+    def restore_cached_frame(self) -> None:
+        if self.cached_frame is None:
+            return
+        compact, size = self.cached_frame
+        self.cached_frame = None
+        pixels = rgba8_to_float32(compact, np.empty(compact.size, dtype=np.float32))
+        try:
+            self.texture = gpu.types.GPUTexture(size, format='RGBA32F', data=gpu.types.Buffer('FLOAT', pixels.size, pixels))
+        except Exception as e:
+            print(e)
+            return
+        # Hit tests read the cached frame until the renderer publishes a new one.
+        self.shm_texture_buffer = pixels
+        self.frame_alpha = copy_alpha(pixels, self.frame_alpha)
+        self.frame_size = size
+
 
     # Sockets communication.
     # ----------------------------------------------------------------
@@ -346,7 +499,7 @@ class CEF_Python_Controller:
                         if signal == SOCKET_SIGNAL.PING:
                             print("[SERVER] Received PING signal")
                             # Send back a PONG signal
-                            conn.send(SOCKET_SIGNAL.PONG.to_bytes(4, byteorder='big'))
+                            conn.send(encode_signal(SOCKET_SIGNAL.PONG))
                         elif signal == SOCKET_SIGNAL.BUFFER_UPDATE:
                             print("[SERVER] Received BUFFER_UPDATE signal")
                             self.is_dirty = True
@@ -396,7 +549,7 @@ class CEF_Python_Controller:
             if signal == SOCKET_SIGNAL.PING:
                 print("[SERVER] Received PING signal")
                 # Send back a PONG signal
-                self.client.send(SOCKET_SIGNAL.PONG.to_bytes(4, byteorder='big'))
+                self.client.send(encode_signal(SOCKET_SIGNAL.PONG))
             elif signal == SOCKET_SIGNAL.BUFFER_UPDATE:
                 print("[SERVER] Received BUFFER_UPDATE signal")
                 self.is_dirty = True
@@ -408,20 +561,39 @@ class CEF_Python_Controller:
 
         return 1 / FPS
 
+    def send_control(self, message: bytes) -> bool:
+        ''' Control messages (bws_protocol.CONTROL_SIGNALS, PROFILE_STOP) are not retried on reconnection. '''
+        if self.client is None:
+            return False
+        try:
+            self.client.sendall(message)
+        except socket.error:
+            return False
+        return True
+
     def send(self, signal: int, *event_data: tuple) -> bool:
-        def _send():
-            # Send command ID.
-            self.client.send(signal.to_bytes(4, byteorder='big'))
+        ''' Returns True if the message was sent (on reconnection too), False if it was dropped. '''
+        # Is an Event? Stamp it so its latency can be tracked until it is drawn.
+        if signal in INPUT_SIGNALS:
+            input_id, time_ns = self.metrics.latency.new_input(signal)
+            message = encode_input(signal, input_id, time_ns, *event_data)
+            if recorder := self.metrics.recorder:
+                recorder.input(signal, time_ns, event_data)
+        else:
+            message = encode_signal(signal)
 
-            # Is an Event? Send its data!
-            if signal >= 8 and event_data:
-                self.client.send(struct.pack(EVENT_DATA_BYTES[signal], *event_data))
+        def _send():
+            self.client.sendall(message)
+            if signal in INPUT_SIGNALS:
+                self.last_input_id = input_id
+                self.metrics.input_sent()
 
         # attempt to send and receive wave, otherwise reconnect
         try:
             if self.client is None:
                 raise socket.error("[SERVER] No client")
             _send()
+            return True
         except socket.error as e:
             # set connection status and recreate socket
             self.connected = False
@@ -440,6 +612,7 @@ class CEF_Python_Controller:
                     _send()
                     if self.first_connection:
                         self.first_connection = False
+                    return True
                 except socket.error:
                     if self.first_connection:
                         # Avoid slowdown in first connection while client is loading...
@@ -448,6 +621,7 @@ class CEF_Python_Controller:
                         break
                     ntries += 1
                     # time.sleep(.1)
+            return False
 
     # Polling.
     # ----------------------------------------------------------------
@@ -456,7 +630,7 @@ class CEF_Python_Controller:
         return True
 
     def poll_select(self, context: Context) -> bool:
-        return self.poll_draw(context) and self.shm_texture_buffer is not None
+        return self.poll_draw(context) and self.frame_alpha is not None
 
     def poll_draw(self, context: Context) -> bool:
         return self.poll_common(context) and self.texture is not None and self.batch is not None
@@ -467,7 +641,7 @@ class CEF_Python_Controller:
 
     @classmethod
     def _poll(self, context: Context, instance: 'CEF_Python_Controller') -> bool:
-        if context.window_manager.show_gz_cefpython:
+        if getattr(context.window_manager, self.toggle_prop):
             if instance is not None and not instance.is_running:
                 if not instance.start(context):
                     return False
@@ -476,6 +650,12 @@ class CEF_Python_Controller:
                 print("[B3D] Client closed due to some issue. Restarting...")
                 instance.process = None
                 instance.stop(context)
+            if instance is not None and instance.is_running and not instance.is_visible:
+                # Shown again: redisplay the cached frame now, not on the next visibility check.
+                instance.set_visible(True, context.region, False)
+            if instance is not None and instance.is_running and (instance._frame_timer is None or not instance._frame_timer.is_running):
+                # Cancelled by the scheduler (timer error...): poll the frames again.
+                instance.start_frame_timer(context)
             return True
         else:
             if instance is not None and instance.is_running:
@@ -487,13 +667,14 @@ class CEF_Python_Controller:
         if not self.poll_select(context):
             ## print(self.shm_texture_buffer, self.texture, self.batch)
             return False
-        a = self.get_pixel_alpha(*loc)
+        mouse = self.to_renderer_pos(context, *loc)
+        a = None if mouse is None else self.hover_alpha(context, loc)
         is_hovered = a is not None and a > 0.01
         ## print("_test_select: alpha:", a, is_hovered)
-        self.renderer_mouse_pos = (loc[0], self.height - loc[1])
+        if mouse is not None:
+            self.renderer_mouse_pos = mouse
         if is_hovered:
-            self.prev_mouse_pos = self.mouse_pos.copy()
-            self.mouse_pos = Vector(loc)
+            self.mouse_pos = (loc[0], loc[1])
             if not self.is_hovered:
                 self.mouse_enter(context, self.renderer_mouse_pos)
             self.mouse_move(context, self.renderer_mouse_pos)
@@ -509,11 +690,8 @@ class CEF_Python_Controller:
         ## print('_invoke')
         if not self.ensure_client_connection():
             return OpsReturn.CANCEL
-        if event.type == 'TIMER':
-            # self._event_timer.time_delta
-            if self.is_dirty or self.shm_texture_buffer[-1] == 1:
-                self.update_texture()
-                self.shm_texture_buffer[-1] = 0
+        if event_code(event) >> VALUE_BITS == TIMER_TYPE_CODE:
+            if self.consume_frame() or self.is_dirty:
                 self.is_dirty = False
                 context.region.tag_redraw()
             return OpsReturn.PASS
@@ -525,10 +703,11 @@ class CEF_Python_Controller:
 
     def _modal(self, context: Context, event: Event, tweak) -> set[str]:
         ## print('_modal')
-        if event.type in {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE'}:
-            self.renderer_mouse_pos = (event.mouse_region_x, self.height - event.mouse_region_y)
-            self.prev_mouse_pos = self.mouse_pos.copy()
-            self.mouse_pos = Vector((event.mouse_region_x, event.mouse_region_y))
+        if event_code(event) >> VALUE_BITS in MOUSE_MOVE_TYPE_CODES:
+            x = event.mouse_region_x
+            y = event.mouse_region_y
+            self.mouse_pos = (x, y)
+            self.renderer_mouse_pos = self.to_renderer_pos(context, x, y) or self.renderer_mouse_pos
             self.mouse_move(context, self.renderer_mouse_pos)
         if self.modal(context, event, self.renderer_mouse_pos):
             return OpsReturn.RUN
@@ -549,17 +728,12 @@ class CEF_Python_Controller:
         if not self.poll_draw(context):
             return
 
+        draw_start_ns = time.perf_counter_ns()
         self.draw(context)
-
-        self.draw_frame_count += 1
-        # Calculate FPS every second
-        if time.time() - self.draw_start_time > 1.0:  # one second has passed
-            fps = self.draw_frame_count / (time.time() - self.draw_start_time)
-            ## print(f'Draw-Handler FPS: {int(fps)}')
-
-            # Reset the frame count and start time
-            self.draw_frame_count = 0
-            self.draw_start_time = time.time()
+        draw_end_ns = time.perf_counter_ns()
+        self.metrics.frame_drawn(draw_start_ns / 1e9)
+        self.metrics.latency.frame_drawn(draw_start_ns, draw_end_ns)
+        draw_hud(context, self.metrics)
 
 
     # Mouse-Hover Events.
@@ -570,10 +744,12 @@ class CEF_Python_Controller:
 
     def mouse_move(self, context: Context, mouse) -> None:
         threshold = 2 if self.is_dragging else 5
-        if (self.mouse_pos - self.last_mouse_pos).length_squared < threshold:
+        x, y = self.mouse_pos
+        last_x, last_y = self.last_mouse_pos
+        if (x - last_x) * (x - last_x) + (y - last_y) * (y - last_y) < threshold:
             return
         ## print("mouse_move")
-        self.last_mouse_pos = self.mouse_pos.copy()
+        self.last_mouse_pos = self.mouse_pos
         self.send(SOCKET_SIGNAL.MOUSE_MOVE, *mouse)
 
     def mouse_exit(self, context: Context, mouse) -> None:
@@ -593,46 +769,29 @@ class CEF_Python_Controller:
     
     def mouse_drag_start(self, mouse) -> None:
         self.send(SOCKET_SIGNAL.MOUSE_DRAG_START, *mouse)
-        
+
+    def mouse_scroll(self, mouse, signal: int) -> None:
+        self.send(signal, *mouse)
+
+    def drag_start(self, mouse) -> bool:
+        self.is_dragging = True
+        print("START DRAGGING")
+        self.mouse_drag_start(mouse)
+        return True
+
     def mouse_drag_end(self, mouse) -> None:
         self.send(SOCKET_SIGNAL.MOUSE_DRAG_END, *mouse)
 
     def invoke(self, context: Context, event: Event, mouse) -> bool:
         print("[GZ::invoke() -> ", event.type, event.value)
-        if event.type in {'LEFTMOUSE', 'RIGHTMOUSE', 'MIDDLEMOUSE'}:
-            if event.value in {'PRESS', 'RELEASE'}:
-                mouse_button = event.type.removesuffix('MOUSE')
-                mouse_type: int = getattr(MOUSE_BUTTON, mouse_button)
-                if event.value == 'RELEASE':
-                    self.mouse_up(mouse, mouse_type)
-                else:
-                    self.mouse_down(mouse, mouse_type)
-                return False
-
-            elif event.type == 'LEFTMOUSE' and event.value == 'CLICK_DRAG':
-                self.is_dragging = True
-                print("START DRAGGING")
-                self.mouse_drag_start(mouse)
-                return True
-            else:
-                return False
+        event_id = event_code(event)
+        if event_id in INVOKE_DISPATCH:
+            # Mouse buttons, drag start and wheel: the handler sends the protocol record of the code.
+            return bool(INVOKE_DISPATCH.dispatch(event_id, self, mouse))
 
-        elif event.type in {'WHEELUPMOUSE', 'WHEELDOWNMOUSE'} and event.value == 'PRESS':
-            signal = SOCKET_SIGNAL.SCROLL_UP if event.type == 'WHEELUPMOUSE' else SOCKET_SIGNAL.SCROLL_DOWN
-            self.send(signal, *mouse)
-            return False
-
-        elif event.unicode and event.value in {'PRESS', 'RELEASE'}:
+        if event.unicode and event_id & VALUE_MASK in KEY_VALUE_CODES:
             ##windows_vk_code = 0
-
-            modififiers = KeyEventFlags.EVENTFLAG_NONE
-            if event.alt:
-                modififiers |= KeyEventFlags.EVENTFLAG_ALT_DOWN
-            if event.shift:
-                modififiers |= KeyEventFlags.EVENTFLAG_SHIFT_DOWN
-            if event.ctrl:
-                modififiers |= KeyEventFlags.EVENTFLAG_CONTROL_DOWN
-
+            modififiers = MODIFIER_FLAGS[event.alt | (event.shift << 1) | (event.ctrl << 2)]
             ## key_press = 1 if event.value == 'PRESS' else 0
             self.send(SOCKET_SIGNAL.UNICODE, ord(event.unicode), modififiers)
             return False
@@ -645,7 +804,7 @@ class CEF_Python_Controller:
     def modal(self, context: Context, event: Event, mouse) -> bool:
         # print("[GZ::modal() -> ", event.type, event.value)
         if self.is_dragging:
-            if event.type == 'LEFTMOUSE' and event.value == 'RELEASE':
+            if event_code(event) == LEFTMOUSE_RELEASE_CODE:
                 self.mouse_drag_end(mouse)
                 self.is_dragging = False
                 print("END DRAGGING")
@@ -672,13 +831,23 @@ class CEF_Python_Controller:
     # Util methods.
     # ----------------------------------------------------------------
 
-    def get_pixel_alpha(self, x: int, y: int) -> tuple | None:
-        if self.shm_texture_buffer is None:
-            return None
-        pixel_index = (x * self.width + y) * 4
-        if pixel_index >= len(self.shm_texture_buffer):
+    def frame_consumed(self, header) -> None:
+        ''' A new frame is in 'texture' ('header' is its bws_frames.FrameHeader). '''
+        pass
+
+    def to_renderer_pos(self, context: Context, x: int, y: int) -> tuple[int, int] | None:
+        ''' Page coordinates (top-left origin) of region coordinates, None outside of the page. '''
+        return (x, self.height - y)
+
+    def hover_alpha(self, context: Context, loc) -> float | None:
+        ''' Alpha of the displayed page under the region coordinates 'loc'. '''
+        return self.get_pixel_alpha(*loc)
+
+    def get_pixel_alpha(self, x: int, y: int) -> float | None:
+        ''' Alpha of the last consumed frame at region coordinates (bottom-left origin). '''
+        if self.frame_alpha is None:
             return None
-        return self.shm_texture_buffer[pixel_index + 3]
+        return pixel_alpha(self.frame_alpha, self.width, self.height, int(x), self.height - 1 - int(y), channels=1)
 
     def handle_button_click(self, button_id: str) -> None:
         """Handle button click events from CEF"""
@@ -711,9 +880,23 @@ class CEF_Python_Controller:
 ################################################################
 
 
+# Invoke routing: event code -> (handler, protocol record). Handlers are called with (controller, mouse, *record).
+INVOKE_DISPATCH = EventDispatch()
+for _button in ('LEFT', 'MIDDLE', 'RIGHT'):
+    INVOKE_DISPATCH.add(f'{_button}MOUSE', 'PRESS', CEF_Python_Controller.mouse_down, getattr(MOUSE_BUTTON, _button))
+    INVOKE_DISPATCH.add(f'{_button}MOUSE', 'RELEASE', CEF_Python_Controller.mouse_up, getattr(MOUSE_BUTTON, _button))
+INVOKE_DISPATCH.add('LEFTMOUSE', 'CLICK_DRAG', CEF_Python_Controller.drag_start)
+INVOKE_DISPATCH.add('WHEELUPMOUSE', 'PRESS', CEF_Python_Controller.mouse_scroll, SOCKET_SIGNAL.SCROLL_UP)
+INVOKE_DISPATCH.add('WHEELDOWNMOUSE', 'PRESS', CEF_Python_Controller.mouse_scroll, SOCKET_SIGNAL.SCROLL_DOWN)
+
+
 @ACK.Deco.UI_APPEND(bpy.types.VIEW3D_HT_header, poll=lambda header, ctx: True)
 def ext_view3d_header(header, context: Context) -> None:
     header.layout.prop(context.window_manager, 'show_gz_cefpython', text='Interact!', toggle=True)
+    header.layout.prop(context.window_manager, 'show_bws_metrics_hud', text='', icon='INFO', toggle=True)
+    draw_release_hidden_views(header.layout, context)
+    draw_remote_hub(header.layout, context)
+    draw_stream_mode(header.layout, context)
 
 
 def init():
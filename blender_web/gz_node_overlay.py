@@ -0,0 +1,164 @@
+import bpy
+import gpu
+from bpy.types import Context
+from gpu_extras.batch import batch_for_shader
+
+from .ackit import ACK
+from .ackit.bcy import RegionView
+from .gz_cefpython import CEF_Python_Controller
+from .shaders import IMAGE_SHADER
+from .scripts.bws_frames import pixel_alpha
+from .scripts.bws_mip import MipRequester, Viewport
+from .scripts.bws_protocol import SOCKET_SIGNAL
+
+
+# View space position of the top-left corner of the page. One page pixel is one view unit.
+PAGE_ORIGIN = (0.0, 0.0)
+
+
+@ACK.Deco.GZ({'NODE_EDITOR'})
+class CEF_Node_Overlay_Controller(CEF_Python_Controller):
+    ''' Web page anchored in the node editor view, zoomed and panned with the nodes.
+
+        Zoomed out, the renderer paints it at a lower resolution (mip level) and only sends the part
+        that is visible (see bws_mip): the page costs the pixels it covers in the region, not its size.
+        Frames are matched to the viewport they were painted with by their input id.
+    '''
+    toggle_prop = 'show_gz_node_overlay'
+
+    def __init__(self, context: Context) -> None:
+        super().__init__(context)
+        # The page keeps the size of the region it was opened in.
+        self.mip = MipRequester(self.width, self.height)
+        # Viewport of the texture, and requests not displayed yet: [(input_id, viewport)].
+        self.viewport = Viewport.full(self.width, self.height)
+        self.pending_viewports: list[tuple[int, Viewport]] = []
+        self.view_stamp = -1
+        self.batch_key = None
+
+    def start(self, context: Context) -> bool:
+        self.mip = MipRequester(self.width, self.height)
+        self.viewport = Viewport.full(self.width, self.height)
+        self.pending_viewports.clear()
+        self.view_stamp = -1
+        self.batch_key = None
+        return super().start(context)
+
+
+    # Viewport requests.
+    # ----------------------------------------------------------------
+
+    @property
+    def page_rect(self) -> tuple[float, float, float, float]:
+        x, y = PAGE_ORIGIN
+        return x, y - self.height, x + self.width, y
+
+    def _draw_prepare(self, context: Context) -> None:
+        if not self.is_running or self.client is None:
+            # Requests sent before the renderer is connected would be lost.
+            return
+        view = RegionView.get(context.region)
+        if view is not None:
+            if not view.changed(self.view_stamp):
+                return
+            self.view_stamp = view.stamp
+            zoom = view.zoom
+            visible_rect = view.visible_rect
+        else:
+            view2d = context.region.view2d
+            x_min, y_min = view2d.region_to_view(0, 0)
+            x_max, y_max = view2d.region_to_view(context.region.width, context.region.height)
+            zoom = context.region.height / (y_max - y_min) if y_max != y_min else 1.0
+            visible_rect = (x_min, y_min, x_max, y_max)
+
+        viewport = self.mip.update(zoom, self.page_rect, visible_rect)
+        if viewport is None:
+            return
+        if self.send(SOCKET_SIGNAL.VIEWPORT, *viewport):
+            self.pending_viewports.append((self.last_input_id, viewport))
+        else:
+            # Never applied by the renderer ('last_input_id' is still the previous input): ask again on next draw.
+            self.mip.rollback()
+            self.view_stamp = -1
+
+    def frame_consumed(self, header) -> None:
+        # Frames painted after a request (input id >= its id) use its viewport.
+        pending = self.pending_viewports
+        while pending and pending[0][0] <= header.input_id:
+            self.viewport = pending.pop(0)[1]
+
+
+    # Page mapping.
+    # ----------------------------------------------------------------
+
+    def _region_to_view(self, context: Context, x: float, y: float) -> tuple[float, float]:
+        if view := RegionView.get(context.region):
+            return view.region_to_view(x, y)
+        return context.region.view2d.region_to_view(x, y)
+
+    def _view_to_region(self, context: Context, x: float, y: float) -> tuple[float, float]:
+        if view := RegionView.get(context.region):
+            return view.view_to_region(x, y)
+        return context.region.view2d.view_to_region(x, y, clip=False)
+
+    def to_renderer_pos(self, context: Context, x: int, y: int) -> tuple[int, int] | None:
+        view_x, view_y = self._region_to_view(context, x, y)
+        page_x = int(view_x - PAGE_ORIGIN[0])
+        page_y = int(PAGE_ORIGIN[1] - view_y)
+        if page_x < 0 or page_y < 0 or page_x >= self.width or page_y >= self.height:
+            return None
+        return page_x, page_y
+
+    def hover_alpha(self, context: Context, loc) -> float | None:
+        if self.frame_alpha is None:
+            return None
+        mouse = self.to_renderer_pos(context, *loc)
+        if mouse is None:
+            return None
+        viewport = self.viewport
+        crop_x, crop_y, _width, _height = viewport.crop()
+        frame_width, frame_height = self.frame_size
+        return pixel_alpha(self.frame_alpha, frame_width, frame_height,
+                           (mouse[0] >> viewport.level) - crop_x, (mouse[1] >> viewport.level) - crop_y, channels=1)
+
+
+    # Drawing.
+    # ----------------------------------------------------------------
+
+    def update_batch(self) -> None:
+        # Built on draw, in region space.
+        self.batch = None
+
+    def poll_draw(self, context: Context) -> bool:
+        return self.poll_common(context) and self.texture is not None
+
+    def draw(self, context: Context) -> None:
+        viewport = self.viewport
+        view = RegionView.get(context.region)
+        key = (viewport, self.frame_size, view.stamp if view is not None else tuple(context.region.view2d.region_to_view(0, 0)))
+        if key != self.batch_key:
+            self.batch_key = key
+            # Part of the page covered by the frame, in page pixels.
+            level = viewport.level
+            crop_x, crop_y, _width, _height = viewport.crop()
+            frame_width, frame_height = self.frame_size
+            x_min = PAGE_ORIGIN[0] + (crop_x << level)
+            x_max = PAGE_ORIGIN[0] + ((crop_x + frame_width) << level)
+            y_max = PAGE_ORIGIN[1] - (crop_y << level)
+            y_min = PAGE_ORIGIN[1] - ((crop_y + frame_height) << level)
+            corners = [self._view_to_region(context, x, y) for x, y in ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max))]
+            self.batch = batch_for_shader(IMAGE_SHADER, 'TRI_FAN', {"pos": corners, "texco": [(0, 1), (1, 1), (1, 0), (0, 0)]})
+
+        IMAGE_SHADER.uniform_sampler("image", self.texture)
+        gpu.state.blend_set('ALPHA')
+        self.batch.draw(IMAGE_SHADER)
+        gpu.state.blend_set('NONE')
+
+
+@ACK.Deco.UI_APPEND(bpy.types.NODE_HT_header, poll=lambda header, ctx: True)
+def ext_node_header(header, context: Context) -> None:
+    header.layout.prop(context.window_manager, 'show_gz_node_overlay', text='Web Overlay', toggle=True)
+
+
+def init():
+    ACK.Helper.PROP(bpy.types.WindowManager, 'show_gz_node_overlay', ACK.Prop.BOOL(name="Web Overlay", default=False))
@@ -0,0 +1,186 @@
+from collections.abc import Callable
+import weakref
+
+import bpy
+import gpu
+import numpy as np
+from bpy.props import BoolProperty, StringProperty
+from bpy.types import Context, Depsgraph, Image, Operator, Scene
+
+from .ackit import ACK
+from .scripts.bws_images import DEFAULT_CAPACITY, SharedImages
+from .scripts.bws_protocol import SOCKET_SIGNAL, encode_control
+
+
+VIEWPORT_IMAGE_NAME = 'viewport'
+
+
+# Live shares, so images can be shared with every web view at once.
+_image_shares: 'weakref.WeakSet[ImageShare]' = weakref.WeakSet()
+
+
+class ImageShare:
+    ''' Blender pixels shared with the page of a web view (see scripts/bws_images):
+        Image datablocks and viewport captures are copied into a SHM next to the frame SHM,
+        and the renderer is notified so the page can fetch them as typed arrays.
+        - 'watched': images shared again whenever they are updated.
+        - 'send_control': set by the view to send control messages to its renderer. '''
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.frame_shm_name = ''
+        self.images: SharedImages | None = None
+        self.generation = -1
+        self.watched: set[str] = set()
+        self.send_control: Callable[[bytes], bool] | None = None
+        # Reused foreach_get() buffers, by pixel count.
+        self._buffers: dict[int, np.ndarray] = {}
+        _image_shares.add(self)
+
+    def attach_view(self, frame_shm_name: str) -> None:
+        ''' The SHM is only created with the first shared image. '''
+        self.release()
+        self.frame_shm_name = frame_shm_name
+
+    def release(self) -> None:
+        if images := self.images:
+            self.images = None
+            images.close()
+            images.unlink()
+        self.watched.clear()
+        self._buffers.clear()
+
+    def _ensure_room(self, name: str, nbytes: int) -> None:
+        if self.images is not None and self.images.fits(name, nbytes):
+            return
+        # Next generation with room for everything: the renderer switches to it with the next notification.
+        previous = self.images
+        used = previous.used - previous.data_offset if previous is not None else 0
+        self.generation += 1
+        self.images = SharedImages.create(self.frame_shm_name, self.generation, max(DEFAULT_CAPACITY, (used + nbytes) * 2))
+        if previous is not None:
+            for info in previous.images():
+                if info.name != name:
+                    self.images.publish(info.name, previous.read_array(info.name)[1])
+            previous.close()
+            previous.unlink()
+
+    def publish(self, name: str, pixels: np.ndarray, flip_y: bool = False) -> bool:
+        ''' (height, width, channels) float32 or uint8 pixels. Returns True if the renderer was notified. '''
+        if not self.frame_shm_name or self.send_control is None:
+            return False
+        self._ensure_room(name, pixels.nbytes)
+        if self.images.publish(name, pixels, flip_y) is None:
+            return False
+        return self.send_control(encode_control(SOCKET_SIGNAL.IMAGE_SHARED, self.generation, name))
+
+    def share_image(self, image: Image) -> bool:
+        width, height = image.size
+        channels = image.channels
+        if not width or not height:
+            return False
+        size = width * height * channels
+        buffer = self._buffers.get(size, None)
+        if buffer is None:
+            buffer = self._buffers[size] = np.empty(size, dtype=np.float32)
+        image.pixels.foreach_get(buffer)
+        # Bottom-up in Blender, flipped while copying into the SHM.
+        return self.publish(image.name, buffer.reshape(height, width, channels), flip_y=True)
+
+
+def share_image(image: Image, watch: bool = False) -> int:
+    ''' Shares an image with every web view. Returns the number of views notified. '''
+    shared = 0
+    for image_share in list(_image_shares):
+        if watch:
+            image_share.watched.add(image.name)
+        shared += image_share.share_image(image)
+    return shared
+
+
+def share_region(name: str) -> int:
+    ''' Shares the pixels of the region being drawn with every web view.
+        Call it from a draw callback, after what has to be captured. Returns the number of views notified. '''
+    x, y, width, height = gpu.state.viewport_get()
+    buffer = gpu.state.active_framebuffer_get().read_color(x, y, width, height, 4, 0, 'FLOAT')
+    buffer.dimensions = width * height * 4
+    pixels = np.asarray(buffer, dtype=np.float32).reshape(height, width, 4)
+    return sum(image_share.publish(name, pixels, flip_y=True) for image_share in list(_image_shares))
+
+
+@ACK.Deco.HANDLER.DEPSGRAPH_UPDATE_POST(persistent=True)
+def image_share_depsgraph_update(context: Context, scene: Scene, depsgraph: Depsgraph, *_) -> None:
+    watched = set().union(*(image_share.watched for image_share in list(_image_shares)))
+    if not watched:
+        return
+    for update in depsgraph.updates:
+        if not isinstance(update.id, Image) or update.id.name not in watched:
+            continue
+        image = bpy.data.images[update.id.name]
+        for image_share in list(_image_shares):
+            if image.name in image_share.watched:
+                image_share.share_image(image)
+
+
+class BWS_OT_share_image(Operator):
+    bl_idname = "bws.share_image"
+    bl_label = "Share Image with Web Views"
+    bl_description = "Share the pixels of an image with the pages of the web views (window.bwsImages)"
+
+    image_name: StringProperty(name="Image", default='',
+                               description="Image to share. The image of the active Image Editor by default")
+    watch: BoolProperty(name="Keep Updated", default=False,
+                        description="Share the image again whenever it is updated")
+
+    def execute(self, context: Context):
+        if self.image_name:
+            image = bpy.data.images.get(self.image_name, None)
+        else:
+            image = getattr(context.space_data, 'image', None)
+        if image is None:
+            self.report({'WARNING'}, "No image to share")
+            return {'CANCELLED'}
+        if not share_image(image, self.watch):
+            self.report({'WARNING'}, "No web view to share the image with")
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
+class BWS_OT_share_viewport(Operator):
+    bl_idname = "bws.share_viewport"
+    bl_label = "Share Viewport with Web Views"
+    bl_description = "Capture the next redraw of this 3D viewport and share it with the pages of the web views"
+
+    image_name: StringProperty(name="Name", default=VIEWPORT_IMAGE_NAME, description="Name of the capture for the pages")
+
+    @classmethod
+    def poll(cls, context: Context) -> bool:
+        return context.area is not None and context.area.type == 'VIEW_3D'
+
+    def execute(self, context: Context):
+        name = self.image_name
+        region = context.region
+        handle = None
+
+        def _capture():
+            if bpy.context.region != region:
+                return
+            bpy.types.SpaceView3D.draw_handler_remove(handle, 'WINDOW')
+            share_region(name)
+
+        handle = bpy.types.SpaceView3D.draw_handler_add(_capture, (), 'WINDOW', 'POST_PIXEL')
+        region.tag_redraw()
+        return {'FINISHED'}
+
+
+@ACK.Deco.UI_APPEND(bpy.types.IMAGE_MT_image, poll=lambda menu, ctx: True)
+def ext_image_menu(menu, context: Context) -> None:
+    layout = menu.layout
+    layout.separator()
+    layout.operator(BWS_OT_share_image.bl_idname)
+    layout.operator(BWS_OT_share_image.bl_idname, text="Share Image with Web Views (Keep Updated)").watch = True
+
+
+def unregister():
+    for image_share in list(_image_shares):
+        image_share.release()
@@ -0,0 +1,157 @@
+import time
+import weakref
+
+import bpy
+import gpu
+import numpy as np
+from bpy.types import Context, Image, WindowManager
+
+from .ackit import ACK
+from .scripts.bws_frames import INV_255
+
+
+# How often the consumers of a streamed image are looked up (seconds).
+CONSUMERS_CHECK_INTERVAL = 1.0
+
+STREAM_MODES = (
+    ('NONE', "Off", "Do not stream the web view"),
+    ('IMAGE', "Image", "Copy the frames into the pixels of an Image datablock (materials, EEVEE, compositor, image editor)"),
+    ('GPU', "GPU Only", "Only share the GPU texture of the web view with custom draw handlers (see image_stream.get_texture), the image pixels are not touched"),
+)
+
+
+# Live streams by image name, so other draw handlers / addons can reach their textures.
+_image_streams: 'weakref.WeakValueDictionary[str, ImageStream]' = weakref.WeakValueDictionary()
+
+
+def get_texture(image_name: str) -> gpu.types.GPUTexture | None:
+    ''' GPU texture of the web view streaming into 'image_name' (top-left origin, like the SHM frames). '''
+    if stream := _image_streams.get(image_name, None):
+        return stream.texture
+    return None
+
+
+def find_consumers(image: Image) -> list[bpy.types.Area]:
+    ''' Areas that would display the image: image editors showing it, and 3D views in material
+        or rendered shading if any datablock (material, compositor node...) uses it. '''
+    used = image.users > int(image.use_fake_user)
+    areas = []
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            space = area.spaces.active
+            if area.type == 'IMAGE_EDITOR' and space.image == image:
+                areas.append(area)
+            elif used and area.type == 'VIEW_3D' and space.shading.type in {'MATERIAL', 'RENDERED'}:
+                areas.append(area)
+            elif used and area.type == 'NODE_EDITOR' and space.tree_type == 'CompositorNodeTree':
+                areas.append(area)
+    return areas
+
+
+class ImageStream:
+    ''' Streams the frames of a web view into an Image datablock.
+        - 'IMAGE' mode: throttled to the stream FPS and only while something displays the image.
+          Pixels are flipped (Blender images are bottom-left) and normalized into a reused float32
+          buffer, then written with a single pixels.foreach_set(): no per-frame Python lists.
+        - 'GPU' mode: the texture already uploaded by the view is shared as is (zero copies). '''
+
+    def __init__(self, image_name: str, width: int, height: int) -> None:
+        self.image_name = image_name
+        self.width = width
+        self.height = height
+        self.texture: gpu.types.GPUTexture | None = None
+        self._staging = np.empty((height, width, 4), dtype=np.float32)
+        self._next_push_time = 0.0
+        self._next_consumers_check = 0.0
+        self._consumers: list[bpy.types.Area] = []
+        _image_streams[image_name] = self
+
+    def get_image(self, create: bool = True) -> Image | None:
+        image = bpy.data.images.get(self.image_name, None)
+        if image is None:
+            if not create:
+                return None
+            image = bpy.data.images.new(self.image_name, width=self.width, height=self.height, alpha=True)
+        elif tuple(image.size) != (self.width, self.height):
+            image.scale(self.width, self.height)
+        return image
+
+    def push(self, pixels: np.ndarray, texture: gpu.types.GPUTexture | None = None) -> bool:
+        ''' Call it with the pixels of the frame slot being consumed (RGBA, top-left origin,
+            float32 or uint8) and the texture it was uploaded to. Returns True if the image was updated. '''
+        wm = bpy.context.window_manager
+        mode = wm.bws_image_stream
+        if mode == 'NONE':
+            self.texture = None
+            return False
+        if mode == 'GPU':
+            self.texture = texture
+            return False
+
+        now = time.perf_counter()
+        if now < self._next_push_time:
+            return False
+        self._next_push_time = now + 1.0 / max(wm.bws_image_stream_fps, 1)
+
+        image = self.get_image()
+        if not self.update_consumers(image):
+            return False
+
+        self.write(pixels, image)
+        for area in self._consumers:
+            try:
+                area.tag_redraw()
+            except ReferenceError:
+                self._next_consumers_check = 0.0
+        return True
+
+    def update_consumers(self, image: Image | None = None) -> list[bpy.types.Area]:
+        ''' Areas displaying the image, looked up again every CONSUMERS_CHECK_INTERVAL. '''
+        now = time.perf_counter()
+        if now >= self._next_consumers_check:
+            self._next_consumers_check = now + CONSUMERS_CHECK_INTERVAL
+            if image is None:
+                image = self.get_image(create=False)
+            self._consumers = find_consumers(image) if image is not None else []
+        return self._consumers
+
+    def is_consumed(self) -> bool:
+        ''' Frames may be displayed outside of the web view: by custom draw handlers ('GPU' mode),
+            or by the areas showing the image ('IMAGE' mode). The consumers are refreshed here too:
+            push() is not called while the view is hidden. '''
+        mode = bpy.context.window_manager.bws_image_stream
+        return mode == 'GPU' or (mode == 'IMAGE' and bool(self.update_consumers()))
+
+    def write(self, pixels: np.ndarray, image: Image | None = None) -> Image:
+        ''' Unconditional copy of a frame into the image (no throttling, no consumers check). '''
+        if image is None:
+            image = self.get_image()
+        flipped = pixels.reshape(self.height, self.width, 4)[::-1]
+        if pixels.dtype == np.uint8:
+            np.multiply(flipped, INV_255, out=self._staging)
+        else:
+            np.copyto(self._staging, flipped)
+        image.pixels.foreach_set(self._staging.reshape(-1))
+        image.update()
+        return image
+
+    def release(self) -> None:
+        self.texture = None
+        self._consumers = []
+        self._staging = None
+        if _image_streams.get(self.image_name, None) is self:
+            del _image_streams[self.image_name]
+
+
+def draw_stream_mode(layout: bpy.types.UILayout, context: Context) -> None:
+    wm = context.window_manager
+    row = layout.row(align=True)
+    row.prop(wm, 'bws_image_stream', text='')
+    if wm.bws_image_stream == 'IMAGE':
+        row.prop(wm, 'bws_image_stream_fps', text='FPS')
+
+
+def init():
+    ACK.Helper.PROP(WindowManager, 'bws_image_stream', ACK.Prop.ENUM(name="Stream to Image", items=STREAM_MODES, default='NONE'))
+    ACK.Helper.PROP(WindowManager, 'bws_image_stream_fps', ACK.Prop.INT(name="Image Stream FPS", default=15, min=1, max=60,
+                                                                       description="Maximum rate of the image updates"))
@@ -0,0 +1,187 @@
+from multiprocessing import shared_memory
+from collections.abc import Callable
+import time
+import weakref
+
+import blf
+from bpy.props import StringProperty
+from bpy.types import Context, Operator, WindowManager
+from bpy_extras.io_utils import ExportHelper
+
+from .ackit import ACK
+from .ackit._register.reg_decorators.reg_timer import SCHEDULER
+from .scripts.bws_metrics import (
+    BLENDER_SCHEMA, RENDERER_SCHEMA,
+    StatsBlock, stats_block_name, format_summary
+)
+from .scripts.bws_trace import LatencyTracker, export_chrome_trace
+from .scripts.bws_replay import SessionRecorder
+from .scripts.bws_export import FrameExporter
+from .scripts.bws_frames import FrameRing
+
+
+HUD_FONT_ID = 0
+HUD_FONT_SIZE = 12
+HUD_LINE_HEIGHT = 16
+HUD_MARGIN = 12
+
+
+
+# Live view metrics, so they can be queried from anywhere (Python console, other addons...).
+_view_metrics: 'weakref.WeakSet[ViewMetrics]' = weakref.WeakSet()
+
+
+class ViewMetrics:
+    ''' Metrics of a single web view.
+        - 'local': Blender side registry (upload, draw, frames consumed...).
+        - Renderer side registry is read from the SHM stats block created next to the frame SHM.
+        - 'latency': input-to-photon latency by event type + Chrome trace of both processes.
+        - 'recorder': input stream and frame timeline being recorded, if any (see session_recording).
+        - 'exporter': frames being exported as images or video, if any. 'create_exporter' creates it
+          with the next consumed frame (see frame_export).
+        - 'send_control': set by the view to send control messages to its renderer (see renderer_profiling),
+          'profile_prefix': output of the running renderer profile, if any. '''
+
+    def __init__(self, label: str, size: tuple[int, int] = (0, 0)) -> None:
+        self.label = label
+        self.size = size
+        self.local = BLENDER_SCHEMA.create_registry()
+        self.latency = LatencyTracker(label)
+        self.recorder: SessionRecorder | None = None
+        self.exporter: FrameExporter | None = None
+        self.create_exporter: Callable[[FrameRing], FrameExporter | None] | None = None
+        self.send_control: Callable[[bytes], bool] | None = None
+        self.profile_prefix = ''
+        self.stats_shm: shared_memory.SharedMemory | None = None
+        self.renderer_block: StatsBlock | None = None
+        _view_metrics.add(self)
+
+    def create_stats_block(self, frame_shm_name: str) -> None:
+        ''' Call it BEFORE launching the renderer, so it can attach to the stats block. '''
+        self.release()
+        self.stats_shm = shared_memory.SharedMemory(
+            name=stats_block_name(frame_shm_name),
+            create=True,
+            size=StatsBlock.calc_size(RENDERER_SCHEMA)
+        )
+        self.renderer_block = StatsBlock(self.stats_shm.buf, RENDERER_SCHEMA)
+
+    def release(self) -> None:
+        if exporter := self.exporter:
+            # The staged frames are written in the background.
+            self.exporter = None
+            exporter.close(wait=False)
+        self.create_exporter = None
+        self.renderer_block = None
+        if shm := self.stats_shm:
+            self.stats_shm = None
+            shm.close()
+            shm.unlink()
+
+    # Shortcuts for the hot paths.
+    # ----------------------------------------------------------------
+
+    def frame_consumed(self, upload_start_time: float) -> None:
+        self.local.counters['frames_consumed'].inc()
+        self.local.histograms['upload'].observe_since(upload_start_time)
+
+    def frame_drawn(self, draw_start_time: float) -> None:
+        self.local.histograms['draw'].observe_since(draw_start_time)
+        self.local.rates['draw_fps'].tick()
+
+    def input_sent(self) -> None:
+        self.local.counters['inputs_sent'].inc()
+
+    def file_label(self) -> str:
+        label = ''.join(c if c.isalnum() else '_' for c in self.label)
+        return f"bws_{label}_{time.strftime('%Y%m%d-%H%M%S')}"
+
+    def export_frame(self, ring: FrameRing, slot: int) -> None:
+        ''' Call it with every consumed slot, before releasing it. Never blocks (see bws_export). '''
+        if self.exporter is None:
+            if self.create_exporter is None:
+                return
+            self.exporter, self.create_exporter = self.create_exporter(ring), None
+            if self.exporter is None:
+                return
+        self.exporter.submit(ring.pixels(slot))
+
+    # Query.
+    # ----------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        return {
+            'blender': self.local.snapshot(),
+            'renderer': self.renderer_block.read() if self.renderer_block is not None else None,
+            'latency': self.latency.report(),
+        }
+
+
+def live_views() -> list[ViewMetrics]:
+    ''' Metrics of every live web view (the feature operators act on all of them). '''
+    return list(_view_metrics)
+
+
+def get_metrics() -> dict[str, dict]:
+    ''' Snapshot of every live web view, by label. '''
+    return {view_metrics.label: view_metrics.snapshot() for view_metrics in live_views()}
+
+
+def get_timer_metrics() -> dict:
+    ''' Addon timers (one scheduler for all of them): Blender wake-ups and per-timer CPU time. '''
+    return {'wake_ups': SCHEDULER.wake_ups, 'timers': SCHEDULER.stats()}
+
+
+def draw_hud(context: Context, view_metrics: ViewMetrics) -> None:
+    ''' Draws the metrics of a view as text in the bottom-left corner of the region.
+        Call it from a POST_PIXEL draw callback. '''
+    if not context.window_manager.show_bws_metrics_hud:
+        return
+    snapshot = view_metrics.snapshot()
+    lines = [f"[{view_metrics.label}] Blender"]
+    lines.extend(format_summary(snapshot['blender']))
+    if snapshot['renderer'] is not None:
+        lines.append("Renderer")
+        lines.extend(format_summary(snapshot['renderer']))
+    if snapshot['latency']:
+        lines.append("Input to photon")
+        for name, latency in snapshot['latency'].items():
+            lines.append(f"{name}: p50 {latency['p50']:.2f} ms | p95 {latency['p95']:.2f} ms | p99 {latency['p99']:.2f} ms")
+    timer_metrics = get_timer_metrics()
+    if timer_metrics['timers']:
+        cpu_ms = sum(timer['cpu_ms'] for timer in timer_metrics['timers'])
+        lines.append(f"Timers: {len(timer_metrics['timers'])} | {timer_metrics['wake_ups']} wake-ups | {cpu_ms:.1f} ms CPU")
+
+    blf.size(HUD_FONT_ID, HUD_FONT_SIZE)
+    blf.color(HUD_FONT_ID, 1.0, 1.0, 1.0, 0.9)
+    blf.enable(HUD_FONT_ID, blf.SHADOW)
+    blf.shadow(HUD_FONT_ID, 3, 0.0, 0.0, 0.0, 0.8)
+    y = HUD_MARGIN
+    for line in reversed(lines):
+        blf.position(HUD_FONT_ID, HUD_MARGIN, y, 0)
+        blf.draw(HUD_FONT_ID, line)
+        y += HUD_LINE_HEIGHT
+    blf.disable(HUD_FONT_ID, blf.SHADOW)
+
+
+def export_trace(filepath: str) -> int:
+    ''' Writes the Chrome trace of every live web view (Blender + renderer processes). '''
+    return export_chrome_trace(filepath, *(view_metrics.latency.trace for view_metrics in live_views()))
+
+
+class BWS_OT_export_latency_trace(Operator, ExportHelper):
+    bl_idname = "bws.export_latency_trace"
+    bl_label = "Export Latency Trace"
+    bl_description = "Export the input-to-photon trace of the web views as Chrome trace JSON (chrome://tracing, Perfetto)"
+
+    filename_ext = '.json'
+    filter_glob: StringProperty(default='*.json', options={'HIDDEN'})
+
+    def execute(self, context: Context):
+        count = export_trace(self.filepath)
+        self.report({'INFO'}, f"Exported {count} trace events")
+        return {'FINISHED'}
+
+
+def init():
+    ACK.Helper.PROP(WindowManager, 'show_bws_metrics_hud', ACK.Prop.BOOL(name="Metrics HUD", default=False))
@@ -15,7 +15,12 @@ import bpy
 import gpu
 from gpu_extras.batch import batch_for_shader
 from mathutils import Vector
+from .ackit import ACK
 from .shaders import IMAGE_SHADER
+from .metrics import ViewMetrics, draw_hud
+from .image_stream import ImageStream
+from .scripts.bws_bundle import bundle_url
+from .scripts.bws_frames import FrameRing, copy_alpha, pixel_alpha
 
 
 HTML_FILENAME = 'test_web.html'
@@ -97,8 +102,7 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
         self.batch = batch_for_shader(IMAGE_SHADER, 'TRI_FAN', {"pos": [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)], "texco": [(0, 1), (1, 1), (1, 0), (0, 0)]})
         self.texture = None
 
-        self.draw_frame_count = 0
-        self.draw_start_time = time.time()
+        self.metrics = ViewMetrics('CEF-Python')
 
         self.mouse_pos = Vector((event.mouse_region_x, event.mouse_region_y))
         self.was_mouse_moved = True
@@ -111,32 +115,31 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
         else:
             image.scale(self.width, self.height)
         self.image = image
+        self.image_stream = ImageStream(image.name, self.width, self.height)
 
         channels = self.image.channels
 
-        a = np.zeros((self.width * self.height * channels, ), dtype=np.float32)
-        # self.image.pixels.foreach_get(a)
-        self.shm = shared_memory.SharedMemory(create=True, size=a.nbytes)
-        b = np.ndarray(a.shape, dtype=a.dtype, buffer=self.shm.buf)
-        b[:] = a[:]
-        self.shm_texture_buffer = b
+        self.frame_ring = FrameRing.create(self.width, self.height, channels)
+        self.shm = self.frame_ring.shm
+        self.shm_texture_buffer = self.frame_ring.pixels(0)
+        # Alpha of the last consumed frame, copied before its slot is given back to the renderer (hit tests).
+        self.frame_alpha = None
+        self.metrics.create_stats_block(self.shm.name)
         self.gpu_buffer = gpu.types.Buffer('FLOAT', self.width * self.height * 4, self.shm_texture_buffer)
         self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
-        del a
 
         server_port = self.start_server()
 
         # Start the Pyppeteer process in a new process to avoid blocking the UI
         # We need to use a virtual environment with Python 3.9...
         # python_executable = path.join(path.dirname(path.abspath(__file__)), '.env_cefpython', 'Scripts', 'python.exe')
-        html_example = path.abspath(path.join(path.dirname(__file__), 'html', HTML_FILENAME))
         self.process = subprocess.Popen(
             [
                 path.abspath(path.join(path.dirname(__file__), 'venv', '.env_cefpython', 'Scripts', 'python.exe')),
                 path.abspath(path.join(path.dirname(__file__), 'scripts', 'bws_cefpython.py')),
                 '--',
                 # "file://C:/Users/JF/Videos/AddonsMedia/2020-08-25_09-04-34.mp4",
-                f'file://{html_example}', # 'https://twitter.com/Blender', # 'https://youtu.be/_cMxraX_5RE',
+                bundle_url(HTML_FILENAME), # 'https://twitter.com/Blender', # 'https://youtu.be/_cMxraX_5RE',
                 f'{context.region.width},{context.region.height},{channels}',
                 self.shm.name,
                 str(server_port)
@@ -145,7 +148,7 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
         )
 
         # Open socket reader flow.
-        bpy.app.timers.register(timer_callback)
+        self._socket_timer = ACK.Helper.TIMER(timer_callback)
 
         # Start handlers.
         global FPS
@@ -170,12 +173,11 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
 
 
     def test_select(self, loc: tuple[int, int]) -> bool:
-        pixel_index = (loc[1] * self.width + loc[0]) * 4
-        if pixel_index >= len(self.shm_texture_buffer):
+        if self.frame_alpha is None:
             return False
-        px_alpha = self.shm_texture_buffer[pixel_index + 3]
+        px_alpha = pixel_alpha(self.frame_alpha, self.width, self.height, *loc, channels=1)
         # print(px_alpha, px_alpha > 0.01)
-        return px_alpha > 0.01
+        return px_alpha is not None and px_alpha > 0.01
 
 
     def finish(self, context: bpy.types.Context) -> None:
@@ -190,8 +192,7 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
         self._draw_handler = None
 
         # Close the socket reader flow.
-        if bpy.app.timers.is_registered(timer_callback):
-            bpy.app.timers.unregister(timer_callback)
+        self._socket_timer.stop()
 
         def _close_browser():
             global _sock
@@ -212,7 +213,7 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
                 _sock = None
             return None
 
-        bpy.app.timers.register(_close_browser)
+        ACK.Helper.TIMER(_close_browser)
 
         # Terminate CEF process.
         if self.process:
@@ -220,9 +221,12 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
 
         # Close SharedMemory block.
         if self.shm:
-            self.shm.close()
-            self.shm.unlink()
             del self.shm_texture_buffer
+            del self.gpu_buffer
+            self.frame_ring.close()
+            self.frame_ring.unlink()
+            self.metrics.release()
+            self.image_stream.release()
 
 
     def modal(self, context, event):
@@ -237,12 +241,21 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
 
         if event.type == 'TIMER':
             global is_texture_data_updated
-            if is_texture_data_updated:
+            slot = self.frame_ring.acquire_read()
+            if is_texture_data_updated or slot is not None:
                 is_texture_data_updated = False
                 try:
+                    upload_start_time = time.perf_counter()
                     self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
+                    self.metrics.frame_consumed(upload_start_time)
                 except Exception as e:
                     print(e)
+                # Single slot ring: the uploaded frame is slot 0, refilled by the renderer once released.
+                self.frame_alpha = copy_alpha(self.shm_texture_buffer, self.frame_alpha)
+            if slot is not None:
+                self.image_stream.push(self.frame_ring.pixels(slot), self.texture)
+                self.metrics.export_frame(self.frame_ring, slot)
+                self.frame_ring.release(slot)
 
             # Refresh graphics.
             region.tag_redraw()
@@ -311,21 +324,14 @@ class BWS_OT_web_navigator_cefpython(bpy.types.Operator):
         if self.texture is None or self.batch is None:
             return
 
-        self.draw_frame_count += 1
-
+        draw_start_time = time.perf_counter()
         IMAGE_SHADER.uniform_sampler("image", self.texture)
         gpu.state.blend_set('ALPHA')
         self.batch.draw(IMAGE_SHADER)
         gpu.state.blend_set('NONE')
 
-        # Calculate FPS every second
-        if time.time() - self.draw_start_time > 1.0:  # one second has passed
-            fps = self.draw_frame_count / (time.time() - self.draw_start_time)
-            print(f'Draw-Handler FPS: {int(fps)}')
-
-            # Reset the frame count and start time
-            self.draw_frame_count = 0
-            self.draw_start_time = time.time()
+        self.metrics.frame_drawn(draw_start_time)
+        draw_hud(bpy.context, self.metrics)
 
 
 def draw_op(header, context):
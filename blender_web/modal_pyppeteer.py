@@ -14,6 +14,8 @@ from os import path
 from gpu_extras.batch import batch_for_shader
 from mathutils import Vector
 from .shaders import IMAGE_SHADER
+from .metrics import ViewMetrics, draw_hud
+from .scripts.bws_bundle import bundle_url
 
 
 _sock = None
@@ -71,8 +73,7 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
         self.batch = batch_for_shader(IMAGE_SHADER, 'TRI_FAN', {"pos": [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)], "texco": [(0, 1), (1, 1), (1, 0), (0, 0)]})
         self.texture = None
 
-        self.draw_frame_count = 0
-        self.draw_start_time = time.time()
+        self.metrics = ViewMetrics('Pyppeteer')
 
         self.mouse_pos = Vector((event.mouse_region_x, event.mouse_region_y))
         self.was_mouse_moved = True
@@ -94,6 +95,7 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
         b = np.ndarray(a.shape, dtype=a.dtype, buffer=self.shm.buf)
         b[:] = a[:]
         self.shm_texture_buffer = b
+        self.metrics.create_stats_block(self.shm.name)
         self.gpu_buffer = gpu.types.Buffer('FLOAT', self.width * self.height * 4, self.shm_texture_buffer)
         self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
         del a
@@ -113,7 +115,7 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
                 str(server_socket),
                 f'{context.region.width},{context.region.height},{channels}',
                 self.shm.name,
-                'file://X:/@jfranmatheu/BlenderWebStreaming/blender_web/scripts/test_web.html',
+                bundle_url('test_web.html'),
                 self.image.filepath_raw,
             ],
             shell=True
@@ -166,6 +168,7 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
             if self.shm:
                 self.shm.close()
                 self.shm.unlink()
+            self.metrics.release()
             del self.shm_texture_buffer
             return {'FINISHED'}
 
@@ -183,7 +186,9 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
             if is_texture_data_updated:
                 is_texture_data_updated = False
                 try:
+                    upload_start_time = time.perf_counter()
                     self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
+                    self.metrics.frame_consumed(upload_start_time)
                 except Exception as e:
                     print(e)
 
@@ -221,19 +226,12 @@ class BWS_OT_web_navigator_pyppeteer(bpy.types.Operator):
         if self.texture is None or self.batch is None:
             return
 
-        self.draw_frame_count += 1
-
+        draw_start_time = time.perf_counter()
         IMAGE_SHADER.uniform_sampler("image", self.texture)
         self.batch.draw(IMAGE_SHADER)
 
-        # Calculate FPS every second
-        if time.time() - self.draw_start_time > 1.0:  # one second has passed
-            fps = self.draw_frame_count / (time.time() - self.draw_start_time)
-            print(f'Draw-Handler FPS: {fps}')
-
-            # Reset the frame count and start time
-            self.draw_frame_count = 0
-            self.draw_start_time = time.time()
+        self.metrics.frame_drawn(draw_start_time)
+        draw_hud(bpy.context, self.metrics)
 
 '''
 def draw_op(header, context):
@@ -13,7 +13,17 @@ import bpy
 import gpu
 from gpu_extras.batch import batch_for_shader
 from mathutils import Vector
+from .ackit import ACK
 from .shaders import IMAGE_SHADER
+from .metrics import ViewMetrics, draw_hud
+from .image_stream import ImageStream
+from .scripts.bws_bundle import bundle_url
+from .scripts.bws_frames import FrameRing, copy_alpha, pixel_alpha
+
+
+# The Qt renderer draws 8-bit RGBA straight into the frame slots (see scripts/bws_qt.py).
+FRAME_SLOTS = 2
+ALPHA_THRESHOLD = 2  # ~0.01
 
 
 FPS = 30
@@ -33,8 +43,7 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
         self.batch = batch_for_shader(IMAGE_SHADER, 'TRI_FAN', {"pos": [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)], "texco": [(0, 1), (1, 1), (1, 0), (0, 0)]})
         self.texture = None
 
-        self.draw_frame_count = 0
-        self.draw_start_time = time.time()
+        self.metrics = ViewMetrics('PyQt5')
 
         self.mouse_pos = Vector((event.mouse_region_x, event.mouse_region_y))
         self.was_mouse_moved = True
@@ -47,18 +56,22 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
         else:
             image.scale(self.width, self.height)
         self.image = image
-
-        channels = self.image.channels
-
-        a = np.zeros((self.width * self.height * channels, ), dtype=np.float32)
-        # self.image.pixels.foreach_get(a)
-        self.shm = shared_memory.SharedMemory(create=True, size=a.nbytes)
-        b = np.ndarray(a.shape, dtype=a.dtype, buffer=self.shm.buf)
-        b[:] = a[:]
-        self.shm_texture_buffer = b
-        self.gpu_buffer = gpu.types.Buffer('FLOAT', self.width * self.height * 4, self.shm_texture_buffer)
-        self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
-        del a
+        self.image_stream = ImageStream(image.name, self.width, self.height)
+
+        channels = 4
+
+        self.frame_ring = FrameRing.create(self.width, self.height, channels, slot_count=FRAME_SLOTS, dtype=np.uint8)
+        self.shm = self.frame_ring.shm
+        # Pixels of the last consumed frame, for hit testing.
+        self.shm_texture_buffer = self.frame_ring.pixels(0)
+        # Alpha of the last consumed frame, copied before its slot is given back to the renderer (hit tests).
+        self.frame_alpha = None
+        self.metrics.create_stats_block(self.shm.name)
+        self.gpu_buffers = [
+            gpu.types.Buffer('UBYTE', self.width * self.height * channels, self.frame_ring.pixels(slot))
+            for slot in range(FRAME_SLOTS)
+        ]
+        self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA8', data=self.gpu_buffers[0])
 
         server_port = self.start_server()
 
@@ -72,7 +85,7 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
                 path.join(path.dirname(__file__), 'scripts', 'bws_pyqt.py'),
                 '--',
                 # "file://C:/Users/JF/Videos/AddonsMedia/2020-08-25_09-04-34.mp4",
-                'X:/@jfranmatheu/BlenderWebStreaming/blender_web/scripts/test_web.html', # 'https://twitter.com/Blender', # 'https://youtu.be/_cMxraX_5RE',
+                bundle_url('test_web.html'), # 'https://twitter.com/Blender', # 'https://youtu.be/_cMxraX_5RE',
                 f'{context.region.width},{context.region.height},{channels}',
                 self.shm.name,
                 str(server_port)
@@ -103,12 +116,10 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
 
 
     def test_select(self, loc: tuple[int, int]) -> bool:
-        pixel_index = (loc[1] * self.width + loc[0]) * 4
-        if pixel_index >= len(self.shm_texture_buffer):
+        if self.frame_alpha is None:
             return False
-        px_alpha = self.shm_texture_buffer[pixel_index + 3]
-        # print(px_alpha, px_alpha > 0.01)
-        return px_alpha > 0.01
+        px_alpha = pixel_alpha(self.frame_alpha, self.width, self.height, *loc, channels=1)
+        return px_alpha is not None and px_alpha > ALPHA_THRESHOLD
 
 
     def finish(self, context: bpy.types.Context) -> None:
@@ -141,7 +152,7 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
                 _sock = None
             return None
 
-        bpy.app.timers.register(_close_browser)
+        ACK.Helper.TIMER(_close_browser)
 
         # Terminate CEF process.
         if self.process:
@@ -149,9 +160,12 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
 
         # Close SharedMemory block.
         if self.shm:
-            self.shm.close()
-            self.shm.unlink()
             del self.shm_texture_buffer
+            del self.gpu_buffers
+            self.frame_ring.close()
+            self.frame_ring.unlink()
+            self.metrics.release()
+            self.image_stream.release()
 
 
     def modal(self, context, event):
@@ -173,14 +187,20 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
             # pixels = gpu.types.Buffer('FLOAT', width * height * 4, pixels)
             # self.texture = gpu.types.GPUTexture((width, height), format='RGBA16F', data=pixels)
 
-            try:
-                # No hace falta actualizar buffer al usar el mismo del SHM.
-                # self.gpu_buffer[:] = self.shm_texture_buffer[:]
-                # self.gpu_buffer = gpu.types.Buffer('FLOAT', self.width * self.height * 4, self.shm_texture_buffer)
-                # Volcar buffuer actualizado a la GPU.
-                self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA32F', data=self.gpu_buffer)
-            except Exception as e:
-                print(e)
+            slot = self.frame_ring.acquire_read()
+            if slot is not None:
+                try:
+                    # Volcar buffuer actualizado a la GPU.
+                    upload_start_time = time.perf_counter()
+                    self.texture = gpu.types.GPUTexture((self.width, self.height), format='RGBA8', data=self.gpu_buffers[slot])
+                    self.metrics.frame_consumed(upload_start_time)
+                    self.shm_texture_buffer = self.frame_ring.pixels(slot)
+                    self.frame_alpha = copy_alpha(self.shm_texture_buffer, self.frame_alpha)
+                    self.image_stream.push(self.shm_texture_buffer, self.texture)
+                    self.metrics.export_frame(self.frame_ring, slot)
+                except Exception as e:
+                    print(e)
+                self.frame_ring.release(slot)
 
             # Refresh graphics.
             region.tag_redraw()
@@ -228,21 +248,14 @@ class BWS_OT_web_navigator_pyqt(bpy.types.Operator):
         if self.texture is None or self.batch is None:
             return
 
-        self.draw_frame_count += 1
-
+        draw_start_time = time.perf_counter()
         IMAGE_SHADER.uniform_sampler("image", self.texture)
         gpu.state.blend_set('ALPHA')
         self.batch.draw(IMAGE_SHADER)
         gpu.state.blend_set('NONE')
 
-        # Calculate FPS every second
-        if time.time() - self.draw_start_time > 1.0:  # one second has passed
-            fps = self.draw_frame_count / (time.time() - self.draw_start_time)
-            print(f'Draw-Handler FPS: {int(fps)}')
-
-            # Reset the frame count and start time
-            self.draw_frame_count = 0
-            self.draw_start_time = time.time()
+        self.metrics.frame_drawn(draw_start_time)
+        draw_hud(bpy.context, self.metrics)
 
 '''
 def draw_op(header, context):
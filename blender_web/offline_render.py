@@ -0,0 +1,222 @@
+import re
+import socket
+import subprocess
+import sys
+from os import path
+
+import bpy
+import numpy as np
+from bpy.types import Context, Scene
+
+from .ackit import ACK
+from .image_stream import ImageStream
+from .scripts.bws_bundle import renderer_url
+from .scripts.bws_frames import FrameRing
+from .scripts.bws_offline import OFFLINE_ARGUMENT, FRAME_TIMEOUT, OfflineFrameRequests, frame_time_us
+from .scripts.bws_protocol import SOCKET_SIGNAL, encode_signal
+
+
+# Current frame being painted + the prefetched next one + the one Blender is reading.
+FRAME_SLOTS = 3
+CONNECT_TIMEOUT = 30.0
+
+SCRIPTS_DIR = path.join(path.dirname(__file__), 'scripts')
+CEF_PYTHON = path.join(path.dirname(__file__), 'venv', '.env_cefpython', 'Scripts', 'python.exe')
+# 'scheme://...' urls are loaded as is, anything else is a file path (Blender '//' relative paths included).
+URL_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://')
+
+
+def render_size(scene: Scene) -> tuple[int, int]:
+    render = scene.render
+    scale = render.resolution_percentage / 100
+    return max(int(render.resolution_x * scale), 1), max(int(render.resolution_y * scale), 1)
+
+
+def page_url(scene: Scene) -> str | None:
+    ''' Url loaded by the renderer, None if the renderers can't load its scheme. '''
+    url = scene.bws_offline_url
+    if URL_SCHEME.match(url):
+        if url.startswith('mock://') or renderer_url(url) is not None:
+            return url
+        return None
+    return 'file://' + path.abspath(bpy.path.abspath(url))
+
+
+class OfflineRenderer:
+    ''' A renderer process in offline mode (virtual time, one frame per request) at a fixed resolution.
+        Blender independent from the GPU: the frames are only copied into an Image datablock. '''
+
+    def __init__(self, url: str, width: int, height: int, image_name: str) -> None:
+        self.url = url
+        self.width = width
+        self.height = height
+        self.ring: FrameRing | None = None
+        self.server: socket.socket | None = None
+        self.client: socket.socket | None = None
+        self.process: subprocess.Popen | None = None
+        self.requests: OfflineFrameRequests | None = None
+        self.stream = ImageStream(image_name, width, height)
+        # Frame currently held by the image.
+        self.baked_frame: int | None = None
+
+    def matches(self, url: str, width: int, height: int, image_name: str) -> bool:
+        return (self.url, self.width, self.height, self.stream.image_name) == (url, width, height, image_name)
+
+    def start(self) -> None:
+        self.ring = FrameRing.create(self.width, self.height, 4, FRAME_SLOTS, dtype=np.uint8)
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        if self.url.startswith('mock://'):
+            # Blender's Python has numpy: enough for the mock renderer.
+            python, script = sys.executable, path.join(SCRIPTS_DIR, 'bws_mock.py')
+        else:
+            python, script = CEF_PYTHON, path.join(SCRIPTS_DIR, 'bws_cefpython.py')
+        self.process = subprocess.Popen([
+            python, script, '--',
+            self.url, f'{self.width},{self.height},{4}', self.ring.name, str(self.server.getsockname()[1]),
+            OFFLINE_ARGUMENT
+        ])
+        self.server.settimeout(CONNECT_TIMEOUT)
+        self.client, _addr = self.server.accept()
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.requests = OfflineFrameRequests(self.ring, self.client.sendall)
+        print("[OFFLINE] Renderer started", self.url, f"{self.width}x{self.height}")
+
+    def stop(self) -> None:
+        if self.client is not None:
+            try:
+                self.client.sendall(encode_signal(SOCKET_SIGNAL.KILL))
+            except socket.error:
+                pass
+            self.client.close()
+            self.client = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+        self.stream.release()
+        self.requests = None
+
+    def bake(self, scene: Scene, frame: int) -> None:
+        ''' Waits for the page frame of 'frame', writes it into the image and prefetches the next one,
+            so the renderer paints it while Blender renders this one. '''
+        if frame == self.baked_frame:
+            return
+        time_us = frame_time_us(frame, scene.frame_start, scene.render.fps, scene.render.fps_base)
+        slot = self.requests.render(frame, time_us, FRAME_TIMEOUT)
+        try:
+            self.stream.write(self.ring.pixels(slot))
+        finally:
+            self.ring.release(slot)
+        self.baked_frame = frame
+
+        next_frame = frame + scene.frame_step
+        if next_frame <= scene.frame_end:
+            self.requests.request(next_frame, frame_time_us(next_frame, scene.frame_start, scene.render.fps, scene.render.fps_base))
+
+
+_renderer: OfflineRenderer | None = None
+_render_active = False
+
+
+def bake_frame(scene: Scene) -> None:
+    global _renderer
+    if not scene.bws_offline_render:
+        return
+    url = page_url(scene)
+    if url is None:
+        print("[OFFLINE] ERROR! Unsupported url scheme (expected http://, https://, file://, bws:// or a file path):", scene.bws_offline_url)
+        stop_renderer()
+        return
+    width, height = render_size(scene)
+    image_name = scene.bws_offline_image
+    if _renderer is not None and not _renderer.matches(url, width, height, image_name):
+        stop_renderer()
+    if _renderer is None:
+        _renderer = OfflineRenderer(url, width, height, image_name)
+        try:
+            _renderer.start()
+        except (OSError, socket.timeout) as e:
+            print("[OFFLINE] ERROR! Could not start the renderer:", e)
+            stop_renderer()
+            return
+    try:
+        _renderer.bake(scene, scene.frame_current)
+    except (TimeoutError, socket.error) as e:
+        print("[OFFLINE] ERROR! Frame", scene.frame_current, "was not baked:", e)
+        stop_renderer()
+
+
+def stop_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        _renderer.stop()
+        _renderer = None
+
+
+@ACK.Deco.HANDLER.RENDER_INIT(persistent=True)
+def offline_render_init(context: Context, *_) -> None:
+    global _render_active
+    _render_active = True
+
+
+@ACK.Deco.HANDLER.FRAME_CHANGE_PRE(persistent=True)
+def offline_frame_change(context: Context, scene: Scene, *_) -> None:
+    # Interactive frame changes (timeline scrubbing) are not baked, only the ones of a render or a background script.
+    if _render_active or bpy.app.background:
+        bake_frame(scene)
+
+
+@ACK.Deco.HANDLER.RENDER_PRE(persistent=True)
+def offline_render_pre(context: Context, scene: Scene, *_) -> None:
+    # Still renders do not change the frame.
+    bake_frame(scene)
+
+
+@ACK.Deco.HANDLER.RENDER_COMPLETE(persistent=True)
+def offline_render_complete(context: Context, *_) -> None:
+    global _render_active
+    _render_active = False
+    stop_renderer()
+
+
+@ACK.Deco.HANDLER.RENDER_CANCEL(persistent=True)
+def offline_render_cancel(context: Context, *_) -> None:
+    global _render_active
+    _render_active = False
+    stop_renderer()
+
+
+@ACK.Deco.UI_APPEND(bpy.types.RENDER_PT_format, poll=lambda panel, ctx: True)
+def ext_render_format(panel, context: Context) -> None:
+    scene = context.scene
+    layout = panel.layout
+    layout.prop(scene, 'bws_offline_render')
+    col = layout.column()
+    col.active = scene.bws_offline_render
+    col.prop(scene, 'bws_offline_url')
+    col.prop(scene, 'bws_offline_image')
+
+
+def init():
+    ACK.Helper.PROP(Scene, 'bws_offline_render', ACK.Prop.BOOL(name="Bake Web Overlay", default=False,
+                                                                description="Render the web page into an image for every rendered frame, with a deterministic page clock"))
+    ACK.Helper.PROP(Scene, 'bws_offline_url', ACK.Prop.STRING(name="Page", default='',
+                                                               description="URL (http://, https://, file://, bws:// for the addon pages) or path of the HTML page"))
+    ACK.Helper.PROP(Scene, 'bws_offline_image', ACK.Prop.STRING(name="Image", default='BWS Overlay',
+                                                                 description="Image datablock receiving the page frames (use it in the compositor or in materials)"))
+
+
+def unregister():
+    stop_renderer()
@@ -0,0 +1,44 @@
+import sys
+from os import path
+
+from bpy.types import Context, UILayout, WindowManager
+
+from .ackit import ACK
+from .scripts.bws_stream import HUB_SCHEME, hub_url
+
+
+# Stand-in renderer of the pages rendered on another machine: numpy and standard library only,
+# so it runs on Blender's Python (no renderer venv on this machine).
+REMOTE_SCRIPT = path.join(path.dirname(__file__), 'scripts', 'bws_remote.py')
+
+
+def is_remote_url(url: str) -> bool:
+    return url.startswith(HUB_SCHEME + '://')
+
+
+def remote_url(context: Context) -> str | None:
+    ''' hub:// url of the views when a remote hub is set ('bws_remote_hub'), None to render locally. '''
+    address = context.window_manager.bws_remote_hub.strip()
+    if not address:
+        return None
+    try:
+        return hub_url(address)
+    except ValueError:
+        print("[REMOTE] ERROR! Invalid hub address (expected host:port), rendering locally:", address)
+        return None
+
+
+def remote_command(url: str, whc: str, shm_name: str, port: int) -> list[str]:
+    ''' Launch command of bws_remote.py, same arguments as the other renderer scripts. '''
+    return [sys.executable, REMOTE_SCRIPT, '--', url, whc, shm_name, str(port)]
+
+
+def draw_remote_hub(layout: UILayout, context: Context) -> None:
+    layout.prop(context.window_manager, 'bws_remote_hub', text='', icon='URL')
+
+
+def init():
+    ACK.Helper.PROP(WindowManager, 'bws_remote_hub', ACK.Prop.STRING(
+        name="Remote Hub", default='',
+        description="host:port of a streaming hub (scripts/bws_stream.py) relaying a page rendered on another machine. "
+                    "Used when a web view starts, empty to render the page locally. The published size must match the view"))
@@ -0,0 +1,94 @@
+from os import path
+import tempfile
+import time
+
+import bpy
+from bpy.props import BoolProperty, StringProperty
+from bpy.types import Context, Operator
+
+from .ackit import ACK
+from .metrics import ViewMetrics, live_views
+from .scripts.bws_protocol import SOCKET_SIGNAL, PROFILE_FLAGS, encode_control, encode_signal
+from .scripts.bws_profiling import load_profile
+
+
+PROFILE_POLL_INTERVAL = 0.25
+PROFILE_TIMEOUT = 10.0
+
+
+def start_profiling(view_metrics: ViewMetrics, flags: int, directory: str) -> bool:
+    ''' Asks the renderer of the view to profile itself (see bws_profiling). '''
+    if view_metrics.send_control is None:
+        return False
+    view_metrics.profile_prefix = path.join(directory, view_metrics.file_label())
+    return view_metrics.send_control(encode_control(SOCKET_SIGNAL.PROFILE_START, flags, view_metrics.profile_prefix))
+
+
+def stop_profiling(view_metrics: ViewMetrics) -> str:
+    ''' Returns the output prefix the renderer is writing the profile to ('' if it was not profiling). '''
+    prefix, view_metrics.profile_prefix = view_metrics.profile_prefix, ''
+    if prefix and view_metrics.send_control is not None and view_metrics.send_control(encode_signal(SOCKET_SIGNAL.PROFILE_STOP)):
+        return prefix
+    return ''
+
+
+class BWS_OT_renderer_profile_start(Operator):
+    bl_idname = "bws.renderer_profile_start"
+    bl_label = "Start Renderer Profiling"
+    bl_description = "Profile the renderer processes of the web views (sampled stacks, allocations, frame stage spans)"
+
+    sampling: BoolProperty(name="Sampling Profiler", default=True)
+    tracemalloc: BoolProperty(name="Allocations (tracemalloc)", default=False,
+                              description="Trace memory allocations. Slows down the renderer noticeably")
+    frame_spans: BoolProperty(name="Frame Spans", default=True,
+                              description="Record the renderer frame stages, merged into the exported latency trace")
+    directory: StringProperty(name="Directory", subtype='DIR_PATH', default='',
+                              description="Where the renderer writes the profile files. Blender temp directory by default")
+
+    def execute(self, context: Context):
+        flags = (PROFILE_FLAGS.SAMPLING * self.sampling) | (PROFILE_FLAGS.TRACEMALLOC * self.tracemalloc) | (PROFILE_FLAGS.FRAME_SPANS * self.frame_spans)
+        if not flags:
+            self.report({'WARNING'}, "Nothing to profile")
+            return {'CANCELLED'}
+        directory = bpy.path.abspath(self.directory) if self.directory else (bpy.app.tempdir or tempfile.gettempdir())
+        started = sum(start_profiling(view_metrics, flags, directory) for view_metrics in live_views())
+        if not started:
+            self.report({'WARNING'}, "No renderer to profile")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Profiling {started} renderer(s)")
+        return {'FINISHED'}
+
+
+class BWS_OT_renderer_profile_stop(Operator):
+    bl_idname = "bws.renderer_profile_stop"
+    bl_label = "Stop Renderer Profiling"
+    bl_description = "Stop profiling the renderers and load their summaries as text datablocks"
+
+    def execute(self, context: Context):
+        pending = {view_metrics: prefix for view_metrics in live_views() if (prefix := stop_profiling(view_metrics))}
+        if not pending:
+            self.report({'WARNING'}, "No renderer was being profiled")
+            return {'CANCELLED'}
+        deadline = time.monotonic() + PROFILE_TIMEOUT
+
+        # The renderers write the files when they get the signal: poll until every summary is there.
+        def _poll_profiles():
+            for view_metrics, prefix in list(pending.items()):
+                summary, events = load_profile(prefix)
+                if summary is None:
+                    continue
+                del pending[view_metrics]
+                view_metrics.latency.trace.extend(events)
+                text = bpy.data.texts.new(f"BWS Profile {view_metrics.label}")
+                text.write(summary)
+                print(f"[PROFILER] {view_metrics.label}: {prefix}")
+            if not pending:
+                return None
+            if time.monotonic() > deadline:
+                print(f"[PROFILER] Timed out waiting for: {', '.join(pending.values())}")
+                return None
+            return PROFILE_POLL_INTERVAL
+
+        ACK.Helper.TIMER(_poll_profiles, first_interval=PROFILE_POLL_INTERVAL)
+        self.report({'INFO'}, f"Stopping {len(pending)} renderer profile(s)")
+        return {'FINISHED'}
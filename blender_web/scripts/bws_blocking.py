@@ -0,0 +1,156 @@
+""" Request blocking rules of the renderers, compiled once.
+
+    - Hosts: a blocked domain blocks all its subdomains. A host is looked up by its suffixes in a set,
+      one lookup per label whatever the number of rules (no per-rule substring scan).
+    - Resource types (CDP names: 'Font', 'Media'...): blocked on every host.
+
+    Chromium backends push the rules to the browser, so most requests never reach Python:
+    host rules become Network.setBlockedURLs patterns, and only the resource types to block
+    (plus the addon pages, see bws_bundle) are intercepted with Fetch.enable patterns.
+    Blocked requests are counted by rule (BlockStats).
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+
+AD_HOSTS = (
+    'adnxs.com',
+    'adservice.google.com',
+    'amazon-adsystem.com',
+    'criteo.com',
+    'doubleclick.net',
+    'googlesyndication.com',
+    'googletagservices.com',
+    'outbrain.com',
+    'taboola.com',
+)
+
+TRACKER_HOSTS = (
+    'connect.facebook.net',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'hotjar.com',
+    'scorecardresearch.com',
+    'segment.io',
+)
+
+# CDP Network.ResourceType values.
+RESOURCE_TYPES = frozenset((
+    'Document', 'Stylesheet', 'Image', 'Media', 'Font', 'Script', 'TextTrack', 'XHR', 'Fetch', 'Prefetch',
+    'EventSource', 'WebSocket', 'Manifest', 'SignedExchange', 'Ping', 'CSPViolationReport', 'Preflight', 'Other',
+))
+# Lowercase names (pyppeteer Request.resourceType) -> CDP names.
+RESOURCE_TYPE_NAMES = {resource_type.lower(): resource_type for resource_type in RESOURCE_TYPES}
+
+# Rule name of the blocked requests that match no rule (blocked by the browser for another reason).
+OTHER_RULE = 'other'
+
+
+def url_host(url: str) -> str:
+    """ Lowercase host of an absolute url, without user info and port. '' if there is none. """
+    start = url.find('://')
+    if start == -1:
+        return ''
+    start += 3
+    end = len(url)
+    for separator in '/?#':
+        index = url.find(separator, start, end)
+        if index != -1:
+            end = index
+    host = url[start:end]
+    at = host.rfind('@')
+    if at != -1:
+        host = host[at + 1:]
+    if host.startswith('['):
+        # IPv6 literal.
+        return host[:host.find(']') + 1].lower()
+    colon = host.find(':')
+    if colon != -1:
+        host = host[:colon]
+    return host.lower()
+
+
+class BlockStats:
+    """ Requests seen and blocked, by rule (host or 'type:<resource type>'). """
+    __slots__ = ('requests', 'blocked', 'by_rule')
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.blocked = 0
+        self.by_rule: Dict[str, int] = {}
+
+    def record(self, rule: str) -> None:
+        self.blocked += 1
+        self.by_rule[rule] = self.by_rule.get(rule, 0) + 1
+
+    def as_dict(self) -> dict:
+        return {'requests': self.requests, 'blocked': self.blocked, 'by_rule': dict(self.by_rule)}
+
+    def summary(self, top: int = 5) -> str:
+        rules = sorted(self.by_rule.items(), key=lambda item: item[1], reverse=True)[:top]
+        hits = ', '.join(f"{rule}: {count}" for rule, count in rules)
+        return f"{self.blocked}/{self.requests} requests blocked" + (f" ({hits})" if hits else '')
+
+
+class BlockingEngine:
+    def __init__(self, hosts: Iterable[str] = AD_HOSTS + TRACKER_HOSTS, resource_types: Iterable[str] = ()) -> None:
+        self.hosts = frozenset(host.strip().lower().lstrip('.') for host in hosts if host.strip())
+        self.resource_types = frozenset(resource_types)
+        unknown = self.resource_types - RESOURCE_TYPES
+        if unknown:
+            raise ValueError(f"Unknown resource types {sorted(unknown)}, expected CDP names like 'Font' or 'Media'")
+        self.stats = BlockStats()
+
+    def match_host(self, host: str) -> Optional[str]:
+        """ Blocked domain of 'host' (itself or a parent domain), None if it is allowed. """
+        hosts = self.hosts
+        if host in hosts:
+            return host
+        index = host.find('.')
+        while index != -1:
+            suffix = host[index + 1:]
+            if suffix in hosts:
+                return suffix
+            index = host.find('.', index + 1)
+        return None
+
+    def match(self, url: str, resource_type: Optional[str] = None) -> Optional[str]:
+        """ Rule blocking the request, None if it is allowed. Does not count it. """
+        if resource_type is not None and resource_type in self.resource_types:
+            return 'type:' + resource_type
+        return self.match_host(url_host(url))
+
+    def check(self, url: str, resource_type: Optional[str] = None) -> Optional[str]:
+        """ Same as match(), and counts the request in the stats. """
+        self.stats.requests += 1
+        rule = self.match(url, resource_type)
+        if rule is not None:
+            self.stats.record(rule)
+        return rule
+
+    def record_blocked(self, url: str, resource_type: Optional[str] = None) -> str:
+        """ Counts a request the browser blocked by itself (Network.setBlockedURLs, Fetch.failRequest). """
+        rule = self.match(url, resource_type) or OTHER_RULE
+        self.stats.record(rule)
+        return rule
+
+
+    # CDP.
+    # ----------------------------------------------------------------
+
+    def blocked_url_patterns(self) -> List[str]:
+        """ Network.setBlockedURLs patterns of the host rules: the domain and its subdomains, any scheme. """
+        patterns = []
+        for host in sorted(self.hosts):
+            patterns.append(f'*://{host}/*')
+            patterns.append(f'*://*.{host}/*')
+        return patterns
+
+    def fetch_patterns(self, url_patterns: Iterable[str] = ()) -> List[dict]:
+        """ Fetch.enable patterns: the resource types to block and 'url_patterns' (requests answered by the renderer). """
+        patterns = [{'urlPattern': '*', 'resourceType': resource_type, 'requestStage': 'Request'}
+                    for resource_type in sorted(self.resource_types)]
+        patterns.extend({'urlPattern': url_pattern, 'requestStage': 'Request'} for url_pattern in url_patterns)
+        return patterns
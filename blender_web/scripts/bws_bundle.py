@@ -0,0 +1,237 @@
+""" Addon pages served from memory under the bws:// scheme, plus the persistent per-addon cache directories.
+
+    The addon html/ tree is packed into a single content-hashed bundle:
+
+        [BUNDLE_HEADER][JSON index][asset data]...
+
+    Identical files are stored once, SVGs are minified while packing, and every asset gets an ETag
+    (hash of its content). The pack is cached in cache_dir('bundle'), named after a key of the tree
+    file stats (paths, sizes, mtimes): the next launch only lists the tree and reads the pack in one
+    go, no page asset is read or parsed again. Editing any file invalidates the pack.
+
+    URLs:
+        bws://addon/color_picker.html       Page of the bundle (bundle_url()).
+        http://bws.local/color_picker.html  Same, for engines that can not register custom schemes
+                                            (CEF Python, Pyppeteer): the renderer intercepts this origin.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import struct
+import sys
+from os import path
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import unquote, urlsplit
+
+
+BUNDLE_MAGIC = b'BWSB'
+BUNDLE_VERSION = 1
+# magic, version, index size.
+BUNDLE_HEADER = struct.Struct('<4sII')
+
+BUNDLE_SCHEME = 'bws'
+BUNDLE_URL = 'bws://addon/'
+BUNDLE_HTTP_URL = 'http://bws.local/'
+# Schemes the web renderers load as is (bws:// is served from the bundle, see to_http_url).
+WEB_URL_SCHEMES = frozenset(('http', 'https', 'file'))
+INDEX_PAGE = 'index.html'
+
+HTML_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'html')
+CACHE_DIR_ENV = 'BWS_CACHE_DIR'
+CACHE_DIR_NAME = 'blender_web'
+
+SVG_COMMENT = re.compile(rb'<!--.*?-->', re.S)
+SVG_BETWEEN_TAGS = re.compile(rb'>\s+<')
+
+MIME_TYPES = {
+    '.html': 'text/html',
+    '.js': 'text/javascript',
+    '.mjs': 'text/javascript',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+    '.json': 'application/json',
+    '.wasm': 'application/wasm',
+}
+
+
+def cache_dir(*parts: str) -> str:
+    """ Persistent cache directory of the addon ('BWS_CACHE_DIR' overrides the platform default). Created if needed. """
+    base = os.environ.get(CACHE_DIR_ENV, '')
+    if not base:
+        if sys.platform == 'win32':
+            base = path.join(os.environ.get('LOCALAPPDATA', path.expanduser('~')), CACHE_DIR_NAME, 'cache')
+        elif sys.platform == 'darwin':
+            base = path.join(path.expanduser('~'), 'Library', 'Caches', CACHE_DIR_NAME)
+        else:
+            base = path.join(os.environ.get('XDG_CACHE_HOME', '') or path.join(path.expanduser('~'), '.cache'), CACHE_DIR_NAME)
+    directory = path.join(base, *parts)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def bundle_url(page: str) -> str:
+    """ 'color_picker.html' -> 'bws://addon/color_picker.html'. """
+    return BUNDLE_URL + page.replace(os.sep, '/').lstrip('/')
+
+
+def to_http_url(url: str) -> str:
+    """ bws:// url -> intercepted http:// url, for engines without custom schemes. Other urls are returned as is. """
+    if url.startswith(BUNDLE_URL):
+        return BUNDLE_HTTP_URL + url[len(BUNDLE_URL):]
+    return url
+
+
+def renderer_url(url: str) -> Optional[str]:
+    """ Url a web renderer loads for a page url: web urls as is, bws:// on its intercepted http origin.
+        None for the schemes they can not load. """
+    scheme = urlsplit(url).scheme.lower()
+    if scheme == BUNDLE_SCHEME:
+        return to_http_url(url)
+    if scheme in WEB_URL_SCHEMES:
+        return url
+    return None
+
+
+def bundle_path(url: str) -> Optional[str]:
+    """ Asset path of a bws:// (or intercepted http://) url, None for any other url. """
+    for prefix in (BUNDLE_URL, BUNDLE_HTTP_URL):
+        if url.startswith(prefix):
+            return unquote(urlsplit(url).path).lstrip('/')
+    return None
+
+
+def tree_key(root: str) -> str:
+    """ Key of the tree, from its file stats only (no file is read). """
+    digest = hashlib.sha1(str(BUNDLE_VERSION).encode())
+    for directory, directories, files in os.walk(root):
+        directories.sort()
+        for name in sorted(files):
+            filepath = path.join(directory, name)
+            stat = os.stat(filepath)
+            digest.update(f'{path.relpath(filepath, root)}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def minify_svg(data: bytes) -> bytes:
+    return SVG_BETWEEN_TAGS.sub(b'><', SVG_COMMENT.sub(b'', data)).strip()
+
+
+class Asset(NamedTuple):
+    data: memoryview
+    mime: str
+    etag: str
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            'Content-Type': self.mime,
+            'ETag': f'"{self.etag}"',
+            'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*',
+        }
+
+
+class AssetBundle:
+    """ In-memory bundle of a tree: path -> Asset. """
+
+    def __init__(self, data: bytes, index: Dict[str, list], key: str = '', from_cache: bool = False) -> None:
+        self.data = memoryview(data)
+        # path -> [offset, size, mime, etag], offsets relative to the asset data.
+        self.index = index
+        self.key = key
+        self.from_cache = from_cache
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha1(''.join(sorted(f'{p}:{entry[3]}' for p, entry in self.index.items())).encode()).hexdigest()[:16]
+
+    def get(self, asset_path: str) -> Optional[Asset]:
+        asset_path = asset_path.strip('/')
+        entry = self.index.get(asset_path, None)
+        if entry is None:
+            entry = self.index.get(f'{asset_path}/{INDEX_PAGE}'.lstrip('/'), None)
+            if entry is None:
+                return None
+        offset, size, mime, etag = entry
+        return Asset(self.data[offset:offset + size], mime, etag)
+
+    def __contains__(self, asset_path: str) -> bool:
+        return self.get(asset_path) is not None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def build(cls, root: str, key: str = '') -> 'AssetBundle':
+        chunks = []
+        offsets: Dict[str, int] = {}
+        index = {}
+        size = 0
+        for directory, directories, files in os.walk(root):
+            directories.sort()
+            for name in sorted(files):
+                filepath = path.join(directory, name)
+                with open(filepath, 'rb') as f:
+                    data = f.read()
+                extension = path.splitext(name)[1].lower()
+                if extension == '.svg':
+                    data = minify_svg(data)
+                etag = hashlib.sha256(data).hexdigest()[:16]
+                if etag not in offsets:
+                    offsets[etag] = size
+                    chunks.append(data)
+                    size += len(data)
+                mime = MIME_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                index[path.relpath(filepath, root).replace(os.sep, '/')] = [offsets[etag], len(data), mime, etag]
+        return cls(b''.join(chunks), index, key)
+
+    def pack(self) -> bytes:
+        index = json.dumps(self.index, separators=(',', ':')).encode('utf-8')
+        return BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index)) + index + self.data.tobytes()
+
+    @classmethod
+    def unpack(cls, data: bytes, key: str = '') -> Optional['AssetBundle']:
+        """ None if 'data' is not a pack of this version. """
+        if len(data) < BUNDLE_HEADER.size:
+            return None
+        magic, version, index_size = BUNDLE_HEADER.unpack_from(data, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            return None
+        start = BUNDLE_HEADER.size + index_size
+        index = json.loads(bytes(data[BUNDLE_HEADER.size:start]).decode('utf-8'))
+        return cls(memoryview(data)[start:], index, key, from_cache=True)
+
+    @classmethod
+    def load(cls, root: str = HTML_DIR, cache: Optional[str] = None) -> 'AssetBundle':
+        """ Bundle of 'root', from the pack cached in 'cache' (cache_dir('bundle') by default) when the tree did not change.
+            Otherwise the bundle is built and its pack replaces the stale ones. """
+        if cache is None:
+            cache = cache_dir('bundle')
+        key = tree_key(root)
+        pack_path = path.join(cache, f'bundle-{key}.bin')
+        try:
+            with open(pack_path, 'rb') as f:
+                bundle = cls.unpack(f.read(), key)
+            if bundle is not None:
+                return bundle
+        except OSError:
+            pass
+
+        bundle = cls.build(root, key)
+        try:
+            os.makedirs(cache, exist_ok=True)
+            temp_path = f'{pack_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(bundle.pack())
+            # Atomic: Blender and a renderer may build the same bundle at once.
+            os.replace(temp_path, pack_path)
+            for name in os.listdir(cache):
+                if name.startswith('bundle-') and name.endswith('.bin') and name != path.basename(pack_path):
+                    os.remove(path.join(cache, name))
+        except OSError as e:
+            print("[BUNDLE] WARN! Could not cache the bundle:", e)
+        return bundle
@@ -41,14 +41,24 @@ import platform
 import sys
 import socket
 from typing import Any
-from time import time, sleep
-from math import floor
+from time import time, sleep, perf_counter_ns
+from math import floor, log
 from multiprocessing import shared_memory
 import threading
 import struct
 from queue import Queue
 import json
 
+from bws_bundle import BUNDLE_SCHEME, AssetBundle, bundle_path, cache_dir, renderer_url
+from bws_frames import FrameRing
+from bws_images import SHARED_IMAGES_JS, SHARED_IMAGES_URL, SharedImages, image_shared_js, response_headers
+from bws_metrics import RendererMetrics
+from bws_mip import Viewport
+from bws_offline import OFFLINE_ARGUMENT, RENDER_READY_BINDING, VIRTUAL_TIME_JS, FRAME_TIMEOUT, advance_js
+from bws_pipeline import FramePipeline
+from bws_profiling import RendererProfiler
+from bws_protocol import SOCKET_SIGNAL, MOUSE_BUTTON, VISIBILITY_FLAGS, KeyEventFlags, INPUT_SIGNALS, recv_input, recv_control
+
 
 try:
     from PIL import Image, __version__ as PILLOW_VERSION
@@ -72,8 +82,41 @@ SHARED_MEMORY_ID = ''
 SERVER_PORT = 0
 SOCKET_LOCK = threading.Lock()
 
-SHM = None
-TEXTURE_BUFFER = None
+FRAME_RING: FrameRing = None
+PIPELINE: FramePipeline = None
+METRICS = RendererMetrics()
+PROFILER = RendererProfiler()
+# Last input applied to the browser: (input_id, sent time, applied time). Echoed in every frame header.
+LAST_INPUT = (0, 0, 0)
+# The view is not displayed in Blender (VISIBILITY): the browser does not paint.
+HIDDEN = False
+# Part of the page painted and its mip level (see bws_mip), None for the whole page at full resolution.
+VIEWPORT: Viewport = None
+# Signals whose first two values are page coordinates: scaled to the paint of the mip level.
+POINTER_SIGNALS = frozenset({
+    SOCKET_SIGNAL.MOUSE_MOVE,
+    SOCKET_SIGNAL.MOUSE_PRESS,
+    SOCKET_SIGNAL.MOUSE_RELEASE,
+    SOCKET_SIGNAL.MOUSE_DRAG_START,
+    SOCKET_SIGNAL.MOUSE_DRAG_END,
+    SOCKET_SIGNAL.SCROLL_UP,
+    SOCKET_SIGNAL.SCROLL_DOWN,
+})
+
+# Offline rendering (see bws_offline): the page runs on virtual time and is only painted on request.
+OFFLINE = False
+PAGE_LOADED = threading.Event()
+# RENDER_FRAME request waiting for the page to be ready, then for its paint: (input_id, sent time, applied time).
+OFFLINE_REQUEST = None
+OFFLINE_PAINT = None
+OFFLINE_PAINTED = threading.Event()
+VIRTUAL_TIME_US = 0
+
+# Images shared by Blender with the page (see bws_images): (SHM generation, SharedImages).
+SHARED_IMAGES = (-1, None)
+
+# Addon pages, served from memory for bws:// urls (see bws_bundle).
+BUNDLE = None
 
 # Off-screen-rendering requires setting "windowless_rendering_enabled"
 # option.
@@ -120,65 +163,6 @@ browser_settings = {
     # "universal_access_from_file_urls_allowed": True,
 }
 
-class SOCKET_SIGNAL:
-    PING = 0
-    PONG = 1
-    BUFFER_UPDATE = 2
-    KILL = 3
-
-    MOUSE_MOVE = 8
-    MOUSE_PRESS = 9
-    MOUSE_RELEASE = 10
-    MOUSE_DRAG_START = 11
-    MOUSE_DRAG_END = 12
-
-    SCROLL_UP = 16
-    SCROLL_DOWN = 17
-
-    UNICODE = 24
-    
-    # UI Events
-    BUTTON_CLICK = 32
-    INPUT_CHANGE = 33
-
-
-class MOUSE_BUTTON:
-    LEFT = 0
-    MIDDLE = 1
-    RIGHT = 2
-
-
-class KeyEventFlags:
-    EVENTFLAG_NONE = 0
-    EVENTFLAG_CAPS_LOCK_ON = 1 << 0
-    EVENTFLAG_SHIFT_DOWN = 1 << 1
-    EVENTFLAG_CONTROL_DOWN = 1 << 2
-    EVENTFLAG_ALT_DOWN = 1 << 3
-    EVENTFLAG_LEFT_MOUSE_BUTTON = 1 << 4
-    EVENTFLAG_MIDDLE_MOUSE_BUTTON = 1 << 5
-    EVENTFLAG_RIGHT_MOUSE_BUTTON = 1 << 6
-    # Mac OS-X command key.
-    EVENTFLAG_COMMAND_DOWN = 1 << 7
-    EVENTFLAG_NUM_LOCK_ON = 1 << 8
-    EVENTFLAG_IS_KEY_PAD = 1 << 9
-    EVENTFLAG_IS_LEFT = 1 << 10
-    EVENTFLAG_IS_RIGHT = 1 << 11
-
-
-EVENT_DATA_BYTES = {
-    SOCKET_SIGNAL.MOUSE_MOVE        : 'II',     # (X, Y)
-    SOCKET_SIGNAL.MOUSE_PRESS       : 'III',    # (X, Y, MOUSE_BUTTON)
-    SOCKET_SIGNAL.MOUSE_RELEASE     : 'III',    # (X, Y, MOUSE_BUTTON)
-    SOCKET_SIGNAL.MOUSE_DRAG_START  : 'II',     # (X, Y)
-    SOCKET_SIGNAL.MOUSE_DRAG_END    : 'II',     # (X, Y)
-    SOCKET_SIGNAL.SCROLL_UP         : 'II',     # (X, Y)
-    SOCKET_SIGNAL.SCROLL_DOWN       : 'II',     # (X, Y)
-    SOCKET_SIGNAL.UNICODE           : 'II',     # (UNICODE CODE, KeyEventFlags)
-    SOCKET_SIGNAL.BUTTON_CLICK      : 'I',      # (button_id length, button_id string)
-    SOCKET_SIGNAL.INPUT_CHANGE      : 'If',     # (input_id length, input_id string, value)
-}
-
-
 ##################################################################################################
 ##################################################################################################
 ##################################################################################################
@@ -388,7 +372,7 @@ class _Browser:
             * This method is only used when window rendering is disabled. * """
         pass
 
-    def WasHidden(self) -> None:
+    def WasHidden(self, hidden: bool) -> None:
         """ Notify the browser that it has been hidden or shown.
             Layouting and RenderHandler::OnPaint notification will stop when the browser is hidden.
             * This method is only used when window rendering is disabled. * """
@@ -646,7 +630,8 @@ class Client:
                     continue
 
                 signal = int.from_bytes(signal_raw, byteorder='big')
-                print("[CLIENT] Received signal:", signal)
+                if DEBUG:
+                    print("[CLIENT] Received signal:", signal)
 
                 if signal == SOCKET_SIGNAL.PONG:
                     if not self.pong_expected:
@@ -658,20 +643,52 @@ class Client:
                     exit_app()
                     return None
 
-                event_data_bytes = EVENT_DATA_BYTES.get(signal, None)
-                if event_data_bytes is None:
+                if signal == SOCKET_SIGNAL.PROFILE_START:
+                    PROFILER.handle_control(signal, recv_control(s))
+                    continue
+
+                if signal == SOCKET_SIGNAL.PROFILE_STOP:
+                    PROFILER.handle_control(signal, ())
+                    continue
+
+                if signal == SOCKET_SIGNAL.IMAGE_SHARED:
+                    on_image_shared(*recv_control(s))
+                    continue
+
+                if signal == SOCKET_SIGNAL.VISIBILITY:
+                    # The frame ring is swapped between two paints, on the UI thread.
+                    CEF.PostTask(cef.TID_UI, set_visibility, *recv_control(s))
+                    continue
+
+                if signal not in INPUT_SIGNALS:
                     raise ValueError("[CLIENT] Unknown event signal was received!", signal)
 
-                # self.sock.settimeout(0.1)
-                event_data_raw = s.recv(struct.calcsize(event_data_bytes))
-                # self.sock.settimeout(None)
-                if not event_data_raw:
-                    print("[CLIENT] WARN! Received empty event data!", signal)
-                    # sleep(0.1)
+                try:
+                    input_id, input_time_ns, event_data = recv_input(s, signal)
+                except (ConnectionError, socket.error):
+                    print("[CLIENT] WARN! Connection closed while receiving event data!", signal)
+                    self.sock = None
+                    continue
+
+                if DEBUG:
+                    print("[CLIENT] Received event data:", input_id, event_data)
+
+                if signal == SOCKET_SIGNAL.RENDER_FRAME:
+                    # Blocks this thread until the frame is painted: requests are served in order.
+                    render_offline_frame(input_id, input_time_ns, *event_data)
                     continue
 
-                event_data = struct.unpack(event_data_bytes, event_data_raw)
-                print("[CLIENT] Received event data:", event_data)
+                if signal == SOCKET_SIGNAL.VIEWPORT:
+                    # Applied between two paints, on the UI thread (LAST_INPUT is set there).
+                    CEF.PostTask(cef.TID_UI, apply_viewport, input_id, input_time_ns, *event_data)
+                    continue
+
+                METRICS.input_received()
+
+                viewport = VIEWPORT
+                if viewport is not None and viewport.level and signal in POINTER_SIGNALS:
+                    # Blender sends page pixels, the browser is painted at 1 / 2 ** level of them.
+                    event_data = (event_data[0] >> viewport.level, event_data[1] >> viewport.level, *event_data[2:])
 
                 if signal == SOCKET_SIGNAL.MOUSE_MOVE:
                     if self.is_dragging:
@@ -727,14 +744,147 @@ class Client:
                     }
                     BrowserWrapper.get().browser.SendKeyEvent(key_event)
 
+                global LAST_INPUT
+                LAST_INPUT = (input_id, input_time_ns, perf_counter_ns())
+
         exit_app()
 
 
+def attach_frame_ring(name: str) -> bool:
+    """ Opens the frame ring created by Blender and the paint pipeline that fills it. """
+    global FRAME_RING
+    global PIPELINE
+    FRAME_RING = FrameRing.attach(name)
+    if (FRAME_RING.width, FRAME_RING.height, FRAME_RING.channels) != (VIEWPORT_WIDTH, VIEWPORT_HEIGHT, IMAGE_CHANNELS):
+        print("[CEF] Error: Frame SHM size does not match the viewport", FRAME_RING.width, FRAME_RING.height, FRAME_RING.channels)
+        return False
+    # OnPaint only snapshots the paint buffer: conversion and hashing run on the pipeline workers.
+    # Offline, every requested frame is published, even if identical to the previous one.
+    PIPELINE = FramePipeline(FRAME_RING, bgra=True, skip_unchanged=not OFFLINE, metrics=METRICS, profiler=PROFILER)
+    return True
+
+
+def detach_frame_ring() -> None:
+    """ Waits for the frames in flight and closes the frame ring. """
+    global FRAME_RING
+    global PIPELINE
+    if PIPELINE:
+        PIPELINE.close()
+        PIPELINE = None
+    if FRAME_RING:
+        FRAME_RING.close()
+        FRAME_RING = None
+
+
+def set_visibility(flags: int, ring_name: str) -> None:
+    """ UI thread. Hidden views don't paint. Blender may release their frame ring, and sends a new one when they show up. """
+    global HIDDEN
+    HIDDEN = bool(flags & VISIBILITY_FLAGS.HIDDEN)
+    if flags & VISIBILITY_FLAGS.RELEASE_FRAMES or ring_name:
+        detach_frame_ring()
+    if ring_name and not attach_frame_ring(ring_name):
+        detach_frame_ring()
+    browser = BrowserWrapper.get().browser
+    browser.WasHidden(HIDDEN)
+    if not HIDDEN:
+        browser.Invalidate(cef.PET_VIEW)
+
+
+def paint_size() -> tuple:
+    """ Size of the browser view: the whole page painted at the mip level of the viewport. """
+    if VIEWPORT is None:
+        return VIEWPORT_WIDTH, VIEWPORT_HEIGHT
+    return VIEWPORT.paint_size(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
+
+
+def apply_viewport(input_id: int, input_time_ns: int, level: int, x: int, y: int, width: int, height: int) -> None:
+    """ UI thread. Paints the page at 1 / 2 ** level of its size and only keeps (x, y, width, height) of it. """
+    global VIEWPORT
+    global LAST_INPUT
+    browser = BrowserWrapper.get().browser
+    viewport = Viewport(level, x, y, width, height)
+    if viewport == Viewport.full(VIEWPORT_WIDTH, VIEWPORT_HEIGHT):
+        viewport = None
+    previous_level = 0 if VIEWPORT is None else VIEWPORT.level
+    VIEWPORT = viewport
+    LAST_INPUT = (input_id, input_time_ns, perf_counter_ns())
+    if level != previous_level:
+        # Same CSS layout, painted smaller: CEF zooms by 1.2 ** zoom_level.
+        browser.SetZoomLevel(-level * log(2) / log(1.2))
+        browser.WasResized()
+    browser.Invalidate(cef.PET_VIEW)
+
+
+def paint_crop(width: int, height: int) -> tuple:
+    """ (x, y, width, height) of a paint of (width, height) that is sent to Blender, None for all of it. """
+    if VIEWPORT is None:
+        return None
+    x, y, crop_width, crop_height = VIEWPORT.crop()
+    x = min(x, width - 1)
+    y = min(y, height - 1)
+    return x, y, min(crop_width, width - x), min(crop_height, height - y)
+
+
+def render_offline_frame(input_id: int, input_time_ns: int, frame: int, time_us: int) -> None:
+    global OFFLINE_REQUEST
+    global VIRTUAL_TIME_US
+    if not OFFLINE:
+        print("[CEF] WARN! Render frame request ignored: the renderer was not started in offline mode", frame)
+        return
+    browser = BrowserWrapper.get().browser
+    if time_us < VIRTUAL_TIME_US:
+        # The page clock can not go back: start over from a fresh page.
+        PAGE_LOADED.clear()
+        browser.Reload()
+    if not PAGE_LOADED.wait(FRAME_TIMEOUT):
+        print("[CEF] WARN! Page not loaded yet, rendering frame anyway", frame)
+    VIRTUAL_TIME_US = time_us
+
+    OFFLINE_PAINTED.clear()
+    OFFLINE_REQUEST = (input_id, input_time_ns, perf_counter_ns())
+    browser.ExecuteJavascript(advance_js(time_us, input_id))
+    if not OFFLINE_PAINTED.wait(FRAME_TIMEOUT):
+        print("[CEF] WARN! Frame was not painted in time", frame)
+        OFFLINE_REQUEST = None
+
+
+def on_render_ready(input_id) -> None:
+    """ JS binding, called on the UI thread once the page laid out the frame of a request. """
+    global OFFLINE_REQUEST
+    global OFFLINE_PAINT
+    request = OFFLINE_REQUEST
+    if request is None or request[0] != int(input_id):
+        return
+    OFFLINE_REQUEST = None
+    OFFLINE_PAINT = request
+    # Force a full paint even if nothing changed in the page: every request gets its frame.
+    BrowserWrapper.get().browser.Invalidate(cef.PET_VIEW)
+
+
+def on_image_shared(generation: int, name: str) -> None:
+    """ Blender published a new version of an image: tell the page, which fetches it from SHARED_IMAGES_URL. """
+    global SHARED_IMAGES
+    current_generation, images = SHARED_IMAGES
+    if generation != current_generation:
+        # Blender moved the images to a bigger SHM.
+        if images is not None:
+            images.close()
+        images = SharedImages.attach(SHARED_MEMORY_ID, generation)
+        SHARED_IMAGES = (generation, images)
+    info = images.find(name) if images is not None else None
+    if info is None:
+        print("[CEF] WARN! Shared image not found:", name)
+        return
+    BrowserWrapper.get().browser.ExecuteJavascript(image_shared_js(name, info.version))
+
+
 def main():
     check_versions()
     sys.excepthook = CEF.ExceptHook  # To shutdown all CEF processes on error
 
     command_line_arguments()
+    # Persistent per-addon cache: HTTP cache, cookies and local storage survive the renderer restarts.
+    settings["cache_path"] = cache_dir('cef')
     CEF.Initialize(settings=settings, switches=switches)
     BrowserWrapper.get()
     Client.get(create=True).tcp_echo_client()
@@ -761,20 +911,28 @@ def command_line_arguments():
         global SHARED_MEMORY_ID
         global SERVER_PORT
 
-        url, whc, SHARED_MEMORY_ID, port = sys.argv[sys.argv.index('--') + 1:]
+        args = sys.argv[sys.argv.index('--') + 1:]
+        url, whc, SHARED_MEMORY_ID, port = args[:4]
         width, height, channels = [int(v) for v in whc.split(',')]
 
+        if OFFLINE_ARGUMENT in args[4:]:
+            global OFFLINE
+            OFFLINE = True
+
         if port and port.isnumeric():
             SERVER_PORT = int(port)
         else:
             print("[CEF] Error: Invalid port argument", port)
             sys.exit(1)
-        if url.startswith(("https://", "file://")):
-            global URL
-            URL = url
-        else:
+        global URL
+        URL = renderer_url(url)
+        if URL is None:
             print("[CEF] Error: Invalid url argument", url)
             sys.exit(1)
+        if url.lower().startswith(BUNDLE_SCHEME + '://'):
+            # No custom schemes in CEF Python: the bundle is served on an intercepted http origin.
+            global BUNDLE
+            BUNDLE = AssetBundle.load()
         if width > 0 and height > 0 and channels in {3, 4}:
             global IMAGE_CHANNELS
             global VIEWPORT_WIDTH
@@ -787,13 +945,13 @@ def command_line_arguments():
             sys.exit(1)
 
         if SHARED_MEMORY_ID != '':
-            global SHM
-            global TEXTURE_BUFFER
-            SHM = shared_memory.SharedMemory(name=SHARED_MEMORY_ID)
-            TEXTURE_BUFFER = np.ndarray((VIEWPORT_WIDTH * VIEWPORT_HEIGHT * IMAGE_CHANNELS, ), dtype=np.float32, buffer=SHM.buf)
+            global METRICS
+            METRICS = RendererMetrics(SHARED_MEMORY_ID)
+            if not attach_frame_ring(SHARED_MEMORY_ID):
+                sys.exit(1)
 
     elif len(sys.argv) > 1:
-        print("[CEF] Error: Expected arguments: url (width height channels) shm server_port")
+        print("[CEF] Error: Expected arguments: url (width height channels) shm server_port [offline]")
         sys.exit(1)
 
 
@@ -804,16 +962,17 @@ def exit_app():
     #   events may result in unexpected behavior. Use cef.PostTask
     #   function to call exit_app from these events.
     print("[CEF] Close browser and exit app")
-    global SHM
-    global TEXTURE_BUFFER
     if client := Client._instance:
         Client._instance = None
         client.sock = None
         del client
-    if SHM:
-        SHM.close()
-        SHM = None
-        TEXTURE_BUFFER = None
+    detach_frame_ring()
+    global SHARED_IMAGES
+    if SHARED_IMAGES[1] is not None:
+        SHARED_IMAGES[1].close()
+        SHARED_IMAGES = (-1, None)
+    PROFILER.stop()
+    METRICS.close()
     BrowserWrapper.get().close()
 
 
@@ -846,6 +1005,11 @@ class BrowserWrapper:
         browser.SetClientHandler(LoadHandler())
         browser.SetClientHandler(RenderHandler())
         browser.SetClientHandler(JSQueryHandler())
+        browser.SetClientHandler(RequestHandler())
+        if OFFLINE:
+            bindings = cef.JavascriptBindings(bindToFrames=False, bindToPopups=False)
+            bindings.SetFunction(RENDER_READY_BINDING, on_render_ready)
+            browser.SetJavascriptBindings(bindings)
         browser.SendFocusEvent(True)
         # You must call WasResized at least once to let know CEF that
         # viewport size is available and that OnPaint may be called.
@@ -881,6 +1045,20 @@ class LoadHandler(object):
     def __init__(self) -> None:
         self.thread = None
 
+    def OnLoadStart(self, browser: _Browser, frame, **_):
+        if not frame.IsMain():
+            return
+        frame.ExecuteJavascript(SHARED_IMAGES_JS)
+        if OFFLINE:
+            # Before the page scripts: they must only ever see the virtual clock.
+            frame.ExecuteJavascript(VIRTUAL_TIME_JS)
+
+    def OnLoadingStateChange(self, browser: _Browser, is_loading, **_):
+        if is_loading:
+            PAGE_LOADED.clear()
+        else:
+            PAGE_LOADED.set()
+
     ## def OnLoadingStateChange(self, browser, is_loading, **_):
     ##     """Called when the loading state has changed."""
     ##     if not is_loading:
@@ -905,27 +1083,132 @@ class LoadHandler(object):
         CEF.PostTask(cef.TID_UI, exit_app, browser)
 
 
+class RequestHandler(object):
+    def GetResourceHandler(self, browser: _Browser, frame, request, **_):
+        """ Requests to SHARED_IMAGES_URL are answered from the shared images SHM,
+            the addon pages from the bundle in memory, other ones go to the network. """
+        url = request.GetUrl()
+        if url.startswith(SHARED_IMAGES_URL):
+            from urllib.parse import unquote
+            return MemoryResourceHandler(read_shared_image, unquote(url[len(SHARED_IMAGES_URL):].split('?')[0]))
+        if BUNDLE is not None:
+            asset_path = bundle_path(url)
+            if asset_path is not None:
+                return MemoryResourceHandler(read_bundle_asset, asset_path)
+        return None
+
+
+def read_shared_image(name: str):
+    """ (headers, data) of a shared image, copied once from the SHM (consistent snapshot). """
+    images = SHARED_IMAGES[1]
+    if images is None:
+        return None
+    info, data = images.read(name)
+    if info is None:
+        return None
+    return response_headers(info), data
+
+
+def read_bundle_asset(asset_path: str):
+    asset = BUNDLE.get(asset_path)
+    if asset is None:
+        return None
+    return asset.headers(), asset.data
+
+
+class MemoryResourceHandler(object):
+    """ Serves a response from memory: 'read(key)' returns (headers, data), or None for a 404.
+        Data is handed to CEF in chunks, shared images are received by the page as an ArrayBuffer. """
+
+    def __init__(self, read, key: str) -> None:
+        self.read = read
+        self.key = key
+        self.headers = None
+        self.data = None
+        self.offset = 0
+
+    def ProcessRequest(self, request, callback, **_) -> bool:
+        response = self.read(self.key)
+        if response is not None:
+            self.headers, self.data = response
+        callback.Continue()
+        return True
+
+    def GetResponseHeaders(self, response, response_length_out, redirect_url_out, **_) -> None:
+        if self.headers is None:
+            response.SetStatus(404)
+            response.SetStatusText("Not Found")
+            response.SetHeaderMap({'Access-Control-Allow-Origin': '*'})
+            response_length_out[0] = 0
+            return
+        headers = dict(self.headers)
+        response.SetStatus(200)
+        response.SetStatusText("OK")
+        response.SetMimeType(headers.pop('Content-Type'))
+        response.SetHeaderMap(headers)
+        response_length_out[0] = len(self.data)
+
+    def ReadResponse(self, data_out, bytes_to_read, bytes_read_out, callback, **_) -> bool:
+        if self.data is None or self.offset >= len(self.data):
+            bytes_read_out[0] = 0
+            return False
+        chunk = bytes(self.data[self.offset:self.offset + bytes_to_read])
+        self.offset += len(chunk)
+        data_out[0] = chunk
+        bytes_read_out[0] = len(chunk)
+        return True
+
+    def CanGetCookie(self, cookie, **_) -> bool:
+        return False
+
+    def CanSetCookie(self, cookie, **_) -> bool:
+        return False
+
+    def Cancel(self, **_) -> None:
+        self.data = None
+
+
 class RenderHandler(object):
     def __init__(self):
         self.OnPaint_called = False
-        self.frame_count = 0
-        self.start_time = time()
 
     def GetViewRect(self, rect_out: list, **_) -> bool:
         """Called to retrieve the view rectangle which is relative
         to screen coordinates. Return True if the rectangle was
         provided."""
         # rect_out --> [x, y, width, height]
-        rect_out.extend([0, 0, VIEWPORT_WIDTH, VIEWPORT_HEIGHT])
+        rect_out.extend([0, 0, *paint_size()])
         return True
 
-    def OnPaint(self, browser: _Browser, element_type, paint_buffer: _PaintBuffer, **_) -> None:
+    def OnPaint(self, browser: _Browser, element_type, paint_buffer: _PaintBuffer, width: int, height: int, **_) -> None:
         """Called when an element should be painted."""
-        global SHM
-        if SHM is None:
+        if HIDDEN:
+            # Last paint before WasHidden(), or the frame ring is released.
+            return
+        if FRAME_RING is None or PIPELINE is None:
             print("Can't paint! SHM is not available!")
             return
-        if TEXTURE_BUFFER[-1] != 0:
+        if element_type != cef.PET_VIEW:
+            raise Exception("Unsupported element_type in OnPaint")
+
+        global OFFLINE_PAINT
+        if OFFLINE and OFFLINE_PAINT is None:
+            # Offline, only the paint of a ready request is a frame.
+            return
+
+        if (width, height) != paint_size():
+            # Painted at the previous mip level: the resized paint follows.
+            return
+        PIPELINE.set_crop((width, height), paint_crop(width, height))
+
+        slot = FRAME_RING.acquire_write()
+        if slot is None:
+            if OFFLINE:
+                # Every slot holds a prefetched frame: paint again once Blender consumed one.
+                CEF.PostDelayedTask(cef.TID_UI, 5, browser.Invalidate, cef.PET_VIEW)
+                return
+            # Blender did not consume the previous frame yet.
+            METRICS.frame_dropped()
             return
 
         ## client = Client.get()
@@ -933,50 +1216,29 @@ class RenderHandler(object):
         ##     return
 
         # Process a frame...
-        self.frame_count += 1
-
-        if self.OnPaint_called:
-            sys.stdout.write(".")
-            sys.stdout.flush()
+        paint_start_ns = perf_counter_ns()
+        if OFFLINE:
+            input_id, input_time_ns, input_applied_ns = OFFLINE_PAINT
+            OFFLINE_PAINT = None
         else:
-            sys.stdout.write("[CEF] OnPaint")
-            self.OnPaint_called = True
-
-        if element_type == cef.PET_VIEW:
-            # Buffer string is a huge string, so for performance
-            # reasons it would be better not to copy this string.
-
-            image = Image.frombytes("RGBA", (VIEWPORT_WIDTH, VIEWPORT_HEIGHT), paint_buffer.GetBytes(mode="rgba", origin="top-left"), "raw", "RGBA", 0, 1)
-            # Convert the image to a numpy array
-            arr = np.array(image)
-            # Convert the numpy array to float32
-            arr = arr.astype(np.float32)
-            # Normalize the values to be between 0 and 1
-            arr /= 255.0
-            # Flatten the array
-            arr = arr.flatten()
-
-            TEXTURE_BUFFER[:] = arr[:]
-            image.close()
-            del image
-            del arr
-
-            # client.sock.settimeout(0.2)
-            ## if client.sock:
-            ##     client.sock.sendall(SOCKET_SIGNAL.BUFFER_UPDATE.to_bytes(4, byteorder='big'))
-            # client.sock.settimeout(None)
-            TEXTURE_BUFFER[-1] = 1
-        else:
-            raise Exception("Unsupported element_type in OnPaint")
+            input_id, input_time_ns, input_applied_ns = LAST_INPUT
 
-        # Calculate FPS every second
-        if time() - self.start_time > 1.0:  # one second has passed
-            fps = self.frame_count / (time() - self.start_time)
-            print(f'[CEF] FPS: {fps}')
+        if not self.OnPaint_called:
+            print("[CEF] OnPaint")
+            self.OnPaint_called = True
 
-            # Reset the frame count and start time
-            self.frame_count = 0
-            self.start_time = time()
+        # Snapshot the raw BGRA buffer into the staging of the claimed slot (a single memmove) and return:
+        # CEF's UI thread is free again while the workers convert and hash the frame in row bands.
+        # The frame is published by the pipeline, in paint order, once every band is done.
+        PIPELINE.process(
+            slot, paint_buffer.GetIntPointer(),
+            input_id=input_id,
+            input_time_ns=input_time_ns,
+            input_applied_ns=input_applied_ns,
+            paint_start_ns=paint_start_ns
+        )
+        if OFFLINE:
+            OFFLINE_PAINTED.set()
 
 '''
 class JSQueryHandler:
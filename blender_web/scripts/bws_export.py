@@ -0,0 +1,404 @@
+""" Frame export: image sequences (PNG, EXR) and video (ffmpeg pipe) from the consumed frames.
+
+    submit() runs on the thread consuming the frame ring (Blender's UI thread) and never blocks:
+    it copies the frame into a free staging buffer (SharedMemory) and returns.
+
+        - PNG / EXR: a process pool encodes and writes the staged frames (zlib runs in parallel,
+          outside Blender's GIL). Workers attach to the staging SHM once, frames are never pickled.
+        - FFMPEG: a writer thread converts the frames to RGBA8, in order, and feeds them to an
+          ffmpeg process through its stdin (rawvideo).
+
+    When every staging buffer is busy (backpressure), the frame is dropped (BACKPRESSURE.DROP) or
+    a copy is queued in memory, up to 'max_queued' frames (BACKPRESSURE.QUEUE).
+
+    Frames are RGBA, top-left origin, float32 normalized or uint8, straight alpha (FrameRing pixels).
+    PNG and the video keep the page sRGB values. EXR is linear half float (ZIP, one scanline per block).
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon. Standard library + numpy only.
+"""
+
+import importlib
+import multiprocessing
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from bws_frames import attach_shared_memory
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import attach_shared_memory
+
+
+EXPORT_WORKERS = max(min((os.cpu_count() or 2) - 1, 4), 1)
+MAX_QUEUED = 32
+PNG_COMPRESSION = 3
+EXR_COMPRESSION = 4
+
+FFMPEG_ARGS = ('-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2')
+VIDEO_EXTENSION = '.mp4'
+
+
+class EXPORT_FORMAT:
+    PNG = 'PNG'
+    EXR = 'EXR'
+    FFMPEG = 'FFMPEG'
+
+
+FILE_EXTENSIONS = {
+    EXPORT_FORMAT.PNG: '.png',
+    EXPORT_FORMAT.EXR: '.exr',
+}
+
+
+class BACKPRESSURE:
+    DROP = 'DROP'
+    QUEUE = 'QUEUE'
+
+
+# Encoders.
+# ----------------------------------------------------------------
+
+def to_rgba8(pixels: np.ndarray) -> np.ndarray:
+    if pixels.dtype == np.uint8:
+        return pixels
+    return (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def srgb_to_linear(pixels: np.ndarray) -> np.ndarray:
+    """ (H, W, 4) float32 [0, 1] sRGB -> linear. Alpha is left as is. """
+    linear = pixels.astype(np.float32, copy=True)
+    rgb = linear[..., :3]
+    low = rgb <= 0.04045
+    rgb[...] = np.where(low, rgb / 12.92, np.power((np.maximum(rgb, 0.04045) + 0.055) / 1.055, 2.4))
+    return linear
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(rgba8: np.ndarray, level: int = PNG_COMPRESSION) -> bytes:
+    """ (H, W, 4) uint8 -> PNG, 'Sub' filter on every row (cheap and good for flat UI pixels). """
+    height, width = rgba8.shape[:2]
+    rows = rgba8.reshape(height, width * 4)
+    filtered = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:5] = rows[:, :4]
+    np.subtract(rows[:, 4:], rows[:, :-4], out=filtered[:, 5:])
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+        _png_chunk(b'IDAT', zlib.compress(filtered.tobytes(), level)),
+        _png_chunk(b'IEND', b''),
+    ))
+
+
+def _exr_attribute(name: str, kind: str, value: bytes) -> bytes:
+    return name.encode() + b'\0' + kind.encode() + b'\0' + struct.pack('<i', len(value)) + value
+
+
+EXR_CHANNELS = 'ABGR'  # Sorted by name, as the format requires.
+EXR_ZIPS = 2
+
+
+def encode_exr(linear: np.ndarray, level: int = EXR_COMPRESSION) -> bytes:
+    """ (H, W, 4) float linear RGBA -> scanline EXR, half float, ZIPS compression. """
+    height, width = linear.shape[:2]
+    channel_list = b''.join(
+        channel.encode() + b'\0' + struct.pack('<iB3xii', 1, 0, 1, 1)  # HALF, pLinear, sampling 1x1.
+        for channel in EXR_CHANNELS
+    ) + b'\0'
+    window = struct.pack('<iiii', 0, 0, width - 1, height - 1)
+    header = b''.join((
+        struct.pack('<ii', 20000630, 2),
+        _exr_attribute('channels', 'chlist', channel_list),
+        _exr_attribute('compression', 'compression', bytes((EXR_ZIPS, ))),
+        _exr_attribute('dataWindow', 'box2i', window),
+        _exr_attribute('displayWindow', 'box2i', window),
+        _exr_attribute('lineOrder', 'lineOrder', b'\0'),
+        _exr_attribute('pixelAspectRatio', 'float', struct.pack('<f', 1.0)),
+        _exr_attribute('screenWindowCenter', 'v2f', struct.pack('<ff', 0.0, 0.0)),
+        _exr_attribute('screenWindowWidth', 'float', struct.pack('<f', 1.0)),
+        b'\0',
+    ))
+
+    # Scanline data: each channel's row of halfs, channels in EXR_CHANNELS order.
+    planes = linear[..., [3, 2, 1, 0]].astype('<f2').transpose(0, 2, 1)
+    rows = np.ascontiguousarray(planes).view(np.uint8).reshape(height, -1)
+    # ZIP predictor: interleave the bytes (low halves first), then delta encode them.
+    reordered = np.concatenate((rows[:, 0::2], rows[:, 1::2]), axis=1)
+    predicted = reordered.copy()
+    np.subtract(reordered[:, 1:], reordered[:, :-1], out=predicted[:, 1:])
+    predicted[:, 1:] += 128
+
+    chunks = []
+    for y in range(height):
+        data = zlib.compress(predicted[y].tobytes(), level)
+        if len(data) >= rows.shape[1]:
+            data = rows[y].tobytes()
+        chunks.append(struct.pack('<ii', y, len(data)) + data)
+
+    offsets = []
+    offset = len(header) + 8 * height
+    for chunk in chunks:
+        offsets.append(offset)
+        offset += len(chunk)
+    return header + struct.pack(f'<{height}Q', *offsets) + b''.join(chunks)
+
+
+def encode_frame(pixels: np.ndarray, fmt: str) -> bytes:
+    if fmt == EXPORT_FORMAT.PNG:
+        return encode_png(to_rgba8(pixels))
+    if fmt == EXPORT_FORMAT.EXR:
+        normalized = pixels if pixels.dtype != np.uint8 else pixels * np.float32(1 / 255)
+        return encode_exr(srgb_to_linear(normalized))
+    raise ValueError(f"Unknown export format '{fmt}'")
+
+
+# Worker processes.
+# ----------------------------------------------------------------
+
+_worker_shms: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def write_frame(shm_name: str, offset: int, shape: Tuple[int, int, int], dtype: str, filepath: str, fmt: str) -> int:
+    """ Runs in a worker process. Encodes a staged frame into 'filepath'. Returns the file size. """
+    shm = _worker_shms.get(shm_name, None)
+    if shm is None:
+        shm = _worker_shms[shm_name] = attach_shared_memory(shm_name)
+    pixels = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+    data = encode_frame(pixels, fmt)
+    del pixels
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def _pool_write_frame():
+    """ write_frame as the spawned workers can import it: from the standalone 'bws_export' module,
+        since importing the addon package needs bpy. The workers inherit this process' sys.path. """
+    if not __package__:
+        return write_frame
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    if scripts_dir not in sys.path:
+        sys.path.append(scripts_dir)
+    return importlib.import_module('bws_export').write_frame
+
+
+# Exporter.
+# ----------------------------------------------------------------
+
+class FrameExporter:
+    """ Consumer side. submit() every consumed frame, close() when done. """
+
+    def __init__(self, directory: str, width: int, height: int, channels: int = 4, dtype=np.float32,
+                 fmt: str = EXPORT_FORMAT.PNG, policy: str = BACKPRESSURE.DROP,
+                 workers: int = EXPORT_WORKERS, staging_slots: int = 0, max_queued: int = MAX_QUEUED,
+                 prefix: str = 'frame', fps: float = 30, ffmpeg: str = 'ffmpeg', ffmpeg_args: Tuple[str, ...] = FFMPEG_ARGS) -> None:
+        if channels != 4:
+            raise ValueError(f"Frame export needs RGBA frames (got {channels} channels)")
+        if fmt not in {EXPORT_FORMAT.PNG, EXPORT_FORMAT.EXR, EXPORT_FORMAT.FFMPEG}:
+            raise ValueError(f"Unknown export format '{fmt}'")
+        self.directory = directory
+        self.prefix = prefix
+        self.format = fmt
+        self.policy = policy
+        self.max_queued = max_queued if policy == BACKPRESSURE.QUEUE else 0
+        self.shape = (height, width, channels)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = width * height * channels * self.dtype.itemsize
+        slot_count = staging_slots or workers * 2
+        os.makedirs(directory, exist_ok=True)
+
+        self.staging = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slot_count)
+        self._views = [
+            np.ndarray(self.shape, dtype=self.dtype, buffer=self.staging.buf, offset=slot * self.frame_bytes)
+            for slot in range(slot_count)
+        ]
+        self._free: Deque[int] = deque(range(slot_count))
+        # BACKPRESSURE.QUEUE: (index, frame copy) waiting for a staging buffer, in submission order.
+        self._backlog: Deque[Tuple[int, np.ndarray]] = deque()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes_written = 0
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._ffmpeg: Optional[subprocess.Popen] = None
+        self._ffmpeg_queue: Optional[queue.Queue] = None
+        self._ffmpeg_thread: Optional[threading.Thread] = None
+        if fmt == EXPORT_FORMAT.FFMPEG:
+            self._start_ffmpeg(ffmpeg, ffmpeg_args, fps)
+        else:
+            # Spawn: forking Blender (GPU context, threads) is not safe.
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            self._write_frame = _pool_write_frame()
+
+    @property
+    def queued(self) -> int:
+        return len(self._backlog)
+
+    @property
+    def output(self) -> str:
+        """ Video filepath, or filepath pattern of the image sequence. """
+        if self.format == EXPORT_FORMAT.FFMPEG:
+            return os.path.join(self.directory, self.prefix + VIDEO_EXTENSION)
+        return os.path.join(self.directory, f"{self.prefix}_%06d{FILE_EXTENSIONS[self.format]}")
+
+    def submit(self, pixels: np.ndarray) -> bool:
+        """ Stages a frame for export. Never blocks: returns False if it was dropped. """
+        with self._lock:
+            if self._closed:
+                return False
+            if self._free and not self._backlog:
+                slot = self._free.popleft()
+            elif len(self._backlog) < self.max_queued:
+                slot = None
+            else:
+                self.dropped += 1
+                return False
+            index = self.submitted
+            self.submitted += 1
+            if slot is None:
+                self._backlog.append((index, np.array(pixels, dtype=self.dtype).reshape(self.shape)))
+                return True
+        np.copyto(self._views[slot], pixels.reshape(self.shape))
+        self._dispatch(slot, index)
+        return True
+
+    def _dispatch(self, slot: int, index: int) -> None:
+        if self._ffmpeg_queue is not None:
+            self._ffmpeg_queue.put(slot)
+            return
+        filepath = self.output % index
+        future = self._executor.submit(
+            self._write_frame, self.staging.name, slot * self.frame_bytes, self.shape, self.dtype.str, filepath, self.format
+        )
+        future.add_done_callback(partial(self._written, slot))
+
+    def _written(self, slot: int, future: Future) -> None:
+        try:
+            self.bytes_written += future.result()
+            self.written += 1
+        except Exception as e:
+            print("[EXPORT] Error writing frame:", e)
+            self.errors += 1
+        self._release(slot)
+
+    def _release(self, slot: int) -> None:
+        """ A staging buffer is free again: reuse it for the oldest queued frame, if any. """
+        with self._lock:
+            if not self._backlog:
+                self._free.append(slot)
+                if len(self._free) == len(self._views):
+                    self._idle.notify_all()
+                return
+            index, pixels = self._backlog.popleft()
+        np.copyto(self._views[slot], pixels)
+        self._dispatch(slot, index)
+
+    # FFmpeg.
+    # ----------------------------------------------------------------
+
+    def _start_ffmpeg(self, ffmpeg: str, ffmpeg_args: Tuple[str, ...], fps: float) -> None:
+        executable = shutil.which(ffmpeg)
+        if executable is None:
+            self._release_staging()
+            raise FileNotFoundError(f"ffmpeg executable not found: '{ffmpeg}'")
+        height, width = self.shape[:2]
+        self._ffmpeg = subprocess.Popen([
+            executable, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', f'{fps:g}', '-i', '-',
+            *ffmpeg_args, self.output
+        ], stdin=subprocess.PIPE)
+        self._ffmpeg_queue = queue.Queue()
+        self._ffmpeg_thread = threading.Thread(target=self._ffmpeg_loop, name='bws_export_ffmpeg', daemon=True)
+        self._ffmpeg_thread.start()
+
+    def _ffmpeg_loop(self) -> None:
+        rgba8 = np.empty(self.shape, dtype=np.uint8)
+        scaled = np.empty(self.shape, dtype=np.float32) if self.dtype != np.uint8 else None
+        stdin = self._ffmpeg.stdin
+        while (slot := self._ffmpeg_queue.get()) is not None:
+            try:
+                frame = self._views[slot]
+                if scaled is None:
+                    np.copyto(rgba8, frame)
+                else:
+                    np.multiply(frame, 255.0, out=scaled)
+                    np.add(scaled, 0.5, out=scaled)
+                    np.clip(scaled, 0.0, 255.0, out=scaled)
+                    np.copyto(rgba8, scaled, casting='unsafe')
+                stdin.write(rgba8.data)
+                self.bytes_written += rgba8.nbytes
+                self.written += 1
+            except (OSError, ValueError) as e:
+                print("[EXPORT] Error writing to ffmpeg:", e)
+                self.errors += 1
+            self._release(slot)
+
+    # Cleanup.
+    # ----------------------------------------------------------------
+
+    def close(self, wait: bool = True) -> None:
+        """ Stops accepting frames and finishes the staged/queued ones.
+            With wait=False the final flush runs in a background thread. """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if wait:
+            self._finish()
+        else:
+            threading.Thread(target=self._finish, name='bws_export_close', daemon=True).start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """ Blocks until every submitted frame is written or failed. """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._backlog and len(self._free) == len(self._views), timeout)
+
+    def _finish(self) -> None:
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._ffmpeg is not None:
+            self._ffmpeg_queue.put(None)
+            self._ffmpeg_thread.join()
+            self._ffmpeg.stdin.close()
+            self._ffmpeg.wait()
+            self._ffmpeg = None
+        self._release_staging()
+        print(f"[EXPORT] {self.written} frames written ({self.dropped} dropped, {self.errors} errors) -> {self.output}")
+
+    def _release_staging(self) -> None:
+        self._views = []
+        self.staging.close()
+        self.staging.unlink()
+
+    def stats(self) -> List[Tuple[str, int]]:
+        return [
+            ('submitted', self.submitted),
+            ('written', self.written),
+            ('queued', self.queued),
+            ('dropped', self.dropped),
+            ('errors', self.errors),
+        ]
@@ -0,0 +1,363 @@
+""" Frame SharedMemory layout shared by Blender (consumer) and the renderer (producer).
+
+    [ring header][slot 0 header][slot 0 pixels][slot 1 header][slot 1 pixels]...
+
+    Each slot goes through FREE -> WRITING -> READY -> READING -> FREE.
+    The producer only moves FREE/WRITING slots and the consumer only READY/READING ones,
+    so a single uint32 state per slot is enough to synchronize both processes.
+    With 1 slot this is the same handshake as the old 'ready' flag in the last float.
+
+    Every slot header carries the frame sequence, the id of the last input applied by the
+    renderer before painting it (see bws_protocol) and perf_counter_ns() timestamps.
+
+    A frame can be smaller than the ring (mip levels and crops, see bws_mip): its pixels are then
+    packed at the start of the slot, 'width * height * channels' values, and its size is in the header.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon.
+"""
+
+import os
+import struct
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+RING_MAGIC = b'BWSF'
+RING_VERSION = 1
+
+# magic, version, slot_count, width, height, channels, dtype code, producer pid.
+RING_HEADER = struct.Struct('<4sIIIIIII')
+# state, frame size, seq, input_id, input_time_ns, input_applied_ns, paint_start_ns, publish_ns, dirty rect (x, y, w, h).
+# The frame size is packed as (width << 16 | height), 0 for a frame of the ring size.
+SLOT_HEADER = struct.Struct('<IIQQQQQQIIII')
+SLOT_STATE = struct.Struct('<I')
+
+ALIGNMENT = 64
+RING_HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 128
+
+PRODUCER_PID_OFFSET = RING_HEADER.size - 4
+
+
+class SLOT:
+    FREE = 0
+    WRITING = 1
+    READY = 2
+    READING = 3
+
+
+DTYPES = {
+    0: np.float32,
+    1: np.uint8,
+}
+DTYPE_CODES = {np.dtype(dtype): code for code, dtype in DTYPES.items()}
+
+
+class FrameHeader(NamedTuple):
+    seq: int
+    input_id: int
+    input_time_ns: int
+    input_applied_ns: int
+    paint_start_ns: int
+    publish_ns: int
+    dirty: Tuple[int, int, int, int]
+    # (width, height) of the frame, (0, 0) for the ring size (see FrameRing.frame_size).
+    size: Tuple[int, int] = (0, 0)
+
+
+def _align(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def calc_slot_stride(width: int, height: int, channels: int, dtype=np.float32) -> int:
+    return SLOT_HEADER_SIZE + _align(width * height * channels * np.dtype(dtype).itemsize)
+
+
+def calc_ring_size(width: int, height: int, channels: int, slot_count: int, dtype=np.float32) -> int:
+    return RING_HEADER_SIZE + slot_count * calc_slot_stride(width, height, channels, dtype)
+
+
+# Pixel helpers.
+# ----------------------------------------------------------------
+
+INV_255 = np.float32(1.0 / 255.0)
+
+
+def rgba8_to_float32(src, out: np.ndarray) -> np.ndarray:
+    """ Normalizes 8-bit RGBA bytes (any buffer) into a float32 array, without temporaries. """
+    return np.multiply(np.frombuffer(src, dtype=np.uint8), INV_255, out=out)
+
+
+def float32_to_rgba8(pixels: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """ 8-bit copy of normalized float32 pixels, 4 times smaller (cached frames of hidden views).
+        Lossless for frames painted in 8 bits: rgba8_to_float32() gives the same floats back. """
+    scaled = np.multiply(pixels, 255.0, dtype=np.float32)
+    np.clip(scaled, 0.0, 255.0, out=scaled)
+    np.rint(scaled, out=scaled)
+    if out is None:
+        return scaled.astype(np.uint8)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+
+def pixel_alpha(pixels: np.ndarray, width: int, height: int, x: int, y: int, channels: int = 4) -> Optional[float]:
+    """ Alpha of the pixel at (x, y), top-left origin. None if out of bounds. """
+    if x < 0 or y < 0 or x >= width or y >= height:
+        return None
+    return pixels[(y * width + x) * channels + channels - 1]
+
+
+def copy_alpha(pixels: np.ndarray, out: np.ndarray = None, channels: int = 4) -> np.ndarray:
+    """ Copy of the alpha channel of interleaved pixels ('out' is reused if it has the right size).
+        Hit tests read it with pixel_alpha(..., channels=1) once the frame slot is given back to the renderer. """
+    alpha = pixels[channels - 1::channels]
+    if out is None or out.size != alpha.size or out.dtype != pixels.dtype:
+        return alpha.copy()
+    np.copyto(out, alpha)
+    return out
+
+
+TILE_SIZE = 64
+
+
+class TileHasher:
+    """ Detects the tiles that changed between two captures of the same size.
+
+        Each tile hash is a weighted sum (wrapping uint64) of its 32-bit words with random odd
+        weights: a single pass over the frame and no per-tile Python work. Edge tiles may be smaller.
+        Needs a pixel size multiple of 4 bytes (RGBA8, float32...).
+        Row bands (tile aligned) can be hashed from several threads, see bws_pipeline. """
+
+    def __init__(self, width: int, height: int, channels: int = 4, dtype=np.uint8, tile_size: int = TILE_SIZE, seed: int = 0x5EED) -> None:
+        pixel_bytes = channels * np.dtype(dtype).itemsize
+        if pixel_bytes % 4:
+            raise ValueError(f"Pixel size ({pixel_bytes} bytes) is not a multiple of 4")
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.words_per_pixel = pixel_bytes // 4
+        row_words = width * self.words_per_pixel
+        self.tile_rows = (height + tile_size - 1) // tile_size
+        self.col_starts = np.arange(0, width, tile_size) * self.words_per_pixel
+        rng = np.random.default_rng(seed)
+        self.weights = rng.integers(0, 2 ** 63, size=(height, row_words), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._products = np.empty((height, row_words), dtype=np.uint64)
+        self.hashes: Optional[np.ndarray] = None
+        # Tiles that changed in the last update (tiles_y, tiles_x).
+        self.changed: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        """ Next update reports the whole frame as dirty. """
+        self.hashes = None
+
+    def hash_tiles(self, pixels: np.ndarray, row_start: int = 0, row_end: int = None) -> np.ndarray:
+        """ Hashes of the tiles in the rows [row_start, row_end), shape (tile rows, tile columns).
+            'row_start' must be a multiple of the tile size. Only the whole frame call
+            (no row range) reuses the internal buffer, bands are safe to hash concurrently. """
+        words = pixels.view(np.uint32).reshape(self.height, -1)
+        if row_start == 0 and row_end is None:
+            products = np.multiply(words, self.weights, out=self._products)
+        else:
+            products = np.multiply(words[row_start:row_end], self.weights[row_start:row_end])
+        rows = np.add.reduceat(products, np.arange(0, products.shape[0], self.tile_size), axis=0)
+        return np.add.reduceat(rows, self.col_starts, axis=1)
+
+    def update(self, pixels: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """ Hashes a new capture. Returns the dirty rect (x, y, w, h, top-left origin)
+            bounding every changed tile, or None if nothing changed. """
+        return self.diff(self.hash_tiles(pixels))
+
+    def diff(self, hashes: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """ Same as update() with the tile hashes of the new capture. """
+        previous, self.hashes = self.hashes, hashes
+        if previous is None:
+            self.changed = np.ones(hashes.shape, dtype=bool)
+            return (0, 0, self.width, self.height)
+        self.changed = changed = hashes != previous
+        if not changed.any():
+            return None
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        tile_size = self.tile_size
+        x, y = int(cols[0]) * tile_size, int(rows[0]) * tile_size
+        return (x, y, min((int(cols[-1]) + 1) * tile_size, self.width) - x, min((int(rows[-1]) + 1) * tile_size, self.height) - y)
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """ Opens a SHM created by another process without letting this process' resource tracker
+        unlink it at exit (POSIX, Python < 3.13 has no 'track=False'). The creator owns it. """
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class FrameRing:
+    shm: shared_memory.SharedMemory
+
+    def __init__(self, shm: shared_memory.SharedMemory) -> None:
+        magic, version, slot_count, width, height, channels, dtype_code, _pid = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"'{shm.name}' is not a frame ring (magic={magic}, version={version})")
+        self.shm = shm
+        self.slot_count = slot_count
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.dtype = np.dtype(DTYPES[dtype_code])
+        self.frame_length = width * height * channels
+        self.slot_stride = calc_slot_stride(width, height, channels, self.dtype)
+        self._pixels = [
+            np.ndarray((self.frame_length, ), dtype=self.dtype, buffer=shm.buf, offset=self._slot_offset(slot) + SLOT_HEADER_SIZE)
+            for slot in range(slot_count)
+        ]
+        # Producer side sequence. Consumer side count of READY frames skipped for a newer one.
+        self.seq = max(self.read_header(slot).seq for slot in range(slot_count))
+        self.skipped = 0
+
+    @classmethod
+    def create(cls, width: int, height: int, channels: int = 4, slot_count: int = 1, dtype=np.float32, name: str = None) -> 'FrameRing':
+        """ Blender side. Creates and zero-fills the SHM. """
+        size = calc_ring_size(width, height, channels, slot_count, dtype)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slot_count, width, height, channels, DTYPE_CODES[np.dtype(dtype)], 0)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str) -> 'FrameRing':
+        """ Renderer side. Opens the SHM created by Blender and registers itself as the producer. """
+        ring = cls(attach_shared_memory(name))
+        struct.pack_into('<I', ring.shm.buf, PRODUCER_PID_OFFSET, os.getpid())
+        return ring
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def producer_pid(self) -> int:
+        return struct.unpack_from('<I', self.shm.buf, PRODUCER_PID_OFFSET)[0]
+
+    def _slot_offset(self, slot: int) -> int:
+        return RING_HEADER_SIZE + slot * self.slot_stride
+
+    def pixels(self, slot: int) -> np.ndarray:
+        """ Flat pixel view of a slot (width * height * channels). """
+        return self._pixels[slot]
+
+    def get_state(self, slot: int) -> int:
+        return SLOT_STATE.unpack_from(self.shm.buf, self._slot_offset(slot))[0]
+
+    def _set_state(self, slot: int, state: int) -> None:
+        SLOT_STATE.pack_into(self.shm.buf, self._slot_offset(slot), state)
+
+    def read_header(self, slot: int) -> FrameHeader:
+        values = SLOT_HEADER.unpack_from(self.shm.buf, self._slot_offset(slot))
+        return FrameHeader(*values[2:8], values[8:12], (values[1] >> 16, values[1] & 0xFFFF))
+
+    def frame_size(self, header: FrameHeader) -> Tuple[int, int]:
+        """ (width, height) of the frame of a slot. """
+        width, height = header.size
+        if width == 0 or height == 0:
+            return self.width, self.height
+        return width, height
+
+    def frame_pixels(self, slot: int, size: Tuple[int, int]) -> np.ndarray:
+        """ Flat pixel view of a frame of 'size' packed at the start of a slot. """
+        return self._pixels[slot][:size[0] * size[1] * self.channels]
+
+
+    # Producer (renderer).
+    # ----------------------------------------------------------------
+
+    def acquire_write(self) -> Optional[int]:
+        """ Returns a FREE slot (now WRITING) or None if Blender did not consume any of them yet. """
+        for slot in range(self.slot_count):
+            if self.get_state(slot) == SLOT.FREE:
+                self._set_state(slot, SLOT.WRITING)
+                return slot
+        return None
+
+    def publish(self, slot: int,
+                input_id: int = 0, input_time_ns: int = 0, input_applied_ns: int = 0,
+                paint_start_ns: int = 0, publish_ns: int = 0,
+                dirty: Tuple[int, int, int, int] = None, size: Tuple[int, int] = None) -> int:
+        """ Fills the slot header and hands it to Blender. Returns the frame sequence.
+            'size' is the (width, height) of a frame smaller than the ring, see frame_pixels(). """
+        self.seq += 1
+        if size is None or size == (self.width, self.height):
+            packed_size = 0
+        else:
+            packed_size = size[0] << 16 | size[1]
+        if dirty is None:
+            dirty = (0, 0, *(size or (self.width, self.height)))
+        SLOT_HEADER.pack_into(
+            self.shm.buf, self._slot_offset(slot),
+            SLOT.WRITING, packed_size, self.seq,
+            input_id, input_time_ns, input_applied_ns, paint_start_ns, publish_ns,
+            *dirty
+        )
+        self._set_state(slot, SLOT.READY)
+        return self.seq
+
+    def abort_write(self, slot: int) -> None:
+        self._set_state(slot, SLOT.FREE)
+
+
+    # Consumer (Blender).
+    # ----------------------------------------------------------------
+
+    def acquire_read(self) -> Optional[int]:
+        """ Returns the newest READY slot (now READING), or None. Older READY slots are freed. """
+        newest_slot = None
+        newest_seq = -1
+        for slot in range(self.slot_count):
+            if self.get_state(slot) != SLOT.READY:
+                continue
+            seq = self.read_header(slot).seq
+            if seq > newest_seq:
+                if newest_slot is not None:
+                    self._set_state(newest_slot, SLOT.FREE)
+                    self.skipped += 1
+                newest_slot, newest_seq = slot, seq
+            else:
+                self._set_state(slot, SLOT.FREE)
+                self.skipped += 1
+        if newest_slot is not None:
+            self._set_state(newest_slot, SLOT.READING)
+        return newest_slot
+
+    def acquire_input(self, input_id: int) -> Optional[int]:
+        """ Returns the READY slot painted for 'input_id' (now READING), or None.
+            READY slots of older inputs are freed, newer ones are kept (offline render prefetch). """
+        found_slot = None
+        for slot in range(self.slot_count):
+            if self.get_state(slot) != SLOT.READY:
+                continue
+            slot_input_id = self.read_header(slot).input_id
+            if slot_input_id == input_id:
+                found_slot = slot
+            elif slot_input_id < input_id:
+                self._set_state(slot, SLOT.FREE)
+                self.skipped += 1
+        if found_slot is not None:
+            self._set_state(found_slot, SLOT.READING)
+        return found_slot
+
+    def release(self, slot: int) -> None:
+        self._set_state(slot, SLOT.FREE)
+
+
+    # Cleanup.
+    # ----------------------------------------------------------------
+
+    def close(self) -> None:
+        self._pixels = []
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
@@ -0,0 +1,333 @@
+""" Reverse channel: Blender images and viewport captures shared with the page, through a SharedMemory
+    created by Blender next to the frame SHM (`<frame shm name>_images<generation>`).
+
+    [header][entry 0]...[entry N - 1][image data]...
+
+    Every entry is a named image (width, height, channels, dtype) with its own data region.
+    Its version is a seqlock: odd while Blender writes the pixels, even once they are consistent,
+    so the renderer can copy them without any lock. Blender notifies the renderer with an
+    IMAGE_SHARED control message (generation, image name) after every publish.
+
+    When an image does not fit anymore, Blender creates the next generation with more room
+    (the shared images are copied over) and the renderer attaches to it on the next notification.
+
+    The page gets the raw pixels as a typed array, never as base64 or PNG (see SHARED_IMAGES_JS):
+
+        window.addEventListener('bwsimage', async (event) => {
+            const image = await bwsImages.get(event.detail.name);   // {width, height, channels, dtype, version, data}
+            context.putImageData(bwsImages.toImageData(image), 0, 0);
+        });
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon.
+"""
+
+import json
+import struct
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    from bws_frames import ALIGNMENT, DTYPES, DTYPE_CODES, attach_shared_memory
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import ALIGNMENT, DTYPES, DTYPE_CODES, attach_shared_memory
+
+
+IMAGES_MAGIC = b'BWSI'
+IMAGES_VERSION = 1
+IMAGES_SHM_SUFFIX = '_images'
+
+MAX_IMAGES = 16
+MAX_NAME_BYTES = 64
+DEFAULT_CAPACITY = 16 * 1024 * 1024
+READ_RETRIES = 100
+
+# magic, version, entry count, _pad, publish count (any image).
+IMAGES_HEADER = struct.Struct('<4sIIIQ')
+# name, version (seqlock), width, height, channels, dtype code, data offset, allocated size.
+IMAGE_ENTRY = struct.Struct(f'<{MAX_NAME_BYTES}sQIIIIQQ')
+IMAGE_VERSION = struct.Struct('<Q')
+
+HEADER_SIZE = 64
+ENTRY_SIZE = 128
+PUBLISH_COUNT_OFFSET = 16
+
+DTYPE_NAMES = {np.dtype(np.float32): 'float32', np.dtype(np.uint8): 'uint8'}
+
+# Fake origin intercepted by the renderer: the page fetches '<url><image name>'.
+SHARED_IMAGES_URL = 'http://bws-images.local/'
+
+
+class SharedImageInfo(NamedTuple):
+    name: str
+    version: int
+    width: int
+    height: int
+    channels: int
+    dtype: np.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return self.width * self.height * self.channels * self.dtype.itemsize
+
+
+def _align(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def shared_images_name(frame_shm_name: str, generation: int = 0) -> str:
+    return f'{frame_shm_name}{IMAGES_SHM_SUFFIX}{generation}'
+
+
+def calc_images_size(capacity: int, entry_count: int = MAX_IMAGES) -> int:
+    return _align(HEADER_SIZE + entry_count * ENTRY_SIZE) + capacity
+
+
+class SharedImages:
+    shm: shared_memory.SharedMemory
+
+    def __init__(self, shm: shared_memory.SharedMemory) -> None:
+        magic, version, entry_count, _pad, _count = IMAGES_HEADER.unpack_from(shm.buf, 0)
+        if magic != IMAGES_MAGIC or version != IMAGES_VERSION:
+            raise ValueError(f"'{shm.name}' is not a shared images block (magic={magic}, version={version})")
+        self.shm = shm
+        self.entry_count = entry_count
+        self.data_offset = _align(HEADER_SIZE + entry_count * ENTRY_SIZE)
+        # Blender side bump allocator. Freed regions are reused by images that fit in them.
+        self.used = max([self.data_offset] + [info[6] + info[7] for info in self._entries() if info[7]])
+
+    @classmethod
+    def create(cls, frame_shm_name: str, generation: int = 0, capacity: int = DEFAULT_CAPACITY, entry_count: int = MAX_IMAGES) -> 'SharedImages':
+        """ Blender side. """
+        size = calc_images_size(capacity, entry_count)
+        shm = shared_memory.SharedMemory(name=shared_images_name(frame_shm_name, generation), create=True, size=size)
+        table_size = HEADER_SIZE + entry_count * ENTRY_SIZE
+        shm.buf[:table_size] = bytes(table_size)
+        IMAGES_HEADER.pack_into(shm.buf, 0, IMAGES_MAGIC, IMAGES_VERSION, entry_count, 0, 0)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, frame_shm_name: str, generation: int = 0) -> Optional['SharedImages']:
+        """ Renderer side. None if Blender did not share any image (yet). """
+        try:
+            return cls(attach_shared_memory(shared_images_name(frame_shm_name, generation)))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def capacity(self) -> int:
+        return self.shm.size - self.data_offset
+
+    @property
+    def publish_count(self) -> int:
+        return struct.unpack_from('<Q', self.shm.buf, PUBLISH_COUNT_OFFSET)[0]
+
+    def _entry_offset(self, index: int) -> int:
+        return HEADER_SIZE + index * ENTRY_SIZE
+
+    def _entries(self) -> List[tuple]:
+        return [IMAGE_ENTRY.unpack_from(self.shm.buf, self._entry_offset(index)) for index in range(self.entry_count)]
+
+    def _find(self, name: str) -> Tuple[int, Optional[tuple]]:
+        key = name.encode('utf-8')
+        for index, entry in enumerate(self._entries()):
+            if entry[0].rstrip(b'\0') == key:
+                return index, entry
+        return -1, None
+
+    def _version(self, index: int) -> int:
+        return IMAGE_VERSION.unpack_from(self.shm.buf, self._entry_offset(index) + MAX_NAME_BYTES)[0]
+
+    def _set_version(self, index: int, version: int) -> None:
+        IMAGE_VERSION.pack_into(self.shm.buf, self._entry_offset(index) + MAX_NAME_BYTES, version)
+
+
+    # Producer (Blender).
+    # ----------------------------------------------------------------
+
+    def fits(self, name: str, nbytes: int) -> bool:
+        """ Whether publish() would find room for an image of 'nbytes' under 'name'. """
+        return self._allocate(name, nbytes, dry_run=True) is not None
+
+    def _allocate(self, name: str, nbytes: int, dry_run: bool = False) -> Optional[Tuple[int, int, int]]:
+        """ (entry index, data offset, allocated size) for the image, None if there is no room. """
+        index, entry = self._find(name)
+        if entry is not None and entry[7] >= nbytes:
+            return index, entry[6], entry[7]
+        entries = self._entries()
+        if index < 0:
+            # A removed entry whose region is big enough, else any free entry.
+            free = [i for i, e in enumerate(entries) if not e[0].strip(b'\0')]
+            if not free:
+                return None
+            index = next((i for i in free if entries[i][7] >= nbytes), free[0])
+            if entries[index][7] >= nbytes:
+                return index, entries[index][6], entries[index][7]
+        size = _align(nbytes)
+        offset = self.used
+        if offset + size > self.shm.size:
+            return None
+        if not dry_run:
+            self.used += size
+        return index, offset, size
+
+    def publish(self, name: str, pixels: np.ndarray, flip_y: bool = False) -> Optional[int]:
+        """ Copies an (height, width, channels) float32 or uint8 image. Blender images are stored bottom-up:
+            'flip_y' makes the copy top-down, as the page expects it (no extra pass).
+            Returns the image version, or None if there is no room left (see fits()). """
+        if len(name.encode('utf-8')) > MAX_NAME_BYTES:
+            raise ValueError(f"Shared image name too long (max {MAX_NAME_BYTES} bytes): {name}")
+        if pixels.ndim == 2:
+            pixels = pixels[..., np.newaxis]
+        height, width, channels = pixels.shape
+        dtype = np.dtype(pixels.dtype)
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported shared image dtype: {dtype}")
+        allocation = self._allocate(name, pixels.nbytes)
+        if allocation is None:
+            return None
+        index, offset, size = allocation
+
+        # Versions keep counting when an entry is reused, so the renderer never mistakes an image for another.
+        version = self._version(index)
+        # Odd while writing: the renderer retries its copy.
+        IMAGE_ENTRY.pack_into(self.shm.buf, self._entry_offset(index), name.encode('utf-8'), version + 1,
+                              width, height, channels, DTYPE_CODES[dtype], offset, size)
+        target = np.ndarray(pixels.shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+        np.copyto(target, pixels[::-1] if flip_y else pixels)
+        del target
+        self._set_version(index, version + 2)
+        struct.pack_into('<Q', self.shm.buf, PUBLISH_COUNT_OFFSET, self.publish_count + 1)
+        return version + 2
+
+    def remove(self, name: str) -> bool:
+        """ The data region stays allocated to the entry, for the next image that fits. """
+        index, entry = self._find(name)
+        if entry is None:
+            return False
+        IMAGE_ENTRY.pack_into(self.shm.buf, self._entry_offset(index), b'', entry[1] + 2, 0, 0, 0, 0, entry[6], entry[7])
+        return True
+
+
+    # Consumer (renderer).
+    # ----------------------------------------------------------------
+
+    def images(self) -> List[SharedImageInfo]:
+        return [
+            SharedImageInfo(entry[0].rstrip(b'\0').decode('utf-8'), entry[1], *entry[2:5], np.dtype(DTYPES[entry[5]]))
+            for entry in self._entries() if entry[0].strip(b'\0')
+        ]
+
+    def find(self, name: str) -> Optional[SharedImageInfo]:
+        _index, entry = self._find(name)
+        if entry is None:
+            return None
+        return SharedImageInfo(name, entry[1], *entry[2:5], np.dtype(DTYPES[entry[5]]))
+
+    def read(self, name: str) -> Tuple[Optional[SharedImageInfo], Optional[bytes]]:
+        """ Consistent copy of an image: (info, bytes) or (None, None) if it is not shared.
+            This is the only copy on the renderer side, the page gets these bytes as they are. """
+        for _ in range(READ_RETRIES):
+            index, entry = self._find(name)
+            if entry is None:
+                return None, None
+            version = entry[1]
+            if version & 1:
+                continue
+            info = SharedImageInfo(name, version, *entry[2:5], np.dtype(DTYPES[entry[5]]))
+            data = bytes(self.shm.buf[entry[6]:entry[6] + info.nbytes])
+            if self._version(index) == version:
+                return info, data
+        return None, None
+
+    def read_array(self, name: str) -> Tuple[Optional[SharedImageInfo], Optional[np.ndarray]]:
+        """ Same as read(), as a (height, width, channels) array. """
+        info, data = self.read(name)
+        if info is None:
+            return None, None
+        return info, np.frombuffer(data, dtype=info.dtype).reshape(info.height, info.width, info.channels)
+
+
+    # Cleanup.
+    # ----------------------------------------------------------------
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+
+
+def response_headers(info: SharedImageInfo) -> dict:
+    """ HTTP headers of a shared image response (read by SHARED_IMAGES_JS). """
+    return {
+        'Content-Type': 'application/octet-stream',
+        'Cache-Control': 'no-store',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'X-BWS-Width, X-BWS-Height, X-BWS-Channels, X-BWS-Dtype, X-BWS-Version',
+        'X-BWS-Width': str(info.width),
+        'X-BWS-Height': str(info.height),
+        'X-BWS-Channels': str(info.channels),
+        'X-BWS-Dtype': DTYPE_NAMES[info.dtype],
+        'X-BWS-Version': str(info.version),
+    }
+
+
+def image_shared_js(name: str, version: int) -> str:
+    """ Tells the page that Blender published a new version of an image. """
+    detail = json.dumps({'name': name, 'version': version})
+    return f"window.dispatchEvent(new CustomEvent('bwsimage', {{detail: {detail}}}));"
+
+
+# Injected in every page before its scripts run.
+SHARED_IMAGES_JS = """
+(function () {
+    if (window.bwsImages) { return; }
+    var BASE_URL = '%s';
+    var TYPES = {uint8: Uint8Array, float32: Float32Array};
+    window.bwsImages = {
+        url: function (name) { return BASE_URL + encodeURIComponent(name); },
+        // {name, width, height, channels, dtype, version, data}: 'data' is a view of the response buffer.
+        get: function (name) {
+            return fetch(this.url(name), {cache: 'no-store'}).then(function (response) {
+                if (!response.ok) { throw new Error('Blender image not shared: ' + name); }
+                var headers = response.headers;
+                var image = {
+                    name: name,
+                    width: +headers.get('X-BWS-Width'),
+                    height: +headers.get('X-BWS-Height'),
+                    channels: +headers.get('X-BWS-Channels'),
+                    dtype: headers.get('X-BWS-Dtype'),
+                    version: +headers.get('X-BWS-Version')
+                };
+                return response.arrayBuffer().then(function (buffer) {
+                    image.data = new TYPES[image.dtype](buffer);
+                    return image;
+                });
+            });
+        },
+        // RGBA8 ImageData for canvases. Shares the buffer when the image already is RGBA8.
+        toImageData: function (image) {
+            var count = image.width * image.height;
+            if (image.dtype === 'uint8' && image.channels === 4) {
+                return new ImageData(new Uint8ClampedArray(image.data.buffer, image.data.byteOffset, count * 4), image.width, image.height);
+            }
+            var rgba = new Uint8ClampedArray(count * 4);
+            var scale = image.dtype === 'float32' ? 255 : 1;
+            var channels = image.channels;
+            for (var i = 0; i < count; i++) {
+                for (var c = 0; c < 4; c++) {
+                    rgba[i * 4 + c] = c < channels ? image.data[i * channels + c] * scale : (c === 3 ? 255 : rgba[i * 4]);
+                }
+            }
+            return new ImageData(rgba, image.width, image.height);
+        }
+    };
+})();
+""" % SHARED_IMAGES_URL
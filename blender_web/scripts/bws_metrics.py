@@ -0,0 +1,363 @@
+""" Performance metrics shared by Blender and the renderer processes.
+
+    Counters, gauges, rates and latency histograms are plain Python objects
+    grouped in a MetricsRegistry. The renderer mirrors its registry into a
+    small SharedMemory stats block (see StatsBlock) so Blender can read the
+    renderer side without any socket round-trip.
+
+    NOTE: This module is imported by the renderer scripts (Python 3.9 venvs)
+    and by the addon, so it must only depend on the standard library.
+"""
+
+import struct
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds, in milliseconds. Last bucket is overflow.
+HISTOGRAM_BOUNDS_MS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 33.0, 66.0, 133.0, 266.0, 533.0)
+HISTOGRAM_BUCKETS = len(HISTOGRAM_BOUNDS_MS) + 1
+
+STATS_MAGIC = b'BWSM'
+STATS_VERSION = 1
+STATS_SHM_SUFFIX = '_stats'
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Rate:
+    """ Events per second, refreshed once per second (same as the old FPS prints). """
+    __slots__ = ('value', '_count', '_start')
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._count = 0
+        self._start = perf_counter()
+
+    def tick(self, amount: int = 1) -> None:
+        self._count += amount
+        now = perf_counter()
+        elapsed = now - self._start
+        if elapsed > 1.0:
+            self.value = self._count / elapsed
+            self._count = 0
+            self._start = now
+
+
+class Histogram:
+    """ Fixed-bucket latency histogram. Values are given in milliseconds. """
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self) -> None:
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        index = 0
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if value_ms <= bound:
+                break
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def observe_since(self, start_time: float) -> None:
+        """ Observe elapsed time since 'start_time' (a perf_counter() value). """
+        self.observe((perf_counter() - start_time) * 1000.0)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        return histogram_percentile(self.buckets, self.count, self.max, p)
+
+
+def histogram_percentile(buckets, count: int, max_value: float, p: float) -> float:
+    """ Approximated percentile (upper bound of the bucket where it falls). 'p' in [0, 100]. """
+    if count == 0:
+        return 0.0
+    target = count * p / 100.0
+    accum = 0
+    for index, bucket_count in enumerate(buckets):
+        accum += bucket_count
+        if accum >= target and bucket_count:
+            if index < len(HISTOGRAM_BOUNDS_MS):
+                return min(HISTOGRAM_BOUNDS_MS[index], max_value)
+            return max_value
+    return max_value
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+class MetricsSchema:
+    """ Ordered metric names of a registry. Both processes must share the same schema
+        to agree on the stats block layout. """
+
+    def __init__(self,
+                 counters: Tuple[str, ...] = (),
+                 gauges: Tuple[str, ...] = (),
+                 rates: Tuple[str, ...] = (),
+                 histograms: Tuple[str, ...] = ()) -> None:
+        self.counters = counters
+        self.gauges = gauges
+        self.rates = rates
+        self.histograms = histograms
+
+        fmt = '<'
+        fmt += 'Q' * len(counters)
+        fmt += 'd' * (len(gauges) + len(rates))
+        fmt += ('Qdd' + 'Q' * HISTOGRAM_BUCKETS) * len(histograms)
+        self.body = struct.Struct(fmt)
+
+    def create_registry(self) -> 'MetricsRegistry':
+        return MetricsRegistry(self)
+
+
+RENDERER_SCHEMA = MetricsSchema(
+    counters=('frames_published', 'frames_dropped', 'frames_unchanged', 'inputs_received'),
+    gauges=('input_queue_depth',),
+    rates=('paint_fps',),
+    histograms=('paint_to_shm', 'input_to_frame'),
+)
+
+BLENDER_SCHEMA = MetricsSchema(
+    counters=('frames_consumed', 'inputs_sent'),
+    rates=('draw_fps',),
+    histograms=('upload', 'draw'),
+)
+
+
+class MetricsRegistry:
+    def __init__(self, schema: MetricsSchema) -> None:
+        self.schema = schema
+        self.counters: Dict[str, Counter] = {name: Counter() for name in schema.counters}
+        self.gauges: Dict[str, Gauge] = {name: Gauge() for name in schema.gauges}
+        self.rates: Dict[str, Rate] = {name: Rate() for name in schema.rates}
+        self.histograms: Dict[str, Histogram] = {name: Histogram() for name in schema.histograms}
+
+    def counter(self, name: str) -> Counter:
+        return self.counters[name]
+
+    def gauge(self, name: str) -> Gauge:
+        return self.gauges[name]
+
+    def rate(self, name: str) -> Rate:
+        return self.rates[name]
+
+    def histogram(self, name: str) -> Histogram:
+        return self.histograms[name]
+
+    def pack_values(self) -> list:
+        values = [counter.value for counter in self.counters.values()]
+        values.extend(gauge.value for gauge in self.gauges.values())
+        values.extend(rate.value for rate in self.rates.values())
+        for histogram in self.histograms.values():
+            values.append(histogram.count)
+            values.append(histogram.total)
+            values.append(histogram.max)
+            values.extend(histogram.buckets)
+        return values
+
+    def snapshot(self) -> dict:
+        return snapshot_from_values(self.schema, self.pack_values())
+
+
+def snapshot_from_values(schema: MetricsSchema, values) -> dict:
+    """ Turns the flat value list of a registry (or a stats block) into a nested dict. """
+    it = iter(values)
+    snapshot = {
+        'counters': {name: next(it) for name in schema.counters},
+        'gauges': {name: next(it) for name in schema.gauges},
+        'rates': {name: next(it) for name in schema.rates},
+        'histograms': {},
+    }
+    for name in schema.histograms:
+        count, total, max_value = next(it), next(it), next(it)
+        buckets = [next(it) for _ in range(HISTOGRAM_BUCKETS)]
+        snapshot['histograms'][name] = {
+            'count': count,
+            'mean': total / count if count else 0.0,
+            'max': max_value,
+            'p50': histogram_percentile(buckets, count, max_value, 50),
+            'p95': histogram_percentile(buckets, count, max_value, 95),
+            'p99': histogram_percentile(buckets, count, max_value, 99),
+            'buckets': buckets,
+        }
+    return snapshot
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+class StatsBlock:
+    """ Seqlock-protected view of a registry over a (shared) memory buffer.
+        Writer bumps 'seq' to an odd value, writes the body and bumps it to even again.
+        Readers retry when 'seq' is odd or changed while reading. """
+    HEADER = struct.Struct('<4sII')  # magic, version, seq
+
+    def __init__(self, buf, schema: MetricsSchema) -> None:
+        self.buf = buf
+        self.schema = schema
+        self.seq = 0
+
+    @classmethod
+    def calc_size(cls, schema: MetricsSchema) -> int:
+        return cls.HEADER.size + schema.body.size
+
+    def init_header(self) -> None:
+        self.seq = 0
+        self.HEADER.pack_into(self.buf, 0, STATS_MAGIC, STATS_VERSION, 0)
+
+    def write(self, registry: MetricsRegistry) -> None:
+        self.seq += 1
+        self.HEADER.pack_into(self.buf, 0, STATS_MAGIC, STATS_VERSION, self.seq)
+        self.schema.body.pack_into(self.buf, self.HEADER.size, *registry.pack_values())
+        self.seq += 1
+        self.HEADER.pack_into(self.buf, 0, STATS_MAGIC, STATS_VERSION, self.seq)
+
+    def read(self, retries: int = 4) -> Optional[dict]:
+        for _ in range(retries):
+            magic, version, seq_start = self.HEADER.unpack_from(self.buf, 0)
+            if magic != STATS_MAGIC or version != STATS_VERSION:
+                return None
+            if seq_start & 1:
+                continue
+            values = self.schema.body.unpack_from(self.buf, self.HEADER.size)
+            if self.HEADER.unpack_from(self.buf, 0)[2] == seq_start:
+                return snapshot_from_values(self.schema, values)
+        return None
+
+
+def stats_block_name(shm_name: str) -> str:
+    return shm_name + STATS_SHM_SUFFIX
+
+
+def attach_stats_block(shm_name: str, schema: MetricsSchema = RENDERER_SCHEMA):
+    """ Renderer side. Opens the stats block that Blender created next to the frame SHM.
+        Returns (shm, block) or (None, None) if Blender did not create one. """
+    import os
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=stats_block_name(shm_name))
+    except (FileNotFoundError, ValueError):
+        return None, None
+    if os.name == 'posix':
+        # Blender owns the block: do not let this process' resource tracker unlink it at exit.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    if shm.size < StatsBlock.calc_size(schema):
+        shm.close()
+        return None, None
+    block = StatsBlock(shm.buf, schema)
+    block.init_header()
+    return shm, block
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+def format_summary(snapshot: dict) -> List[str]:
+    """ Short human readable lines, used by the HUD overlay and debug prints. """
+    lines = []
+    for name, value in snapshot['rates'].items():
+        lines.append(f"{name}: {value:.1f}")
+    if snapshot['counters']:
+        lines.append(' | '.join(f"{name}: {value}" for name, value in snapshot['counters'].items()))
+    for name, value in snapshot['gauges'].items():
+        lines.append(f"{name}: {value:g}")
+    for name, hist in snapshot['histograms'].items():
+        if hist['count'] == 0:
+            continue
+        lines.append(
+            f"{name}: p50 {hist['p50']:.2f} ms | p95 {hist['p95']:.2f} ms | max {hist['max']:.2f} ms"
+        )
+    return lines
+
+
+class RendererMetrics:
+    """ Renderer side helper shared by every backend script.
+        Tracks the pending inputs (received but not yet visible in a published frame)
+        to measure the input queue depth and the input-to-frame latency. """
+
+    def __init__(self, shm_name: str = '') -> None:
+        self.registry = RENDERER_SCHEMA.create_registry()
+        self.shm, self.block = attach_stats_block(shm_name) if shm_name else (None, None)
+        self.pending_input_time: Optional[float] = None
+        self._frames_published = self.registry.counters['frames_published']
+        self._frames_dropped = self.registry.counters['frames_dropped']
+        self._frames_unchanged = self.registry.counters['frames_unchanged']
+        self._inputs_received = self.registry.counters['inputs_received']
+        self._input_queue_depth = self.registry.gauges['input_queue_depth']
+        self._paint_fps = self.registry.rates['paint_fps']
+        self._paint_to_shm = self.registry.histograms['paint_to_shm']
+        self._input_to_frame = self.registry.histograms['input_to_frame']
+
+    def input_received(self) -> None:
+        self._inputs_received.inc()
+        if self.pending_input_time is None:
+            self.pending_input_time = perf_counter()
+        self._input_queue_depth.value += 1
+
+    def frame_dropped(self) -> None:
+        self._frames_dropped.inc()
+
+    def frame_unchanged(self) -> None:
+        """ A capture identical to the previous frame, not published. """
+        self._frames_unchanged.inc()
+
+    def frame_published(self, paint_start_time: float) -> None:
+        now = perf_counter()
+        self._paint_to_shm.observe((now - paint_start_time) * 1000.0)
+        self._frames_published.inc()
+        self._paint_fps.tick()
+        if self.pending_input_time is not None:
+            self._input_to_frame.observe((now - self.pending_input_time) * 1000.0)
+            self.pending_input_time = None
+            self._input_queue_depth.value = 0
+        self.publish()
+
+    def publish(self) -> None:
+        if self.block is not None:
+            self.block.write(self.registry)
+
+    def close(self) -> None:
+        self.block = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
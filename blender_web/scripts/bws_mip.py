@@ -0,0 +1,161 @@
+""" Zoom-aware resolution of web overlays anchored in a 2D view (node editor).
+
+    A page of (page width, page height) pixels is drawn over a view-space rect. Zoomed out, the
+    renderer paints it at 1 / 2 ** level of its resolution (its mip level), and only the part that is
+    visible in the region is cropped and sent to Blender:
+
+        page pixels (level 0, top-left origin) -> paint pixels = page pixels >> level
+
+    Blender requests a new Viewport only when the zoom crosses a level or the visible part leaves
+    the last requested one: panning and zooming inside a level reuse the frames already painted.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+from math import ceil, floor, log2
+from typing import NamedTuple, Optional, Tuple
+
+
+MAX_MIP_LEVEL = 4
+# Fraction of a level the zoom has to go past a level boundary before switching: no thrashing
+# between two levels while zooming around a boundary.
+MIP_HYSTERESIS = 0.2
+# Visible parts are snapped to this grid (page pixels, multiple of 2 ** MAX_MIP_LEVEL) and padded by one
+# cell, so small pans stay inside the last request.
+VIEWPORT_GRID = 64
+
+
+Rect = Tuple[float, float, float, float]  # (x_min, y_min, x_max, y_max)
+
+
+def mip_level(zoom: float, max_level: int = MAX_MIP_LEVEL) -> int:
+    """ Coarsest level still painted at, or above, the displayed resolution.
+        'zoom' is the number of region pixels per page pixel. """
+    if zoom >= 1.0 or zoom <= 0.0:
+        return 0
+    return min(int(floor(log2(1.0 / zoom))), max_level)
+
+
+class Viewport(NamedTuple):
+    """ Part of the page to paint, in page pixels (level 0, top-left origin), and its mip level. """
+    level: int
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @classmethod
+    def full(cls, page_width: int, page_height: int) -> 'Viewport':
+        return cls(0, 0, 0, page_width, page_height)
+
+    @property
+    def rect(self) -> Rect:
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    def contains(self, other: 'Viewport') -> bool:
+        return (self.x <= other.x and self.y <= other.y and
+                other.x + other.width <= self.x + self.width and other.y + other.height <= self.y + self.height)
+
+    def paint_size(self, page_width: int, page_height: int) -> Tuple[int, int]:
+        """ Size of the whole page painted at this level. """
+        return -(-page_width >> self.level), -(-page_height >> self.level)
+
+    def crop(self) -> Tuple[int, int, int, int]:
+        """ (x, y, width, height) of this part in paint pixels. """
+        level = self.level
+        x = self.x >> level
+        y = self.y >> level
+        return x, y, max(1, -(-(self.x + self.width) >> level) - x), max(1, -(-(self.y + self.height) >> level) - y)
+
+    def pixel_fraction(self, page_width: int, page_height: int) -> float:
+        """ Painted and transferred pixels, relative to the full page at full resolution. """
+        _x, _y, width, height = self.crop()
+        return (width * height) / float(page_width * page_height)
+
+
+def visible_part(page_rect: Rect, visible_rect: Rect, page_size: Tuple[int, int],
+                 grid: int = VIEWPORT_GRID, padding: int = 1) -> Optional[Tuple[int, int, int, int]]:
+    """ Page pixels (x, y, width, height) of the page drawn over 'page_rect' that are inside 'visible_rect',
+        both in view space (y up). Snapped outwards to the grid and padded by 'padding' cells.
+        None if the page is not visible. """
+    page_x_min, page_y_min, page_x_max, page_y_max = page_rect
+    page_width, page_height = page_size
+    x_min = max(page_x_min, visible_rect[0])
+    y_min = max(page_y_min, visible_rect[1])
+    x_max = min(page_x_max, visible_rect[2])
+    y_max = min(page_y_max, visible_rect[3])
+    if x_max <= x_min or y_max <= y_min:
+        return None
+
+    # View space -> page pixels (y down).
+    scale_x = page_width / (page_x_max - page_x_min)
+    scale_y = page_height / (page_y_max - page_y_min)
+    left = (x_min - page_x_min) * scale_x
+    right = (x_max - page_x_min) * scale_x
+    top = (page_y_max - y_max) * scale_y
+    bottom = (page_y_max - y_min) * scale_y
+
+    pad = padding * grid
+    left = max(0, int(floor(left / grid)) * grid - pad)
+    top = max(0, int(floor(top / grid)) * grid - pad)
+    right = min(page_width, int(ceil(right / grid)) * grid + pad)
+    bottom = min(page_height, int(ceil(bottom / grid)) * grid + pad)
+    return left, top, right - left, bottom - top
+
+
+class MipRequester:
+    """ Decides when the overlay needs a new Viewport. Blender side, one per overlay. """
+
+    def __init__(self, page_width: int, page_height: int, max_level: int = MAX_MIP_LEVEL,
+                 hysteresis: float = MIP_HYSTERESIS, grid: int = VIEWPORT_GRID) -> None:
+        self.page_size = (page_width, page_height)
+        self.max_level = max_level
+        self.hysteresis = hysteresis
+        self.grid = grid
+        self.level = 0
+        # Last requested viewport, None until the first request.
+        self.viewport: Optional[Viewport] = None
+        self.requests = 0
+        # State before the last request, see rollback().
+        self._previous: Optional[Tuple[int, Optional[Viewport], int]] = None
+
+    def select_level(self, zoom: float) -> int:
+        """ Mip level for 'zoom', keeping the current one until the zoom is past the boundary by 'hysteresis'. """
+        target = mip_level(zoom, self.max_level)
+        level = self.level
+        if target == level or zoom <= 0.0:
+            return level
+        depth = log2(1.0 / zoom)
+        if target > level:
+            # Zooming out: 'depth' must be past the start of the target level.
+            return target if depth >= target + self.hysteresis else max(level, target - 1)
+        # Zooming in: 'depth' must be clearly below the current level.
+        return target if depth <= level - self.hysteresis else level
+
+    def update(self, zoom: float, page_rect: Rect, visible_rect: Rect) -> Optional[Viewport]:
+        """ New viewport to request, or None when the last one still covers the view (or nothing is visible). """
+        needed = visible_part(page_rect, visible_rect, self.page_size, self.grid, padding=0)
+        if needed is None:
+            return None
+        level = self.select_level(zoom)
+        current = self.viewport
+        if current is not None and current.level == level and current.contains(Viewport(level, *needed)):
+            return None
+        self._previous = (self.level, current, self.requests)
+        self.level = level
+        self.viewport = Viewport(level, *visible_part(page_rect, visible_rect, self.page_size, self.grid))
+        self.requests += 1
+        return self.viewport
+
+    def rollback(self) -> None:
+        """ Forgets the viewport returned by the last update(), when its request could not be sent:
+            the next update() requests it again. """
+        if self._previous is not None:
+            self.level, self.viewport, self.requests = self._previous
+            self._previous = None
+
+    @property
+    def pixel_fraction(self) -> float:
+        if self.viewport is None:
+            return 1.0
+        return self.viewport.pixel_fraction(*self.page_size)
@@ -0,0 +1,490 @@
+""" Pure-Python mock renderer. Same launch arguments, socket protocol and frame SHM as bws_cefpython.py,
+    but frames are synthesized with numpy, so the whole pipeline can be measured without Blender, CEF or Qt.
+
+Usage:
+    python bws_mock.py -- mock://partial "1280,720,4" shm_name port [offline]
+
+Modes (url):
+    mock://full         Repaints the whole frame after every applied input.
+    mock://partial      Repaints a small box under the mouse after every applied input (dirty rect).
+    mock://animated     Repaints the whole frame continuously at 'fps' (mock://animated?fps=60).
+
+Offline (see bws_offline): frames are only painted for RENDER_FRAME requests, one per request,
+and the synthetic page only depends on the requested frame number.
+
+The last image shared by Blender (see bws_images) is drawn in the top-left corner of every frame.
+
+Hidden views (VISIBILITY) are not painted, and detach from their frame ring when Blender releases it.
+
+MockHost plays the Blender side (server socket + frame ring + renderer process) for benchmarks and replays.
+"""
+
+import select
+import socket
+import subprocess
+import sys
+from os import path
+from time import perf_counter_ns, sleep
+from typing import Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+try:
+    from bws_bundle import renderer_url
+    from bws_frames import FrameRing, FrameHeader, INV_255
+    from bws_images import SharedImages
+    from bws_metrics import RendererMetrics
+    from bws_offline import OFFLINE_ARGUMENT, OfflineFrameRequests, frame_time_us
+    from bws_profiling import RendererProfiler
+    from bws_protocol import SOCKET_SIGNAL, PROFILE_FLAGS, VISIBILITY_FLAGS, InputDecoder, coalesce_inputs, encode_control, encode_input, encode_signal
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_bundle import renderer_url
+    from .bws_frames import FrameRing, FrameHeader, INV_255
+    from .bws_images import SharedImages
+    from .bws_metrics import RendererMetrics
+    from .bws_offline import OFFLINE_ARGUMENT, OfflineFrameRequests, frame_time_us
+    from .bws_profiling import RendererProfiler
+    from .bws_protocol import SOCKET_SIGNAL, PROFILE_FLAGS, VISIBILITY_FLAGS, InputDecoder, coalesce_inputs, encode_control, encode_input, encode_signal
+
+
+DEBUG = False
+FPS = 30
+RECV_SIZE = 64 * 1024
+BOX_SIZE = 64
+
+MODES = {'full', 'partial', 'animated'}
+
+
+class SyntheticFrames:
+    """ Paints synthetic pages into a flat float32 RGBA slot. Returns the dirty rect (x, y, w, h). """
+
+    def __init__(self, width: int, height: int, channels: int, mode: str) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown mock mode '{mode}', expected one of {sorted(MODES)}")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.mode = mode
+        self.frame_index = 0
+        self.last_box: Optional[Tuple[int, int, int, int]] = None
+        # Box drawn in each slot, to clear it next time that slot is reused.
+        self.slot_boxes = {}
+        # Animated mode: horizontal gradient twice as wide as the frame, scrolled every frame.
+        ramp = np.linspace(0.0, 1.0, width, dtype=np.float32)
+        self.gradient = np.concatenate((ramp, ramp[::-1]))
+
+    def _view(self, pixels: np.ndarray) -> np.ndarray:
+        return pixels.reshape(self.height, self.width, self.channels)
+
+    def _box_at(self, x: int, y: int) -> Tuple[int, int, int, int]:
+        x0 = min(max(x - BOX_SIZE // 2, 0), max(self.width - BOX_SIZE, 0))
+        y0 = min(max(y - BOX_SIZE // 2, 0), max(self.height - BOX_SIZE, 0))
+        return x0, y0, min(BOX_SIZE, self.width), min(BOX_SIZE, self.height)
+
+    def render(self, slot: int, pixels: np.ndarray, mouse: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        self.frame_index += 1
+        image = self._view(pixels)
+
+        if self.mode == 'full':
+            shade = (self.frame_index % 256) / 255.0
+            image[...] = (shade, 1.0 - shade, 0.5, 1.0)[:self.channels]
+            return 0, 0, self.width, self.height
+
+        if self.mode == 'animated':
+            offset = (self.frame_index * 8) % self.width
+            image[:, :, 0] = self.gradient[offset:offset + self.width]
+            image[:, :, 1] = image[:, :, 0]
+            image[:, :, 2] = 0.5
+            if self.channels == 4:
+                image[:, :, 3] = 1.0
+            return 0, 0, self.width, self.height
+
+        # Partial: transparent page with an opaque box under the mouse.
+        box = self._box_at(*mouse)
+        previous_slot_box = self.slot_boxes.get(slot, None)
+        if previous_slot_box is not None:
+            x, y, w, h = previous_slot_box
+            image[y:y + h, x:x + w] = 0.0
+        x, y, w, h = box
+        image[y:y + h, x:x + w] = (0.2, 0.6, 1.0, 1.0)[:self.channels]
+        self.slot_boxes[slot] = box
+
+        dirty = box
+        if self.last_box is not None:
+            lx, ly, lw, lh = self.last_box
+            x0, y0 = min(x, lx), min(y, ly)
+            dirty = (x0, y0, max(x + w, lx + lw) - x0, max(y + h, ly + lh) - y0)
+        self.last_box = box
+        return dirty
+
+
+class MockRenderer:
+    def __init__(self, ring: FrameRing, sock: socket.socket, mode: str, fps: float = FPS, metrics: RendererMetrics = None,
+                 offline: bool = False) -> None:
+        self.ring = ring
+        # Name of the first frame ring: the view id of the other SHMs (shared images), kept when the ring is replaced.
+        self.view_name = ring.name
+        self.hidden = False
+        self.sock = sock
+        self.frames = SyntheticFrames(ring.width, ring.height, ring.channels, mode)
+        self.animated = mode == 'animated' and not offline
+        self.offline = offline
+        self.frame_time_ns = int(1e9 / fps)
+        self.metrics = metrics if metrics is not None else RendererMetrics()
+        self.profiler = RendererProfiler()
+        self.decoder = InputDecoder()
+        self.mouse = (0, 0)
+        # Last input applied: (input_id, sent time, applied time). Echoed in every frame header.
+        self.last_input = (0, 0, 0)
+        self.needs_frame = not offline
+        self.running = True
+        # Shared images block (generation, SharedImages) and the last shared image, in the ring layout.
+        self.shared_images = (-1, None)
+        self.shared_image = None
+
+    def apply(self, record) -> None:
+        signal, input_id, input_time_ns, event_data = record
+        if signal == SOCKET_SIGNAL.KILL:
+            self.running = False
+            return
+        if signal == SOCKET_SIGNAL.PING:
+            self.sock.sendall(encode_signal(SOCKET_SIGNAL.PONG))
+            return
+        if signal in {SOCKET_SIGNAL.PROFILE_START, SOCKET_SIGNAL.PROFILE_STOP}:
+            self.profiler.handle_control(signal, event_data)
+            return
+        if signal == SOCKET_SIGNAL.IMAGE_SHARED:
+            self.image_shared(*event_data)
+            return
+        if signal == SOCKET_SIGNAL.VISIBILITY:
+            self.set_visibility(*event_data)
+            return
+        if input_id == 0:
+            if DEBUG:
+                print("[MOCK] Ignored signal:", signal)
+            return
+        if signal == SOCKET_SIGNAL.RENDER_FRAME:
+            self.render_frame(input_id, input_time_ns, *event_data)
+            return
+        self.metrics.input_received()
+        if signal != SOCKET_SIGNAL.UNICODE:
+            self.mouse = event_data[:2]
+        self.last_input = (input_id, input_time_ns, perf_counter_ns())
+        self.needs_frame = not self.offline
+
+    def render_frame(self, input_id: int, input_time_ns: int, frame: int, _time_us: int) -> None:
+        """ Offline request: exactly one frame, painted as the frame number dictates. """
+        if not self.offline:
+            return
+        self.last_input = (input_id, input_time_ns, perf_counter_ns())
+        # render() counts the frame in.
+        self.frames.frame_index = frame - 1
+        self.frames.last_box = None
+        while self.running and not self.paint():
+            # Every slot holds a prefetched frame: wait for Blender to consume one.
+            sleep(0.001)
+
+    def set_visibility(self, flags: int, ring_name: str) -> None:
+        self.hidden = bool(flags & VISIBILITY_FLAGS.HIDDEN)
+        if flags & VISIBILITY_FLAGS.RELEASE_FRAMES and self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if ring_name:
+            if self.ring is not None:
+                self.ring.close()
+            self.ring = FrameRing.attach(ring_name)
+            # Every slot of the new ring is painted from scratch.
+            self.frames.slot_boxes.clear()
+            self.frames.last_box = None
+        self.needs_frame = not (self.hidden or self.offline)
+
+    def image_shared(self, generation: int, name: str) -> None:
+        current_generation, images = self.shared_images
+        if generation != current_generation:
+            if images is not None:
+                images.close()
+            images = SharedImages.attach(self.view_name, generation)
+            self.shared_images = (generation, images)
+        if images is None:
+            return
+        info, pixels = images.read_array(name)
+        if info is None or self.ring is None:
+            return
+        height, width = min(info.height, self.ring.height), min(info.width, self.ring.width)
+        channels = min(info.channels, self.ring.channels)
+        # Opaque where the shared image has no alpha.
+        image = np.full((height, width, self.ring.channels), 255 if self.ring.dtype == np.uint8 else 1.0, dtype=self.ring.dtype)
+        if pixels.dtype == self.ring.dtype:
+            image[..., :channels] = pixels[:height, :width, :channels]
+        elif pixels.dtype == np.uint8:
+            image[..., :channels] = pixels[:height, :width, :channels] * INV_255
+        else:
+            image[..., :channels] = np.clip(pixels[:height, :width, :channels], 0.0, 1.0) * 255.0 + 0.5
+        self.shared_image = image
+        self.needs_frame = not self.offline
+
+    def paint(self) -> bool:
+        if self.hidden or self.ring is None:
+            self.needs_frame = False
+            return False
+        slot = self.ring.acquire_write()
+        if slot is None:
+            # Blender did not consume the previous frame yet. Retry soon.
+            if not self.offline:
+                self.metrics.frame_dropped()
+            return False
+        paint_start_ns = perf_counter_ns()
+        dirty = self.frames.render(slot, self.ring.pixels(slot), self.mouse)
+        if self.shared_image is not None:
+            height, width = self.shared_image.shape[:2]
+            self.ring.pixels(slot).reshape(self.ring.height, self.ring.width, self.ring.channels)[:height, :width] = self.shared_image
+            x, y, w, h = dirty
+            dirty = (0, 0, max(x + w, width), max(y + h, height))
+        notify_start_ns = perf_counter_ns()
+        seq = self.ring.publish(slot, *self.last_input, paint_start_ns, notify_start_ns, dirty)
+        self.metrics.frame_published(paint_start_ns / 1e9)
+        self.needs_frame = False
+
+        if self.profiler.spans is not None:
+            args = {'seq': seq}
+            self.profiler.span('render', paint_start_ns, notify_start_ns, args)
+            self.profiler.span('notify', notify_start_ns, perf_counter_ns(), args)
+        return True
+
+    def run(self) -> None:
+        next_tick_ns = perf_counter_ns()
+        while self.running:
+            now_ns = perf_counter_ns()
+            if self.animated and not self.hidden:
+                if now_ns >= next_tick_ns:
+                    self.needs_frame = True
+                    next_tick_ns = now_ns + self.frame_time_ns
+                timeout = max(next_tick_ns - now_ns, 0) / 1e9
+            else:
+                timeout = 0.001 if self.needs_frame else 0.1
+
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+            if readable:
+                try:
+                    data = self.sock.recv(RECV_SIZE)
+                except socket.error:
+                    data = b''
+                if not data:
+                    break
+                for record in coalesce_inputs(self.decoder.feed(data)):
+                    self.apply(record)
+
+            if self.needs_frame and self.running:
+                self.paint()
+
+        self.profiler.stop()
+
+
+def parse_url(url: str) -> Tuple[str, float]:
+    """ 'mock://animated?fps=60' -> ('animated', 60.0). Any other (web) url renders 'animated' at FPS. """
+    parts = urlsplit(url)
+    if parts.scheme != 'mock':
+        return 'animated', FPS
+    fps = parse_qs(parts.query).get('fps', [FPS])[0]
+    return parts.netloc or parts.path.strip('/'), float(fps)
+
+
+def main() -> None:
+    if '--' not in sys.argv:
+        print("[MOCK] Error: Expected arguments: -- url (width,height,channels) shm server_port [offline]")
+        sys.exit(1)
+
+    args = sys.argv[sys.argv.index('--') + 1:]
+    url, whc, shm_name, port = args[:4]
+    offline = OFFLINE_ARGUMENT in args[4:]
+    width, height, channels = [int(v) for v in whc.split(',')]
+    if not url.startswith('mock://') and renderer_url(url) is None:
+        # Same urls as the web renderers.
+        print("[MOCK] Error: Invalid url argument", url)
+        sys.exit(1)
+    mode, fps = parse_url(url)
+
+    ring = FrameRing.attach(shm_name)
+    if (ring.width, ring.height, ring.channels) != (width, height, channels):
+        print("[MOCK] Error: Frame SHM size does not match the viewport", ring.width, ring.height, ring.channels)
+        sys.exit(1)
+    metrics = RendererMetrics(shm_name)
+
+    sock = socket.create_connection(('127.0.0.1', int(port)))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    print(f"[MOCK] Connected to port {port}. Rendering '{mode}' {width}x{height}", "offline" if offline else f"at {fps:g} fps")
+    renderer = MockRenderer(ring, sock, mode, fps, metrics, offline)
+    try:
+        renderer.run()
+    finally:
+        sock.close()
+        metrics.close()
+        if renderer.ring is not None:
+            renderer.ring.close()
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+class MockHost:
+    """ Stand-in for the Blender side: owns the server socket and the frame ring,
+        launches a renderer script with the usual arguments and consumes its frames. """
+
+    def __init__(self, width: int, height: int, channels: int = 4, slot_count: int = 1,
+                 url: str = 'mock://partial', script: str = None, python: str = None, offline: bool = False) -> None:
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.slot_count = slot_count
+        self.url = url
+        self.offline = offline
+        self.offline_requests: Optional[OfflineFrameRequests] = None
+        self.script = script or path.abspath(__file__)
+        self.python = python or sys.executable
+        self.ring: FrameRing = None
+        self.server: socket.socket = None
+        self.client: socket.socket = None
+        self.process: subprocess.Popen = None
+        self.shared_images: Optional[SharedImages] = None
+        self.next_input_id = 1
+        # Name of the first frame ring (view id of the shared images), and whether the frame ring is released.
+        self.view_name = ''
+        self.released = False
+
+    def start(self, timeout: float = 10.0) -> 'MockHost':
+        self.ring = FrameRing.create(self.width, self.height, self.channels, self.slot_count)
+        self.view_name = self.ring.name
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        port = self.server.getsockname()[1]
+        self.process = subprocess.Popen([
+            self.python, self.script, '--',
+            self.url, f'{self.width},{self.height},{self.channels}', self.ring.name, str(port),
+            *([OFFLINE_ARGUMENT] if self.offline else [])
+        ])
+        self.server.settimeout(timeout)
+        self.client, _addr = self.server.accept()
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.offline:
+            self.offline_requests = OfflineFrameRequests(self.ring, self.client.sendall)
+        return self
+
+    def stop(self) -> None:
+        if self.client is not None:
+            try:
+                self.client.sendall(encode_signal(SOCKET_SIGNAL.KILL))
+            except socket.error:
+                pass
+            self.client.close()
+            self.client = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        if self.shared_images is not None:
+            self.shared_images.close()
+            self.shared_images.unlink()
+            self.shared_images = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+
+    def __enter__(self) -> 'MockHost':
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def encode_input(self, signal: int, *event_data) -> Tuple[int, bytes]:
+        input_id = self.next_input_id
+        self.next_input_id += 1
+        return input_id, encode_input(signal, input_id, perf_counter_ns(), *event_data)
+
+    def send_input(self, signal: int, *event_data) -> int:
+        input_id, message = self.encode_input(signal, *event_data)
+        self.client.sendall(message)
+        return input_id
+
+    def profile_start(self, prefix: str, flags: int = PROFILE_FLAGS.ALL) -> None:
+        self.client.sendall(encode_control(SOCKET_SIGNAL.PROFILE_START, flags, prefix))
+
+    def profile_stop(self) -> None:
+        self.client.sendall(encode_signal(SOCKET_SIGNAL.PROFILE_STOP))
+
+    def share_image(self, name: str, pixels: np.ndarray, flip_y: bool = False) -> int:
+        """ Publishes an image for the page (see bws_images) and notifies the renderer. Returns its version. """
+        if self.shared_images is None:
+            self.shared_images = SharedImages.create(self.view_name, capacity=max(pixels.nbytes, 1 << 20))
+        version = self.shared_images.publish(name, pixels, flip_y)
+        if version is None:
+            raise MemoryError(f"No room left for shared image '{name}'")
+        self.client.sendall(encode_control(SOCKET_SIGNAL.IMAGE_SHARED, 0, name))
+        return version
+
+    def set_visible(self, visible: bool, release: bool = False) -> None:
+        """ Hides or shows the view. 'release' frees the frame ring while hidden, a new one is created on show. """
+        if not visible:
+            flags = VISIBILITY_FLAGS.HIDDEN
+            if release and not self.released:
+                flags |= VISIBILITY_FLAGS.RELEASE_FRAMES
+                self.released = True
+                self.ring.close()
+                self.ring.unlink()
+                self.ring = None
+            self.client.sendall(encode_control(SOCKET_SIGNAL.VISIBILITY, flags, ''))
+            return
+        ring_name = ''
+        if self.released:
+            self.released = False
+            self.ring = FrameRing.create(self.width, self.height, self.channels, self.slot_count)
+            ring_name = self.ring.name
+        self.client.sendall(encode_control(SOCKET_SIGNAL.VISIBILITY, 0, ring_name))
+
+    def poll_frame(self) -> Optional[FrameHeader]:
+        """ Consumes the newest published frame, if any. """
+        if self.ring is None:
+            return None
+        slot = self.ring.acquire_read()
+        if slot is None:
+            return None
+        header = self.ring.read_header(slot)
+        self.ring.release(slot)
+        return header
+
+    def render_frame(self, frame: int, fps: int = 24, prefetch: int = 0, timeout: float = 10.0) -> Tuple[FrameHeader, np.ndarray]:
+        """ Offline host: renders a frame (and requests the next 'prefetch' ones). Returns its header and a pixel copy. """
+        requests = self.offline_requests
+        requests.request(frame, frame_time_us(frame, 1, fps))
+        for next_frame in range(frame + 1, frame + 1 + prefetch):
+            requests.request(next_frame, frame_time_us(next_frame, 1, fps))
+        slot = requests.acquire(frame, timeout)
+        header = self.ring.read_header(slot)
+        pixels = self.ring.pixels(slot).copy()
+        self.ring.release(slot)
+        return header, pixels
+
+    def wait_frame(self, input_id: int = 0, timeout: float = 2.0) -> FrameHeader:
+        """ Consumes frames until one reflects 'input_id' (or any frame if 0). """
+        deadline = perf_counter_ns() + int(timeout * 1e9)
+        while perf_counter_ns() < deadline:
+            header = self.poll_frame()
+            if header is not None and header.input_id >= input_id:
+                return header
+            sleep(0)
+        raise TimeoutError(f"No frame reflecting input {input_id} after {timeout} seconds")
+
+
+if __name__ == '__main__':
+    main()
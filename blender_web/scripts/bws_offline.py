@@ -0,0 +1,181 @@
+""" Deterministic offline rendering: one page frame per Blender frame, at render resolution.
+
+    Blender sends a RENDER_FRAME request per animation frame (frame number + page virtual time).
+    A renderer launched with the 'offline' argument:
+
+        - Freezes the page clock: VIRTUAL_TIME_JS replaces performance.now, Date, timers and
+          requestAnimationFrame, and pauses/seeks the CSS and Web animations.
+        - Advances the page to the requested virtual time, runs the due timers and frame
+          callbacks once, then paints exactly one frame and publishes it with the input id
+          of the request (no unchanged frame skipping).
+        - Handles the requests in order. Going back in time reloads the page first, so the
+          same sequence of frames always produces the same pixels.
+
+    OfflineFrameRequests is the Blender side: it stamps the requests and matches the published
+    slots to them, so the next frame can be prefetched while Blender renders the current one.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon.
+"""
+
+from time import perf_counter_ns, sleep
+from typing import Callable, Dict
+
+try:
+    from bws_frames import FrameRing
+    from bws_protocol import SOCKET_SIGNAL, encode_input
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import FrameRing
+    from .bws_protocol import SOCKET_SIGNAL, encode_input
+
+
+OFFLINE_ARGUMENT = 'offline'
+FRAME_TIMEOUT = 30.0
+POLL_INTERVAL = 0.001
+
+# Name of the function the page calls once the frame of a request is laid out (JS binding).
+RENDER_READY_BINDING = 'bwsRenderReady'
+
+# Injected before the page scripts run. Virtual time starts at 0 (the scene start frame) and only
+# moves with __bwsVirtualTime.advance(time_ms, request_id).
+VIRTUAL_TIME_JS = """
+(function () {
+    if (window.__bwsVirtualTime) { return; }
+    var RealDate = Date;
+    var realRequestAnimationFrame = window.requestAnimationFrame.bind(window);
+    var epoch = RealDate.now();
+    var now = 0;
+    var nextId = 1;
+    var nextOrder = 1;
+    var timers = new Map();
+    var frameCallbacks = new Map();
+    var animationStarts = new WeakMap();
+
+    function call(callback, args) {
+        try {
+            if (typeof callback === 'function') { callback.apply(window, args); }
+            else { (0, eval)(String(callback)); }
+        } catch (error) { console.error(error); }
+    }
+
+    function addTimer(callback, delay, args, repeat) {
+        var id = nextId++;
+        delay = Math.max(Number(delay) || 0, 0);
+        timers.set(id, {callback: callback, args: args, at: now + delay, order: nextOrder++, interval: repeat ? Math.max(delay, 1) : 0});
+        return id;
+    }
+
+    function runTimers(target) {
+        for (;;) {
+            var dueId = 0, due = null;
+            timers.forEach(function (timer, id) {
+                if (timer.at <= target && (due === null || timer.at < due.at || (timer.at === due.at && timer.order < due.order))) {
+                    due = timer; dueId = id;
+                }
+            });
+            if (due === null) { break; }
+            now = due.at;
+            if (due.interval) { due.at += due.interval; due.order = nextOrder++; }
+            else { timers.delete(dueId); }
+            call(due.callback, due.args);
+        }
+        now = target;
+    }
+
+    function seekAnimations() {
+        if (!document.getAnimations) { return; }
+        document.getAnimations().forEach(function (animation) {
+            if (!animationStarts.has(animation)) { animationStarts.set(animation, now); }
+            animation.pause();
+            animation.currentTime = now - animationStarts.get(animation);
+        });
+    }
+
+    class VirtualDate extends RealDate {
+        constructor(...args) {
+            if (args.length) { super(...args); } else { super(epoch + now); }
+        }
+        static now() { return epoch + now; }
+    }
+    window.Date = VirtualDate;
+    performance.now = function () { return now; };
+    window.setTimeout = function (callback, delay) { return addTimer(callback, delay, Array.prototype.slice.call(arguments, 2), false); };
+    window.setInterval = function (callback, delay) { return addTimer(callback, delay, Array.prototype.slice.call(arguments, 2), true); };
+    window.clearTimeout = window.clearInterval = function (id) { timers.delete(id); };
+    window.requestAnimationFrame = function (callback) { var id = nextId++; frameCallbacks.set(id, callback); return id; };
+    window.cancelAnimationFrame = function (id) { frameCallbacks.delete(id); };
+
+    window.__bwsVirtualTime = {
+        now: function () { return now; },
+        advance: function (time, requestId) {
+            if (time > now) { runTimers(time); }
+            var callbacks = frameCallbacks;
+            frameCallbacks = new Map();
+            callbacks.forEach(function (callback) { call(callback, [now]); });
+            seekAnimations();
+            // Animations started by this frame's callbacks are seeked before the first real frame,
+            // the second one makes sure the compositor painted the result.
+            realRequestAnimationFrame(function () {
+                seekAnimations();
+                realRequestAnimationFrame(function () { window.%s(requestId); });
+            });
+        }
+    };
+})();
+""" % RENDER_READY_BINDING
+
+
+def frame_time_us(frame: int, frame_start: int, fps: int, fps_base: float = 1.0) -> int:
+    """ Page virtual time of a Blender frame, in microseconds since the start frame (never negative). """
+    return max(round((frame - frame_start) * fps_base * 1e6 / fps), 0)
+
+
+def advance_js(time_us: int, input_id: int) -> str:
+    return f"window.__bwsVirtualTime.advance({time_us / 1000.0!r}, {input_id});"
+
+
+class OfflineFrameRequests:
+    """ Blender side. 'send' writes a message to the renderer socket. Requests are served in order,
+        so a READY slot of an older request than the one awaited is stale and can be freed. """
+
+    def __init__(self, ring: FrameRing, send: Callable[[bytes], None]) -> None:
+        self.ring = ring
+        self.send = send
+        self.next_input_id = 1
+        # Frame -> input id of the requests in flight.
+        self.requested: Dict[int, int] = {}
+
+    def request(self, frame: int, time_us: int) -> int:
+        """ Asks the renderer for a frame, unless it is already in flight. Returns the request input id. """
+        input_id = self.requested.get(frame, None)
+        if input_id is not None:
+            return input_id
+        input_id = self.next_input_id
+        self.next_input_id += 1
+        self.send(encode_input(SOCKET_SIGNAL.RENDER_FRAME, input_id, perf_counter_ns(), frame, time_us))
+        self.requested[frame] = input_id
+        return input_id
+
+    def is_requested(self, frame: int) -> bool:
+        return frame in self.requested
+
+    def acquire(self, frame: int, timeout: float = FRAME_TIMEOUT) -> int:
+        """ Blocks until the frame is published. Returns its slot (READING, release it with ring.release()).
+            Requests of other frames made before this one are forgotten: their frames are stale. """
+        input_id = self.requested[frame]
+        deadline = perf_counter_ns() + int(timeout * 1e9)
+        while True:
+            slot = self.ring.acquire_input(input_id)
+            if slot is not None:
+                break
+            if perf_counter_ns() > deadline:
+                del self.requested[frame]
+                raise TimeoutError(f"Frame {frame} was not rendered after {timeout} seconds")
+            sleep(POLL_INTERVAL)
+        self.requested = {f: i for f, i in self.requested.items() if i > input_id}
+        return slot
+
+    def render(self, frame: int, time_us: int, timeout: float = FRAME_TIMEOUT) -> int:
+        """ request() + acquire(). """
+        self.request(frame, time_us)
+        return self.acquire(frame, timeout)
@@ -0,0 +1,231 @@
+""" Frame post-processing off the renderer UI thread.
+
+    The paint callback only claims a free frame slot and snapshots the raw paint buffer into
+    the staging buffer of that slot (a single memmove). The post-processing stages then run on
+    a small thread pool, split into row bands (numpy releases the GIL inside the ufuncs):
+
+        - convert: BGRA/RGBA 8-bit -> slot pixels (RGBA, float32 normalized or uint8).
+        - hash: tile hashes of the band (bws_frames.TileHasher), for unchanged frame skipping.
+
+    A frame is published once all its bands are done, always in paint order, so the
+    consumer never sees an older frame after a newer one.
+
+    With a crop (set_crop(), zoomable overlays, see bws_mip) only that part of the paint is
+    snapshotted, converted and hashed, and it is published as a smaller frame.
+
+    NOTE: Shared by the renderer scripts (Python 3.9).
+"""
+
+import ctypes
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+try:
+    from bws_frames import FrameRing, TileHasher, INV_255
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import FrameRing, TileHasher, INV_255
+
+
+PIPELINE_WORKERS = 4
+BAND_ROWS = 64
+
+# Source channel of each RGBA output channel.
+SWIZZLE_BGRA = (2, 1, 0, 3)
+SWIZZLE_RGBA = (0, 1, 2, 3)
+
+
+class FrameJob:
+    __slots__ = (
+        'slot', 'header', 'staging', 'hashes',
+        'snapshot_end_ns', 'process_end_ns', 'remaining', 'failed',
+    )
+
+    def __init__(self, slot: int, staging: np.ndarray, header: dict, band_count: int, hashes: Optional[np.ndarray]) -> None:
+        self.slot = slot
+        self.staging = staging
+        # Keyword arguments for FrameRing.publish() (input ids and timestamps).
+        self.header = header
+        self.hashes = hashes
+        self.snapshot_end_ns = perf_counter_ns()
+        self.process_end_ns = 0
+        self.remaining = band_count
+        self.failed = False
+
+
+class FramePipeline:
+    """ Producer side. snapshot() + submit() from the paint callback, everything else runs in the pool. """
+
+    def __init__(self, ring: FrameRing, workers: int = PIPELINE_WORKERS, band_rows: int = BAND_ROWS,
+                 bgra: bool = True, skip_unchanged: bool = True, metrics=None, profiler=None) -> None:
+        if ring.channels != 4:
+            raise ValueError(f"Frame pipeline needs an RGBA frame ring (got {ring.channels} channels)")
+        self.ring = ring
+        self.swizzle = SWIZZLE_BGRA if bgra else SWIZZLE_RGBA
+        self.normalize = ring.dtype == np.float32
+        self.band_rows = band_rows
+        self.skip_unchanged = skip_unchanged
+        # 8-bit snapshot of the last paint of each slot.
+        self._staging = [np.empty(ring.width * ring.height * 4, dtype=np.uint8) for _ in range(ring.slot_count)]
+        # Paint size and the part of it that is kept, None for whole paints of the ring size.
+        self.source_size: Optional[Tuple[int, int]] = None
+        self.crop: Optional[Tuple[int, int, int, int]] = None
+        self._set_frame_size(ring.width, ring.height)
+        self.metrics = metrics
+        self.profiler = profiler
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bws_frame_pipeline')
+        self._jobs: Deque[FrameJob] = deque()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def _set_frame_size(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 4
+        self.staging = [staging[:self.frame_bytes].reshape(height, width, 4) for staging in self._staging]
+        self.hasher = TileHasher(width, height, 4, np.uint8, self.band_rows) if self.skip_unchanged else None
+        self.bands = [(y, min(y + self.band_rows, height)) for y in range(0, height, self.band_rows)]
+
+    def set_crop(self, source_size: Optional[Tuple[int, int]], crop: Optional[Tuple[int, int, int, int]]) -> None:
+        """ Next paints are 'source_size' (width, height) and only 'crop' (x, y, width, height) of them is kept.
+            None for whole paints of the ring size. Waits for the frames in flight. """
+        ring = self.ring
+        if crop is None:
+            source_size = None
+        else:
+            x, y, width, height = crop
+            if x < 0 or y < 0 or x + width > source_size[0] or y + height > source_size[1] or \
+                    width > ring.width or height > ring.height:
+                raise ValueError(f"Crop {crop} does not fit the paint {source_size} or the frame ring")
+            if source_size == (ring.width, ring.height) and crop == (0, 0, ring.width, ring.height):
+                source_size = crop = None
+        if (source_size, crop) == (self.source_size, self.crop):
+            return
+        self.wait()
+        self.source_size = source_size
+        self.crop = crop
+        if crop is None:
+            self._set_frame_size(ring.width, ring.height)
+        else:
+            self._set_frame_size(crop[2], crop[3])
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def snapshot(self, slot: int, source) -> np.ndarray:
+        """ Copies a paint buffer into the staging buffer of a WRITING slot.
+            'source' is a raw pointer (int, e.g. cef PaintBuffer.GetIntPointer()) or any buffer. """
+        staging = self.staging[slot]
+        crop = self.crop
+        if crop is None:
+            if isinstance(source, int):
+                ctypes.memmove(staging.ctypes.data, source, self.frame_bytes)
+            else:
+                staging.reshape(-1)[:] = np.frombuffer(source, dtype=np.uint8, count=self.frame_bytes)
+            return staging
+        source_width, source_height = self.source_size
+        source_bytes = source_width * source_height * 4
+        if isinstance(source, int):
+            source = (ctypes.c_uint8 * source_bytes).from_address(source)
+        x, y, width, height = crop
+        paint = np.frombuffer(source, dtype=np.uint8, count=source_bytes).reshape(source_height, source_width, 4)
+        np.copyto(staging, paint[y:y + height, x:x + width])
+        return staging
+
+    def submit(self, slot: int, **header) -> FrameJob:
+        """ Queues the post-processing of a snapshot. 'header' is forwarded to FrameRing.publish(). """
+        hashes = None
+        if self.hasher is not None:
+            hashes = np.empty((self.hasher.tile_rows, len(self.hasher.col_starts)), dtype=np.uint64)
+        job = FrameJob(slot, self.staging[slot], header, len(self.bands), hashes)
+        with self._lock:
+            self._jobs.append(job)
+        for row_start, row_end in self.bands:
+            self.executor.submit(self._process_band, job, row_start, row_end)
+        return job
+
+    def process(self, slot: int, source, **header) -> FrameJob:
+        """ snapshot() + submit(). """
+        self.snapshot(slot, source)
+        return self.submit(slot, **header)
+
+    def _process_band(self, job: FrameJob, row_start: int, row_end: int) -> None:
+        try:
+            src = job.staging[row_start:row_end]
+            dst = self.ring.frame_pixels(job.slot, (self.width, self.height)).reshape(self.height, self.width, 4)[row_start:row_end]
+            if self.swizzle == SWIZZLE_RGBA:
+                if self.normalize:
+                    np.multiply(src, INV_255, out=dst)
+                else:
+                    np.copyto(dst, src)
+            else:
+                # Strided per-channel passes: no temporaries and no Python work per pixel.
+                self._swizzle(src, dst)
+            if job.hashes is not None:
+                tile_size = self.hasher.tile_size
+                job.hashes[row_start // tile_size:(row_end + tile_size - 1) // tile_size] = \
+                    self.hasher.hash_tiles(job.staging, row_start, row_end)
+        except Exception as e:
+            print("[PIPELINE] Error processing frame band", row_start, row_end, e)
+            job.failed = True
+        finally:
+            self._band_done(job)
+
+    def _swizzle(self, src: np.ndarray, dst: np.ndarray) -> None:
+        for dst_channel, src_channel in enumerate(self.swizzle):
+            if self.normalize:
+                np.multiply(src[..., src_channel], INV_255, out=dst[..., dst_channel])
+            else:
+                np.copyto(dst[..., dst_channel], src[..., src_channel])
+
+    def _band_done(self, job: FrameJob) -> None:
+        with self._lock:
+            job.remaining -= 1
+            if job.remaining:
+                return
+            job.process_end_ns = perf_counter_ns()
+            # Publish in paint order.
+            while self._jobs and self._jobs[0].remaining == 0:
+                self._finish(self._jobs.popleft())
+            if not self._jobs:
+                self._idle.notify_all()
+
+    def _finish(self, job: FrameJob) -> None:
+        ring = self.ring
+        if job.failed:
+            ring.abort_write(job.slot)
+            return
+        dirty = self.hasher.diff(job.hashes) if self.hasher is not None else None
+        if self.hasher is not None and dirty is None:
+            ring.abort_write(job.slot)
+            if self.metrics is not None:
+                self.metrics.frame_unchanged()
+            return
+
+        publish_ns = perf_counter_ns()
+        paint_start_ns = job.header.get('paint_start_ns', job.snapshot_end_ns)
+        size = None if self.crop is None else (self.width, self.height)
+        seq = ring.publish(job.slot, publish_ns=publish_ns, dirty=dirty, size=size, **job.header)
+        if self.metrics is not None:
+            self.metrics.frame_published(paint_start_ns / 1e9)
+        if self.profiler is not None and self.profiler.spans is not None:
+            args = {'seq': seq, 'bands': len(self.bands)}
+            self.profiler.span('snapshot', paint_start_ns, job.snapshot_end_ns, args)
+            self.profiler.span('process', job.snapshot_end_ns, job.process_end_ns, args)
+            self.profiler.span('publish', job.process_end_ns, perf_counter_ns(), args)
+
+    def wait(self, timeout: float = None) -> bool:
+        """ Blocks until every submitted frame is published or dropped. """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._jobs, timeout)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.staging = []
+        self._staging = []
@@ -0,0 +1,200 @@
+""" Renderer-side profiling, toggled from Blender with the PROFILE_START / PROFILE_STOP control signals.
+
+    - Sampling profiler: a daemon thread samples the stacks of every other thread
+      (sys._current_frames) and aggregates them as collapsed stacks (flamegraph.pl, speedscope).
+    - tracemalloc: top allocation sites and current/peak traced memory.
+    - Frame spans: per-frame stage spans (copy, convert, notify...) as Chrome trace events,
+      merged by Blender with its own trace (bws_trace).
+
+    Files written on stop, for an output prefix given by Blender:
+        <prefix>.collapsed.txt      Sampled stacks.
+        <prefix>.spans.json         Chrome trace events of the frame spans.
+        <prefix>.summary.txt        Human readable summary. Written last: Blender waits for it.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from time import perf_counter_ns, sleep
+from typing import List, Optional, Tuple
+
+try:
+    from bws_protocol import SOCKET_SIGNAL, PROFILE_FLAGS
+    from bws_trace import TraceBuffer, TID_MAIN
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_protocol import SOCKET_SIGNAL, PROFILE_FLAGS
+    from .bws_trace import TraceBuffer, TID_MAIN
+
+
+SAMPLING_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 16
+SUMMARY_TOP = 25
+
+SUMMARY_SUFFIX = '.summary.txt'
+COLLAPSED_SUFFIX = '.collapsed.txt'
+SPANS_SUFFIX = '.spans.json'
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = SAMPLING_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.sample_count = 0
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self) -> None:
+        self.stacks.clear()
+        self.sample_count = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='bws_sampling_profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        thread_names = {}
+        while self._running:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in thread_names:
+                    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+            sleep(self.interval)
+
+    def write_collapsed(self, filepath: str) -> None:
+        with open(filepath, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(';'.join(stack) + f' {count}\n')
+
+    def top_functions(self, top: int = SUMMARY_TOP) -> List[Tuple[str, int, int]]:
+        """ [(function, self samples, total samples)] sorted by self samples. """
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for function in set(stack[1:]):
+                total_counts[function] += count
+        return [(function, count, total_counts[function]) for function, count in self_counts.most_common(top)]
+
+
+class RendererProfiler:
+    """ One per renderer process. Control messages call start()/stop(); the paint path calls span(). """
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.prefix = ''
+        self.flags = 0
+        self.start_ns = 0
+        self.sampler: Optional[SamplingProfiler] = None
+        self.spans: Optional[TraceBuffer] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.flags != 0
+
+    def handle_control(self, signal: int, event_data: tuple) -> None:
+        """ Dispatches PROFILE_START (flags, output prefix) and PROFILE_STOP. """
+        if signal == SOCKET_SIGNAL.PROFILE_START:
+            self.start(*event_data)
+        elif signal == SOCKET_SIGNAL.PROFILE_STOP:
+            self.stop()
+
+    def start(self, flags: int, prefix: str) -> None:
+        if self.is_running:
+            self.stop()
+        self.flags = flags or PROFILE_FLAGS.ALL
+        self.prefix = prefix
+        self.start_ns = perf_counter_ns()
+        if self.flags & PROFILE_FLAGS.SAMPLING:
+            self.sampler = SamplingProfiler()
+            self.sampler.start()
+        if self.flags & PROFILE_FLAGS.TRACEMALLOC:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if self.flags & PROFILE_FLAGS.FRAME_SPANS:
+            self.spans = TraceBuffer()
+        print(f"[PROFILER] Started (flags={self.flags}) -> {prefix}")
+
+    def span(self, name: str, start_ns: int, end_ns: int, args: dict = None) -> None:
+        """ Records a frame stage. Cheap no-op when frame spans are disabled. """
+        if self.spans is not None:
+            self.spans.complete(name, 'renderer', self.pid, TID_MAIN, start_ns, end_ns, args)
+
+    def stop(self) -> Optional[str]:
+        """ Stops everything and writes the profile files. Returns the summary filepath. """
+        if not self.is_running:
+            return None
+        stop_ns = perf_counter_ns()
+        lines = [
+            f"Renderer profile (pid {self.pid})",
+            f"Duration: {(stop_ns - self.start_ns) / 1e6:.1f} ms",
+            "",
+        ]
+
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.write_collapsed(self.prefix + COLLAPSED_SUFFIX)
+            lines.append(f"Sampling profiler: {self.sampler.sample_count} samples every {self.sampler.interval * 1000:g} ms")
+            lines.append(f"  Collapsed stacks: {self.prefix + COLLAPSED_SUFFIX}")
+            lines.append(f"  {'self':>8} {'total':>8}  function")
+            for function, self_count, total_count in self.sampler.top_functions():
+                lines.append(f"  {self_count:>8} {total_count:>8}  {function}")
+            lines.append("")
+            self.sampler = None
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            lines.append(f"tracemalloc: current {current / 1024:.1f} KiB | peak {peak / 1024:.1f} KiB")
+            for stat in snapshot.statistics('lineno')[:SUMMARY_TOP]:
+                lines.append(f"  {stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {stat.traceback[0]}")
+            lines.append("")
+
+        spans, self.spans = self.spans, None
+        if spans is not None:
+            with open(self.prefix + SPANS_SUFFIX, 'w') as f:
+                json.dump(spans.to_dict(), f)
+            lines.append(f"Frame spans: {len(spans.events)} events -> {self.prefix + SPANS_SUFFIX}")
+
+        # Write the summary last and atomically: it signals Blender that the profile is complete.
+        summary_path = self.prefix + SUMMARY_SUFFIX
+        with open(summary_path + '.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(summary_path + '.tmp', summary_path)
+        print(f"[PROFILER] Stopped -> {summary_path}")
+        self.flags = 0
+        return summary_path
+
+
+def load_profile(prefix: str) -> Tuple[Optional[str], List[dict]]:
+    """ Blender side. Returns (summary text or None if not written yet, frame span events). """
+    summary_path = prefix + SUMMARY_SUFFIX
+    if not os.path.exists(summary_path):
+        return None, []
+    with open(summary_path) as f:
+        summary = f.read()
+    events: List[dict] = []
+    if os.path.exists(prefix + SPANS_SUFFIX):
+        with open(prefix + SPANS_SUFFIX) as f:
+            events = json.load(f)['traceEvents']
+    return summary, events
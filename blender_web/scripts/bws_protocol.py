@@ -0,0 +1,252 @@
+""" Socket protocol between Blender and the renderer processes.
+
+    Every message starts with a 4-byte big-endian signal. Input events sent by
+    Blender (signal >= 8) are followed by an INPUT_HEADER (monotonic input id and
+    send time) and the event payload described in EVENT_DATA_BYTES.
+
+    Times are `time.perf_counter_ns()` values: it is backed by a system-wide
+    monotonic clock (CLOCK_MONOTONIC, QueryPerformanceCounter, mach_absolute_time)
+    so timestamps taken in both processes can be compared.
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+import struct
+from typing import List, Tuple
+
+
+class SOCKET_SIGNAL:
+    PING = 0
+    PONG = 1
+    BUFFER_UPDATE = 2
+    KILL = 3
+    PROFILE_START = 4
+    PROFILE_STOP = 5
+    IMAGE_SHARED = 6
+    VISIBILITY = 7
+
+    MOUSE_MOVE = 8
+    MOUSE_PRESS = 9
+    MOUSE_RELEASE = 10
+    MOUSE_DRAG_START = 11
+    MOUSE_DRAG_END = 12
+
+    SCROLL_UP = 16
+    SCROLL_DOWN = 17
+
+    UNICODE = 24
+
+    # UI Events
+    BUTTON_CLICK = 32
+    INPUT_CHANGE = 33
+
+    # Offline rendering
+    RENDER_FRAME = 40
+
+    # Zoomable overlays (see bws_mip)
+    VIEWPORT = 48
+
+
+SIGNAL_NAMES = {value: name for name, value in vars(SOCKET_SIGNAL).items() if name.isupper()}
+
+
+class MOUSE_BUTTON:
+    LEFT = 0
+    MIDDLE = 1
+    RIGHT = 2
+
+
+class PROFILE_FLAGS:
+    SAMPLING = 1 << 0
+    TRACEMALLOC = 1 << 1
+    FRAME_SPANS = 1 << 2
+    ALL = SAMPLING | TRACEMALLOC | FRAME_SPANS
+
+
+class VISIBILITY_FLAGS:
+    # The view is not displayed: the browser stops painting.
+    HIDDEN = 1 << 0
+    # Blender released the frame ring of the hidden view: detach from it, a new one comes with the next VISIBILITY.
+    RELEASE_FRAMES = 1 << 1
+
+
+class KeyEventFlags:
+    EVENTFLAG_NONE = 0
+    EVENTFLAG_CAPS_LOCK_ON = 1 << 0
+    EVENTFLAG_SHIFT_DOWN = 1 << 1
+    EVENTFLAG_CONTROL_DOWN = 1 << 2
+    EVENTFLAG_ALT_DOWN = 1 << 3
+    EVENTFLAG_LEFT_MOUSE_BUTTON = 1 << 4
+    EVENTFLAG_MIDDLE_MOUSE_BUTTON = 1 << 5
+    EVENTFLAG_RIGHT_MOUSE_BUTTON = 1 << 6
+    # Mac OS-X command key.
+    EVENTFLAG_COMMAND_DOWN = 1 << 7
+    EVENTFLAG_NUM_LOCK_ON = 1 << 8
+    EVENTFLAG_IS_KEY_PAD = 1 << 9
+    EVENTFLAG_IS_LEFT = 1 << 10
+    EVENTFLAG_IS_RIGHT = 1 << 11
+
+
+EVENT_DATA_BYTES = {
+    SOCKET_SIGNAL.MOUSE_MOVE        : 'II',     # (X, Y)
+    SOCKET_SIGNAL.MOUSE_PRESS       : 'III',    # (X, Y, MOUSE_BUTTON)
+    SOCKET_SIGNAL.MOUSE_RELEASE     : 'III',    # (X, Y, MOUSE_BUTTON)
+    SOCKET_SIGNAL.MOUSE_DRAG_START  : 'II',     # (X, Y)
+    SOCKET_SIGNAL.MOUSE_DRAG_END    : 'II',     # (X, Y)
+    SOCKET_SIGNAL.SCROLL_UP         : 'II',     # (X, Y)
+    SOCKET_SIGNAL.SCROLL_DOWN       : 'II',     # (X, Y)
+    SOCKET_SIGNAL.UNICODE           : 'II',     # (UNICODE CODE, KeyEventFlags)
+    SOCKET_SIGNAL.BUTTON_CLICK      : 'I',      # (button_id length, button_id string)
+    SOCKET_SIGNAL.INPUT_CHANGE      : 'II',     # (input_id length, input_id string, type_id (INPUT_TYPE_ID) of value, value (int, float, str, bool...))
+    SOCKET_SIGNAL.RENDER_FRAME      : 'iQ',     # (Blender frame, page virtual time in microseconds)
+    SOCKET_SIGNAL.VIEWPORT          : 'IIIII',  # (mip level, X, Y, WIDTH, HEIGHT) of the page part to paint, see bws_mip.Viewport
+}
+
+# Input events that Blender sends to the renderer. Only these carry an INPUT_HEADER.
+# RENDER_FRAME requests are stamped too: the frame painted for one echoes its input id (see bws_offline).
+# So are VIEWPORT requests: frames with an input id >= the request's one are painted with that viewport.
+INPUT_SIGNALS = frozenset({
+    SOCKET_SIGNAL.MOUSE_MOVE,
+    SOCKET_SIGNAL.MOUSE_PRESS,
+    SOCKET_SIGNAL.MOUSE_RELEASE,
+    SOCKET_SIGNAL.MOUSE_DRAG_START,
+    SOCKET_SIGNAL.MOUSE_DRAG_END,
+    SOCKET_SIGNAL.SCROLL_UP,
+    SOCKET_SIGNAL.SCROLL_DOWN,
+    SOCKET_SIGNAL.UNICODE,
+    SOCKET_SIGNAL.RENDER_FRAME,
+    SOCKET_SIGNAL.VIEWPORT,
+})
+
+# Control messages with a text argument: signal + CONTROL_HEADER + utf-8 text.
+CONTROL_SIGNALS = frozenset({
+    SOCKET_SIGNAL.PROFILE_START,    # (PROFILE_FLAGS, output path prefix)
+    SOCKET_SIGNAL.IMAGE_SHARED,     # (shared images SHM generation, image name), see bws_images
+    SOCKET_SIGNAL.VISIBILITY,       # (VISIBILITY_FLAGS, name of the new frame ring SHM or '')
+})
+
+SIGNAL = struct.Struct('!I')
+INPUT_HEADER = struct.Struct('!QQ')  # (input_id, send time in ns)
+CONTROL_HEADER = struct.Struct('!II')  # (flags, text length)
+
+# Pre-compiled payload structs, indexed by signal.
+EVENT_DATA_STRUCTS = {signal: struct.Struct('!' + fmt) for signal, fmt in EVENT_DATA_BYTES.items()}
+# Whole input record (signal + header + payload) structs, indexed by signal.
+INPUT_RECORD_STRUCTS = {
+    signal: struct.Struct('!IQQ' + EVENT_DATA_BYTES[signal])
+    for signal in INPUT_SIGNALS
+}
+
+
+def encode_signal(signal: int) -> bytes:
+    return SIGNAL.pack(signal)
+
+
+def encode_input(signal: int, input_id: int, time_ns: int, *event_data) -> bytes:
+    """ Encodes a full input record: signal + INPUT_HEADER + payload, in a single buffer. """
+    return INPUT_RECORD_STRUCTS[signal].pack(signal, input_id, time_ns, *event_data)
+
+
+def encode_control(signal: int, flags: int, text: str) -> bytes:
+    data = text.encode('utf-8')
+    return SIGNAL.pack(signal) + CONTROL_HEADER.pack(flags, len(data)) + data
+
+
+def recv_exact(sock, size: int) -> bytes:
+    """ Blocking read of exactly 'size' bytes. Returns b'' if the connection was closed. """
+    data = sock.recv(size)
+    if not data or len(data) == size:
+        return data
+    chunks = [data]
+    remaining = size - len(data)
+    while remaining > 0:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            return b''
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_input(sock, signal: int) -> Tuple[int, int, tuple]:
+    """ Reads the rest of an input record after its signal. Returns (input_id, time_ns, event_data). """
+    payload = EVENT_DATA_STRUCTS[signal]
+    raw = recv_exact(sock, INPUT_HEADER.size + payload.size)
+    if not raw:
+        raise ConnectionError("Connection closed while reading an input record")
+    input_id, time_ns = INPUT_HEADER.unpack_from(raw, 0)
+    return input_id, time_ns, payload.unpack_from(raw, INPUT_HEADER.size)
+
+
+def recv_control(sock) -> Tuple[int, str]:
+    """ Reads the rest of a control record after its signal. Returns (flags, text). """
+    raw = recv_exact(sock, CONTROL_HEADER.size)
+    if not raw:
+        raise ConnectionError("Connection closed while reading a control record")
+    flags, length = CONTROL_HEADER.unpack(raw)
+    data = recv_exact(sock, length) if length else b''
+    if length and not data:
+        raise ConnectionError("Connection closed while reading a control record")
+    return flags, data.decode('utf-8')
+
+
+def decode_input_records(data) -> Tuple[List[Tuple[int, int, int, tuple]], int]:
+    """ Decodes a buffer of consecutive records.
+        Returns ([(signal, input_id, time_ns, event_data), ...], consumed bytes).
+        Signals without payload (KILL, PING...) are returned as (signal, 0, 0, ()),
+        control records as (signal, 0, 0, (flags, text)).
+        A trailing incomplete record is not consumed. """
+    records = []
+    offset = 0
+    size = len(data)
+    signal_size = SIGNAL.size
+    while offset + signal_size <= size:
+        signal = SIGNAL.unpack_from(data, offset)[0]
+        record = INPUT_RECORD_STRUCTS.get(signal, None)
+        if record is None and signal in CONTROL_SIGNALS:
+            text_start = offset + signal_size + CONTROL_HEADER.size
+            if text_start > size:
+                break
+            flags, length = CONTROL_HEADER.unpack_from(data, offset + signal_size)
+            if text_start + length > size:
+                break
+            records.append((signal, 0, 0, (flags, bytes(data[text_start:text_start + length]).decode('utf-8'))))
+            offset = text_start + length
+            continue
+        if record is None:
+            records.append((signal, 0, 0, ()))
+            offset += signal_size
+            continue
+        if offset + record.size > size:
+            break
+        values = record.unpack_from(data, offset)
+        records.append((signal, values[1], values[2], values[3:]))
+        offset += record.size
+    return records, offset
+
+
+class InputDecoder:
+    """ Incremental decoder for a non-blocking socket: feed() whatever recv() returned. """
+
+    def __init__(self) -> None:
+        self._pending = b''
+
+    def feed(self, data: bytes) -> List[Tuple[int, int, int, tuple]]:
+        if self._pending:
+            data = self._pending + data
+        records, consumed = decode_input_records(data)
+        self._pending = data[consumed:]
+        return records
+
+
+def coalesce_inputs(records: List[Tuple[int, int, int, tuple]]) -> List[Tuple[int, int, int, tuple]]:
+    """ Collapses runs of consecutive MOUSE_MOVE records into the last one of the run.
+        The kept record has the highest input id of the run, so the latency of the
+        collapsed inputs is still resolved when its frame is drawn. """
+    coalesced = []
+    for record in records:
+        if coalesced and record[0] == SOCKET_SIGNAL.MOUSE_MOVE and coalesced[-1][0] == SOCKET_SIGNAL.MOUSE_MOVE:
+            coalesced[-1] = record
+        else:
+            coalesced.append(record)
+    return coalesced
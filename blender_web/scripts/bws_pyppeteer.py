@@ -4,6 +4,7 @@ import os
 import signal
 import struct
 
+import pyppeteer.errors
 import pyppeteer.page
 
 PYPPETEER_CHROMIUM_REVISION = '1263111'
@@ -12,7 +13,7 @@ os.environ['PYPPETEER_CHROMIUM_REVISION'] = PYPPETEER_CHROMIUM_REVISION
 import sys
 import asyncio
 import pyppeteer
-from time import time
+from time import time, perf_counter
 from multiprocessing import shared_memory
 import numpy as np
 from PIL import Image
@@ -21,16 +22,24 @@ import threading
 import queue
 import base64
 
+from bws_blocking import AD_HOSTS, RESOURCE_TYPE_NAMES, TRACKER_HOSTS, BlockingEngine
+from bws_bundle import BUNDLE_HTTP_URL, AssetBundle, bundle_path, cache_dir, to_http_url
+from bws_metrics import RendererMetrics
+
 
 SERVER_PORT = sys.argv[-5]
 START_WIDTH, START_HEIGHT, IMAGE_CHANNELS = [int(v) for v in sys.argv[-4].split(',')]
 SHARED_MEMORY_ID = sys.argv[-3]
 URL = sys.argv[-2]
+# Addon pages, served from memory on an intercepted http origin (see bws_bundle).
+BUNDLE = AssetBundle.load() if URL.startswith('bws://') else None
+URL = to_http_url(URL)
 RENDER_PATH = sys.argv[-1]
 FPS = 24
 
 SHM = shared_memory.SharedMemory(name=SHARED_MEMORY_ID)
 TEXTURE_BUFFER = np.ndarray((START_WIDTH * START_HEIGHT * IMAGE_CHANNELS, ), dtype=np.float32, buffer=SHM.buf)
+METRICS = RendererMetrics(SHARED_MEMORY_ID)
 
 print(sys.argv)
 
@@ -77,10 +86,60 @@ minimal_args = [
   '--headless',
 ]
 
-blocked_domains = [
-  'googlesyndication.com',
-  'adservice.google.com',
-]
+# Request blocking (see bws_blocking): domains (and their subdomains), and CDP resource types.
+BLOCKED_HOSTS = AD_HOSTS + TRACKER_HOSTS
+# The page is muted anyway: audio / video downloads only slow it down.
+BLOCKED_RESOURCE_TYPES = ('Media', )
+BLOCKER = BlockingEngine(BLOCKED_HOSTS, BLOCKED_RESOURCE_TYPES)
+
+
+async def setup_request_blocking(page: pyppeteer.page.Page) -> None:
+    """ Pushes the blocking rules to the browser, before the first request of the page.
+        Blocked hosts never reach Python (Network.setBlockedURLs). Only the addon pages (bundle) and
+        the resource types to block are intercepted (Fetch), every other request goes straight through. """
+    client = page._client
+    await client.send('Network.setBlockedURLs', {'urls': BLOCKER.blocked_url_patterns()})
+
+    async def _request_paused(event: dict) -> None:
+        request_id = event['requestId']
+        url = event['request']['url']
+        asset_path = bundle_path(url) if BUNDLE is not None else None
+        try:
+            if asset_path is not None:
+                asset = BUNDLE.get(asset_path)
+                if asset is None:
+                    await client.send('Fetch.fulfillRequest', {'requestId': request_id, 'responseCode': 404, 'body': ''})
+                else:
+                    await client.send('Fetch.fulfillRequest', {
+                        'requestId': request_id,
+                        'responseCode': 200,
+                        'responseHeaders': [{'name': name, 'value': value} for name, value in asset.headers().items()],
+                        'body': base64.b64encode(asset.data).decode('ascii'),
+                    })
+            elif BLOCKER.match(url, event.get('resourceType')) is not None:
+                # Counted by the 'requestfailed' handler, with the requests blocked by the browser.
+                await client.send('Fetch.failRequest', {'requestId': request_id, 'errorReason': 'BlockedByClient'})
+            else:
+                await client.send('Fetch.continueRequest', {'requestId': request_id})
+        except pyppeteer.errors.NetworkError as e:
+            # The page navigated away, the request is gone.
+            print("[PYPPETEER] Paused request:", e)
+
+    fetch_patterns = BLOCKER.fetch_patterns([BUNDLE_HTTP_URL + '*'] if BUNDLE is not None else ())
+    if fetch_patterns:
+        client.on('Fetch.requestPaused', lambda event: asyncio.ensure_future(_request_paused(event)))
+        await client.send('Fetch.enable', {'patterns': fetch_patterns})
+
+    def _request(request) -> None:
+        BLOCKER.stats.requests += 1
+
+    def _request_failed(request) -> None:
+        failure = request.failure()
+        if failure and failure.get('errorText') == 'net::ERR_BLOCKED_BY_CLIENT':
+            BLOCKER.record_blocked(request.url, RESOURCE_TYPE_NAMES.get(request.resourceType, None))
+
+    page.on('request', _request)
+    page.on('requestfailed', _request_failed)
 
 
 async def tcp_client():
@@ -102,7 +161,7 @@ async def tcp_client():
     args.append('--use-gl=angle');args.append('--use-angle=gl-egl')
     browser = await pyppeteer.launch(
         {
-            'userDataDir': './user_data/',
+            'userDataDir': cache_dir('pyppeteer'),
             'headless': True,
             'ignoreDefaultArgs': True,
             'args': args # minimal_args
@@ -111,22 +170,15 @@ async def tcp_client():
 
     page = await browser.newPage()
     await page.setViewport({"width": START_WIDTH, "height": START_HEIGHT})
+    # OPTIMIZATION: Avoid ads and trackers connections slowing down the browser.
+    # Set before loading the page, so its first request is filtered and the addon pages are answered from the bundle.
+    await setup_request_blocking(page)
+
     # Go to the webpage and wait until network is idle
     await page.goto(URL) # , waitUntil='networkidle2') # 'chrome://gpu'
     # Or, if you control the page, you can wait for a specific selector to appear
     # await page.waitForSelector('.take_screenshot_now')
 
-    # OPTIMIZATION: Avoid ads connections slowing down the browser.
-    page.setRequestInterception(True)
-
-    @page.on('request')
-    async def handle_request(request):
-        url = request.url
-        if any(domain in url for domain in blocked_domains):
-            await request.abort()
-        else:
-            await request.continue_()
-
     # Screenshot.
     def _screenshot_worker(writer):
         print("client:shm")
@@ -134,9 +186,6 @@ async def tcp_client():
         print("client:shm...np...buffer")
         texture_buffer = np.ndarray((START_WIDTH * START_HEIGHT * IMAGE_CHANNELS, ), dtype=np.float32, buffer=shm.buf)
 
-        frame_count = 0
-        start_time = time()
-
         while True:
             if writer is None or writer.is_closing():
                 break
@@ -147,7 +196,7 @@ async def tcp_client():
             if isinstance(item, str) and item == 'SHUTDOWN':
                 break
 
-            frame_count += 1
+            paint_start_time = perf_counter()
 
             # Decode the image data
             # screenshot_data = item
@@ -169,6 +218,7 @@ async def tcp_client():
 
             # Notify the server that the texture data is updated!
             writer.write(struct.pack('?', True))
+            METRICS.frame_published(paint_start_time)
 
             # print("- Expected size:", texture_data.nbytes, "\t- Screenshot size:", arr.nbytes)
             texture_data_queue.task_done()
@@ -178,15 +228,6 @@ async def tcp_client():
             del item
             del arr
 
-            # Calculate FPS every second
-            if time() - start_time > 1.0:  # one second has passed
-                fps = frame_count / (time() - start_time)
-                print(f'Render-Screen FPS: {fps}')
-
-                # Reset the frame count and start time
-                frame_count = 0
-                start_time = time()
-
         del texture_buffer
         if shm:
             shm.close()
@@ -212,6 +253,8 @@ async def tcp_client():
                 line, buffer = buffer.split('\n', 1)
                 commands = line.split(',')
                 command_id = commands[0]
+                if command_id != '@':
+                    METRICS.input_received()
                 if command_id == '@':
                     # SPECIAL COMMANDS FROM PARENT PROCESS.
                     command_id = commands[1]
@@ -272,6 +315,8 @@ async def tcp_client():
     SHM.close()
     del SHM
     del TEXTURE_BUFFER
+    METRICS.close()
+    print("[PYPPETEER] Request blocking:", BLOCKER.stats.summary())
 
     await browser.close()
 
@@ -1,18 +1,22 @@
-from PyQt5.QtCore import QUrl, QMetaObject, Q_ARG, QTimer, Qt, pyqtSlot, QCoreApplication, QEvent, QPoint, QRect
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage
+from PyQt5.QtCore import QUrl, QMetaObject, Q_ARG, QTimer, Qt, pyqtSlot, QRect
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineProfile
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QMouseEvent, QKeyEvent
 import sys
-import numpy as np
-from time import time
-from multiprocessing import shared_memory
+from time import time, perf_counter_ns
 import threading
 import socket
-from string import Template
-from PIL import Image
+
+from bws_bundle import AssetBundle
+from bws_frames import FrameRing, TileHasher
+from bws_metrics import RendererMetrics
+from bws_protocol import SOCKET_SIGNAL, MOUSE_BUTTON
+from bws_qt import QtFrameCapture, QtInputInjector, register_bundle_scheme, setup_profile
 
 
 FPS = 30
+# QtWebEngine has no paint callback: keep capturing for a few timer ticks after any activity
+# (DOM change, animation frame, input), as the view may repaint a bit later.
+SETTLE_FRAMES = 3
 
 # Config
 URL = "https://twitter.com/Blender"
@@ -25,10 +29,14 @@ SERVER_PORT = 0
 SOCKET_CLIENT = None
 
 SHARED_MEMORY_ID = ''
-SHM = None
-TEXTURE_BUFFER = None
+FRAME_RING = None
+CAPTURE = None
+HASHER = None
+METRICS = RendererMetrics()
 
 QAPP = None
+# bws:// handler of the default profile (see bws_qt.setup_profile), kept alive with the app.
+BUNDLE_HANDLER = None
 
 
 def main():
@@ -70,10 +78,10 @@ def command_line_arguments():
             sys.exit(1)
 
         if SHARED_MEMORY_ID != '':
-            global SHM
-            global TEXTURE_BUFFER
-            SHM = shared_memory.SharedMemory(name=SHARED_MEMORY_ID)
-            TEXTURE_BUFFER = np.ndarray((VIEWPORT_WIDTH * VIEWPORT_HEIGHT * IMAGE_CHANNELS, ), dtype=np.float32, buffer=SHM.buf)
+            global FRAME_RING
+            FRAME_RING = FrameRing.attach(SHARED_MEMORY_ID)
+            global METRICS
+            METRICS = RendererMetrics(SHARED_MEMORY_ID)
 
     elif len(sys.argv) > 1:
         print("[bws_pyqt.py] Error: Expected arguments: url (width height channels) shm server_port")
@@ -86,8 +94,17 @@ def create_app():
     global VIEWPORT_HEIGHT
     global VIEWPORT_WIDTH
 
+    register_bundle_scheme()
     app = QApplication(['-platform', 'minimal'])  # sys.argv)
     QAPP = app
+    global BUNDLE_HANDLER
+    BUNDLE_HANDLER = setup_profile(QWebEngineProfile.defaultProfile(), AssetBundle.load())
+    if FRAME_RING is not None:
+        # Wrap every frame slot once: the view is rendered straight into the SHM.
+        global CAPTURE
+        global HASHER
+        CAPTURE = QtFrameCapture.from_ring(FRAME_RING)
+        HASHER = TileHasher(FRAME_RING.width, FRAME_RING.height, FRAME_RING.channels, FRAME_RING.dtype)
     viewer = Viewer()
     viewer.setFixedSize(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
     viewer.load_url(URL)
@@ -113,16 +130,19 @@ def start_socket_client():
 
 def exit_app():
     print("[bws_pyqt.py] Exit app")
-    global SHM
-    global TEXTURE_BUFFER
+    global FRAME_RING
+    global CAPTURE
     global SOCKET_CLIENT
     if SOCKET_CLIENT:
         SOCKET_CLIENT.close()
         SOCKET_CLIENT = None
-    if SHM:
-        SHM.close()
-        SHM = None
-        TEXTURE_BUFFER = None
+    if CAPTURE:
+        CAPTURE.close()
+        CAPTURE = None
+    if FRAME_RING:
+        FRAME_RING.close()
+        FRAME_RING = None
+    METRICS.close()
 
     global QAPP
     QAPP.quit()  # exit with success, otherwise use exit()
@@ -132,99 +152,40 @@ def exit_app():
 ########################################################################
 ########################################################################
 
-MOUSEMOVE = Template("""
-var x = ${x}; // replace with your x coordinate
-var y = ${y}; // replace with your y coordinate
-var element = document.elementFromPoint(x, y);
-if (element) {
-    var mouseMoveEvent = new MouseEvent('mousemove', {
-        'view': window,
-        'bubbles': true,
-        'cancelable': true,
-        'screenX': x,
-        'screenY': y,
-        'clientX': x,
-        'clientY': y
-    });
-    element.dispatchEvent(mouseMoveEvent);
-""")
-
-MOUSE_MOVE_JS = """
-var lastActiveElement = null;
-
-function mouseMove(x, y) {
-    var element = document.elementFromPoint(x, y);
-    if (element) {
-        var mouseMoveEvent = new MouseEvent('mousemove', {
-            'view': window,
-            'bubbles': true,
-            'cancelable': true,
-            'screenX': x,
-            'screenY': y,
-            'clientX': x,
-            'clientY': y
-        });
-        element.dispatchEvent(mouseMoveEvent);
-
-        // If there was a last active element and it's not the current element, blur it
-        if (lastActiveElement && lastActiveElement !== element && typeof lastActiveElement.blur === 'function') {
-            lastActiveElement.blur();
-        }
-
-        // If the current element can be focused, focus it and set it as the last active element
-        if (typeof element.focus === 'function') {
-            element.focus();
-            lastActiveElement = element;
-        }
-    }
+# Text commands sent by modal_pyqt.py, one per line.
+MOUSE_BUTTON_NAMES = {
+    'LEFT': MOUSE_BUTTON.LEFT,
+    'MIDDLE': MOUSE_BUTTON.MIDDLE,
+    'RIGHT': MOUSE_BUTTON.RIGHT,
 }
-"""
-
-MOUSECLICK = Template("""
-var x = ${x}; // replace with your x coordinate
-var y = ${y}; // replace with your y coordinate
-var element = document.elementFromPoint(x, y);
-if (element) element.click();
-""")
-
-SCROLL_BY = Template("""
-var x = ${deltaX}; // replace with your x coordinate
-var y = ${deltaY}; // replace with your y coordinate
-window.scrollBy(x, y);
-""")
-
-KEYPRESS = Template("""
-// var element = document.querySelector('input'); // replace with your element
-var element = document.activeElement;
-// if (element && element.tagName == 'INPUT') {
-//     console.log(element.value);  // print the value of the input field
-// }
-var event = new KeyboardEvent('keydown', {key: '${key}'}); // replace with your key
-if (element) element.dispatchEvent(event);
-""")
-
-
-def mouse_move(view: 'Viewer', page: QWebEnginePage, x: int, y: int):
-    print("mouse is moving to:", x, y)
-    # create a QMouseEvent
-    event = QMouseEvent(QEvent.MouseMove, QPoint(x, y), Qt.NoButton, Qt.NoButton, Qt.NoModifier)
-    # post the event to the QApplication
-    QCoreApplication.postEvent(view, event)
-    # page.runJavaScript(MOUSEMOVE.substitute(x=x, y=y))
-    # page.runJavaScript(MOUSE_MOVE_JS + f'\nmouseMove({x}, {y});')
-    page.runJavaScript(f'mouseMove({x}, {y});')
-
-def mouse_click(page: QWebEnginePage, x: int, y: int):
-    page.runJavaScript(MOUSECLICK.substitute(x=x, y=y))
-
-def scroll_by(page: QWebEnginePage, deltaX: int, deltaY: int):
-    page.runJavaScript(SCROLL_BY.substitute(deltaX=deltaX, deltaY=deltaY))
-
-def keypress(page: QWebEnginePage, key: str):
-    page.runJavaScript(KEYPRESS.substitute(key=key))
-
-
-def handle_events(view: 'Viewer', page: QWebEnginePage):
+
+
+def parse_command(line: str) -> list:
+    """ Turns a text command into bws_protocol input records (signal, input_id, time_ns, event_data). """
+    command_id, _, args = line.partition(',')
+    if command_id == 'mousemove':
+        x, y = map(int, args.split(','))
+        return [(SOCKET_SIGNAL.MOUSE_MOVE, 0, 0, (x, y))]
+    if command_id == 'click':
+        x, y, _, button = args.split(',')
+        button = MOUSE_BUTTON_NAMES.get(button, MOUSE_BUTTON.LEFT)
+        return [
+            (SOCKET_SIGNAL.MOUSE_PRESS, 0, 0, (int(x), int(y), button)),
+            (SOCKET_SIGNAL.MOUSE_RELEASE, 0, 0, (int(x), int(y), button)),
+        ]
+    if command_id == 'scroll':
+        x, y, sign = map(int, args.split(','))
+        return [(SOCKET_SIGNAL.SCROLL_DOWN if sign > 0 else SOCKET_SIGNAL.SCROLL_UP, 0, 0, (x, y))]
+    if command_id == 'unicode':
+        # 'unicode,<press>,<char>,<modifiers>': the char itself may be a comma.
+        key = args.split(',', 1)[1].rsplit(',', 1)[0]
+        if len(key) == 1:
+            return [(SOCKET_SIGNAL.UNICODE, 0, 0, (ord(key), 0))]
+    return []
+
+
+def handle_events(view: 'Viewer', injector: QtInputInjector):
+    """ Socket thread. Inputs are injected as native Qt events by the GUI thread, in batches. """
     global SOCKET_CLIENT
 
     print("[bws_pyqt.py] Start::handle_events", SOCKET_CLIENT)
@@ -245,104 +206,74 @@ def handle_events(view: 'Viewer', page: QWebEnginePage):
         buffer += data.decode()
         while '\n' in buffer:
             line, buffer = buffer.split('\n', 1)
-            commands = line.split(',')
-            command_id = commands[0]
-            # print(command_id, commands)
-            if command_id == '@':
+            if line.startswith('@,'):
                 # SPECIAL COMMANDS FROM PARENT PROCESS.
-                command_id = commands[1]
-                if command_id == 'KILL':
+                if line == '@,KILL':
                     exit_app()
                     return None
-            elif command_id == 'mousemove':
-                x, y = map(int, commands[1:])
-                mouse_move(view, page, x=x, y=y)
-                view.dirty = True
-            elif command_id == 'click':
-                x, y = map(int, commands[1:3])
-                mouse_click(page, x=x, y=y)
-                view.dirty = True
-            elif command_id == 'resize':
-                width, height = map(int, commands[1:])
-            elif command_id == 'scroll':
-                x, y, sign = map(int, commands[1:])
-                scroll_by(page, deltaX=0, deltaY=sign*10)
-                view.dirty = True
-            elif command_id == 'unicode':
-                key_press, key, modifiers = map(int, commands[1:])
-                keypress(page, key=key)
-                view.dirty = True
-            else:
                 continue
-
-        buffer = ''
+            METRICS.input_received()
+            try:
+                records = parse_command(line)
+            except ValueError:
+                print("[bws_pyqt.py] Invalid command:", line)
+                continue
+            for record in records:
+                injector.post(record)
+            if records:
+                view.mark_dirty()
 
 
 def refresh_buffer(view: 'Viewer'):
-    ## if not view.dirty:
-    ##     return
-    ## view.dirty = False
+    if view.dirty_frames <= 0:
+        return
+    if FRAME_RING is None or CAPTURE is None:
+        return
 
-    global TEXTURE_BUFFER
-    if TEXTURE_BUFFER is None:
+    paint_start_ns = perf_counter_ns()
+    slot = FRAME_RING.acquire_write()
+    if slot is None:
+        # Blender did not consume the previous frames yet.
+        METRICS.frame_dropped()
         return
-    global VIEWPORT_WIDTH
-    global VIEWPORT_HEIGHT
 
-    image = view.grab().toImage()
-    ptr = image.constBits()
-    ptr.setsize(VIEWPORT_WIDTH * VIEWPORT_HEIGHT * 4)
-
-    image = Image.frombytes("RGBA", (VIEWPORT_WIDTH, VIEWPORT_HEIGHT), ptr, "raw") #, "RGBA", 0, 1)
-    # image.save(SCREENSHOT_PATH, "PNG")
-    # Convert the image to a numpy array
-    arr = np.array(image)
-    # Convert the numpy array to float32
-    arr = arr.astype(np.float32)
-    # Normalize the values to be between 0 and 1
-    arr /= 255.0
-    # Flatten the array
-    arr = arr.flatten()
-
-    if TEXTURE_BUFFER is None:
+    view.dirty_frames -= 1
+    if CAPTURE.capture(view, slot) is None:
+        FRAME_RING.abort_write(slot)
         return
-    TEXTURE_BUFFER[:] = arr[:]
-    image.close()
-    del image
-    del arr
+    # Compare with the previous capture: unchanged frames are never published.
+    dirty = HASHER.update(FRAME_RING.pixels(slot))
+    if dirty is None:
+        FRAME_RING.abort_write(slot)
+        METRICS.frame_unchanged()
+        return
+    FRAME_RING.publish(slot, paint_start_ns=paint_start_ns, publish_ns=perf_counter_ns(), dirty=dirty)
+    METRICS.frame_published(paint_start_ns / 1e9)
 
 
 class MyPage(QWebEnginePage):
     def javaScriptConsoleMessage(self, level, msg, line, sourceID):
         if msg in {'DOM_CHANGE'}:
-            refresh_buffer(self.parent())
+            self.parent().mark_dirty()
 
 class Viewer(QWebEngineView):
     def __init__(self, *args, **kwargs):
         super(Viewer, self).__init__(*args, **kwargs)
         self.setPage(MyPage(self))
         ## self.repaintRequested.connect(self.on_repaint_requested)
-        self.dirty = True
-        self.frame_count = 0
-        self.start_time = time()
+        # Timer ticks left to capture (see SETTLE_FRAMES).
+        self.dirty_frames = SETTLE_FRAMES
+        self.injector = QtInputInjector(self)
+
+    def mark_dirty(self):
+        # Also called from the events thread: a plain int store.
+        self.dirty_frames = SETTLE_FRAMES
 
     @pyqtSlot()
     def refresh_buffer(self):
-        # Process a frame...
-        self.frame_count += 1
-
         # print("Refreshing buffer...")  # Implement your actual logic here
         refresh_buffer(self)
 
-        # Calculate FPS every second
-        if time() - self.start_time > 1.0:  # one second has passed
-            fps = self.frame_count / (time() - self.start_time)
-            print(f'[screenshot.py] FPS: {fps}')
-
-            # Reset the frame count and start time
-            self.frame_count = 0
-            self.start_time = time()
-
     def safe_refresh_buffer(self):
         QMetaObject.invokeMethod(self, "refresh_buffer", Qt.QueuedConnection)
 
@@ -353,65 +284,31 @@ class Viewer(QWebEngineView):
 
     def on_load_finished(self):
         print('[bws_pyqt.py] Load finished')
+        self.mark_dirty()
         self.page().runJavaScript("""
-            var observer = new MutationObserver(function(mutations) {
-                mutations.forEach(function(mutation) {
+            // Debounced activity: at most one notification per animation frame,
+            // and one per frame while CSS animations / transitions are running.
+            window.bwsActivityPending = false;
+            window.bwsNotifyActivity = function() {
+                if (window.bwsActivityPending) return;
+                window.bwsActivityPending = true;
+                requestAnimationFrame(function() {
+                    window.bwsActivityPending = false;
                     console.log('DOM_CHANGE');
+                    if (document.getAnimations && document.getAnimations().length) {
+                        window.bwsNotifyActivity();
+                    }
                 });
+            };
+            var observer = new MutationObserver(window.bwsNotifyActivity);
+            ['scroll', 'resize', 'load', 'transitionrun', 'animationstart'].forEach(function(type) {
+                window.addEventListener(type, window.bwsNotifyActivity, true);
             });
             observer.observe(document, { attributes: true, childList: true, characterData: true, subtree: true });
         """)
 
-        self.page().runJavaScript("""
-            window.lastHoveredElement = null;
-
-            window.mouseMove = function(x, y) {
-                var element = document.elementFromPoint(x, y);
-                element.dispatchEvent(mouseEnterEvent);
-                if (element) {
-                    if (window.lastHoveredElement && window.lastHoveredElement !== element) {
-                        var mouseOutEvent = new MouseEvent('mouseout', {
-                            'view': window,
-                            'bubbles': true,
-                            'cancelable': true
-                        });
-                        window.lastHoveredElement.dispatchEvent(mouseOutEvent);
-                    }
-
-                    if (element !== window.lastHoveredElement) {
-                        var mouseEnterEvent = new MouseEvent('mouseenter', {
-                            'view': window,
-                            'bubbles': true,
-                            'cancelable': true
-                        });
-                        element.dispatchEvent(mouseEnterEvent);
-                    }
-
-                    var mouseOverEvent = new MouseEvent('mouseover', {
-                        'view': window,
-                        'bubbles': true,
-                        'cancelable': true
-                    });
-                    element.dispatchEvent(mouseOverEvent);
-
-                    var mouseMoveEvent = new MouseEvent('mousemove', {
-                        'view': window,
-                        'bubbles': true,
-                        'cancelable': true,
-                        'screenX': x,
-                        'screenY': y,
-                        'clientX': x,
-                        'clientY': y
-                    });
-                    element.dispatchEvent(mouseMoveEvent);
-
-                    window.lastHoveredElement = element;
-                }
-            };
-        """)
-
         print("[bws_pyqt.py] Running thread to handle events from Blender...")
-        self.thread = threading.Thread(target=handle_events, args=(self, self.page(),), name='b3d_cef_handle_events')
+        self.thread = threading.Thread(target=handle_events, args=(self, self.injector,), name='b3d_cef_handle_events')
         self.thread.start()
 
         # Create a QTimer
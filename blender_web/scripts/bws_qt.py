@@ -0,0 +1,261 @@
+""" Qt renderer helpers: zero-copy capture into shared memory and native input injection.
+
+    Capture: every target buffer (a FrameRing slot or a raw SHM block) is wrapped once by a persistent
+    QImage that does not own its pixels, so the widget renders straight into the shared memory:
+    no grab(), no intermediate QImage, no Python-level pixel copies per capture.
+
+    Pixels are 8-bit RGBA, straight alpha, top-left origin (QImage.Format_RGBA8888).
+
+    Input: bws_protocol input records are turned into QMouseEvent / QWheelEvent / QKeyEvent and
+    sent to the view's render widget (focusProxy) on the GUI thread, like real OS input.
+    Records posted from the socket thread are delivered in batches, once per event loop
+    iteration, with consecutive mouse moves coalesced.
+
+    Pages: the addon pages are served from the in-memory bundle under a real bws:// scheme
+    (see bws_bundle), and the profile caches go to the persistent per-addon cache directory.
+
+    NOTE: Shared by the Qt renderer scripts (Python 3.9, PyQt5).
+"""
+
+import ctypes
+import threading
+from typing import List, Optional, Tuple
+
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QEvent, QObject, QPoint, QPointF, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPainter, QKeyEvent, QMouseEvent, QWheelEvent
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler
+from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+from PyQt5.QtWidgets import QApplication, QWidget
+
+try:
+    from bws_bundle import BUNDLE_SCHEME, AssetBundle, bundle_path, cache_dir
+    from bws_protocol import SOCKET_SIGNAL, MOUSE_BUTTON, KeyEventFlags, coalesce_inputs
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_bundle import BUNDLE_SCHEME, AssetBundle, bundle_path, cache_dir
+    from .bws_protocol import SOCKET_SIGNAL, MOUSE_BUTTON, KeyEventFlags, coalesce_inputs
+
+
+CAPTURE_FORMAT = QImage.Format_RGBA8888
+CAPTURE_CHANNELS = 4
+
+
+class SharedImage:
+    """ QImage over an existing writable buffer (shm.buf, a FrameRing slot view...). """
+
+    def __init__(self, buffer, width: int, height: int, offset: int = 0) -> None:
+        size = width * height * CAPTURE_CHANNELS
+        if memoryview(buffer).nbytes - offset < size:
+            raise ValueError(f"Buffer too small for a {width}x{height} RGBA8 image")
+        # Keeps the buffer exported (and so mapped) while the QImage points to it.
+        self._anchor = (ctypes.c_char * size).from_buffer(buffer, offset)
+        self.width = width
+        self.height = height
+        self.image = QImage(sip.voidptr(ctypes.addressof(self._anchor)), width, height, width * CAPTURE_CHANNELS, CAPTURE_FORMAT)
+
+    def release(self) -> None:
+        """ Call it before closing the buffer: an exported SHM buffer can not be closed. """
+        self.image = None
+        self._anchor = None
+
+
+class QtFrameCapture:
+    """ Renders a widget into one of several shared images with a single, reused QPainter. """
+
+    def __init__(self, images: List[SharedImage]) -> None:
+        self.images = images
+        self.painter = QPainter()
+
+    @classmethod
+    def from_ring(cls, ring) -> 'QtFrameCapture':
+        """ One shared image per slot of a bws_frames.FrameRing created with dtype=np.uint8. """
+        if ring.dtype.itemsize != 1 or ring.channels != CAPTURE_CHANNELS:
+            raise ValueError(f"Qt capture needs an RGBA uint8 frame ring (got {ring.channels} x {ring.dtype})")
+        return cls([SharedImage(ring.pixels(slot), ring.width, ring.height) for slot in range(ring.slot_count)])
+
+    @classmethod
+    def from_buffer(cls, buffer, width: int, height: int, offset: int = 0) -> 'QtFrameCapture':
+        return cls([SharedImage(buffer, width, height, offset)])
+
+    def capture(self, widget: QWidget, slot: int = 0) -> Optional[QImage]:
+        """ Renders the widget into the image of the given slot. Call it from the Qt main thread. """
+        if not self.images:
+            return None
+        image = self.images[slot].image
+        image.fill(Qt.transparent)
+        painter = self.painter
+        if not painter.begin(image):
+            return None
+        widget.render(painter)
+        painter.end()
+        return image
+
+    def close(self) -> None:
+        if self.painter.isActive():
+            self.painter.end()
+        for image in self.images:
+            image.release()
+        self.images = []
+
+
+# Input injection.
+# ----------------------------------------------------------------
+
+WHEEL_STEP = 120  # Qt angle delta of one wheel notch (1/8 degree units).
+
+QT_MOUSE_BUTTONS = {
+    MOUSE_BUTTON.LEFT: Qt.LeftButton,
+    MOUSE_BUTTON.MIDDLE: Qt.MiddleButton,
+    MOUSE_BUTTON.RIGHT: Qt.RightButton,
+}
+
+QT_MODIFIERS = (
+    (KeyEventFlags.EVENTFLAG_SHIFT_DOWN, Qt.ShiftModifier),
+    (KeyEventFlags.EVENTFLAG_CONTROL_DOWN, Qt.ControlModifier),
+    (KeyEventFlags.EVENTFLAG_ALT_DOWN, Qt.AltModifier),
+    (KeyEventFlags.EVENTFLAG_COMMAND_DOWN, Qt.MetaModifier),
+)
+
+# Control characters with their own Qt key and no text.
+QT_SPECIAL_KEYS = {
+    '\r': Qt.Key_Return,
+    '\n': Qt.Key_Return,
+    '\t': Qt.Key_Tab,
+    '\b': Qt.Key_Backspace,
+    '\x1b': Qt.Key_Escape,
+    '\x7f': Qt.Key_Delete,
+}
+
+
+def qt_modifiers(flags: int) -> Qt.KeyboardModifiers:
+    modifiers = Qt.NoModifier
+    for flag, modifier in QT_MODIFIERS:
+        if flags & flag:
+            modifiers |= modifier
+    return modifiers
+
+
+class QtInputInjector(QObject):
+    """ Delivers input records to a QtWebEngine view as native Qt events.
+        post() can be called from any thread; events are sent from the GUI thread. """
+
+    flushRequested = pyqtSignal()
+
+    def __init__(self, view: QWidget) -> None:
+        super().__init__()
+        self.view = view
+        self.buttons = Qt.NoButton
+        self.modifiers = Qt.NoModifier
+        self._pending: List[Tuple[int, int, int, tuple]] = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+        # Queued: the flush runs in the next event loop iteration of the thread owning this object.
+        self.flushRequested.connect(self.flush, Qt.QueuedConnection)
+
+    def post(self, record: Tuple[int, int, int, tuple]) -> None:
+        """ Queues a (signal, input_id, time_ns, event_data) record (see bws_protocol). """
+        with self._lock:
+            self._pending.append(record)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.flushRequested.emit()
+
+    @pyqtSlot()
+    def flush(self) -> int:
+        """ Sends every pending record. Returns the number of Qt events sent. """
+        with self._lock:
+            records, self._pending = self._pending, []
+            self._scheduled = False
+        if not records:
+            return 0
+        # The render widget is created by QtWebEngine once the page is loaded.
+        target = self.view.focusProxy() or self.view
+        sent = 0
+        for signal, _input_id, _time_ns, event_data in coalesce_inputs(records):
+            for event in self.make_events(target, signal, event_data):
+                QApplication.sendEvent(target, event)
+                sent += 1
+        return sent
+
+    def make_events(self, target: QWidget, signal: int, event_data: tuple) -> list:
+        if signal == SOCKET_SIGNAL.MOUSE_MOVE:
+            return [QMouseEvent(QEvent.MouseMove, QPointF(*event_data), Qt.NoButton, self.buttons, self.modifiers)]
+
+        if signal in {SOCKET_SIGNAL.MOUSE_PRESS, SOCKET_SIGNAL.MOUSE_RELEASE}:
+            x, y, button = event_data
+            qt_button = QT_MOUSE_BUTTONS.get(button, Qt.LeftButton)
+            if signal == SOCKET_SIGNAL.MOUSE_PRESS:
+                self.buttons |= qt_button
+                target.setFocus(Qt.MouseFocusReason)
+                return [QMouseEvent(QEvent.MouseButtonPress, QPointF(x, y), qt_button, self.buttons, self.modifiers)]
+            self.buttons &= ~qt_button
+            return [QMouseEvent(QEvent.MouseButtonRelease, QPointF(x, y), qt_button, self.buttons, self.modifiers)]
+
+        if signal in {SOCKET_SIGNAL.SCROLL_UP, SOCKET_SIGNAL.SCROLL_DOWN}:
+            x, y = event_data
+            delta = WHEEL_STEP if signal == SOCKET_SIGNAL.SCROLL_UP else -WHEEL_STEP
+            position = QPointF(x, y)
+            return [QWheelEvent(position, QPointF(target.mapToGlobal(QPoint(x, y))), QPoint(), QPoint(0, delta),
+                                self.buttons, self.modifiers, Qt.NoScrollPhase, False)]
+
+        if signal == SOCKET_SIGNAL.UNICODE:
+            code, flags = event_data
+            self.modifiers = qt_modifiers(flags)
+            char = chr(code)
+            if char in QT_SPECIAL_KEYS:
+                key, text = QT_SPECIAL_KEYS[char], ''
+            else:
+                # Qt key codes match the upper case Latin-1 code points.
+                key, text = ord(char.upper()) if len(char.upper()) == 1 else Qt.Key_unknown, char
+            events = [
+                QKeyEvent(QEvent.KeyPress, key, self.modifiers, text),
+                QKeyEvent(QEvent.KeyRelease, key, self.modifiers, text),
+            ]
+            self.modifiers = Qt.NoModifier
+            return events
+
+        return []
+
+
+def register_bundle_scheme() -> None:
+    """ Declares the bws:// scheme. Must be called before the QApplication is created. """
+    scheme = QWebEngineUrlScheme(BUNDLE_SCHEME.encode())
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.CorsEnabled |
+                    QWebEngineUrlScheme.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class BundleSchemeHandler(QWebEngineUrlSchemeHandler):
+    """ Answers bws:// requests from the in-memory bundle, on the GUI thread, without touching the disk. """
+
+    def __init__(self, bundle: AssetBundle, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.bundle = bundle
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob) -> None:
+        asset = self.bundle.get(bundle_path(job.requestUrl().toString()) or '')
+        if asset is None:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        # Owned by the job, released with it.
+        buffer = QBuffer(job)
+        buffer.setData(QByteArray(asset.data.tobytes()))
+        job.reply(asset.mime.encode(), buffer)
+
+
+def setup_profile(profile: QWebEngineProfile, bundle: Optional[AssetBundle] = None) -> Optional[BundleSchemeHandler]:
+    """ Persistent disk cache and storage in the addon cache directory, and the bws:// handler.
+        Returns the handler, which must be kept alive as long as the profile. """
+    directory = cache_dir('qt')
+    profile.setCachePath(directory)
+    profile.setPersistentStoragePath(directory)
+    profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+    profile.setPersistentCookiesPolicy(QWebEngineProfile.AllowPersistentCookies)
+    if bundle is None:
+        return None
+    handler = BundleSchemeHandler(bundle, profile)
+    profile.installUrlSchemeHandler(BUNDLE_SCHEME.encode(), handler)
+    return handler
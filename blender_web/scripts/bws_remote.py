@@ -0,0 +1,133 @@
+""" Stand-in renderer for a page rendered on another machine and relayed by a streaming hub (bws_stream).
+    Same launch arguments, socket protocol and frame SHM as bws_cefpython.py, so Blender does not know the difference:
+    hub frames (tile deltas) are written into the frame ring and Blender inputs are sent to the hub as events.
+
+Usage:
+    python bws_remote.py -- hub://host:port "1280,720,4" shm_name port
+
+On the renderer machine: python bws_stream.py publish --hub host:port --url ... --size 1280,720
+(the published size must match the viewport).
+"""
+
+import select
+import socket
+import sys
+import threading
+from collections import deque
+from time import perf_counter_ns
+
+try:
+    from bws_frames import FrameRing
+    from bws_protocol import SOCKET_SIGNAL, InputDecoder, encode_input, encode_signal
+    from bws_stream import MESSAGE, ROLE, HubConnection, TileDeltaDecoder, decode_message, encode_message, parse_address, rgba8_to_frame
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import FrameRing
+    from .bws_protocol import SOCKET_SIGNAL, InputDecoder, encode_input, encode_signal
+    from .bws_stream import MESSAGE, ROLE, HubConnection, TileDeltaDecoder, decode_message, encode_message, parse_address, rgba8_to_frame
+
+
+RECV_SIZE = 64 * 1024
+
+
+class RemoteRenderer:
+    def __init__(self, ring: FrameRing, sock: socket.socket, hub: HubConnection) -> None:
+        self.ring = ring
+        self.sock = sock
+        self.hub = hub
+        self.decoder = TileDeltaDecoder()
+        # Inputs sent to the hub: (input_id, Blender send time), to fill the frame headers.
+        self.sent_inputs = deque()
+        self.input_time_ns = 0
+        # Dirty rect of the frames that found no free slot.
+        self.pending_dirty = None
+        self.running = True
+
+    def receive_frames(self) -> None:
+        try:
+            while self.running:
+                message = self.hub.receive()
+                if decode_message(message)[0] == MESSAGE.FRAME:
+                    self.write_frame(message)
+        except (ConnectionError, OSError) as e:
+            print("[REMOTE] Hub connection lost:", e)
+        self.running = False
+
+    def write_frame(self, message: bytes) -> None:
+        paint_start_ns = perf_counter_ns()
+        dirty = self.decoder.apply(message)
+        if dirty is None:
+            return
+        canvas = self.decoder.canvas
+        if canvas.shape[:2] != (self.ring.height, self.ring.width):
+            print("[REMOTE] Error: Hub frames are", canvas.shape[1], "x", canvas.shape[0], "but the viewport is", self.ring.width, "x", self.ring.height)
+            return
+        if self.pending_dirty is not None:
+            x, y, w, h = dirty
+            px, py, pw, ph = self.pending_dirty
+            x0, y0 = min(x, px), min(y, py)
+            dirty = (x0, y0, max(x + w, px + pw) - x0, max(y + h, py + ph) - y0)
+        slot = self.ring.acquire_write()
+        if slot is None:
+            # Blender did not consume the previous frame: the next one carries this dirty rect too.
+            self.pending_dirty = dirty
+            return
+        self.pending_dirty = None
+        rgba8_to_frame(canvas, self.ring.pixels(slot))
+
+        input_id = self.decoder.input_id
+        while self.sent_inputs and self.sent_inputs[0][0] <= input_id:
+            self.input_time_ns = self.sent_inputs.popleft()[1]
+        self.ring.publish(slot, input_id, self.input_time_ns, paint_start_ns, paint_start_ns, perf_counter_ns(), dirty)
+
+    def run(self) -> None:
+        threading.Thread(target=self.receive_frames, name='bws_remote_frames', daemon=True).start()
+        decoder = InputDecoder()
+        while self.running:
+            readable, _, _ = select.select([self.sock], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = self.sock.recv(RECV_SIZE)
+            except socket.error:
+                data = b''
+            if not data:
+                break
+            for signal, input_id, input_time_ns, event_data in decoder.feed(data):
+                if signal == SOCKET_SIGNAL.KILL:
+                    self.running = False
+                    break
+                if signal == SOCKET_SIGNAL.PING:
+                    self.sock.sendall(encode_signal(SOCKET_SIGNAL.PONG))
+                elif input_id:
+                    self.sent_inputs.append((input_id, input_time_ns))
+                    self.hub.send(encode_message(MESSAGE.EVENT, input_id, encode_input(signal, input_id, input_time_ns, *event_data)))
+        self.running = False
+
+
+def main() -> None:
+    if '--' not in sys.argv:
+        print("[REMOTE] Error: Expected arguments: -- hub://host:port (width,height,channels) shm server_port")
+        sys.exit(1)
+
+    url, whc, shm_name, port = sys.argv[sys.argv.index('--') + 1:][:4]
+    width, height, channels = [int(v) for v in whc.split(',')]
+    ring = FrameRing.attach(shm_name)
+    if (ring.width, ring.height, ring.channels) != (width, height, channels) or channels != 4:
+        print("[REMOTE] Error: Frame SHM size does not match the viewport", ring.width, ring.height, ring.channels)
+        sys.exit(1)
+
+    hub = HubConnection(*parse_address(url), ROLE.BLENDER)
+    sock = socket.create_connection(('127.0.0.1', int(port)))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    print(f"[REMOTE] Connected to port {port}. Streaming {width}x{height} from {url}")
+    try:
+        RemoteRenderer(ring, sock, hub).run()
+    finally:
+        hub.close()
+        sock.close()
+        ring.close()
+
+
+if __name__ == '__main__':
+    main()
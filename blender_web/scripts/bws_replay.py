@@ -0,0 +1,339 @@
+""" Record/replay of input streams and frame timelines, for regression benchmarks.
+
+    A Recording holds the outbound inputs (time offset, signal name, event data) and the
+    inbound frame timeline (time offset, seq, echoed input id, paint/publish times, dirty rect).
+    Times are microseconds relative to the start of the recording.
+
+    Blender records sessions with SessionRecorder (see metrics.py operators). This module
+    also runs standalone to generate synthetic recordings, replay them against the mock or
+    a real renderer, and diff the reports of two runs:
+
+        python bws_replay.py generate mouse --rate 1000 --duration 2 -o mouse_1khz.json
+        python bws_replay.py replay mouse_1khz.json --url mock://partial --fast --report before.json
+        python bws_replay.py replay mouse_1khz.json --script bws_cefpython.py --python <venv python> --url file://... --report after.json
+        python bws_replay.py diff before.json after.json
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon. Recording is standard library only,
+    replaying needs numpy (bws_mock.MockHost).
+"""
+
+import argparse
+import json
+import math
+import sys
+from time import perf_counter_ns, sleep
+from typing import Dict, List, Optional
+
+try:
+    from bws_protocol import SOCKET_SIGNAL, SIGNAL_NAMES, MOUSE_BUTTON, encode_input
+    from bws_trace import LatencyTracker
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_protocol import SOCKET_SIGNAL, SIGNAL_NAMES, MOUSE_BUTTON, encode_input
+    from .bws_trace import LatencyTracker
+
+
+RECORDING_FORMAT = 'bws-recording'
+RECORDING_VERSION = 1
+REPORT_DECIMALS = 3
+
+
+class Recording:
+    def __init__(self, width: int, height: int, label: str = '', inputs: list = None, frames: list = None) -> None:
+        self.width = width
+        self.height = height
+        self.label = label
+        # [t_us, signal name, *event_data]
+        self.inputs: List[list] = inputs if inputs is not None else []
+        # [t_us, seq, input_id, paint_start_us, publish_us, x, y, w, h]
+        self.frames: List[list] = frames if frames is not None else []
+
+    @property
+    def duration_us(self) -> int:
+        last_input = self.inputs[-1][0] if self.inputs else 0
+        last_frame = self.frames[-1][0] if self.frames else 0
+        return max(last_input, last_frame)
+
+    def save(self, filepath: str) -> None:
+        """ One row per line, so two recordings can be compared with any text diff tool. """
+        def rows(items):
+            return ',\n'.join('    ' + json.dumps(item) for item in items)
+
+        with open(filepath, 'w') as f:
+            f.write('{\n')
+            f.write(f'  "format": "{RECORDING_FORMAT}",\n  "version": {RECORDING_VERSION},\n')
+            f.write(f'  "label": {json.dumps(self.label)},\n  "width": {self.width},\n  "height": {self.height},\n')
+            f.write(f'  "inputs": [\n{rows(self.inputs)}\n  ],\n')
+            f.write(f'  "frames": [\n{rows(self.frames)}\n  ]\n')
+            f.write('}\n')
+
+    @classmethod
+    def load(cls, filepath: str) -> 'Recording':
+        with open(filepath) as f:
+            data = json.load(f)
+        if data.get('format') != RECORDING_FORMAT or data.get('version') != RECORDING_VERSION:
+            raise ValueError(f"'{filepath}' is not a {RECORDING_FORMAT} v{RECORDING_VERSION} file")
+        return cls(data['width'], data['height'], data.get('label', ''), data['inputs'], data['frames'])
+
+
+class SessionRecorder:
+    """ Blender side. Call input() for every sent input and frame() for every consumed frame. """
+
+    def __init__(self, label: str, width: int, height: int) -> None:
+        self.recording = Recording(width, height, label)
+        self.start_ns = perf_counter_ns()
+
+    def _offset_us(self, time_ns: int) -> int:
+        return max(time_ns - self.start_ns, 0) // 1000
+
+    def input(self, signal: int, time_ns: int, event_data: tuple) -> None:
+        self.recording.inputs.append([self._offset_us(time_ns), SIGNAL_NAMES[signal], *event_data])
+
+    def frame(self, header, consumed_ns: int) -> None:
+        """ 'header' is the bws_frames.FrameHeader of the consumed slot. """
+        self.recording.frames.append([
+            self._offset_us(consumed_ns), header.seq, header.input_id,
+            self._offset_us(header.paint_start_ns), self._offset_us(header.publish_ns),
+            *header.dirty
+        ])
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+# Synthetic generators.
+# ----------------------------------------------------------------
+
+def generate_mouse(width: int, height: int, rate: float = 1000.0, duration: float = 2.0) -> Recording:
+    """ Mouse moves along a circle at 'rate' Hz. """
+    recording = Recording(width, height, f'mouse {rate:g} Hz')
+    count = int(rate * duration)
+    radius = min(width, height) * 0.4
+    for index in range(count):
+        angle = index / max(count, 1) * math.tau * 4
+        x = int(width / 2 + math.cos(angle) * radius)
+        y = int(height / 2 + math.sin(angle) * radius)
+        recording.inputs.append([int(index * 1e6 / rate), 'MOUSE_MOVE', x, y])
+    return recording
+
+
+def generate_drag(width: int, height: int, rate: float = 1000.0, duration: float = 1.0) -> Recording:
+    """ Fast horizontal drag: DRAG_START, moves at 'rate' Hz across the view, DRAG_END. """
+    recording = Recording(width, height, f'drag {rate:g} Hz')
+    count = int(rate * duration)
+    y = height // 2
+    recording.inputs.append([0, 'MOUSE_DRAG_START', 0, y])
+    for index in range(1, count + 1):
+        recording.inputs.append([int(index * 1e6 / rate), 'MOUSE_MOVE', int(index / count * (width - 1)), y])
+    recording.inputs.append([int((count + 1) * 1e6 / rate), 'MOUSE_DRAG_END', width - 1, y])
+    return recording
+
+
+def generate_wheel(width: int, height: int, rate: float = 200.0, duration: float = 1.0) -> Recording:
+    """ Wheel storm: alternating bursts of 20 scroll down / up steps at 'rate' Hz. """
+    recording = Recording(width, height, f'wheel {rate:g} Hz')
+    for index in range(int(rate * duration)):
+        name = 'SCROLL_DOWN' if (index // 20) % 2 == 0 else 'SCROLL_UP'
+        recording.inputs.append([int(index * 1e6 / rate), name, width // 2, height // 2])
+    return recording
+
+
+def generate_typing(width: int, height: int, rate: float = 20.0, duration: float = 2.0) -> Recording:
+    """ Characters typed at 'rate' per second. """
+    recording = Recording(width, height, f'typing {rate:g} cps')
+    text = 'the quick brown fox jumps over the lazy dog '
+    recording.inputs.append([0, 'MOUSE_PRESS', width // 2, height // 2, MOUSE_BUTTON.LEFT])
+    recording.inputs.append([1000, 'MOUSE_RELEASE', width // 2, height // 2, MOUSE_BUTTON.LEFT])
+    for index in range(int(rate * duration)):
+        recording.inputs.append([2000 + int(index * 1e6 / rate), 'UNICODE', ord(text[index % len(text)]), 0])
+    return recording
+
+
+GENERATORS = {
+    'mouse': generate_mouse,
+    'drag': generate_drag,
+    'wheel': generate_wheel,
+    'typing': generate_typing,
+}
+
+
+# Replay.
+# ----------------------------------------------------------------
+
+def _round(value):
+    if isinstance(value, float):
+        return round(value, REPORT_DECIMALS)
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+    return value
+
+
+def replay(recording: Recording, host, fast: bool = False, drain_timeout: float = 2.0, output: Recording = None) -> dict:
+    """ Sends the recorded inputs through a started bws_mock.MockHost (mock or real renderer),
+        at the original pace or as fast as possible, and consumes frames meanwhile.
+        Returns a report (see save_report). If 'output' is given, the replayed timeline is recorded into it. """
+    tracker = LatencyTracker('replay')
+    recorder = SessionRecorder(recording.label, recording.width, recording.height) if output is not None else None
+    frames = 0
+
+    def consume_frames() -> None:
+        nonlocal frames
+        while True:
+            header = host.poll_frame()
+            if header is None:
+                return
+            now_ns = perf_counter_ns()
+            frames += 1
+            tracker.frame_consumed(header, now_ns, now_ns)
+            tracker.frame_drawn(now_ns, now_ns)
+            if recorder is not None:
+                recorder.frame(header, now_ns)
+
+    start_ns = perf_counter_ns()
+    for t_us, name, *event_data in recording.inputs:
+        if not fast:
+            target_ns = start_ns + t_us * 1000
+            while perf_counter_ns() < target_ns:
+                consume_frames()
+                sleep(0)
+        signal = getattr(SOCKET_SIGNAL, name)
+        input_id, time_ns = tracker.new_input(signal)
+        host.client.sendall(encode_input(signal, input_id, time_ns, *event_data))
+        if recorder is not None:
+            recorder.input(signal, time_ns, tuple(event_data))
+        consume_frames()
+    send_end_ns = perf_counter_ns()
+
+    # Wait until every input is reflected in a frame (or give up).
+    deadline_ns = send_end_ns + int(drain_timeout * 1e9)
+    while tracker.pending and perf_counter_ns() < deadline_ns:
+        consume_frames()
+        sleep(0)
+    end_ns = perf_counter_ns()
+
+    if output is not None:
+        output.width, output.height, output.label = recording.width, recording.height, recording.label
+        output.inputs, output.frames = recorder.recording.inputs, recorder.recording.frames
+
+    duration_s = max(end_ns - start_ns, 1) / 1e9
+    return _round({
+        'recording': {
+            'label': recording.label,
+            'inputs': len(recording.inputs),
+            'duration_ms': recording.duration_us / 1000.0,
+        },
+        'mode': 'fast' if fast else 'paced',
+        'duration_ms': duration_s * 1000.0,
+        'send_ms': (send_end_ns - start_ns) / 1e6,
+        'inputs_per_second': len(recording.inputs) / duration_s,
+        'frames': frames,
+        'frames_per_second': frames / duration_s,
+        'frames_skipped': host.ring.skipped,
+        'unresolved_inputs': len(tracker.pending) + tracker.lost_inputs,
+        'latency_ms': tracker.report(),
+    })
+
+
+def save_report(report: dict, filepath: str) -> None:
+    with open(filepath, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def _flatten(report: dict, prefix: str = '') -> Dict[str, object]:
+    items = {}
+    for key, value in report.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            items.update(_flatten(value, name + '.'))
+        else:
+            items[name] = value
+    return items
+
+
+def diff_reports(before: dict, after: dict) -> List[str]:
+    """ One line per metric that changed: 'name: before -> after (+x.x%)'. """
+    before, after = _flatten(before), _flatten(after)
+    lines = []
+    for name in sorted(set(before) | set(after)):
+        a, b = before.get(name, None), after.get(name, None)
+        if a == b:
+            continue
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            lines.append(f"{name}: {a} -> {b} ({(b - a) / abs(a) * 100.0:+.1f}%)")
+        else:
+            lines.append(f"{name}: {a} -> {b}")
+    return lines
+
+
+##################################################################################################
+##################################################################################################
+##################################################################################################
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record/replay of Blender Web Streaming input and frame traces")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="Write a synthetic recording")
+    generate.add_argument('generator', choices=sorted(GENERATORS))
+    generate.add_argument('-o', '--output', required=True)
+    generate.add_argument('--width', type=int, default=1280)
+    generate.add_argument('--height', type=int, default=720)
+    generate.add_argument('--rate', type=float, default=None, help="Events per second")
+    generate.add_argument('--duration', type=float, default=None, help="Seconds")
+
+    play = commands.add_parser('replay', help="Replay a recording against a renderer")
+    play.add_argument('recording')
+    play.add_argument('--url', default='mock://partial')
+    play.add_argument('--script', default=None, help="Renderer script (default: bws_mock.py)")
+    play.add_argument('--python', default=None, help="Python executable of the renderer (default: this one)")
+    play.add_argument('--slots', type=int, default=1)
+    play.add_argument('--fast', action='store_true', help="Send as fast as possible instead of the original pace")
+    play.add_argument('--report', default=None, help="Write the report JSON here")
+    play.add_argument('--timeline', default=None, help="Write the replayed recording (with frames) here")
+
+    diff = commands.add_parser('diff', help="Compare two replay reports")
+    diff.add_argument('before')
+    diff.add_argument('after')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        kwargs = {key: value for key, value in (('rate', args.rate), ('duration', args.duration)) if value is not None}
+        recording = GENERATORS[args.generator](args.width, args.height, **kwargs)
+        recording.save(args.output)
+        print(f"{len(recording.inputs)} inputs written to {args.output}")
+
+    elif args.command == 'replay':
+        try:
+            from bws_mock import MockHost
+        except ImportError:
+            from .bws_mock import MockHost
+        recording = Recording.load(args.recording)
+        output = Recording(recording.width, recording.height) if args.timeline else None
+        with MockHost(recording.width, recording.height, slot_count=args.slots, url=args.url,
+                      script=args.script, python=args.python) as host:
+            host.wait_frame(timeout=30.0)
+            report = replay(recording, host, fast=args.fast, output=output)
+        if args.report:
+            save_report(report, args.report)
+        if output is not None:
+            output.save(args.timeline)
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+    elif args.command == 'diff':
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        for line in diff_reports(before, after) or ["No differences"]:
+            print(line)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
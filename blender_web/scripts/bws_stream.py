@@ -0,0 +1,541 @@
+""" Remote streaming: frames as compressed tile deltas and binary events, relayed by a hub.
+
+    Messages (one WebSocket binary message, or length-prefixed on TCP):
+
+        MESSAGE_HEADER (kind, codec, correlation id) + body
+
+        FRAME       Tile delta: FRAME_HEADER + [TILE_HEADER + encoded RGBA8 tile]... Correlation id is the frame seq.
+                    Key frames carry every tile. Only the tiles that changed otherwise (bws_frames.TileHasher).
+        EVENT       A bws_protocol input record (signal + INPUT_HEADER + payload), as sent to a renderer socket.
+        REQUEST     JSON query to the renderer (e.g. element at x, y). Answered by a REPLY with the same correlation id.
+                    The publish() bridge answers every query with an error for now (no queries in the renderer protocol).
+        REPLY       JSON answer.
+        HELLO       First message on TCP: client role (utf-8).
+
+    Roles: one 'renderer' (publishes frames, answers requests) and any number of viewers ('blender', 'web'...).
+    The hub keeps the latest canvas. Every viewer has its own send queue: when a slow viewer falls
+    MAX_QUEUED_FRAMES behind, its queued deltas are dropped and it gets a key frame of the current canvas instead.
+    Events and replies are never dropped.
+
+    Usage:
+        python bws_stream.py hub --port 9100
+        python bws_stream.py publish --hub 127.0.0.1:9100 --url file://... --size 1280,720 --script bws_cefpython.py --python <venv python>
+
+    On the Blender machine, bws_remote.py stands in for the renderer script (same launch arguments, hub://host:port url).
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon. Standard library + numpy,
+    LZ4 (lz4) and WebP (Pillow) codecs are optional.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import struct
+import sys
+import threading
+import zlib
+from collections import deque
+from time import sleep
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from bws_frames import FrameRing, TileHasher, INV_255
+    from bws_protocol import recv_exact
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_frames import FrameRing, TileHasher, INV_255
+    from .bws_protocol import recv_exact
+
+
+TILE_SIZE = 64
+ZLIB_LEVEL = 1
+MAX_QUEUED_FRAMES = 4
+REQUEST_TIMEOUT = 5.0
+HUB_PORT = 9100
+# Url scheme of the pages relayed by a hub (bws_remote.py).
+HUB_SCHEME = 'hub'
+
+
+class MESSAGE:
+    FRAME = 1
+    EVENT = 2
+    REQUEST = 3
+    REPLY = 4
+    HELLO = 5
+
+
+class CODEC:
+    RAW = 0
+    ZLIB = 1
+    LZ4 = 2
+    WEBP = 3
+
+
+class ROLE:
+    RENDERER = 'renderer'
+    BLENDER = 'blender'
+    WEB = 'web'
+
+
+CODEC_NAMES = {CODEC.RAW: 'raw', CODEC.ZLIB: 'zlib', CODEC.LZ4: 'lz4', CODEC.WEBP: 'webp'}
+CODECS_BY_NAME = {name: codec for codec, name in CODEC_NAMES.items()}
+
+# kind, codec, correlation id.
+MESSAGE_HEADER = struct.Struct('!BBxxQ')
+# input id, width, height, tile size, tile count.
+FRAME_HEADER = struct.Struct('!QIIHxxI')
+# tile x, tile y (in tiles), encoded size.
+TILE_HEADER = struct.Struct('!HHI')
+LENGTH = struct.Struct('!I')
+
+
+def available_codecs() -> Dict[str, int]:
+    codecs = {'raw': CODEC.RAW, 'zlib': CODEC.ZLIB}
+    if lz4_frame is not None:
+        codecs['lz4'] = CODEC.LZ4
+    if Image is not None:
+        codecs['webp'] = CODEC.WEBP
+    return codecs
+
+
+# Tile codecs.
+# ----------------------------------------------------------------
+
+def encode_tile(tile: np.ndarray, codec: int) -> bytes:
+    """ (h, w, 4) uint8 tile -> bytes. """
+    if codec == CODEC.ZLIB:
+        return zlib.compress(tile.tobytes(), ZLIB_LEVEL)
+    if codec == CODEC.LZ4:
+        return lz4_frame.compress(tile.tobytes())
+    if codec == CODEC.WEBP:
+        import io
+        buffer = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(tile), 'RGBA').save(buffer, format='WEBP', lossless=True, quality=0)
+        return buffer.getvalue()
+    return tile.tobytes()
+
+
+def decode_tile(data, codec: int, out: np.ndarray) -> None:
+    """ Decodes a tile into 'out', a (h, w, 4) uint8 view of the canvas. """
+    if codec == CODEC.ZLIB:
+        data = zlib.decompress(data)
+    elif codec == CODEC.LZ4:
+        data = lz4_frame.decompress(data)
+    elif codec == CODEC.WEBP:
+        import io
+        out[...] = np.asarray(Image.open(io.BytesIO(data)).convert('RGBA'))
+        return
+    out[...] = np.frombuffer(data, dtype=np.uint8).reshape(out.shape)
+
+
+def encode_message(kind: int, correlation_id: int, body: bytes = b'', codec: int = CODEC.RAW) -> bytes:
+    return MESSAGE_HEADER.pack(kind, codec, correlation_id) + body
+
+
+def decode_message(data) -> Tuple[int, int, int, memoryview]:
+    """ Returns (kind, codec, correlation id, body). """
+    kind, codec, correlation_id = MESSAGE_HEADER.unpack_from(data, 0)
+    return kind, codec, correlation_id, memoryview(data)[MESSAGE_HEADER.size:]
+
+
+def encode_json(kind: int, correlation_id: int, payload: dict) -> bytes:
+    return encode_message(kind, correlation_id, json.dumps(payload).encode('utf-8'))
+
+
+def encode_frame_tiles(pixels: np.ndarray, tiles: np.ndarray, tile_size: int, codec: int, seq: int, input_id: int = 0) -> bytes:
+    """ FRAME message with the tiles flagged in 'tiles' (tile rows, tile columns) of an (H, W, 4) uint8 frame. """
+    height, width = pixels.shape[:2]
+    parts = []
+    for ty, tx in zip(*np.nonzero(tiles)):
+        y, x = int(ty) * tile_size, int(tx) * tile_size
+        data = encode_tile(pixels[y:y + tile_size, x:x + tile_size], codec)
+        parts.append(TILE_HEADER.pack(int(tx), int(ty), len(data)))
+        parts.append(data)
+    header = FRAME_HEADER.pack(input_id, width, height, tile_size, len(parts) // 2)
+    return encode_message(MESSAGE.FRAME, seq, header + b''.join(parts), codec)
+
+
+class TileDeltaEncoder:
+    """ Producer side: RGBA8 frames -> FRAME messages with the changed tiles only. """
+
+    def __init__(self, width: int, height: int, codec: int = CODEC.ZLIB, tile_size: int = TILE_SIZE) -> None:
+        self.width = width
+        self.height = height
+        self.codec = codec
+        self.tile_size = tile_size
+        self.hasher = TileHasher(width, height, 4, np.uint8, tile_size)
+        self.seq = 0
+
+    def encode(self, pixels: np.ndarray, input_id: int = 0, key: bool = False) -> Optional[bytes]:
+        """ Returns None if nothing changed (and no key frame was asked for). """
+        pixels = pixels.reshape(self.height, self.width, 4)
+        if key:
+            self.hasher.reset()
+        if self.hasher.update(pixels) is None:
+            return None
+        self.seq += 1
+        return encode_frame_tiles(pixels, self.hasher.changed, self.tile_size, self.codec, self.seq, input_id)
+
+
+class TileDeltaDecoder:
+    """ Consumer side: applies FRAME messages to an RGBA8 canvas. """
+
+    def __init__(self) -> None:
+        self.canvas: Optional[np.ndarray] = None
+        self.seq = 0
+        self.input_id = 0
+
+    def apply(self, message) -> Optional[Tuple[int, int, int, int]]:
+        """ Returns the dirty rect (x, y, w, h) of the frame, None for an empty delta. """
+        _kind, codec, seq, body = decode_message(message)
+        input_id, width, height, tile_size, tile_count = FRAME_HEADER.unpack_from(body, 0)
+        if self.canvas is None or self.canvas.shape[:2] != (height, width):
+            self.canvas = np.zeros((height, width, 4), dtype=np.uint8)
+        self.seq = seq
+        self.input_id = input_id
+        offset = FRAME_HEADER.size
+        x0 = y0 = 1 << 30
+        x1 = y1 = 0
+        for _ in range(tile_count):
+            tx, ty, size = TILE_HEADER.unpack_from(body, offset)
+            offset += TILE_HEADER.size
+            x, y = tx * tile_size, ty * tile_size
+            tile = self.canvas[y:y + tile_size, x:x + tile_size]
+            decode_tile(body[offset:offset + size], codec, tile)
+            offset += size
+            x0, y0 = min(x0, x), min(y0, y)
+            x1, y1 = max(x1, x + tile.shape[1]), max(y1, y + tile.shape[0])
+        if not tile_count:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+
+# Hub.
+# ----------------------------------------------------------------
+
+class HubClient:
+    """ A connection to the hub, with its own send queues. """
+
+    def __init__(self, hub: 'StreamHub', role: str, send: Callable[[bytes], Awaitable[None]]) -> None:
+        self.hub = hub
+        self.role = role
+        self.send = send
+        self.frames: Deque[bytes] = deque()
+        self.messages: Deque[bytes] = deque()
+        # Viewers start with a key frame, and get one after falling behind.
+        self.needs_key = role != ROLE.RENDERER
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self._wakeup = asyncio.Event()
+
+    def push_frame(self, message: bytes) -> None:
+        if self.needs_key:
+            # The key frame will include this delta.
+            self.frames_dropped += 1
+        elif len(self.frames) >= MAX_QUEUED_FRAMES:
+            self.frames_dropped += len(self.frames) + 1
+            self.frames.clear()
+            self.needs_key = True
+        else:
+            self.frames.append(message)
+        self._wakeup.set()
+
+    def push_message(self, message: bytes) -> None:
+        self.messages.append(message)
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.messages or self.frames or (self.needs_key and self.hub.decoder.canvas is not None):
+                if self.messages:
+                    await self.send(self.messages.popleft())
+                    continue
+                if self.needs_key:
+                    # Built now, from the current canvas: every later delta is queued after it.
+                    self.needs_key = False
+                    message = self.hub.key_frame()
+                else:
+                    message = self.frames.popleft()
+                await self.send(message)
+                self.frames_sent += 1
+
+
+class StreamHub:
+    """ Relays frames from the renderer to the viewers, and events/requests the other way. Transport agnostic. """
+
+    def __init__(self, codec: int = CODEC.ZLIB) -> None:
+        self.key_codec = codec
+        self.renderer: Optional[HubClient] = None
+        self.viewers: Dict[int, HubClient] = {}
+        self.decoder = TileDeltaDecoder()
+        self._key_frame: Tuple[int, bytes] = (-1, b'')
+        self._correlation_ids = itertools.count(1)
+        # Hub correlation id -> (viewer, its correlation id) or a Future for the hub's own requests.
+        self._pending: Dict[int, object] = {}
+
+    def key_frame(self) -> bytes:
+        seq, message = self._key_frame
+        if seq != self.decoder.seq or not message:
+            canvas = self.decoder.canvas
+            tiles = np.ones(((canvas.shape[0] + TILE_SIZE - 1) // TILE_SIZE, (canvas.shape[1] + TILE_SIZE - 1) // TILE_SIZE), dtype=bool)
+            message = encode_frame_tiles(canvas, tiles, TILE_SIZE, self.key_codec, self.decoder.seq, self.decoder.input_id)
+            self._key_frame = (self.decoder.seq, message)
+        return message
+
+    async def serve(self, role: str, send: Callable[[bytes], Awaitable[None]], receive: Callable[[], Awaitable[bytes]]) -> None:
+        """ Runs a connection until it closes: 'receive' returns the next message, 'send' sends one. """
+        client = HubClient(self, role, send)
+        if role == ROLE.RENDERER:
+            if self.renderer is not None:
+                print("[HUB] A new renderer replaces the previous one")
+            self.renderer = client
+        else:
+            self.viewers[id(client)] = client
+        print(f"[HUB] {role} connected")
+        sender = asyncio.ensure_future(client.run())
+        try:
+            while True:
+                self.handle(client, await receive())
+        except Exception as e:
+            print(f"[HUB] {role} disconnected: {e!r}")
+        finally:
+            sender.cancel()
+            if self.renderer is client:
+                self.renderer = None
+            self.viewers.pop(id(client), None)
+
+    def handle(self, client: HubClient, message) -> None:
+        kind, _codec, correlation_id, body = decode_message(message)
+        if client.role == ROLE.RENDERER:
+            if kind == MESSAGE.FRAME:
+                self.decoder.apply(message)
+                for viewer in self.viewers.values():
+                    viewer.push_frame(bytes(message))
+            elif kind == MESSAGE.REPLY:
+                self._reply(correlation_id, body)
+            elif kind == MESSAGE.EVENT:
+                for viewer in self.viewers.values():
+                    viewer.push_message(bytes(message))
+            return
+
+        if kind == MESSAGE.EVENT:
+            if self.renderer is not None:
+                self.renderer.push_message(bytes(message))
+        elif kind == MESSAGE.REQUEST:
+            hub_id = next(self._correlation_ids)
+            self._pending[hub_id] = (client, correlation_id)
+            if self.renderer is None:
+                self._reply(hub_id, json.dumps({'error': "Renderer not connected"}).encode('utf-8'))
+            else:
+                self.renderer.push_message(encode_message(MESSAGE.REQUEST, hub_id, bytes(body)))
+
+    def _reply(self, hub_id: int, body) -> None:
+        pending = self._pending.pop(hub_id, None)
+        if pending is None:
+            return
+        if isinstance(pending, asyncio.Future):
+            if not pending.done():
+                pending.set_result(json.loads(bytes(body)))
+            return
+        client, correlation_id = pending
+        client.push_message(encode_message(MESSAGE.REPLY, correlation_id, bytes(body)))
+
+    async def request(self, payload: dict, timeout: float = REQUEST_TIMEOUT) -> dict:
+        """ Asks the renderer. The answer is read by the renderer's receive loop, never here. """
+        if self.renderer is None:
+            return {'error': "Renderer not connected"}
+        hub_id = next(self._correlation_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[hub_id] = future
+        self.renderer.push_message(encode_json(MESSAGE.REQUEST, hub_id, payload))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return {'error': "Renderer did not answer"}
+        finally:
+            self._pending.pop(hub_id, None)
+
+
+# TCP transport (length-prefixed messages).
+# ----------------------------------------------------------------
+
+async def read_message(reader: asyncio.StreamReader) -> bytes:
+    size = LENGTH.unpack(await reader.readexactly(LENGTH.size))[0]
+    return await reader.readexactly(size)
+
+
+async def write_message(writer: asyncio.StreamWriter, message: bytes) -> None:
+    writer.write(LENGTH.pack(len(message)))
+    writer.write(message)
+    # Blocks the sender of a slow client: its queue fills up and it falls back to key frames.
+    await writer.drain()
+
+
+async def serve_tcp(hub: StreamHub, host: str = '127.0.0.1', port: int = HUB_PORT) -> asyncio.AbstractServer:
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            kind, _codec, _id, body = decode_message(await read_message(reader))
+            if kind != MESSAGE.HELLO:
+                return
+            await hub.serve(bytes(body).decode('utf-8'), lambda message: write_message(writer, message), lambda: read_message(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(_handle, host, port)
+
+
+class HubConnection:
+    """ Blocking TCP client of a hub (renderer bridges, bws_remote.py). send() is thread-safe. """
+
+    def __init__(self, host: str, port: int, role: str) -> None:
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lock = threading.Lock()
+        self.send(encode_message(MESSAGE.HELLO, 0, role.encode('utf-8')))
+
+    def send(self, message: bytes) -> None:
+        with self._lock:
+            self.sock.sendall(LENGTH.pack(len(message)) + message)
+
+    def receive(self) -> bytes:
+        """ Next message. Raises ConnectionError when the hub closes the connection. """
+        size = recv_exact(self.sock, LENGTH.size)
+        if not size:
+            raise ConnectionError("Hub connection closed")
+        message = recv_exact(self.sock, LENGTH.unpack(size)[0])
+        if not message:
+            raise ConnectionError("Hub connection closed")
+        return message
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """ 'host:port' or 'hub://host:port'. """
+    host, _, port = address.split('://')[-1].rstrip('/').rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def hub_url(address: str) -> str:
+    """ 'host:port' (or a hub:// url) -> 'hub://host:port'. Raises ValueError if the port is not a number. """
+    return '%s://%s:%d' % (HUB_SCHEME, *parse_address(address))
+
+
+def frame_to_rgba8(pixels: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """ FrameRing slot pixels (float32 normalized or uint8) -> (H, W, 4) uint8 'out'. """
+    if pixels.dtype == np.uint8:
+        np.copyto(out.reshape(-1), pixels)
+    else:
+        np.copyto(out.reshape(-1), np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5, casting='unsafe')
+    return out
+
+
+def rgba8_to_frame(rgba8: np.ndarray, out: np.ndarray) -> None:
+    """ (H, W, 4) uint8 canvas -> FrameRing slot pixels (float32 normalized or uint8). """
+    if out.dtype == np.uint8:
+        np.copyto(out, rgba8.reshape(-1))
+    else:
+        np.multiply(rgba8.reshape(-1), INV_255, out=out)
+
+
+# Renderer side bridge.
+# ----------------------------------------------------------------
+
+def publish(hub_address: str, url: str, width: int, height: int, codec: int = CODEC.ZLIB,
+            script: str = None, python: str = None, stop: threading.Event = None) -> None:
+    """ Runs a renderer locally (bws_mock.MockHost plays Blender), publishes its frames to a hub
+        and forwards the hub events to it. Blocks until 'stop' is set or a connection closes. """
+    try:
+        from bws_mock import MockHost
+    except ImportError:
+        from .bws_mock import MockHost
+
+    stop = stop or threading.Event()
+    connection = HubConnection(*parse_address(hub_address), ROLE.RENDERER)
+    with MockHost(width, height, slot_count=3, url=url, script=script, python=python) as host:
+        def _forward_events():
+            try:
+                while not stop.is_set():
+                    kind, _codec, correlation_id, body = decode_message(connection.receive())
+                    if kind == MESSAGE.EVENT:
+                        host.client.sendall(bytes(body))
+                    elif kind == MESSAGE.REQUEST:
+                        # Stub: the renderer socket protocol has no queries yet (GET /element of bws_server always gets this).
+                        connection.send(encode_json(MESSAGE.REPLY, correlation_id, {'error': "Unsupported request: renderers do not answer queries yet"}))
+            except (ConnectionError, OSError):
+                stop.set()
+
+        threading.Thread(target=_forward_events, name='bws_stream_events', daemon=True).start()
+        encoder = TileDeltaEncoder(width, height, codec)
+        rgba8 = np.empty((height, width, 4), dtype=np.uint8)
+        print(f"[PUBLISH] {url} {width}x{height} -> hub {hub_address} ({CODEC_NAMES[codec]})")
+        try:
+            while not stop.is_set():
+                slot = host.ring.acquire_read()
+                if slot is None:
+                    sleep(0.001)
+                    continue
+                header = host.ring.read_header(slot)
+                frame_to_rgba8(host.ring.pixels(slot), rgba8)
+                host.ring.release(slot)
+                message = encoder.encode(rgba8, header.input_id)
+                if message is not None:
+                    connection.send(message)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            stop.set()
+            connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    hub_parser = commands.add_parser('hub', help="Run a TCP hub (no FastAPI needed, see scripts/bws_server.py for WebSockets)")
+    hub_parser.add_argument('--host', default='127.0.0.1')
+    hub_parser.add_argument('--port', type=int, default=HUB_PORT)
+
+    publish_parser = commands.add_parser('publish', help="Run a renderer and publish its frames to a hub")
+    publish_parser.add_argument('--hub', default=f'127.0.0.1:{HUB_PORT}')
+    publish_parser.add_argument('--url', default='mock://animated')
+    publish_parser.add_argument('--size', default='1280,720', help="width,height")
+    publish_parser.add_argument('--codec', default='zlib', choices=sorted(available_codecs()))
+    publish_parser.add_argument('--script', default=None, help="Renderer script (bws_mock.py by default)")
+    publish_parser.add_argument('--python', default=None, help="Python executable of the renderer")
+
+    args = parser.parse_args()
+    if args.command == 'hub':
+        async def _run_hub():
+            server = await serve_tcp(StreamHub(), args.host, args.port)
+            print(f"[HUB] Listening on {args.host}:{args.port}")
+            async with server:
+                await server.serve_forever()
+        asyncio.run(_run_hub())
+    else:
+        width, height = [int(v) for v in args.size.split(',')]
+        publish(args.hub, args.url, width, height, CODECS_BY_NAME[args.codec], args.script, args.python)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
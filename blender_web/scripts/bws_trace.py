@@ -0,0 +1,177 @@
+""" Input-to-photon latency tracking and Chrome trace export.
+
+    Blender stamps every input (bws_protocol.encode_input) with an id and a send time.
+    The renderer echoes the id of the last input it applied in each frame header
+    (bws_frames.FrameHeader), so when Blender draws that frame every pending input with
+    a lower or equal id is resolved: latency = draw end - send time.
+
+    All times are perf_counter_ns() values, comparable between processes.
+    Traces are written in the Chrome trace event format (chrome://tracing, Perfetto).
+
+    NOTE: Shared by the renderer scripts (Python 3.9) and the addon, standard library only.
+"""
+
+import json
+import os
+from collections import OrderedDict, deque
+from time import perf_counter_ns
+from typing import Dict, List, Tuple
+
+try:
+    from bws_metrics import Histogram
+    from bws_protocol import SIGNAL_NAMES
+except ImportError:
+    # Imported from the addon (blender_web.scripts package).
+    from .bws_metrics import Histogram
+    from .bws_protocol import SIGNAL_NAMES
+
+
+MAX_TRACE_EVENTS = 200_000
+MAX_PENDING_INPUTS = 4096
+
+# Track (tid) ids inside each process.
+TID_MAIN = 1
+TID_LATENCY = 2
+
+
+class TraceBuffer:
+    """ Bounded list of Chrome trace events. Oldest events are dropped first. """
+
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS) -> None:
+        self.events = deque(maxlen=max_events)
+        self.metadata: List[dict] = []
+
+    def complete(self, name: str, cat: str, pid: int, tid: int, start_ns: int, end_ns: int, args: dict = None) -> None:
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': start_ns / 1000.0, 'dur': max(end_ns - start_ns, 0) / 1000.0}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, cat: str, pid: int, tid: int, time_ns: int, args: dict = None) -> None:
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'pid': pid, 'tid': tid, 'ts': time_ns / 1000.0}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def name_process(self, pid: int, name: str) -> None:
+        self.metadata.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+
+    def name_thread(self, pid: int, tid: int, name: str) -> None:
+        self.metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+
+    def extend(self, events) -> None:
+        self.events.extend(events)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def to_dict(self) -> dict:
+        return {'traceEvents': self.metadata + list(self.events), 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(filepath: str, *traces: TraceBuffer) -> int:
+    """ Writes one or more trace buffers into a single Chrome trace JSON file. Returns the event count. """
+    events = []
+    for trace in traces:
+        events.extend(trace.to_dict()['traceEvents'])
+    with open(filepath, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
+
+
+class LatencyTracker:
+    """ Blender side. Matches sent inputs with the drawn frames that reflect them. """
+
+    def __init__(self, label: str, max_pending: int = MAX_PENDING_INPUTS, max_events: int = MAX_TRACE_EVENTS) -> None:
+        self.label = label
+        self.pid = os.getpid()
+        self.renderer_pid = 0
+        self.next_input_id = 1
+        self.max_pending = max_pending
+        # input_id -> (signal, send time).
+        self.pending: 'OrderedDict[int, Tuple[int, int]]' = OrderedDict()
+        # Consumed frames waiting to be drawn: (frame header, upload start, upload end).
+        self.undrawn: List[tuple] = []
+        self.lost_inputs = 0
+        self.histograms: Dict[str, Histogram] = {}
+        self.trace = TraceBuffer(max_events)
+        self._named_pids = set()
+        self._name_pid(self.pid, f"Blender [{label}]")
+
+    def _name_pid(self, pid: int, name: str) -> None:
+        if pid and pid not in self._named_pids:
+            self._named_pids.add(pid)
+            self.trace.name_process(pid, name)
+            self.trace.name_thread(pid, TID_MAIN, 'main')
+            self.trace.name_thread(pid, TID_LATENCY, 'input-to-photon')
+
+    def set_renderer_pid(self, pid: int) -> None:
+        if pid != self.renderer_pid:
+            self.renderer_pid = pid
+            self._name_pid(pid, f"Renderer [{self.label}]")
+
+    def new_input(self, signal: int) -> Tuple[int, int]:
+        """ Stamps a new input. Returns (input_id, time_ns) to encode in the input record. """
+        input_id = self.next_input_id
+        self.next_input_id += 1
+        time_ns = perf_counter_ns()
+        self.pending[input_id] = (signal, time_ns)
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.lost_inputs += 1
+        self.trace.instant(SIGNAL_NAMES.get(signal, str(signal)), 'input', self.pid, TID_MAIN, time_ns, {'input_id': input_id})
+        return input_id, time_ns
+
+    def frame_consumed(self, header, upload_start_ns: int, upload_end_ns: int) -> None:
+        """ 'header' is the bws_frames.FrameHeader of the uploaded slot. """
+        self.undrawn.append((header, upload_start_ns, upload_end_ns))
+        if self.renderer_pid and header.paint_start_ns:
+            self.trace.complete('paint', 'frame', self.renderer_pid, TID_MAIN, header.paint_start_ns, header.publish_ns,
+                                {'seq': header.seq, 'input_id': header.input_id})
+        if self.renderer_pid and header.input_applied_ns:
+            self.trace.instant('input applied', 'input', self.renderer_pid, TID_MAIN, header.input_applied_ns, {'input_id': header.input_id})
+        self.trace.complete('upload', 'frame', self.pid, TID_MAIN, upload_start_ns, upload_end_ns, {'seq': header.seq})
+
+    def frame_drawn(self, draw_start_ns: int, draw_end_ns: int) -> None:
+        if not self.undrawn:
+            return
+        frames = self.undrawn
+        self.undrawn = []
+        last_input_id = max(header.input_id for header, _, _ in frames)
+        self.trace.complete('draw', 'frame', self.pid, TID_MAIN, draw_start_ns, draw_end_ns,
+                            {'seq': frames[-1][0].seq, 'input_id': last_input_id})
+
+        pending = self.pending
+        while pending:
+            input_id = next(iter(pending))
+            if input_id > last_input_id:
+                break
+            signal, sent_ns = pending.popitem(last=False)[1]
+            name = SIGNAL_NAMES.get(signal, str(signal))
+            histogram = self.histograms.get(name, None)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe((draw_end_ns - sent_ns) / 1_000_000)
+            self.trace.complete(name, 'latency', self.pid, TID_LATENCY, sent_ns, draw_end_ns, {'input_id': input_id})
+
+    def report(self) -> Dict[str, dict]:
+        """ Input-to-photon latency percentiles (ms) by event type. """
+        return {
+            name: {
+                'count': histogram.count,
+                'mean': histogram.mean,
+                'p50': histogram.percentile(50),
+                'p95': histogram.percentile(95),
+                'p99': histogram.percentile(99),
+                'max': histogram.max,
+            }
+            for name, histogram in self.histograms.items()
+        }
+
+    def reset(self) -> None:
+        self.pending.clear()
+        self.undrawn.clear()
+        self.histograms.clear()
+        self.trace.clear()
+        self.lost_inputs = 0
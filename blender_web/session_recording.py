@@ -0,0 +1,49 @@
+from bpy.props import StringProperty
+from bpy.types import Context, Operator
+from bpy_extras.io_utils import ExportHelper
+
+from .metrics import ViewMetrics, live_views
+from .scripts.bws_replay import SessionRecorder
+
+
+def start_recording(view_metrics: ViewMetrics) -> None:
+    ''' The view feeds 'view_metrics.recorder' with its inputs and consumed frames (see bws_replay). '''
+    view_metrics.recorder = SessionRecorder(view_metrics.label, *view_metrics.size)
+
+
+def stop_recording(view_metrics: ViewMetrics) -> SessionRecorder | None:
+    recorder, view_metrics.recorder = view_metrics.recorder, None
+    return recorder
+
+
+class BWS_OT_record_session_start(Operator):
+    bl_idname = "bws.record_session_start"
+    bl_label = "Start Session Recording"
+    bl_description = "Record the input stream and frame timeline of the web views, to replay them later with bws_replay.py"
+
+    def execute(self, context: Context):
+        for view_metrics in live_views():
+            start_recording(view_metrics)
+        return {'FINISHED'}
+
+
+class BWS_OT_record_session_stop(Operator, ExportHelper):
+    bl_idname = "bws.record_session_stop"
+    bl_label = "Save Session Recording"
+    bl_description = "Stop recording and save one recording file per web view"
+
+    filename_ext = '.json'
+    filter_glob: StringProperty(default='*.json', options={'HIDDEN'})
+
+    def execute(self, context: Context):
+        recorders = [recorder for view_metrics in live_views() if (recorder := stop_recording(view_metrics))]
+        if not recorders:
+            self.report({'WARNING'}, "No session was being recorded")
+            return {'CANCELLED'}
+        for recorder in recorders:
+            filepath = self.filepath
+            if len(recorders) > 1:
+                filepath = filepath.removesuffix(self.filename_ext) + f"_{recorder.recording.label}" + self.filename_ext
+            recorder.recording.save(filepath)
+        self.report({'INFO'}, f"Saved {len(recorders)} recording(s)")
+        return {'FINISHED'}
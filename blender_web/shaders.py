@@ -2,6 +2,10 @@ import bpy
 import gpu
 
 
+# No GPU context in background mode (blender -b): the draw code is never reached there,
+# but the modules importing the shader must still load (offline rendering runs headless).
+IMAGE_SHADER: gpu.types.GPUShader | None = None
+
 if not bpy.app.background:
     IMAGE_SHADER = gpu.types.GPUShader(
 """
@@ -1,3 +1,4 @@
-from .event_globals import GEvent, isEventType, isEventValue, isEvent, set_global_event, get_global_event
+from .event_globals import GEvent, isEventType, isEventValue, isEvent, set_global_event, get_global_event, get_global_event_code
+from .event_codes import EventDispatch, event_code
 from .event_enums import EventType, EventValue
 from .mouse import Mouse, get_mouse_pos
\ No newline at end of file
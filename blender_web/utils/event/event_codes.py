@@ -0,0 +1,102 @@
+''' Blender events as small integers.
+
+    (event.type, event.value) is interned once into an int code: routing an event is then a single
+    dict lookup, and dispatch tables are built from codes ahead of time (see EventDispatch).
+
+    code = type_code << VALUE_BITS | value_code
+'''
+
+from collections.abc import Callable
+
+from bpy.types import Event
+
+from .event_enums import EventType, EventValue
+
+
+VALUE_BITS = 4
+VALUE_MASK = (1 << VALUE_BITS) - 1
+
+
+def _enum_values(enum_cls) -> list[str]:
+    return [value for name, value in vars(enum_cls).items() if not name.startswith('_') and isinstance(value, str)]
+
+
+# Code -> name, and name -> code. Unknown names (newer Blender versions) are interned when first seen.
+EVENT_TYPES: list[str] = _enum_values(EventType)
+EVENT_VALUES: list[str] = _enum_values(EventValue)
+TYPE_CODES: dict[str, int] = {event_type: index for index, event_type in enumerate(EVENT_TYPES)}
+VALUE_CODES: dict[str, int] = {event_value: index for index, event_value in enumerate(EVENT_VALUES)}
+
+# (type, value) -> code.
+EVENT_CODES: dict[tuple[str, str], int] = {
+    (event_type, event_value): (type_code << VALUE_BITS) | value_code
+    for event_type, type_code in TYPE_CODES.items()
+    for event_value, value_code in VALUE_CODES.items()
+}
+
+
+def _intern(names: list[str], codes: dict[str, int], name: str, limit: int | None = None) -> int:
+    code = codes.get(name, None)
+    if code is None:
+        code = len(names)
+        if limit is not None and code > limit:
+            raise ValueError(f"Too many event values to intern '{name}'")
+        names.append(name)
+        codes[name] = code
+    return code
+
+
+def code(event_type: str, event_value: str) -> int:
+    ''' Code of a (type, value) pair. Use it to build dispatch tables. '''
+    event_code = EVENT_CODES.get((event_type, event_value), None)
+    if event_code is None:
+        type_code = _intern(EVENT_TYPES, TYPE_CODES, event_type)
+        value_code = _intern(EVENT_VALUES, VALUE_CODES, event_value, VALUE_MASK)
+        event_code = EVENT_CODES[event_type, event_value] = (type_code << VALUE_BITS) | value_code
+    return event_code
+
+
+def event_code(event: Event) -> int:
+    ''' Code of a Blender event. '''
+    try:
+        return EVENT_CODES[event.type, event.value]
+    except KeyError:
+        return code(event.type, event.value)
+
+
+def type_code(event_type: str) -> int:
+    ''' Type part of the codes: 'event_code >> VALUE_BITS'. '''
+    return _intern(EVENT_TYPES, TYPE_CODES, event_type)
+
+
+def code_name(event_code: int) -> tuple[str, str]:
+    return EVENT_TYPES[event_code >> VALUE_BITS], EVENT_VALUES[event_code & VALUE_MASK]
+
+
+class EventDispatch:
+    ''' Precomputed table: event code -> (handler, record).
+        'record' holds the arguments appended to the handler call, like the protocol signal to send.
+        A handler added with the 'ANY' value matches every value of its type. '''
+    __slots__ = ('table',)
+
+    def __init__(self) -> None:
+        self.table: dict[int, tuple[Callable, tuple]] = {}
+
+    def add(self, event_type: str, event_value: str, handler: Callable, *record) -> None:
+        event_values = EVENT_VALUES if event_value == EventValue.ANY else (event_value,)
+        for value in event_values:
+            self.table[code(event_type, value)] = (handler, record)
+
+    def get(self, event_code: int) -> tuple[Callable, tuple] | None:
+        return self.table.get(event_code, None)
+
+    def dispatch(self, event_code: int, *args, default=None):
+        ''' Calls the handler of the code with '(*args, *record)'. Returns its result, 'default' if there is none. '''
+        route = self.table.get(event_code, None)
+        if route is None:
+            return default
+        handler, record = route
+        return handler(*args, *record)
+
+    def __contains__(self, event_code: int) -> bool:
+        return event_code in self.table
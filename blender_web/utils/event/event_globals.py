@@ -1,9 +1,12 @@
 from mathutils import Vector
 from bpy.types import Event
 
+from .event_codes import EVENT_CODES, code, event_code
+
 
 EVENT_TYPE = 'NONE'
 EVENT_VALUE = 'NONE'
+EVENT_CODE = code('NONE', 'NOTHING')
 EVENT_MODIFIERS = { # Ctrl, Shift, Alt states.
     'ctrl':     False,
     'shift':    False,
@@ -15,22 +18,27 @@ MOUSE_REGION = Vector((0, 0))
 def set_global_event(event: Event):
     global EVENT_TYPE
     global EVENT_VALUE
-    global EVENT_MODIFIERS
+    global EVENT_CODE
     EVENT_TYPE = event.type
     EVENT_VALUE = event.value
+    EVENT_CODE = event_code(event)
     EVENT_MODIFIERS['alt'] = event.alt
     EVENT_MODIFIERS['ctrl'] = event.ctrl
     EVENT_MODIFIERS['shift'] = event.shift
-    global MOUSE
-    global MOUSE_REGION
-    MOUSE = Vector((event.mouse_x, event.mouse_y))
-    MOUSE_REGION = Vector((event.mouse_region_x, event.mouse_region_y))
+    # In place: no Vector per event.
+    MOUSE[0] = event.mouse_x
+    MOUSE[1] = event.mouse_y
+    MOUSE_REGION[0] = event.mouse_region_x
+    MOUSE_REGION[1] = event.mouse_region_y
 
 def get_global_event() -> tuple[str, str]:
     global EVENT_TYPE
     global EVENT_VALUE
     return EVENT_TYPE, EVENT_VALUE
 
+def get_global_event_code() -> int:
+    return EVENT_CODE
+
 
 class _isEventValue:
     _ANY: str = 'ANY'
@@ -855,6 +863,6 @@ class GEvent:
             return False
         if event_value == 'ANY':
             return event_type == EVENT_TYPE
-        return event_type == EVENT_TYPE and event_value == EVENT_VALUE
+        return EVENT_CODES.get((event_type, event_value), None) == EVENT_CODE
 
 isEvent = GEvent.check
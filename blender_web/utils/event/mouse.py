@@ -1,7 +1,5 @@
-from bpy.types import Event, Context
-from mathutils import Vector, Matrix
-
-from ..node_editor import get_node_editor_zoom, get_node_editor_region_coord
+from bpy.types import Event, Context, View2D
+from mathutils import Vector
 
 from math import modf
 
@@ -18,227 +16,340 @@ class _RectTransform:
     def convert_abs_coord_to_rel_coord(self, point: Vector) -> Vector: pass
 
 
+def _sign(value: float) -> int:
+    return 0 if value == 0 else 1 if value > 0 else -1
+
+
 class Mouse:
-    current: Vector   # current mouse position.
-    prev: Vector      # previous mouse position.
-    start: Vector     # initial mouse position.
-    offset: Vector    # mouse offset between initial position and current position.
-    delta: Vector     # difference of mouse position between prev and current.
-
-    # local: Vector     # local space coordinates.
-    local_rel: Vector # local space coordinates, relative factor between [0, 1].
-    local_current: Vector # current local space coordinates.
-    local_prev: Vector
-    local_start: Vector
-    local_offset: Vector
-    local_delta: Vector
-    local_dir: Vector
-    local_delta_int: Vector # Same as local_delta but it always returns a integer value, with cumulative effect.
-    local_delta_acummulative: Vector # Exclusively used for 'local_delta_int' as a cumulative delta value.
-
-    view_current: Vector
-    view_prev: Vector
-    view_start: Vector
-    view_offset: Vector
-    view_delta: Vector
-
-    dir: Vector       # direction of mouse taking into account previous position.
-    
+    ''' Pointer state of a modal, updated in place.
+
+        'update' only stores the region coordinates: no allocation per event. The Vector attributes are
+        preallocated and refreshed when they are read, so callers keep the same objects between events.
+        View and local space coordinates are computed on read, from the View2D of the last 'update' that
+        got a context: several moves between two reads cost a single transform.
+        NOTE: local space deltas ('local_delta', 'local_dir', 'local_delta_int') are relative to the previous read.
+    '''
+    __slots__ = (
+        # Region space, as plain numbers.
+        '_x', '_y', '_prev_x', '_prev_y', '_start_x', '_start_y',
+        '_current', '_prev', '_start', '_offset', '_delta', '_dir',
+        # View space.
+        '_view2d', '_region_height', '_view_valid',
+        '_view_current', '_view_prev', '_view_start', '_view_offset', '_view_delta',
+        # Local space.
+        '_rect', '_local_valid', '_local_ready',
+        '_local_rel', '_local_current', '_local_prev', '_local_start', '_local_offset',
+        '_local_delta', '_local_dir', '_local_delta_int', '_local_delta_acummulative',
+        'error',
+    )
+
     error: object | None | str | bool
 
+    def __init__(self) -> None:
+        self._x = self._y = self._prev_x = self._prev_y = self._start_x = self._start_y = 0
+        self._current = Vector((0, 0))
+        self._prev = Vector((0, 0))
+        self._start = Vector((0, 0))
+        self._offset = Vector((0, 0))
+        self._delta = Vector((0, 0))
+        self._dir = Vector((0, 0))
+
+        self._view2d: View2D | None = None
+        self._region_height = 0
+        self._view_valid = False
+        self._view_current = Vector((0, 0))
+        self._view_prev = Vector((0, 0))
+        self._view_start = Vector((0, 0))
+        self._view_offset = Vector((0, 0))
+        self._view_delta = Vector((0, 0))
+
+        self._rect: _RectTransform | None = None
+        self._local_valid = False
+        self._local_ready = False
+        self._local_rel = Vector((0, 0))
+        self._local_current = Vector((0, 0))
+        self._local_prev = Vector((0, 0))
+        self._local_start = Vector((0, 0))
+        self._local_offset = Vector((0, 0))
+        self._local_delta = Vector((0, 0))
+        self._local_dir = Vector((0, 0))
+        self._local_delta_int = Vector((0, 0))
+        self._local_delta_acummulative = Vector((0, 0))
+
+        self.error = False
 
     @staticmethod
     def init(event: Event, context: Context | None = None, local_space__rect: _RectTransform | None = None) -> 'Mouse':
         mouse = Mouse()
-        mouse.error = False
-        mouse_region_pos = Vector((event.mouse_region_x, event.mouse_region_y))
-
-        mouse.start = mouse_region_pos
-        mouse.current = mouse_region_pos.copy()
-        mouse.prev = mouse_region_pos.copy()
-        mouse.offset = Vector((0, 0))
-        mouse.delta = Vector((0, 0))
-        mouse.dir = Vector((0, 0))
-
-        if context is not None:
-            view2d = context.region.view2d
-        else:
-            view2d = None
-
-        if view2d is not None:
-            view_pos = view2d.region_to_view(event.mouse_region_x, event.mouse_region_y)
-            mouse.view_current = Vector(view_pos)
-            mouse.view_prev = Vector(view_pos)
-            mouse.view_start = Vector(view_pos)
-            mouse.view_offset = Vector((0, 0))
-            mouse.view_delta = Vector((0, 0))
+        mouse.reset(event, context, local_space__rect)
+        return mouse
 
-            if local_space__rect is not None:
-                mouse.update_local_space(context, local_space__rect, first_time=True)
+    def reset(self, event: Event, context: Context | None = None, local_space__rect: _RectTransform | None = None) -> None:
+        ''' Makes the event position the start position. '''
+        self.error = False
+        self._x = self._prev_x = self._start_x = event.mouse_region_x
+        self._y = self._prev_y = self._start_y = event.mouse_region_y
 
-        return mouse
+        self._set_view(context)
+        self._rect = local_space__rect
+        self._local_valid = False
+        self._local_ready = False
+        if self._view2d is not None:
+            self._view_start.xy = self._view2d.region_to_view(self._x, self._y)
 
     def update(self, event: Event, context: Context | None = None, local_space__rect: _RectTransform | None = None) -> None:
         if self.error:
-            self.init(event, context, local_space__rect)
-            self.error = False
+            self.reset(event, context, local_space__rect)
             return
 
-        self.prev.x = self.current.x
-        self.prev.y = self.current.y
-        self.current.x = event.mouse_region_x
-        self.current.y = event.mouse_region_y
-        self.delta.x = self.current.x - self.prev.x
-        self.delta.y = self.current.y - self.prev.y
-        self.offset.x = self.current.x - self.start.x
-        self.offset.y = self.current.y - self.start.y
+        self._prev_x = self._x
+        self._prev_y = self._y
+        self._x = event.mouse_region_x
+        self._y = event.mouse_region_y
 
+        self._view_valid = False
+        self._local_valid = False
         if context is not None:
-            view2d = context.region.view2d
-        else:
-            view2d = None
-
-        if view2d is not None:
-            view_pos = view2d.region_to_view(event.mouse_region_x, event.mouse_region_y)
-            self.view_delta.x = self.view_current.x - self.view_prev.x
-            self.view_delta.y = self.view_current.y - self.view_prev.y
-            self.view_prev.x = self.view_current.x
-            self.view_prev.y = self.view_current.y
-            self.view_current.x = view_pos[0]
-            self.view_current.y = view_pos[1]
-            self.view_offset.x = self.view_current.x - self.view_start.x
-            self.view_offset.y = self.view_current.y - self.view_start.y
-
+            self._set_view(context)
             if local_space__rect is not None:
-                self.update_local_space(context, local_space__rect)
-
-        self.dir.x = 0 if self.delta.x==0 else 1 if self.delta.x > 0 else -1
-        self.dir.y = 0 if self.delta.y==0 else 1 if self.delta.y > 0 else -1
-
-            # print("Local Current", self.local_current)
-            # print("Local Delta", self.local_delta)
-            # print("Local Dir", self.local_dir)
+                self._rect = local_space__rect
 
+    def _set_view(self, context: Context | None) -> None:
+        if context is None or context.region is None:
+            self._view2d = None
+            return
+        region = context.region
+        self._view2d = region.view2d
+        self._region_height = region.height
+        self._view_valid = False
+
+    # ----------------------------------------------------------------
+    # Region space.
+
+    @property
+    def current(self) -> Vector:
+        ''' Current mouse position. '''
+        vec = self._current
+        vec.x = self._x
+        vec.y = self._y
+        return vec
+
+    @property
+    def prev(self) -> Vector:
+        ''' Previous mouse position. '''
+        vec = self._prev
+        vec.x = self._prev_x
+        vec.y = self._prev_y
+        return vec
+
+    @property
+    def start(self) -> Vector:
+        ''' Initial mouse position. '''
+        vec = self._start
+        vec.x = self._start_x
+        vec.y = self._start_y
+        return vec
+
+    @property
+    def offset(self) -> Vector:
+        ''' Mouse offset between initial position and current position. '''
+        vec = self._offset
+        vec.x = self._x - self._start_x
+        vec.y = self._y - self._start_y
+        return vec
+
+    @property
+    def delta(self) -> Vector:
+        ''' Difference of mouse position between prev and current. '''
+        vec = self._delta
+        vec.x = self._x - self._prev_x
+        vec.y = self._y - self._prev_y
+        return vec
+
+    @property
+    def dir(self) -> Vector:
+        ''' Direction of mouse taking into account previous position. '''
+        vec = self._dir
+        vec.x = _sign(self._x - self._prev_x)
+        vec.y = _sign(self._y - self._prev_y)
+        return vec
+
+    # ----------------------------------------------------------------
+    # View space.
+
+    def _update_view(self) -> None:
+        if self._view_valid or self._view2d is None:
+            return
+        region_to_view = self._view2d.region_to_view
+        self._view_current.xy = region_to_view(self._x, self._y)
+        self._view_prev.xy = region_to_view(self._prev_x, self._prev_y)
+        self._view_valid = True
+
+    @property
+    def view_current(self) -> Vector:
+        self._update_view()
+        return self._view_current
+
+    @property
+    def view_prev(self) -> Vector:
+        self._update_view()
+        return self._view_prev
+
+    @property
+    def view_start(self) -> Vector:
+        return self._view_start
+
+    @property
+    def view_offset(self) -> Vector:
+        self._update_view()
+        vec = self._view_offset
+        vec.x = self._view_current.x - self._view_start.x
+        vec.y = self._view_current.y - self._view_start.y
+        return vec
+
+    @property
+    def view_delta(self) -> Vector:
+        self._update_view()
+        vec = self._view_delta
+        vec.x = self._view_current.x - self._view_prev.x
+        vec.y = self._view_current.y - self._view_prev.y
+        return vec
+
+    # ----------------------------------------------------------------
+    # Local space.
+
+    def _update_local(self) -> None:
+        if self._local_valid or self._rect is None or self._view2d is None:
+            return
+        self._local_valid = True
+        self._local_step()
 
-    def update_local_space(self, context: Context, local_space__rect: _RectTransform, first_time: bool = False) -> None:
-        # Get projected size.
-        view_size = local_space__rect.size
-        view_zoom = get_node_editor_zoom(context)
+    def _local_step(self) -> None:
+        view2d = self._view2d
+        view_to_region = view2d.view_to_region
 
-        reg_size = view_size * view_zoom
+        # Node editor zoom.
+        region_height = self._region_height
+        view_height = view2d.region_to_view(0, region_height)[1] - view2d.region_to_view(0, 0)[1]
+        view_zoom = 1 if view_height == 0 else region_height / view_height
 
         # Project from View2D to Region.
-        top_left, bottom_left, bottom_right, top_right = local_space__rect.coords_rotated
-        top_left = get_node_editor_region_coord(context, top_left)
-        bottom_left = get_node_editor_region_coord(context, bottom_left)
-        bottom_right = get_node_editor_region_coord(context, bottom_right)
-        # top_right = get_node_editor_region_coord(context, top_right)
+        top_left, bottom_left, bottom_right, _top_right = self._rect.coords_rotated
+        tl_x, tl_y = view_to_region(top_left[0], top_left[1], clip=False)
+        bl_x, bl_y = view_to_region(bottom_left[0], bottom_left[1], clip=False)
+        br_x, br_y = view_to_region(bottom_right[0], bottom_right[1], clip=False)
 
         # Change from region to local coordinates.
-        l_co = bottom_left
-        l_hor = bottom_right - l_co
-        l_ver = top_left - l_co
-
-        a, b = l_hor.x, l_ver.x
-        c, d = l_hor.y, l_ver.y
+        a, b = br_x - bl_x, tl_x - bl_x
+        c, d = br_y - bl_y, tl_y - bl_y
 
         A_det = a * d - b * c
         if A_det == 0:
             self.error = True
             return
 
-        A = Matrix((
-            (a, b), # a b
-            (c, d)  # c d
-        ))
-        A.invert()
-
-        # A_adj = ((d, -b), (-c, a))
-        ## k = (1 / A_det)
-        ## A = Matrix(((k*d, k*-b), (k*-c, k*a)))
-
-        Q = self.current - l_co
-
-        local_rel_mouse = A @ Q
-
-        local_abs_mouse = Vector((
-            local_rel_mouse.x * reg_size.x,
-            local_rel_mouse.y * reg_size.y
-        ))
-
-        # print("> LocalRelMouse:", local_rel_mouse)
-        # print("> LocalAbsMouse:", local_abs_mouse)
-
-        '''
-        rotation = local_space__rect.rotation
-
-        view_bbox = local_space__rect.bound_box
-        view_bbox_bot_left = view_bbox[1] # Left Bottom corner.
-        view_co_bot_left: Vector = local_space__rect.bottom_left
-        view_origin = Vector(local_space__rect.origin)
-        view_bbox_size = local_space__rect.bound_box_size
-        view_size = local_space__rect.size
-        view_zoom = get_node_editor_zoom(context)
-        # view_zoom_inv = 1 / view_zoom
-
-        reg_mouse = self.current
-        reg_pos = get_node_editor_region_coord(context, view_co_bot_left)
-        reg_origin = get_node_editor_region_coord(context, view_origin)
-        reg_bbox_size = view_bbox_size * view_zoom
-        reg_size = view_size * view_zoom
+        # Inverse of ((a, b), (c, d)) applied to the mouse relative to the bottom-left corner.
+        k = 1 / A_det
+        q_x = self._x - bl_x
+        q_y = self._y - bl_y
+        rel_x = k * (d * q_x - b * q_y)
+        rel_y = k * (a * q_y - c * q_x)
+
+        view_size = self._rect.size
+        abs_x = rel_x * view_size[0] * view_zoom
+        abs_y = rel_y * view_size[1] * view_zoom
+
+        self._local_rel.x = rel_x
+        self._local_rel.y = rel_y
+
+        if not self._local_ready:
+            self._local_ready = True
+            self._local_start.x = self._local_current.x = self._local_prev.x = abs_x
+            self._local_start.y = self._local_current.y = self._local_prev.y = abs_y
+            self._local_offset.zero()
+            self._local_delta.zero()
+            self._local_dir.zero()
+            self._local_delta_int.zero()
+            self._local_delta_acummulative.zero()
+            return
 
-        reg_origin_norm = reg_origin - reg_pos
-        reg_mouse_norm = reg_mouse - reg_pos
+        self._local_prev.x = self._local_current.x
+        self._local_prev.y = self._local_current.y
+        self._local_current.x = abs_x
+        self._local_current.y = abs_y
 
-        if rotation == 0:
-            reg_mouse_norm_t = reg_mouse_norm
-            reg_size_t = view_size
-        else:
-            reg_mouse_norm_t = rotate_point(reg_mouse_norm, Vector((0, 0)), -rotation)
-            reg_size_t = rotate_point(reg_size, Vector((0, 0)), -rotation)
+        delta_x = abs_x - self._local_prev.x
+        delta_y = abs_y - self._local_prev.y
+        self._local_delta.x = delta_x
+        self._local_delta.y = delta_y
 
-        rel_mouse = Vector((
-            clamp(reg_mouse_norm_t.x / reg_size_t.x),
-            clamp(reg_mouse_norm_t.y / reg_size_t.y)
-        ))
+        acc = self._local_delta_acummulative
+        acc.x, self._local_delta_int.x = modf(acc.x + delta_x) # NOTE: CAN CAUSE FLOATINT POINT ROUNDING ERROR.
+        acc.y, self._local_delta_int.y = modf(acc.y + delta_y) # NOTE: CAN CAUSE FLOATINT POINT ROUNDING ERROR.
 
-        # reg_mouse_norm_t === LOCAL COORDINATES... But with error if rotation is present...
-        # rel_mouse === RELATIVE LOCAL COORDINATES... Mapped between [0, 1].
-        '''
+        self._local_offset.x = abs_x - self._local_start.x
+        self._local_offset.y = abs_y - self._local_start.y
 
-        self.local_rel = local_rel_mouse
+        self._local_dir.x = _sign(delta_x)
+        self._local_dir.y = _sign(delta_y)
 
+    def update_local_space(self, context: Context, local_space__rect: _RectTransform, first_time: bool = False) -> None:
+        ''' Computes the local space coordinates now instead of on the next read. '''
+        self._set_view(context)
+        self._rect = local_space__rect
         if first_time:
-            self.local_start = local_abs_mouse.copy()
-            self.local_current = local_abs_mouse.copy()
-            self.local_prev = local_abs_mouse.copy()
-            self.local_offset = Vector((0, 0))
-            self.local_delta = Vector((0, 0))
-            self.local_dir = Vector((0, 0))
-            self.local_delta_int = Vector((0, 0))
-            self.local_delta_acummulative = Vector((0, 0))
-        else:
-            self.local_prev.x = self.local_current.x
-            self.local_prev.y = self.local_current.y
-            self.local_current.x = local_abs_mouse.x
-            self.local_current.y = local_abs_mouse.y
-
-            self.local_delta.x = local_abs_mouse.x - self.local_prev.x
-            self.local_delta.y = local_abs_mouse.y - self.local_prev.y
-
-            cummulative = self.local_delta_acummulative + self.local_delta
-            self.local_delta_acummulative.x, self.local_delta_int.x = modf(cummulative.x) # NOTE: CAN CAUSE FLOATINT POINT ROUNDING ERROR.
-            self.local_delta_acummulative.y, self.local_delta_int.y = modf(cummulative.y) # NOTE: CAN CAUSE FLOATINT POINT ROUNDING ERROR.
-
-            # self.local_delta = rotate_point(self.local_delta, Vector((0, 0)), local_space__rect.rotation)
-            self.local_offset.x = self.local_current.x - self.local_start.x
-            self.local_offset.y = self.local_current.y - self.local_start.y
-
-            self.local_dir.x = 0 if self.local_delta.x==0 else 1 if self.local_delta.x > 0 else -1
-            self.local_dir.y = 0 if self.local_delta.y==0 else 1 if self.local_delta.y > 0 else -1
-
-        # print(self.local_current, " ----- ", self.local_rel) # " ----- ", reg_size)
-        # print("Region Dimensions:", reg_bbox_size)
+            self._local_ready = False
+        self._local_valid = False
+        self._update_local()
+
+    @property
+    def local_rel(self) -> Vector:
+        ''' Local space coordinates, relative factor between [0, 1]. '''
+        self._update_local()
+        return self._local_rel
+
+    @property
+    def local_current(self) -> Vector:
+        ''' Current local space coordinates. '''
+        self._update_local()
+        return self._local_current
+
+    @property
+    def local_prev(self) -> Vector:
+        self._update_local()
+        return self._local_prev
+
+    @property
+    def local_start(self) -> Vector:
+        self._update_local()
+        return self._local_start
+
+    @property
+    def local_offset(self) -> Vector:
+        self._update_local()
+        return self._local_offset
+
+    @property
+    def local_delta(self) -> Vector:
+        self._update_local()
+        return self._local_delta
+
+    @property
+    def local_dir(self) -> Vector:
+        self._update_local()
+        return self._local_dir
+
+    @property
+    def local_delta_int(self) -> Vector:
+        ''' Same as local_delta but it always returns a integer value, with cumulative effect. '''
+        self._update_local()
+        return self._local_delta_int
+
+    @property
+    def local_delta_acummulative(self) -> Vector:
+        ''' Exclusively used for 'local_delta_int' as a cumulative delta value. '''
+        self._update_local()
+        return self._local_delta_acummulative
 
 
 def get_mouse_pos(event: Event) -> Vector:
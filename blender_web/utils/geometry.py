@@ -8,7 +8,7 @@ from bpy.types import Object
 import bmesh
 from bmesh.types import BMesh, BMFace
 
-from .math import dotproduct, length, cross
+from .math import dotproduct, length
 
 
 # Constant integers for directions
@@ -212,43 +212,7 @@ def calculate_scale_to_fit_box_in_box(box1: list[float | int], box2: list[float
 
 
 def distance_to_line_segment(A: Vector, B: Vector, P: Vector) -> float:
-    x, y = P
-    x1, y1 = A
-    x2, y2 = B
-
-    # Calculate the direction vector of the segment
-    dx = x2 - x1
-    dy = y2 - y1
-
-    # Calculate the length of the direction vector
-    segment_length = sqrt(dx * dx + dy * dy)
-
-    # Avoid division by zero
-    if segment_length == 0:
-        return sqrt((x - x1) ** 2 + (y - y1) ** 2)
-
-    # Calculate the normalized direction vector
-    dx /= segment_length
-    dy /= segment_length
-
-    # Calculate the vector from the start point to the point
-    vx = x - x1
-    vy = y - y1
-
-    # Calculate the dot product of the vector and the direction vector
-    dot_product = vx * dx + vy * dy
-
-    if dot_product <= 0:
-        # The point is before the segment
-        return sqrt((x - x1) ** 2 + (y - y1) ** 2)
-
-    if dot_product >= segment_length:
-        # The point is after the segment
-        return sqrt((x - x2) ** 2 + (y - y2) ** 2)
-
-    # The point is on the segment
-    distance = sqrt((x - (x1 + dx * dot_product)) ** 2 + (y - (y1 + dy * dot_product)) ** 2)
-    return distance
+    return float(distance_to_line_segments(P, A, B))
 
 
 def rect_overlap(rect_A, rect_B) -> bool:
@@ -285,56 +249,20 @@ def is_inside_triangle(x1, y1, x2, y2, x3, y3, x, y):
     else:
         return False
 
-def is_point_inside_triangle(p, p1, p2, p3):
-    def sign(p1, p2, p3):
-        return (p1[0] - p3[0]) * (p2[1] - p3[1]) - (p2[0] - p3[0]) * (p1[1] - p3[1])
+def is_point_inside_triangle(p, p1, p2, p3) -> bool:
+    return bool(points_inside_triangles(p, (p1, p2, p3)))
 
-    d1 = sign(p, p1, p2)
-    d2 = sign(p, p2, p3)
-    d3 = sign(p, p3, p1)
 
-    has_neg = (d1 < 0) or (d2 < 0) or (d3 < 0)
-    has_pos = (d1 > 0) or (d2 > 0) or (d3 > 0)
-
-    return not (has_neg and has_pos)
-
-
-def point_inside_rect(_p, _pos, _size, _angle=0, origin: Vector | None = None):
+def point_inside_rect(_p, _pos, _size, _angle=0, origin: Vector | None = None) -> bool:
     ''' NOTE: '_angle' should be given in radians.
         '_p', '_pos' and '_size' should be Vector type.
         '_pos' should be the lower left corner of the rectangle.
     '''
-    if _angle != 0:
-        p = _p.copy()
-        # rotate around rectangle center by -rectAngle
-        s = sin(-_angle)
-        c = cos(-_angle)
-        if origin is not None:
-            rect_center: Vector = origin
-        else:
-            rect_center: Vector = _pos + _size * 0.5
-        # set origin to rect center
-        p -= rect_center
-        # rotate
-        p = Vector((p.x * c - p.y * s, p.x * s + p.y * c))
-        # put origin back
-        p += rect_center
-    else:
-        p = _p
-
-    return ((_pos[0] + _size[0]) > p[0] > _pos[0]) and ((_pos[1] + _size[1]) > p[1] > _pos[1])
+    return bool(points_inside_rects(_p, _pos, _size, _angle, origin))
 
 
 def check_point_in_convex_hull(convex_hull: list[Vector], point: Vector) -> bool:
-    def _is_inside() -> bool:
-        for idx in range(1, len(convex_hull)):
-            if cross(convex_hull[idx - 1], convex_hull[idx], point) < 0:
-                return False
-        return True
-
-    # visualize results
-    # draw_results(convex_hull, point, _is_inside())
-    return _is_inside()
+    return bool(points_in_convex_hull(convex_hull, point))
 
 
 def get_center(pos: Vector, size: Vector) -> Vector:
@@ -344,9 +272,120 @@ def get_center(pos: Vector, size: Vector) -> Vector:
 def rotate_point(p: Vector, o: Vector, angle: float) -> Vector:
     if angle == 0:
         return p
-    qx = o.x + cos(angle) * (p.x - o.x) - sin(angle) * (p.y - o.y)
-    qy = o.y + sin(angle) * (p.x - o.x) + cos(angle) * (p.y - o.y)
-    return Vector((qx, qy))
+    return Vector(rotate_points(p, o, angle))
+
+
+# ----------------------------------------------------------------
+# Batch kernels.
+# Points are (N, 2) arrays, shapes are a single shape or a stack of M shapes: the result is an (N,) array
+# for a single shape and an (M, N) array for M shapes. A single point (2,) gives a scalar result.
+
+
+def as_points(points) -> np.ndarray:
+    ''' Vectors, tuples or arrays as a float64 array of shape (..., 2). '''
+    points = np.asarray(points, dtype=np.float64)
+    if points.shape[-1] != 2:
+        points = points[..., :2]
+    return points
+
+
+def rotate_points(points, origin, angle) -> np.ndarray:
+    ''' Rotates the points around 'origin' by 'angle' (radians). '''
+    points = as_points(points)
+    origin = as_points(origin)
+    c = np.cos(angle)
+    s = np.sin(angle)
+    dx = points[..., 0] - origin[..., 0]
+    dy = points[..., 1] - origin[..., 1]
+    return np.stack((origin[..., 0] + c * dx - s * dy, origin[..., 1] + s * dx + c * dy), axis=-1)
+
+
+def _shape_axis(points: np.ndarray, shape: np.ndarray, shape_ndim: int) -> tuple[np.ndarray, np.ndarray]:
+    ''' Broadcasts (N, 2) points against (M, ..., 2) shapes: points gain a leading axis,
+        shapes a trailing one before their own dimensions. '''
+    if shape.ndim > shape_ndim:
+        shape = shape.reshape(shape.shape[:1] + (1,) * (points.ndim - 1) + shape.shape[1:])
+    return points, shape
+
+
+def points_inside_rects(points, pos, size, angle=0, origin=None) -> np.ndarray:
+    ''' Mask of the points strictly inside the rects. 'pos' is the lower left corner, 'angle' in radians
+        rotates the rect around 'origin' (its center by default). 'pos', 'size', 'angle' and 'origin'
+        can be stacks of M rects. '''
+    points = as_points(points)
+    pos = as_points(pos)
+    size = as_points(size)
+    angle = np.asarray(angle, dtype=np.float64)
+    if pos.ndim > 1 or size.ndim > 1 or angle.ndim > 0:
+        count = max(len(pos) if pos.ndim > 1 else 1, len(size) if size.ndim > 1 else 1, angle.size)
+        pos = np.broadcast_to(pos, (count, 2))
+        size = np.broadcast_to(size, (count, 2))
+        angle = np.broadcast_to(angle, (count,))
+        if origin is not None:
+            origin = np.broadcast_to(as_points(origin), (count, 2))
+        expand = (slice(None),) + (None,) * (points.ndim - 1)
+        pos = pos[expand]
+        size = size[expand]
+        angle = angle[expand]
+        if origin is not None:
+            origin = origin[expand]
+
+    if np.any(angle != 0):
+        if origin is None:
+            origin = pos + size * 0.5
+        points = rotate_points(points, origin, -angle)
+
+    local = points - pos
+    return (local[..., 0] > 0) & (local[..., 0] < size[..., 0]) & (local[..., 1] > 0) & (local[..., 1] < size[..., 1])
+
+
+def points_inside_triangles(points, triangles) -> np.ndarray:
+    ''' Mask of the points inside the (3, 2) triangle or (M, 3, 2) triangles, edges included. Any winding. '''
+    points, triangles = _shape_axis(as_points(points), as_points(triangles), 2)
+    a = triangles[..., 0, :]
+    b = triangles[..., 1, :]
+    c = triangles[..., 2, :]
+    px = points[..., 0]
+    py = points[..., 1]
+
+    d1 = (px - b[..., 0]) * (a[..., 1] - b[..., 1]) - (a[..., 0] - b[..., 0]) * (py - b[..., 1])
+    d2 = (px - c[..., 0]) * (b[..., 1] - c[..., 1]) - (b[..., 0] - c[..., 0]) * (py - c[..., 1])
+    d3 = (px - a[..., 0]) * (c[..., 1] - a[..., 1]) - (c[..., 0] - a[..., 0]) * (py - a[..., 1])
+
+    has_neg = (d1 < 0) | (d2 < 0) | (d3 < 0)
+    has_pos = (d1 > 0) | (d2 > 0) | (d3 > 0)
+    return ~(has_neg & has_pos)
+
+
+def points_in_convex_hull(convex_hull, points) -> np.ndarray:
+    ''' Mask of the points on the left side (or on) every edge of the CCW (K, 2) hull.
+        Like 'check_point_in_convex_hull', the edges link consecutive points: repeat the first point to close it. '''
+    hull = as_points(convex_hull)
+    points = as_points(points)
+    o = hull[:-1]
+    a = hull[1:]
+    # (K-1, ...) cross products of every edge with every point.
+    expand = (slice(None),) + (None,) * (points.ndim - 1)
+    ox, oy = o[:, 0][expand], o[:, 1][expand]
+    crosses = (a[:, 0][expand] - ox) * (points[..., 1] - oy) - (a[:, 1][expand] - oy) * (points[..., 0] - ox)
+    return np.all(crosses >= 0, axis=0)
+
+
+def distance_to_line_segments(points, a, b) -> np.ndarray:
+    ''' Distance of the points to the segment a-b, or to each of the (M, 2) segments. '''
+    points = as_points(points)
+    a = as_points(a)
+    b = as_points(b)
+    if a.ndim > 1:
+        points, a = _shape_axis(points, a, 1)
+        points, b = _shape_axis(points, b, 1)
+    ab = b - a
+    ap = points - a
+    length_sq = np.einsum('...i,...i->...', ab, ab)
+    # Degenerate segments project everything on 'a'.
+    t = np.einsum('...i,...i->...', ap, ab) / np.where(length_sq == 0, 1.0, length_sq)
+    t = np.clip(t, 0.0, 1.0)[..., None]
+    return np.hypot(*np.moveaxis(ap - ab * t, -1, 0))
 
 
 def angle_between(v1: Vector, v2: Vector) -> float:
@@ -432,15 +471,98 @@ def find_edges(tri_indices: list[tuple[int, int, int]]) -> list[Edge]:
     # Convert the dictionary values to a list
     edges: list[Edge] = list(edge_dict.values())
 
-    # Second pass to establish linked_edges
+    # Second pass to establish linked_edges, through the edges of each vertex.
+    vert_edges: dict[int, list[Edge]] = defaultdict(list)
     for edge in edges:
-        for other_edge in edges:
-            if other_edge != edge and any(v in other_edge.verts for v in edge.verts):
-                edge.linked_edges.add(other_edge)
+        for vert in edge.verts:
+            vert_edges[vert].append(edge)
+    for edge in edges:
+        for vert in edge.verts:
+            edge.linked_edges.update(vert_edges[vert])
+        edge.linked_edges.discard(edge)
 
     return edges
 
 
+def find_boundary_edges(indices) -> np.ndarray:
+    ''' (B, 2) boundary edges of the (T, 3) triangles: the edges used by a single triangle.
+        They keep the winding of their triangle, so with CCW triangles outer boundaries run CCW and holes CW. '''
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    edges = np.stack((tris, np.roll(tris, -1, axis=1)), axis=-1).reshape(-1, 2)
+    if not len(edges):
+        return edges
+    # Undirected key of every edge, then the keys seen once.
+    low = np.minimum(edges[:, 0], edges[:, 1])
+    high = np.maximum(edges[:, 0], edges[:, 1])
+    keys = low * (int(high.max()) + 1) + high
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = first[1:]
+    return edges[np.sort(order[first & last])]
+
+
+def find_boundary_loops(indices) -> list[np.ndarray]:
+    ''' Closed boundary loops of the triangles, as arrays of vertex indices (the first vertex is not repeated).
+        Every outline and hole gives its own loop. The triangles must share a consistent winding.
+        O(E log E): boundary edges are chained by sorting them by their start vertex instead of searching. '''
+    edges = find_boundary_edges(indices)
+    count = len(edges)
+    if count == 0:
+        return []
+    src = edges[:, 0]
+    dst = edges[:, 1]
+
+    # Pair the edges ending at each vertex with the edges starting there. Vertices shared by two loops
+    # (bow-ties) have two of each and are paired in order.
+    incoming = np.argsort(dst)
+    outgoing = np.argsort(src)
+    if not np.array_equal(dst[incoming], src[outgoing]):
+        raise ValueError("Boundary edges can't be chained: the triangles have an inconsistent winding")
+    next_edge = np.empty(count, dtype=np.int64)
+    next_edge[incoming] = outgoing
+
+    loops = []
+    visited = bytearray(count)
+    next_edge_list = next_edge.tolist()
+    for start in range(count):
+        if visited[start]:
+            continue
+        loop = []
+        edge = start
+        while not visited[edge]:
+            visited[edge] = 1
+            loop.append(edge)
+            edge = next_edge_list[edge]
+        loops.append(src[loop])
+    return loops
+
+
+def polygon_signed_area(coords) -> float:
+    ''' Shoelace area of the closed (K, 2) polygon: positive when it is CCW. '''
+    coords = as_points(coords)
+    x = coords[:, 0]
+    y = coords[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def find_boundary_outlines(indices, vertices) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    ''' Boundary loops of the triangles as (K, 2) coordinate arrays, split in outlines and holes
+        by their winding (CCW triangles expected). Largest first. '''
+    vertices = as_points(vertices)
+    outlines = []
+    holes = []
+    for loop in find_boundary_loops(indices):
+        coords = vertices[loop]
+        area = polygon_signed_area(coords)
+        (outlines if area >= 0 else holes).append((abs(area), coords))
+    outlines.sort(key=lambda item: item[0], reverse=True)
+    holes.sort(key=lambda item: item[0], reverse=True)
+    return [coords for _area, coords in outlines], [coords for _area, coords in holes]
+
+
 def find_boundary_vertices_sorted__convex(vertices: list[tuple[float, float]], indices: list[tuple[int, int, int]]):
     '''
         # Example: indices of triangles in CCW order
@@ -471,6 +593,7 @@ def find_boundary_vertices_sorted__convex(vertices: list[tuple[float, float]], i
 def find_boundary_vertices_sorted__nonconvex(indices: list[tuple[int, int, int]], vertices: list[tuple[float, float]] | None = None):
     '''
         If no vertices are given, it will return a list of indices.
+        Returns the longest boundary loop, see 'find_boundary_loops' for every loop.
 
         # Example: indices of triangles in CCW order
         indices = [(0, 1, 4), (0, 4, 2), (4, 1, 3)]
@@ -478,65 +601,14 @@ def find_boundary_vertices_sorted__nonconvex(indices: list[tuple[int, int, int]]
         # Example: vertices as a list of 2D vectors
         vertices = [(0.0, 0.0), (1.0, 0.0), (0.0, 1.0), (1.0, 1.0), (0.5, 0.5)]
     '''
-    def walk_border(start_edge: Edge) -> list[Edge]:
-        walked: set[Edge] = set()
-        boundary_path: list[Edge] = []
-
-        def recursive_walk(edge: Edge):
-            if edge in walked:
-                return
-            walked.add(edge)
-
-            # Add the current edge to the boundary_path
-            boundary_path.append(edge)
-
-            for linked_edge in edge.linked_edges:
-                if linked_edge.is_boundary:
-                    recursive_walk(linked_edge)
-                    if edge == start_edge:
-                        break
-
-        recursive_walk(start_edge)
-
-        return boundary_path
-
-    edges = find_edges(indices)
-
-    # Get boundary edges
-    boundary_edges = [e for e in edges if e.is_boundary]
-
-    if len(boundary_edges) == 0:
+    loops = find_boundary_loops(indices)
+    if len(loops) == 0:
         return []
 
-    # Set a starting edge for walking
-    start_edge = boundary_edges[0]
-
-    # Walk the border and get the boundary path
-    walked_path = walk_border(start_edge)
-
-    # Turn the edge path into a vertices path.
-    unique_vertices = set()
-    result_vertices = []
-    as_indices = vertices is None
-
-    for edge in walked_path:
-        for vertex_index in edge.verts:
-            if as_indices:
-                if vertex_index not in unique_vertices:
-                    result_vertices.append(vertex_index)
-                    unique_vertices.add(vertex_index)
-            else:
-                vertex_coords = vertices[vertex_index]
-                if vertex_coords not in unique_vertices:
-                    result_vertices.append(vertex_coords)
-                    unique_vertices.add(vertex_coords)
-
-    # Fix BAD sign.
-    last_edge = walked_path[-1]
-    if result_vertices[0] not in last_edge.verts and result_vertices[1] in last_edge.verts:
-        result_vertices[0], result_vertices[1] = result_vertices[1], result_vertices[0]
-
-    return result_vertices
+    loop = max(loops, key=len).tolist()
+    if vertices is None:
+        return loop
+    return [tuple(vertices[vertex_index]) for vertex_index in loop]
 
 
 def calculate_matrix_world(position, rotation, size, scale):
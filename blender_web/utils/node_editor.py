@@ -1,17 +1,23 @@
 from bpy.types import Context, SpaceNodeEditor, Area, Region
 from mathutils import Vector
 
-from ..ackit.bcy import CyBlStruct
+from ..ackit.bcy import CyBlStruct, RegionView
 from .geometry import Box
 
 
 def get_node_editor_view_point(context: Context, region_point: Vector) -> Vector:
+    if view := RegionView.get(context.region):
+        return Vector(view.region_to_view(*region_point))
     return Vector(context.region.view2d.region_to_view(*region_point))
 
 def get_node_editor_region_coord(context: Context, view_co: Vector) -> Vector:
+    if view := RegionView.get(context.region):
+        return Vector(view.view_to_region(*view_co))
     return Vector(context.region.view2d.view_to_region(*view_co, clip=False))
 
 def get_node_editor_offset(context: Context) -> Vector:
+    if view := RegionView.get(context.region):
+        return Vector(view.offset)
     return Vector(context.region.view2d.view_to_region(0, 0, clip=False)) # * get_node_editor_zoom(context)
 
 def get_window_region(area: Area) -> Region:
@@ -20,15 +26,20 @@ def get_window_region(area: Area) -> Region:
             return region
     return None
 
+def get_node_editor_window_region(context: Context) -> Region:
+    return context.region if context.region.type == 'WINDOW' else get_window_region(context.area)
+
 def get_node_editor_view_center(context: Context) -> Vector:
-    region = context.region if context.region.type == 'WINDOW' else get_window_region(context.area)
+    region = get_node_editor_window_region(context)
     rw, rh = region.width, region.height
     rw = int(rw * 0.5)
     rh = int(rh * 0.5)
     return get_node_editor_view_point(context, (rw, rh))
 
 def get_node_editor_zoom(context: Context) -> float:
-    region = context.region if context.region.type == 'WINDOW' else get_window_region(context.area)
+    region = get_node_editor_window_region(context)
+    if view := RegionView.get(region):
+        return view.zoom
     view2d = region.view2d
     region_height = region.height
     view_height = view2d.region_to_view(0, region_height)[1] - view2d.region_to_view(0, 0)[1]
@@ -38,11 +49,13 @@ def get_node_editor_zoom(context: Context) -> float:
 
 def get_node_editor_view_size(context: Context | Area | Region) -> Vector:
     if isinstance(context, Context):
-        region = context.region if context.region.type == 'WINDOW' else get_window_region(context.area)
+        region = get_node_editor_window_region(context)
     elif isinstance(context, Area):
         region = get_window_region(context)
     else:
         region = context
+    if view := RegionView.get(region):
+        return Vector(view.view_size)
     view2d = region.view2d
     return Vector(view2d.region_to_view(region.width, region.height)) - Vector(view2d.region_to_view(0, 0))
 
@@ -101,7 +114,7 @@ def center_node_editor_view(context: Context) -> None:
 
 
 def get_node_editor_visible_view_box(context: Context) -> Box:
-    region = context.region if context.region.type == 'WINDOW' else get_window_region(context.area)
+    region = get_node_editor_window_region(context)
     cy_region = CyBlStruct.UI_REGION(region)
     return Box(
         cy_region.v2d.cur.xmin,
@@ -0,0 +1,84 @@
+import weakref
+
+import bpy
+from bpy.types import Context, Region, WindowManager
+
+from .ackit import ACK
+
+
+# How often the visibility of the running views is checked (seconds).
+VISIBILITY_CHECK_INTERVAL = 0.25
+# Regions smaller than this (collapsed areas) don't display their view.
+MIN_REGION_SIZE = 2
+
+
+def find_visible_region(area_type: str) -> Region | None:
+    ''' WINDOW region of a displayed area of 'area_type', in any window. Areas of inactive workspaces
+        are not on a window screen, collapsed ones have a tiny region. '''
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type != area_type:
+                continue
+            for region in area.regions:
+                if region.type == 'WINDOW' and region.width >= MIN_REGION_SIZE and region.height >= MIN_REGION_SIZE:
+                    return region
+    return None
+
+
+class ViewManager:
+    ''' Suspends the running web views that nothing displays.
+
+        A hidden view stops painting (the renderer gets VISIBILITY, CEF 'WasHidden(True)') and no longer
+        polls frames. Its last frame is kept as an 8-bit copy, drawn right away when the view shows up
+        again, until the renderer paints a new one. With 'bws_release_hidden_views', hidden views also
+        free their frame ring and get a new one on show: many open web panels only hold the memory of
+        the visible ones.
+        Views implement 'area_type', 'is_visible', 'keeps_running()' and 'set_visible(visible, region, release)'
+        (see CEF_Python_Controller).
+    '''
+    _views: 'weakref.WeakSet' = weakref.WeakSet()
+    _timer = None
+
+    @classmethod
+    def add(cls, view) -> None:
+        cls._views.add(view)
+        if cls._timer is None or not cls._timer.is_running:
+            # Persistent: the views outlive a file load.
+            cls._timer = ACK.Helper.TIMER(cls.update, first_interval=VISIBILITY_CHECK_INTERVAL,
+                                          step_interval=VISIBILITY_CHECK_INTERVAL, one_time_only=False, persistent=True)
+
+    @classmethod
+    def remove(cls, view) -> None:
+        cls._views.discard(view)
+        if not cls._views and cls._timer is not None:
+            cls._timer.stop()
+            cls._timer = None
+
+    @classmethod
+    def update(cls) -> int | None:
+        views = list(cls._views)
+        if not views:
+            cls._timer = None
+            return -1
+        release = bpy.context.window_manager.bws_release_hidden_views
+        # One screen walk per area type.
+        regions: dict[str, Region | None] = {}
+        for view in views:
+            area_type = view.area_type
+            if area_type not in regions:
+                regions[area_type] = find_visible_region(area_type)
+            region = regions[area_type]
+            visible = region is not None or view.keeps_running()
+            if visible != view.is_visible:
+                view.set_visible(visible, region, release)
+        return None
+
+
+def draw_release_hidden_views(layout: bpy.types.UILayout, context: Context) -> None:
+    layout.prop(context.window_manager, 'bws_release_hidden_views', text='', icon='MEMORY', toggle=True)
+
+
+def init():
+    ACK.Helper.PROP(WindowManager, 'bws_release_hidden_views', ACK.Prop.BOOL(
+        name="Release Hidden Views", default=False,
+        description="Free the frame memory of the web views that are not displayed (a new one is created when they show up again)"))
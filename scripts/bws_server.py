@@ -1,24 +1,12 @@
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from typing import Dict, Any
-import json
-import asyncio
-from pydantic import BaseModel
-
-class Event(BaseModel):
-    type: str
-    x: int = 0
-    y: int = 0
-    key: int = 0
-    modifiers: Dict[str, bool] = {}
-
-class WebEvent(BaseModel):
-    type: str
-    element_id: str
-    element_type: str
-    value: Any = None
-    extra: Dict[str, Any] = {}
+import sys
+from os import path
+
+# Shared with the renderers: frames as tile deltas, binary events, per-client queues (see bws_stream.py).
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'blender_web', 'scripts'))
+from bws_stream import HUB_PORT, ROLE, StreamHub, serve_tcp
 
 app = FastAPI()
 
@@ -31,89 +19,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store connected clients
-blender_ws = None
-qt_ws = None
-web_ws = None
+hub = StreamHub()
 
-@app.websocket("/ws/blender")
-async def blender_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    global blender_ws
-    blender_ws = websocket
-    try:
-        while True:
-            # Receive events from Blender
-            data = await websocket.receive_json()
-            event = Event(**data)
-            
-            # Forward to Qt
-            if qt_ws:
-                await qt_ws.send_json(event.dict())
-            
-    except Exception as e:
-        print(f"Blender websocket error: {e}")
-    finally:
-        blender_ws = None
-
-@app.websocket("/ws/qt")
-async def qt_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    global qt_ws
-    qt_ws = websocket
-    try:
-        while True:
-            # Receive events from Qt
-            data = await websocket.receive_json()
-            
-            # Forward to appropriate client
-            if data.get("target") == "blender" and blender_ws:
-                await blender_ws.send_json(data)
-            elif data.get("target") == "web" and web_ws:
-                await web_ws.send_json(data)
-                
-    except Exception as e:
-        print(f"Qt websocket error: {e}")
-    finally:
-        qt_ws = None
-
-@app.websocket("/ws/web")
-async def web_endpoint(websocket: WebSocket):
+# The Qt renderer was the only publisher of this hub.
+ROLES = {"blender": ROLE.BLENDER, "qt": ROLE.RENDERER, "renderer": ROLE.RENDERER, "web": ROLE.WEB}
+
+
+@app.on_event("startup")
+async def start_tcp_hub():
+    """Same hub over plain TCP, for Blender (bws_remote.py) and renderers without a WebSocket client"""
+    app.state.tcp_server = await serve_tcp(hub, "127.0.0.1", HUB_PORT)
+
+
+@app.on_event("shutdown")
+async def stop_tcp_hub():
+    app.state.tcp_server.close()
+
+
+@app.websocket("/ws/{role}")
+async def hub_endpoint(websocket: WebSocket, role: str):
+    if role not in ROLES:
+        await websocket.close(code=1008)
+        return
     await websocket.accept()
-    global web_ws
-    web_ws = websocket
-    try:
-        while True:
-            # Receive events from web
-            data = await websocket.receive_json()
-            web_event = WebEvent(**data)
-            
-            # Forward to Qt
-            if qt_ws:
-                await qt_ws.send_json(web_event.dict())
-            
-    except Exception as e:
-        print(f"Web websocket error: {e}")
-    finally:
-        web_ws = None
+    # Binary messages only: frames, events and replies (bws_stream.MESSAGE).
+    await hub.serve(ROLES[role], websocket.send_bytes, websocket.receive_bytes)
+
 
 @app.get("/element")
 async def get_element_at(x: int, y: int):
-    """Get element info at coordinates"""
-    if qt_ws:
-        await qt_ws.send_json({
-            "type": "get_element",
-            "x": x,
-            "y": y
-        })
-        # Wait for response from Qt
-        data = await qt_ws.receive_json()
-        return data
-    return {"error": "Qt not connected"}
+    """Get element info at coordinates. Stub for now: the published renderers answer every query with an error"""
+    # The reply is read by the renderer's receive loop and matched by correlation id.
+    return await hub.request({"type": "get_element", "x": x, "y": y})
+
 
 def run_server():
     """Run the FastAPI server"""
     uvicorn.run(app, host="127.0.0.1", port=8000)
 
 if __name__ == "__main__":
-    run_server() 
\ No newline at end of file
+    run_server()
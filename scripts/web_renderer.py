@@ -9,6 +9,10 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtGui import QImage, QPainter, QMouseEvent, QKeyEvent, QWheelEvent
 from multiprocessing import shared_memory
 
+# Shared Qt capture (zero-copy QImage over the SHM).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blender_web', 'scripts'))
+from bws_qt import QtFrameCapture, setup_profile
+
 class EventServer:
     def __init__(self, host='localhost', port=65432):
         self.host = host
@@ -113,7 +117,8 @@ class MainWindow(QMainWindow):
         page.setBackgroundColor(Qt.transparent)
         # Prevent new windows from opening
         page.windowCloseRequested.connect(lambda: None)
-        page.profile().setHttpCacheType(page.profile().MemoryHttpCache)
+        # Disk cache in the addon cache directory: kept between launches.
+        setup_profile(page.profile())
         
         self.web_view.setFixedSize(1024, 768)
         self.web_view.setMouseTracking(True)
@@ -133,6 +138,7 @@ class MainWindow(QMainWindow):
             self.shared_memory = shared_memory.SharedMemory(create=True, size=1024 * 768 * 4, name=shared_mem_name)
         except FileExistsError:
             self.shared_memory = shared_memory.SharedMemory(name=shared_mem_name)
+        self.capture = QtFrameCapture.from_buffer(self.shared_memory.buf, 1024, 768)
 
         # Setup timer for page capture
         self.timer = QTimer(self)
@@ -281,14 +287,8 @@ class MainWindow(QMainWindow):
             print("[QT] Failed to load page")
 
     def capture_page(self):
-        image = QImage(self.size(), QImage.Format_RGBA8888)
-        image.fill(Qt.transparent)
-        painter = QPainter(image)
-        self.web_view.render(painter)
-        painter.end()
-
-        byte_data = image.bits().asstring(1024 * 768 * 4)
-        self.shared_memory.buf[:len(byte_data)] = byte_data
+        # Renders straight into the shared memory.
+        self.capture.capture(self.web_view)
 
     def closeEvent(self, event):
         """Prevent window from closing"""
@@ -316,6 +316,7 @@ if __name__ == "__main__":
     def cleanup():
         print("[QT] Cleaning up...")
         window.event_server.stop()
+        window.capture.close()
         window.shared_memory.close()
         app.quit()
     
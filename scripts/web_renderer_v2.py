@@ -9,6 +9,10 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtGui import QImage, QPainter, QMouseEvent, QKeyEvent
 from multiprocessing import shared_memory
 
+# Shared Qt capture (zero-copy QImage over the SHM).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blender_web', 'scripts'))
+from bws_qt import QtFrameCapture
+
 class EventServer:
     def __init__(self, host='localhost', port=65432):
         self.host = host
@@ -131,6 +135,7 @@ class OffscreenWebView(QWebEngineView):
             self.shared_memory = shared_memory.SharedMemory(create=True, size=1024 * 768 * 4, name=shared_mem_name)
         except FileExistsError:
             self.shared_memory = shared_memory.SharedMemory(name=shared_mem_name)
+        self.capture = QtFrameCapture.from_buffer(self.shared_memory.buf, 1024, 768)
 
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.capture_page)
@@ -242,16 +247,8 @@ class OffscreenWebView(QWebEngineView):
         print(f"[QT] Page background color: {color}")
 
     def capture_page(self):
-        # print("[QT] Capturing page")
-        image = QImage(self.size(), QImage.Format_RGBA8888)
-        image.fill(Qt.transparent)
-        painter = QPainter(image)
-        self.render(painter)
-        painter.end()
-
-        # Copy the pixel data directly to shared memory
-        byte_data = image.bits().asstring(1024 * 768 * 4)
-        self.shared_memory.buf[:len(byte_data)] = byte_data
+        # Renders straight into the shared memory.
+        self.capture.capture(self)
 
     def closeEvent(self, event):
         """Prevent window from closing"""